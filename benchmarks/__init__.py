@@ -0,0 +1,5 @@
+"""
+Benchmarks of ``multinosetests`` overhead
+
+Run them via ``python -m benchmarks --help``.
+"""
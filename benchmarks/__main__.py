@@ -0,0 +1,7 @@
+from __future__ import print_function, unicode_literals
+
+from .run import main
+
+
+if __name__ == '__main__':
+    main()
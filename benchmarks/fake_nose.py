@@ -0,0 +1,32 @@
+"""
+Stand-in for nosetests which sleeps and writes a tiny xunit report
+
+Used to measure scheduling overhead of ``multinosetests``
+without the noise of actually running tests::
+
+    python fake_nose.py --with-xunit --sleep=0.5 --xunit-file=nosetests.xml
+"""
+from __future__ import print_function, unicode_literals
+import sys
+import time
+
+
+REPORT = """<?xml version="1.0" encoding="UTF-8"?>
+<testsuite name="nosetests" tests="1" errors="0" failures="0" skip="0">
+<testcase classname="fake" name="test_sleep" time="{:.3f}"></testcase>
+</testsuite>
+"""
+
+
+def main(argv):
+    options = dict(i.lstrip('-').split('=', 1) for i in argv if '=' in i)
+    duration = float(options.get('sleep', 0))
+
+    time.sleep(duration)
+
+    with open(options['xunit-file'], 'wb') as fid:
+        fid.write(REPORT.format(duration).encode('utf-8'))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
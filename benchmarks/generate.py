@@ -0,0 +1,151 @@
+from __future__ import print_function, unicode_literals
+import os
+
+import coverage
+
+
+# synthetic testcase has the outcome when its index modulo
+# the period equals the offset. Offsets never coincide
+# so that every outcome keeps its own rate
+OUTCOMES = (
+    # (outcome tag, period, offset)
+    ('failure', 100, 99),
+    ('error', 150, 75),
+    ('skipped', 200, 50),
+)
+
+
+def get_outcome(index):
+    """
+    Get the deterministic outcome tag of the synthetic testcase
+    """
+    for outcome, period, offset in OUTCOMES:
+        if index % period == offset:
+            return outcome
+    return None
+
+
+def iter_testcases(count, system_out=0, offset=0):
+    """
+    Iterate over xml strings of synthetic testcases
+
+    Parameters
+    ----------
+    count : int
+        Number of testcases
+    system_out : int, optional
+        Size in bytes of ``<system-out>`` of every testcase
+    offset : int, optional
+        Index of the first testcase so that testcases
+        of different reports have unique names
+    """
+    blob = ('x' * 79 + '\n') * (system_out // 80) + 'x' * (system_out % 80)
+    for index in range(offset, offset + count):
+        outcome = get_outcome(index)
+        children = []
+        if outcome:
+            children.append(
+                '<{0} type="Exception" message="synthetic {0}">'
+                'Traceback</{0}>'.format(outcome)
+            )
+        if system_out:
+            children.append('<system-out>{}</system-out>'.format(blob))
+        yield (
+            '<testcase classname="tests.test_{module}.Test{cls}" '
+            'name="test_{index}" time="{time:.3f}">{children}</testcase>\n'
+            ''.format(module=index // 1000,
+                      cls=index // 100,
+                      index=index,
+                      time=(index % 97) / 1000.0,
+                      children=''.join(children))
+        )
+
+
+def write_xunit(path, count, system_out=0, offset=0):
+    """
+    Write synthetic xunit report with ``count`` testcases
+
+    Testcases are written one by one so that reports with millions
+    of testcases can be generated with constant memory usage.
+
+    Returns
+    -------
+    dict
+        Testsuite attributes of the written report
+    """
+    counts = {'tests': count, 'errors': 0, 'failures': 0, 'skip': 0}
+    for index in range(offset, offset + count):
+        outcome = get_outcome(index)
+        if outcome:
+            counts[{'failure': 'failures',
+                    'error': 'errors',
+                    'skipped': 'skip'}[outcome]] += 1
+
+    with open(path, 'wb') as fid:
+        fid.write(b'<?xml version="1.0" encoding="UTF-8"?>\n')
+        fid.write('<testsuite name="nosetests" tests="{tests}" '
+                  'errors="{errors}" failures="{failures}" skip="{skip}">\n'
+                  ''.format(**counts).encode('utf-8'))
+        for testcase in iter_testcases(count, system_out, offset):
+            fid.write(testcase.encode('utf-8'))
+        fid.write(b'</testsuite>\n')
+    return counts
+
+
+def write_xunit_files(directory, count, files, system_out=0):
+    """
+    Split ``count`` synthetic testcases into ``files`` xunit reports
+
+    Returns
+    -------
+    list
+        Paths of the written reports
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    paths = []
+    per_file, remainder = divmod(count, files)
+    offset = 0
+    for i in range(files):
+        size = per_file + (1 if i < remainder else 0)
+        path = os.path.join(directory, 'nosetests.{}.xml'.format(i))
+        write_xunit(path, size, system_out, offset)
+        paths.append(path)
+        offset += size
+    return paths
+
+
+def write_coverage_files(directory, files, modules, lines, contexts=1):
+    """
+    Write ``files`` synthetic coverage data files where each
+    covers ``lines`` lines of each of the ``modules`` modules
+    under each of the ``contexts`` test contexts
+
+    Every data file covers a different half of the lines
+    so that combining has to merge overlapping data.
+
+    Returns
+    -------
+    list
+        Paths of the written data files
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    paths = []
+    for i in range(files):
+        path = os.path.join(directory, '.coverage.{}'.format(i))
+        data = coverage.CoverageData(basename=path)
+        start = (i % 2) * (lines // 2) + 1
+        package = os.path.join(os.sep, 'src', 'package')
+        for context in range(contexts):
+            data.set_context('tests.test_{}'.format(context))
+            data.add_lines({
+                os.path.join(package, 'module_{}.py'.format(j)):
+                    list(range(start, start + lines // 2))
+                for j in range(modules)
+            })
+        data.write()
+        paths.append(path)
+    return paths
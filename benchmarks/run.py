@@ -0,0 +1,474 @@
+"""
+Benchmarks of ``multinosetests`` overhead
+
+Measures how long and how much memory ``multinosetests`` itself needs
+to build suite reports, merge xunit reports, combine coverage data
+and schedule suites. Every benchmark case is executed in a fresh
+Python process so that its peak memory usage (maximum rss) can be
+measured independently of all other cases. Results are written as json
+so that they can be compared between versions::
+
+    python -m benchmarks --sizes 1000,1000000 --output results.json
+"""
+from __future__ import print_function, unicode_literals
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from multiprocessing import cpu_count
+from timeit import default_timer
+
+from multinosetests.cover import combine_coverage_incremental
+from multinosetests.multinosetests import NosetestsCall, get_nose_xml_report
+from multinosetests.process import SuiteProcess
+from multinosetests.runner import RUN_ENGINES
+from multinosetests.schedule import plan_schedule
+from multinosetests.xunit import MERGE_ENGINES, merge_xunit_files
+
+from . import fake_nose
+from .generate import write_coverage_files, write_xunit_files
+
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+BENCHMARKS = (
+    'report',
+    'merge',
+    'merge_calls',
+    'coverage',
+    'scheduling',
+)
+
+
+@contextlib.contextmanager
+def quiet():
+    """
+    Silence everything ``multinosetests`` prints
+    """
+    stdout, stderr = sys.stdout, sys.stderr
+    with open(os.devnull, 'w') as devnull:
+        sys.stdout = sys.stderr = devnull
+        try:
+            yield
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+
+
+@contextlib.contextmanager
+def workdir():
+    """
+    Execute within a temporary working directory
+    """
+    cwd = os.getcwd()
+    path = tempfile.mkdtemp(prefix='multinosetests-benchmark')
+    os.chdir(path)
+    try:
+        yield path
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(path)
+
+
+def bench_baseline(case):
+    """
+    Nothing at all. Shows time and memory of the benchmark
+    process itself which is included in all other results.
+    """
+    return {'seconds': 0.0}
+
+
+def bench_report(case):
+    """
+    Build suite reports via ``get_nose_xml_report()``
+    """
+    start = default_timer()
+    for path in case['files']:
+        get_nose_xml_report(path)
+    return {'seconds': default_timer() - start}
+
+
+def bench_merge(case):
+    """
+    Merge xunit reports via ``merge_xunit_files()``
+    """
+    with workdir() as path:
+        start = default_timer()
+        merge_xunit_files(case['files'],
+                          os.path.join(path, 'nosetests.xml'),
+                          case['engine'])
+        return {'seconds': default_timer() - start}
+
+
+def bench_merge_calls(case):
+    """
+    Report and merge all suites via ``NosetestsCall.merge_calls()``
+    """
+    with workdir():
+        calls = []
+        for i, path in enumerate(case['files']):
+            nose = NosetestsCall('nosetests suite_{} --with-xunit'.format(i))
+            nose.ensure_artifacts_dir()
+            shutil.copyfile(path, nose.xunit_file)
+            calls.append(nose)
+
+        start = default_timer()
+        with quiet():
+            NosetestsCall.merge_calls(calls,
+                                      report_coverage=False,
+                                      merge_engine=case['engine'])
+        return {'seconds': default_timer() - start}
+
+
+def bench_coverage(case):
+    """
+    Combine coverage data files via ``combine_coverage_incremental()``
+
+    ``seconds`` is the time to build the coverage baseline from all data
+    files and ``incremental_seconds`` the time to replace data of a single
+    suite within the baseline as when only that suite was executed.
+    """
+    with workdir() as path:
+        files = {}
+        for i, source in enumerate(case['files']):
+            files['suite_{}'.format(i)] = os.path.join(
+                path, os.path.basename(source),
+            )
+            shutil.copyfile(source, files['suite_{}'.format(i)])
+        data_file = os.path.join(path, '.coverage')
+        baseline = os.path.join(path, 'baseline')
+
+        start = default_timer()
+        combine_coverage_incremental(files, data_file, baseline,
+                                     keep_data_files=True)
+        seconds = default_timer() - start
+
+        start = default_timer()
+        combine_coverage_incremental(files, data_file, baseline,
+                                     unchanged=sorted(files)[1:],
+                                     keep_data_files=True)
+        return {'seconds': seconds,
+                'incremental_seconds': default_timer() - start}
+
+
+def bench_scheduling(case):
+    """
+    Run suites which only sleep via ``NosetestsCall.run_calls()``
+
+    Overhead is the measured wall time minus the makespan of
+    the ideal schedule of the same sleeps. It includes the startup
+    of the Python interpreter of every suite.
+    """
+    durations = [case['sleep']] * case['suites']
+    _, ideal = plan_schedule(durations, case['jobs'])
+
+    with workdir():
+        # options are placed in front of tests hence the fake
+        # nosetests is executed as a module rather than as a script
+        calls = [
+            NosetestsCall('{} -m {} --with-xunit --sleep={} suite_{}'.format(
+                sys.executable,
+                fake_nose.__name__,
+                duration,
+                i,
+            ))
+            for i, duration in enumerate(durations)
+        ]
+
+        start = default_timer()
+        with quiet():
+            codes = NosetestsCall.run_calls(calls,
+                                            jobs=case['jobs'],
+                                            durations=durations,
+                                            engine=case['engine'])
+        seconds = default_timer() - start
+
+    if any(codes):
+        raise RuntimeError('Scheduled suites failed with {}'.format(codes))
+
+    return {
+        'seconds': seconds,
+        'ideal_seconds': ideal,
+        'overhead_seconds': seconds - ideal,
+    }
+
+
+def run_case(case):
+    """
+    Execute the benchmark case within the current process
+    """
+    return globals()['bench_{}'.format(case['benchmark'])](case)
+
+
+def measure(case):
+    """
+    Execute the benchmark case in a fresh Python process
+
+    Returns
+    -------
+    dict
+        Result of the case with ``peak_rss`` of the process in bytes
+        or with ``error`` when the case failed
+    """
+    env = os.environ.copy()
+    env[str('PYTHONPATH')] = os.pathsep.join(
+        [ROOT] + [i for i in [env.get('PYTHONPATH')] if i]
+    )
+    # output is not read via Popen.communicate() since it would
+    # reap the process before its resource usage is known
+    with tempfile.TemporaryFile() as stdout, \
+            tempfile.TemporaryFile() as stderr:
+        process = SuiteProcess(
+            [sys.executable, '-m', 'benchmarks.run',
+             '--case', json.dumps(case)],
+            env=env,
+            stdout=stdout,
+            stderr=stderr,
+        )
+        return_code = process.wait()
+        stdout.seek(0)
+        stderr.seek(0)
+        output, error = stdout.read(), stderr.read()
+
+    if return_code != 0:
+        lines = error.decode('utf-8', 'replace').strip().splitlines()
+        return {'error': lines[-1] if lines else 'failed'}
+
+    result = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+    result['peak_rss'] = process.usage['max_rss'] if process.usage else None
+    return result
+
+
+def get_cases(args, directory):
+    """
+    Generate all benchmark inputs and get all benchmark cases
+    """
+    cases = []
+
+    for size in args.sizes:
+        if not {'report', 'merge', 'merge_calls'} & set(args.only):
+            break
+        print('Generating {} testcases'.format(size), file=sys.stderr)
+        files = write_xunit_files(
+            os.path.join(directory, 'xunit-{}'.format(size)),
+            size,
+            args.files,
+            args.system_out,
+        )
+        params = {'testcases': size,
+                  'reports': args.files,
+                  'system_out': args.system_out,
+                  'files': files}
+        cases.append(dict(params, benchmark='report'))
+        for engine in args.merge_engines:
+            cases.append(dict(params, benchmark='merge', engine=engine))
+            cases.append(dict(params, benchmark='merge_calls', engine=engine))
+
+    for count in args.coverage_files:
+        if 'coverage' not in args.only:
+            break
+        files = write_coverage_files(
+            os.path.join(directory, 'coverage-{}'.format(count)),
+            count,
+            args.coverage_modules,
+            args.coverage_lines,
+            args.coverage_contexts,
+        )
+        cases.append({'benchmark': 'coverage',
+                      'data_files': count,
+                      'modules': args.coverage_modules,
+                      'lines': args.coverage_lines,
+                      'contexts': args.coverage_contexts,
+                      'files': files})
+
+    for jobs in args.jobs:
+        if 'scheduling' not in args.only:
+            break
+        for engine in sorted(RUN_ENGINES):
+            cases.append({'benchmark': 'scheduling',
+                          'jobs': jobs,
+                          'engine': engine,
+                          'suites': args.suites,
+                          'sleep': args.sleep})
+
+    return [i for i in cases if i['benchmark'] in args.only]
+
+
+def run(args):
+    """
+    Execute all benchmarks
+
+    Returns
+    -------
+    dict
+        Json serializable results of all benchmarks
+    """
+    directory = tempfile.mkdtemp(prefix='multinosetests-benchmark')
+    try:
+        baseline = measure({'benchmark': 'baseline'})
+        results = []
+        for case in get_cases(args, directory):
+            params = {k: v for k, v in case.items() if k != 'files'}
+            print('Running {}'.format(json.dumps(params, sort_keys=True)),
+                  file=sys.stderr)
+
+            runs = [measure(case) for _ in range(args.repeat)]
+            if any('error' in i for i in runs):
+                error = next(i['error'] for i in runs if 'error' in i)
+                print('Failed: {}'.format(error), file=sys.stderr)
+                results.append({'params': params, 'error': error})
+                continue
+            result = {
+                'params': params,
+                'seconds': min(i['seconds'] for i in runs),
+                'seconds_all': [i['seconds'] for i in runs],
+                'peak_rss': max(i['peak_rss'] for i in runs),
+            }
+            for key in runs[0]:
+                if key not in ('seconds', 'peak_rss'):
+                    result[key] = min(i[key] for i in runs)
+            results.append(result)
+    finally:
+        shutil.rmtree(directory)
+
+    return {
+        'meta': {
+            'created': time.time(),
+            'python': sys.version,
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'cpus': cpu_count(),
+            'repeat': args.repeat,
+            # peak rss of the benchmark process doing nothing
+            # which is included in peak rss of every result
+            'baseline_rss': baseline['peak_rss'],
+        },
+        'results': results,
+    }
+
+
+def integers(value):
+    return [int(i) for i in value.split(',') if i]
+
+
+def choices(allowed):
+    def parse(value):
+        values = [i for i in value.split(',') if i]
+        invalid = set(values) - set(allowed)
+        if invalid:
+            raise argparse.ArgumentTypeError(
+                'invalid choice(s): {} (choose from {})'
+                ''.format(', '.join(sorted(invalid)),
+                          ', '.join(sorted(allowed)))
+            )
+        return values
+    return parse
+
+
+parser = argparse.ArgumentParser(
+    prog='python -m benchmarks',
+    description='Benchmark overhead of multinosetests itself '
+                'and print the results as json.'
+)
+parser.add_argument(
+    '--only',
+    type=choices(BENCHMARKS),
+    default=list(BENCHMARKS),
+    help='Comma separated benchmarks to run. Default is all of {}.'
+         ''.format(','.join(BENCHMARKS)))
+parser.add_argument(
+    '--sizes',
+    type=integers,
+    default=[1000, 10000, 100000],
+    help='Comma separated total numbers of testcases of xunit reports. '
+         'Default is 1000,10000,100000.')
+parser.add_argument(
+    '--files',
+    type=int,
+    default=4,
+    help='Number of xunit reports testcases are split into. Default is 4.')
+parser.add_argument(
+    '--system-out',
+    type=int,
+    default=0,
+    metavar='BYTES',
+    help='Size of <system-out> of every testcase. Default is 0.')
+parser.add_argument(
+    '--merge-engines',
+    type=choices(MERGE_ENGINES),
+    default=sorted(MERGE_ENGINES),
+    help='Comma separated merge engines to benchmark. Default is all.')
+parser.add_argument(
+    '--coverage-files',
+    type=integers,
+    default=[10, 100],
+    help='Comma separated numbers of coverage data files to combine. '
+         'Default is 10,100.')
+parser.add_argument(
+    '--coverage-modules',
+    type=int,
+    default=200,
+    help='Number of modules in every coverage data file. Default is 200.')
+parser.add_argument(
+    '--coverage-lines',
+    type=int,
+    default=500,
+    help='Number of lines of every covered module. Default is 500.')
+parser.add_argument(
+    '--coverage-contexts',
+    type=int,
+    default=10,
+    help='Number of test contexts of every coverage data file '
+         'each of which covers every module. Default is 10.')
+parser.add_argument(
+    '--jobs',
+    type=integers,
+    default=[1, 2, 4, 8],
+    help='Comma separated --jobs levels to run scheduling at. '
+         'Default is 1,2,4,8.')
+parser.add_argument(
+    '--suites',
+    type=int,
+    default=16,
+    help='Number of suites to schedule. Default is 16.')
+parser.add_argument(
+    '--sleep',
+    type=float,
+    default=0.2,
+    help='Seconds every scheduled suite sleeps for. Default is 0.2.')
+parser.add_argument(
+    '--repeat',
+    type=int,
+    default=3,
+    help='Number of times every case is run. Fastest run is reported '
+         'as "seconds". Default is 3.')
+parser.add_argument(
+    '--output',
+    metavar='FILE',
+    help='Write results to FILE instead of stdout.')
+parser.add_argument(
+    '--case',
+    help=argparse.SUPPRESS)
+
+
+def main(argv=None):
+    args = parser.parse_args(argv)
+
+    if args.case:
+        print(json.dumps(run_case(json.loads(args.case))))
+        return
+
+    output = json.dumps(run(args), indent=2, sort_keys=True)
+    if args.output:
+        with io.open(args.output, 'w', encoding='utf-8') as fid:
+            fid.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,57 @@
 from __future__ import print_function, unicode_literals
 import argparse
+import os
+import signal
 import sys
 
 import six
 
-from .multinosetests import NosetestsCall, status_print
+from .artifacts import ArtifactStore
+from .cache import ResultCache, get_source_paths
+from .forkserver import ForkServer, ForkServerError
+from .impact import (
+    ChangeSetError,
+    get_changed_files,
+    load_impact_index,
+    write_context_config,
+)
+from .multinosetests import (
+    ARTIFACTS_DIR,
+    CACHE_DIR,
+    COVERAGE_CONTEXT_DIR,
+    IMPACT_INDEX_FILE,
+    NOSETESTS_FILE,
+    PROFILE_FILE,
+    PROFILE_HOOK_DIR,
+    TIMINGS_FILE,
+    NosetestsCall,
+    status_print,
+    status_print_plan,
+)
+from .process import TERMINATE_GRACE_PERIOD, interrupt_suites
+from .profiling import write_hook
+from .remote import (
+    DEFAULT_HOST,
+    DEFAULT_PORT,
+    TOKEN_ENV,
+    WorkerServer,
+    parse_address,
+)
+from .resources import get_cpu_count
+from .runner import DEFAULT_RUN_ENGINE, RUN_ENGINES
+from .schedule import TimingCache
+from .watch import WATCH_INTERVAL, SourceWatcher
+from .xunit import (
+    COMPRESSIONS,
+    DEFAULT_MERGE_ENGINE,
+    MERGE_ENGINES,
+    is_compression_available,
+)
 
 
 parser = argparse.ArgumentParser(
     description='Run nosetests multiple times and merge their '
-                'xml reports using xunitmerge. The advantage '
+                'xml reports into a single report. The advantage '
                 'of this plugin is that it guarantees that all '
                 'nosetests calls are executed even if any of them '
                 'fails. This is especially useful if multiple '
@@ -23,17 +65,655 @@ parser.add_argument(
     action='store',
     type=six.text_type,
     nargs='+',
-    help='Nosetests command string which be executed in shell '
+    help='Nosetests command string which will be executed '
          '(e.g. `nosetests -sv --with-coverage --with-xunit`). '
          'Must contain a flag --with-xunit and can be '
          'provided multiple times.')
+parser.add_argument(
+    '--shell',
+    action='store_true',
+    default=False,
+    help='Execute nosetests commands via shell. Only required when '
+         'commands use shell features such as pipes or variable expansion. '
+         'By default commands are executed directly.')
+parser.add_argument(
+    '--timeout',
+    action='append',
+    type=float,
+    metavar='SECONDS',
+    help='Maximum number of seconds a nosetests suite can run for. '
+         'Suite which exceeds it is terminated via SIGTERM and killed '
+         'via SIGKILL if it does not exit within {:.0f} seconds. '
+         'Can be given either once for all suites or once '
+         'for every command in the same order.'
+         ''.format(TERMINATE_GRACE_PERIOD))
+parser.add_argument(
+    '-j', '--jobs',
+    action='store',
+    type=int,
+    default=None,
+    help='Maximum number of nosetests suites to run at the same time. '
+         'Defaults to the number of CPUs including cgroup CPU quota.')
+parser.add_argument(
+    '--weight',
+    action='append',
+    type=float,
+    metavar='JOBS',
+    help='Number of jobs (see --jobs) a nosetests suite occupies while '
+         'it runs, e.g. the number of CPUs it uses. Default is 1. '
+         'Can be given either once for all suites or once '
+         'for every command in the same order.')
+parser.add_argument(
+    '--memory',
+    action='append',
+    type=int,
+    metavar='MB',
+    help='Memory in megabytes a nosetests suite is expected to use. '
+         'Suite is not started until that much memory is available '
+         'so that memory heavy suites are not started together. '
+         'Can be given either once for all suites or once '
+         'for every command in the same order.')
+parser.add_argument(
+    '--fixed-jobs',
+    action='store_true',
+    default=False,
+    help='Always run --jobs suites at the same time. By default fewer '
+         'suites run while the machine is loaded by other processes and '
+         'new suites are not started while less than 10%% of memory '
+         '(including cgroup memory limit) is available.')
+parser.add_argument(
+    '--worker',
+    action='append',
+    type=six.text_type,
+    metavar='HOST:PORT',
+    help='Address of a multinosetests-worker to execute suites on. '
+         'Can be provided multiple times. Suites are distributed across '
+         'all workers and suites of a worker which disconnects are '
+         'executed by the remaining workers. Workers must run within '
+         'the same checkout of the project. '
+         'Default port is {}.'.format(DEFAULT_PORT))
+parser.add_argument(
+    '--worker-token',
+    action='store',
+    type=six.text_type,
+    metavar='TOKEN',
+    help='Token shared with workers (see their --token option). '
+         'Defaults to ${} environment variable which unlike the option '
+         'is not visible to other users of the machine.'.format(TOKEN_ENV))
+parser.add_argument(
+    '--engine',
+    action='store',
+    choices=sorted(RUN_ENGINES),
+    default=DEFAULT_RUN_ENGINE,
+    help='Engine used to run nosetests suites. '
+         '"asyncio" supervises all suites from a single event loop and '
+         'prefixes every line of their output with a tag of its suite '
+         'while "threads" runs each suite on its own thread with '
+         'its output going directly to the terminal. '
+         'Default is "{}".'.format(DEFAULT_RUN_ENGINE))
+parser.add_argument(
+    '--rerun-failures',
+    action='store',
+    type=int,
+    default=0,
+    metavar='N',
+    help='Rerun failed and errored tests of failed suites up to N times. '
+         'Only the failed tests are rerun via the same command and their '
+         'results replace the failed testcases in the xml report. '
+         'Rerun testcases are marked by "reruns" attribute and testcases '
+         'which passed only when rerun are marked as "flaky". '
+         'Suite whose tests all pass when rerun is considered successful.')
+parser.add_argument(
+    '--preload',
+    action='store',
+    type=six.text_type,
+    metavar='MODULES',
+    help='Comma separated modules to import once in a fork server. '
+         'Suites which run nosetests directly (e.g. `nosetests ...` '
+         'or `python -m nose ...`) are then forked from that server '
+         'and run nose in-process instead of starting a new interpreter '
+         'and importing nose and these modules again. '
+         'Module level code of preloaded modules runs before coverage '
+         'is started so do not preload packages measured by coverage.')
+parser.add_argument(
+    '--merge-engine',
+    action='store',
+    choices=sorted(MERGE_ENGINES),
+    default=DEFAULT_MERGE_ENGINE,
+    help='Engine used to merge xml reports of all nosetests suites. '
+         '"stream" merges reports with constant memory usage while '
+         '"xunitmerge" loads all reports into memory. '
+         'Default is "{}".'.format(DEFAULT_MERGE_ENGINE))
+parser.add_argument(
+    '--xunit-compression',
+    action='store',
+    choices=sorted(COMPRESSIONS),
+    help='Compress the merged xml report while it is written. '
+         'Extension of the compression is appended to "nosetests.xml". '
+         '"zstd" requires zstandard package.')
+parser.add_argument(
+    '--xunit-max-output',
+    action='store',
+    type=int,
+    metavar='CHARS',
+    help='Truncate captured stdout and stderr of every test '
+         'in the merged xml report to at most CHARS characters.')
+parser.add_argument(
+    '--coverage-xml',
+    action='store',
+    type=six.text_type,
+    metavar='FILE',
+    help='Write combined xml coverage report of all suites to FILE.')
+parser.add_argument(
+    '--coverage-html',
+    action='store',
+    type=six.text_type,
+    metavar='DIR',
+    help='Write combined html coverage report of all suites to DIR.')
+parser.add_argument(
+    '--durations',
+    action='store',
+    type=int,
+    default=0,
+    metavar='N',
+    help='Print out total time of tests and N slowest tests '
+         'of each suite and overall.')
+parser.add_argument(
+    '--summary-file',
+    action='store',
+    type=six.text_type,
+    metavar='FILE',
+    help='Write json summary of all suites including test counts, '
+         'durations, slowest tests (see --durations) and return codes '
+         'to FILE.')
+parser.add_argument(
+    '--profile',
+    action='store_true',
+    default=False,
+    help='Profile every suite via cProfile and merge profiles of all '
+         'suites into "nosetests.prof" which can be loaded by pstats. '
+         'Suites executed on remote workers are not profiled.')
+parser.add_argument(
+    '--profile-hotspots',
+    action='store',
+    type=int,
+    default=20,
+    metavar='N',
+    help='Print out N functions with the largest cumulative time '
+         'in the merged profile (see --profile). Default is 20.')
+parser.add_argument(
+    '--timings-file',
+    action='store',
+    type=six.text_type,
+    default=TIMINGS_FILE,
+    metavar='FILE',
+    help='File where wall times of all suites are recorded. '
+         'Recorded timings are used to start the longest suites first. '
+         'Default is "{}".'.format(TIMINGS_FILE))
+parser.add_argument(
+    '--shard-suite',
+    action='store',
+    type=int,
+    default=1,
+    metavar='N',
+    help='Split each nosetests suite into at most N shards which are '
+         'executed at the same time. Tests are distributed across shards '
+         'by their durations recorded in previous runs. '
+         'Results of all shards are reported as a single suite.')
+parser.add_argument(
+    '--check-overlaps',
+    action='store_true',
+    default=False,
+    help='Collect tests of all suites before running them and report '
+         'tests which are run by multiple suites.')
+parser.add_argument(
+    '--dedupe',
+    action='store_true',
+    default=False,
+    help='Same as --check-overlaps but also rewrite suites which run '
+         'nosetests directly to not run tests already run by any '
+         'of the preceding suites so that every test runs exactly once. '
+         'Suites left without tests are not executed. Only use when '
+         'overlapping suites run tests the same way '
+         '(e.g. with the same environment variables).')
+parser.add_argument(
+    '--changed-since',
+    action='store',
+    type=six.text_type,
+    metavar='REF',
+    help='Run only tests affected by files changed in the working tree '
+         'since git REF (including uncommitted and untracked files). '
+         'Affected tests are found in the index of files executed by every '
+         'test which is recorded by every covered suite executed in full. '
+         'Suites which are not indexed yet are executed in full.')
+parser.add_argument(
+    '--cache',
+    action='store_true',
+    default=False,
+    help='Reuse xml reports and coverage data of suites which '
+         'previously succeeded when neither their command, their sources '
+         '(--cover-package packages and test paths) nor installed '
+         'Python packages changed since then.')
+parser.add_argument(
+    '--cache-dir',
+    action='store',
+    type=six.text_type,
+    default=CACHE_DIR,
+    metavar='DIR',
+    help='Directory where cached suite results are stored. '
+         'Default is "{}".'.format(CACHE_DIR))
+parser.add_argument(
+    '--cache-size',
+    action='store',
+    type=int,
+    default=512,
+    metavar='MB',
+    help='Maximum size of the result cache in megabytes. '
+         'Least recently used results are removed first. '
+         'Default is 512.')
+parser.add_argument(
+    '--artifacts-age',
+    action='store',
+    type=float,
+    default=24,
+    metavar='HOURS',
+    help='Xml reports and coverage data files of suites which are left '
+         'in "{}" by interrupted runs and are older than HOURS are '
+         'removed. Default is 24.'.format(ARTIFACTS_DIR))
+parser.add_argument(
+    '--artifacts-size',
+    action='store',
+    type=int,
+    default=256,
+    metavar='MB',
+    help='Maximum size of leftover xml reports and coverage data files '
+         'in megabytes. Least recently modified files are removed first. '
+         'Default is 256.')
+parser.add_argument(
+    '--watch',
+    action='store_true',
+    default=False,
+    help='Keep running after all suites finish and watch their sources '
+         '(--cover-package packages and test paths) for changes. '
+         'Only suites whose sources changed are executed again while '
+         'results of other suites are reused in the merged xml report '
+         'and the combined coverage report. Stop via Ctrl+C.')
+parser.add_argument(
+    '--watch-interval',
+    action='store',
+    type=float,
+    default=WATCH_INTERVAL,
+    metavar='SECONDS',
+    help='How often sources are checked for changes (see --watch). '
+         'Default is {:.0f}.'.format(WATCH_INTERVAL))
+parser.add_argument(
+    '--plan',
+    action='store_true',
+    default=False,
+    help='Only print the schedule of how suites would be distributed '
+         'across workers and the estimated total time '
+         'without running any tests. Suites are planned without '
+         'sharding since collecting their tests requires running them.')
+
+
+worker_parser = argparse.ArgumentParser(
+    description='Execute nosetests suites sent by multinosetests '
+                '(see its --worker option). Suites are executed within '
+                'the current directory which should be the same checkout '
+                'of the project as the one of multinosetests.'
+)
+worker_parser.add_argument(
+    '--host',
+    action='store',
+    type=six.text_type,
+    default=DEFAULT_HOST,
+    help='Address to listen on. Default is "{}". Workers execute any '
+         'command sent by coordinators which know their token so only '
+         'listen on trusted networks.'.format(DEFAULT_HOST))
+worker_parser.add_argument(
+    '--token',
+    action='store',
+    type=six.text_type,
+    help='Token coordinators have to send before they can run suites. '
+         'Defaults to ${} environment variable. '
+         'Required.'.format(TOKEN_ENV))
+worker_parser.add_argument(
+    '--shell',
+    action='store_true',
+    default=False,
+    help='Allow coordinators to execute suites via shell '
+         '(see --shell of multinosetests). '
+         'By default such suites are rejected.')
+worker_parser.add_argument(
+    '--port',
+    action='store',
+    type=int,
+    default=DEFAULT_PORT,
+    help='Port to listen on. Default is {}.'.format(DEFAULT_PORT))
+worker_parser.add_argument(
+    '-j', '--jobs',
+    action='store',
+    type=int,
+    default=None,
+    help='Maximum number of nosetests suites to run at the same time. '
+         'Defaults to the number of CPUs including cgroup CPU quota.')
+
+
+def worker_main():
+    args = worker_parser.parse_args()
+
+    if args.jobs is None:
+        args.jobs = get_cpu_count()
+    if args.jobs < 1:
+        worker_parser.error('--jobs must be a positive integer')
+    token = args.token or os.environ.get(TOKEN_ENV)
+    if not token:
+        worker_parser.error('--token or ${} is required'.format(TOKEN_ENV))
+
+    server = WorkerServer((args.host, args.port),
+                          NosetestsCall,
+                          args.jobs,
+                          token=token,
+                          shell=args.shell)
+    status_print('Listening', '{}:{} with {} jobs'.format(
+        args.host, server.server_address[1], args.jobs,
+    ))
+    signal.signal(signal.SIGINT, interrupt_suites)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def get_command_values(values, option, count, default=None):
+    """
+    Get value of the option given either once for all
+    commands or once for every command
+
+    Values must be positive.
+    """
+    values = values or [default]
+    if len(values) == 1:
+        values = values * count
+    if len(values) != count:
+        parser.error('{} must be given either once '
+                     'or once for every command'.format(option))
+    if any(i is not None and i <= 0 for i in values):
+        parser.error('{} must be positive'.format(option))
+    return values
+
+
+def prepare_suites(nose_calls, args, timings):
+    """
+    Restore cached suites and shard the rest of suites
+
+    Returns
+    -------
+    tuple
+        Tuple of ``(durations, cache, cache_keys)`` with estimated
+        durations of suites and the result cache with cache keys
+        of suites which were not cached yet when ``--cache`` is used
+    """
+    commands = [nose.command for nose in nose_calls]
+    durations = timings.estimate(commands)
+
+    cache = cache_keys = None
+    if args.cache:
+        cache = ResultCache(args.cache_dir,
+                            args.cache_size * 1024 * 1024,
+                            ignore=get_output_paths(args))
+        # results of suites reused while watching are not cached again
+        cache_keys = [None if nose.cached else cache.get_key(nose)
+                      for nose in nose_calls]
+        for nose, key in zip(nose_calls, cache_keys):
+            if key is not None:
+                cache.restore(nose, key)
+
+    if args.shard_suite > 1:
+        for nose in nose_calls:
+            if not nose.cached:
+                nose.shard(args.shard_suite, timings)
+
+    return durations, cache, cache_keys
+
+
+def plan_suites(nose_calls, args, timings):
+    """
+    Print the schedule of the suites and exit
+
+    Unlike ``prepare_suites()``, nothing is written to disk.
+    Cached suites are only looked up rather than restored and
+    suites are not sharded since their tests would have to be
+    collected by running nosetests.
+    """
+    durations = timings.estimate([nose.command for nose in nose_calls])
+    if args.cache:
+        cache = ResultCache(args.cache_dir,
+                            args.cache_size * 1024 * 1024,
+                            ignore=get_output_paths(args))
+        for nose in nose_calls:
+            if not nose.cached:
+                nose.cached = cache.contains(cache.get_key(nose))
+    units, unit_durations = NosetestsCall.get_units(nose_calls, durations)
+    status_print_plan(
+        units,
+        unit_durations,
+        args.jobs,
+        # shards are estimated from durations of individual tests
+        known=[i not in nose_calls or i.command in timings.suites
+               for i in units],
+    )
+    sys.exit(0)
+
+
+def run_suites(nose_calls,
+               args,
+               workers,
+               timings,
+               artifacts,
+               fork_server=None):
+    """
+    Execute the suites and merge their results
+
+    Returns
+    -------
+    bool
+        Whether any of the suites failed
+    """
+    durations, cache, cache_keys = prepare_suites(nose_calls, args, timings)
+
+    # sharded suites still write their merged xml reports
+    artifacts.register(nose_calls + NosetestsCall.get_units(nose_calls)[0])
+
+    # coverage of every test is recorded for the impact index
+    if any(nose.is_covered() for nose in nose_calls):
+        context_dir = write_context_config(COVERAGE_CONTEXT_DIR)
+        for nose in NosetestsCall.get_units(nose_calls)[0]:
+            nose.context_dir = context_dir
+
+    if args.profile:
+        profile_hook = write_hook(PROFILE_HOOK_DIR)
+        for nose in NosetestsCall.get_units(nose_calls)[0]:
+            nose.profile_hook = profile_hook
+
+    if fork_server is not None:
+        for nose in NosetestsCall.get_units(nose_calls)[0]:
+            nose.fork_server = fork_server
+
+    # execute nosetests suites and check if any failed
+    return_calls = NosetestsCall.run_calls(
+        nose_calls,
+        jobs=args.jobs,
+        durations=durations,
+        engine=args.engine,
+        workers=workers,
+        worker_token=args.worker_token,
+        adaptive=not args.fixed_jobs,
+    )
+    if args.rerun_failures and any(return_calls):
+        return_calls = NosetestsCall.rerun_calls(
+            nose_calls,
+            args.rerun_failures,
+            jobs=args.jobs,
+            engine=args.engine,
+            adaptive=not args.fixed_jobs,
+        )
+    for nose in nose_calls:
+        timings.record(nose.command, nose.duration)
+    any_failed = any((code != 0 for code in return_calls))
+
+    if cache:
+        for nose, key in zip(nose_calls, cache_keys):
+            if not nose.cached:
+                cache.store(nose, key)
+        cache.evict()
+
+    status_print('Finished running all nosetest suites')
+
+    # merge the test suites and print out the combined
+    # coverage report only if none of the test suites failed
+    NosetestsCall.merge_calls(
+        nose_calls,
+        report_coverage=not any_failed,
+        merge_engine=args.merge_engine,
+        coverage_xml=args.coverage_xml,
+        coverage_html=args.coverage_html,
+        timings=timings,
+        durations=args.durations,
+        summary_file=args.summary_file,
+        compression=args.xunit_compression,
+        max_output=args.xunit_max_output,
+        # reports of suites are merged again while watching
+        keep_reports=args.watch,
+        # suites not affected by changes keep their coverage data
+        keep_coverage=bool(args.changed_since),
+    )
+    NosetestsCall.update_impact_index(nose_calls)
+    if args.profile:
+        NosetestsCall.merge_profiles(nose_calls,
+                                     hotspots=args.profile_hotspots)
+    timings.save()
+    return any_failed
+
+
+def get_output_paths(args):
+    """
+    Get paths of files and directories written by multinosetests
+    which must not be considered changes of sources
+    """
+    paths = [
+        NOSETESTS_FILE.format('') +
+        COMPRESSIONS.get(args.xunit_compression, ''),
+        PROFILE_FILE.format(''),
+        args.coverage_xml,
+        args.coverage_html,
+        args.summary_file,
+        args.timings_file,
+        args.cache_dir,
+    ]
+    return [i for i in paths if i]
+
+
+def watch_suites(watcher,
+                 nose_calls,
+                 args,
+                 workers,
+                 timings,
+                 artifacts,
+                 fork_server=None):
+    """
+    Execute suites again whenever their sources change
+
+    Only suites whose sources changed are executed. Results of the rest
+    of suites are reused the same way as results of cached suites so
+    that their xml reports are merged again and their coverage data
+    is kept in the coverage baseline without being combined again.
+
+    Returns
+    -------
+    bool
+        Whether any of the suites failed in the last run
+    """
+    any_failed = any(nose.return_code for nose in nose_calls)
+    status_print('Watching', '{} paths for changes'.format(len(watcher.paths)))
+    try:
+        while True:
+            changed = watcher.wait()
+            indexes = set(watcher.get_changed_suites(changed))
+            if not indexes:
+                continue
+
+            status_print('Changed', ', '.join(
+                os.path.relpath(i) for i in sorted(changed)
+            ))
+            for i, nose in enumerate(nose_calls):
+                if i in indexes:
+                    nose_calls[i] = nose.clone()
+                else:
+                    for unit in [nose] + nose.shards:
+                        unit.cached = True
+            any_failed = run_suites(nose_calls, args, workers, timings,
+                                    artifacts, fork_server)
+            status_print('Watching',
+                         '{} paths for changes'.format(len(watcher.paths)))
+    except KeyboardInterrupt:
+        status_print('Stopped watching')
+    return any_failed
 
 
 def main():
     args = parser.parse_args()
 
+    try:
+        workers = [parse_address(i) for i in args.worker or []]
+    except ValueError as e:
+        parser.error(six.text_type(e))
+    args.worker_token = args.worker_token or os.environ.get(TOKEN_ENV)
+    if workers and not args.worker_token:
+        parser.error('--worker-token or ${} is required with --worker'
+                     ''.format(TOKEN_ENV))
+
+    count = len(args.command)
+    timeouts = get_command_values(args.timeout, '--timeout', count)
+    weights = get_command_values(args.weight, '--weight', count, 1)
+    memories = get_command_values(args.memory, '--memory', count)
+
     # initialize all nosetests suites
-    nose_calls = [NosetestsCall(command) for command in args.command]
+    nose_calls = [
+        NosetestsCall(command,
+                      shell=args.shell,
+                      timeout=timeout,
+                      weight=weight,
+                      memory=memory * 1024 * 1024 if memory else None)
+        for command, timeout, weight, memory in zip(args.command,
+                                                    timeouts,
+                                                    weights,
+                                                    memories)
+    ]
+
+    if args.jobs is None:
+        args.jobs = get_cpu_count()
+    if args.jobs < 1:
+        parser.error('--jobs must be a positive integer')
+
+    if args.rerun_failures < 0:
+        parser.error('--rerun-failures must not be negative')
+
+    if args.durations < 0:
+        parser.error('--durations must not be negative')
+
+    if args.profile_hotspots < 0:
+        parser.error('--profile-hotspots must not be negative')
+
+    if args.xunit_max_output is not None and args.xunit_max_output < 0:
+        parser.error('--xunit-max-output must not be negative')
+
+    if (args.xunit_compression and
+            not is_compression_available(args.xunit_compression)):
+        parser.error('{} compression is not available'
+                     ''.format(args.xunit_compression))
 
     # if any of the calls have invalid commands
     # print out errors
@@ -45,17 +725,70 @@ def main():
         parser.error('\n\nErrors found in nosetests commands:\n{}'
                      ''.format('\n'.join(errors)))
 
-    # execute nosetests suites and check if any failed
-    return_calls = [nose() for nose in nose_calls]
-    any_failed = any((code != 0 for code in return_calls))
+    if args.check_overlaps or args.dedupe:
+        nose_calls = NosetestsCall.dedupe_calls(nose_calls,
+                                                rewrite=args.dedupe,
+                                                jobs=args.jobs)
 
-    status_print('Finished running all nosetest suites')
+    if args.changed_since:
+        try:
+            changed_files = get_changed_files(args.changed_since)
+        except ChangeSetError as e:
+            parser.error(six.text_type(e))
+        nose_calls = NosetestsCall.select_changed(
+            nose_calls,
+            changed_files,
+            load_impact_index(IMPACT_INDEX_FILE),
+            jobs=args.jobs,
+            ignore=get_output_paths(args),
+        )
+        if not nose_calls:
+            status_print('No tests are affected by changes since',
+                         args.changed_since)
+            sys.exit(0)
 
-    # merge the test suites and print out the combined
-    # coverage report only if none of the test suites failed
-    NosetestsCall.merge_calls(
-        nose_calls,
-        report_coverage=not any_failed
-    )
+    if args.watch_interval <= 0:
+        parser.error('--watch-interval must be positive')
+
+    timings = TimingCache(args.timings_file).load()
+    if args.plan:
+        plan_suites(nose_calls, args, timings)
+
+    # remove artifacts left behind by interrupted runs
+    artifacts = ArtifactStore(ARTIFACTS_DIR,
+                              args.artifacts_age * 60 * 60,
+                              args.artifacts_size * 1024 * 1024)
+    artifacts.collect(keep=[nose.key for nose in nose_calls])
+
+    fork_server = None
+    if args.preload:
+        try:
+            fork_server = ForkServer(
+                [i.strip() for i in args.preload.split(',') if i.strip()]
+            )
+        except ForkServerError as e:
+            parser.error(six.text_type(e))
+
+    # sources are watched since before the first run so that
+    # changes made while suites are running are not missed
+    watcher = None
+    if args.watch:
+        watcher = SourceWatcher(
+            [get_source_paths(nose.command) for nose in nose_calls],
+            interval=args.watch_interval,
+            ignore=get_output_paths(args),
+        )
+
+    # suites do not receive interrupts from the terminal
+    signal.signal(signal.SIGINT, interrupt_suites)
+    try:
+        any_failed = run_suites(nose_calls, args, workers, timings,
+                                artifacts, fork_server)
+        if watcher is not None:
+            any_failed = watch_suites(watcher, nose_calls, args, workers,
+                                      timings, artifacts, fork_server)
+    finally:
+        if fork_server is not None:
+            fork_server.close()
 
     sys.exit(0 if not any_failed else 1)
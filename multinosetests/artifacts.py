@@ -0,0 +1,186 @@
+from __future__ import print_function, unicode_literals
+import errno
+import hashlib
+import io
+import json
+import os
+import re
+import time
+
+import six
+
+
+MANIFEST_FILE = 'manifest.json'
+# number of hex digits of sha256 used in artifact names
+KEY_LENGTH = 16
+KEY_RE = re.compile(r'\.(?P<key>[0-9a-f]{%d})(?![0-9a-f])' % KEY_LENGTH)
+
+
+def get_artifact_key(command):
+    """
+    Get the stable key of the nosetests command used
+    in names of its artifacts
+
+    Unlike Python string hash which is randomized on every
+    Python 3 run, the key is derived from the content of the
+    command so that the same suite always uses the same artifacts.
+    """
+    digest = hashlib.sha256(six.text_type(command).encode('utf-8'))
+    return digest.hexdigest()[:KEY_LENGTH]
+
+
+def get_path_key(path):
+    """
+    Get the artifact key from the artifact filename
+
+    Returns
+    -------
+    str
+        Artifact key or ``None`` if the filename does not contain any
+    """
+    match = KEY_RE.search(os.path.basename(path))
+    return match.group('key') if match else None
+
+
+def ensure_directory(path):
+    """
+    Create the directory unless it already exists
+    """
+    try:
+        os.makedirs(path)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+
+class ArtifactStore(object):
+    """
+    Directory where per-suite artifacts such as xunit reports
+    and coverage data files are stored
+
+    Artifacts are named by the stable key of their nosetests
+    command (see ``get_artifact_key()``) so that artifacts left behind
+    by interrupted runs are overwritten by the next run of the same
+    suite instead of piling up. Commands of all suites which used the
+    store are recorded in a manifest so that artifacts can be traced
+    back to their suites. Stale artifacts of suites which are not part
+    of the current run are removed by ``collect()``.
+
+    Parameters
+    ----------
+    directory : str
+        Directory where artifacts are stored
+    max_age : float
+        Artifacts which were not modified for more than
+        ``max_age`` seconds are removed
+    max_size : int
+        Maximum total size of artifacts in bytes.
+        Least recently modified artifacts are removed first.
+    """
+
+    def __init__(self, directory, max_age, max_size):
+        self.directory = directory
+        self.max_age = max_age
+        self.max_size = max_size
+
+    @property
+    def manifest_file(self):
+        return os.path.join(self.directory, MANIFEST_FILE)
+
+    def load_manifest(self):
+        """
+        Load the manifest which maps artifact keys to their suites
+
+        Missing or corrupt manifest is ignored since it
+        is only informative.
+        """
+        try:
+            with io.open(self.manifest_file, 'rb') as fid:
+                return json.loads(fid.read().decode('utf-8'))
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def save_manifest(self, manifest):
+        """
+        Save the manifest
+
+        Manifest is first written to a temporary file which
+        is then renamed so that concurrent ``multinosetests``
+        runs never see partially written manifest.
+        """
+        ensure_directory(self.directory)
+        tmp = '{}.{}.tmp'.format(self.manifest_file, os.getpid())
+        with io.open(tmp, 'wb') as fid:
+            fid.write(json.dumps(manifest,
+                                 indent=2,
+                                 sort_keys=True).encode('utf-8'))
+        os.rename(tmp, self.manifest_file)
+
+    def register(self, nose_calls):
+        """
+        Record the suites which are about to use the store in the manifest
+        """
+        manifest = self.load_manifest()
+        now = time.time()
+        for nose in nose_calls:
+            manifest[nose.key] = {'command': nose.command, 'used': now}
+        self.save_manifest(manifest)
+
+    def collect(self, keep=()):
+        """
+        Remove stale artifacts
+
+        First all artifacts older than ``max_age`` are removed
+        and then least recently modified artifacts are removed
+        until the total size of the store is within ``max_size``.
+        Artifacts of suites whose keys are given in ``keep`` are
+        never removed since they belong to the current run.
+
+        Parameters
+        ----------
+        keep : list
+            Keys of artifacts which should not be removed
+
+        Returns
+        -------
+        list
+            Paths of removed artifacts
+        """
+        if not os.path.isdir(self.directory):
+            return []
+
+        keep = set(keep)
+        now = time.time()
+        artifacts = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name == MANIFEST_FILE or get_path_key(name) in keep:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # removed by a concurrent run
+                continue
+            artifacts.append((stat.st_mtime, stat.st_size, path))
+
+        removed = []
+        total = sum(i[1] for i in artifacts)
+        for mtime, size, path in sorted(artifacts):
+            if now - mtime <= self.max_age and total <= self.max_size:
+                continue
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            removed.append(path)
+            total -= size
+
+        # suites without any artifacts left are forgotten
+        remaining = set(get_path_key(i) for i in os.listdir(self.directory))
+        manifest = self.load_manifest()
+        stale = set(manifest) - remaining - keep
+        if stale:
+            self.save_manifest({k: v for k, v in manifest.items()
+                                if k not in stale})
+
+        return removed
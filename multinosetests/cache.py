@@ -0,0 +1,310 @@
+from __future__ import print_function, unicode_literals
+import fnmatch
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import time
+
+import six
+
+from .command import split_command
+from .cover import get_cover_packages
+
+
+# files and directories which are never hashed as sources
+# since they are either generated or are not related to tests.
+# Files written by multinosetests itself are ignored by their paths
+# (see ``iter_files()``) since their names depend on its options.
+IGNORED_PATTERNS = (
+    '.*',
+    '*.egg-info',
+    '*.py[co]',
+    '__pycache__',
+)
+XUNIT_FILE = 'nosetests.xml'
+COVERAGE_FILE = 'coverage'
+META_FILE = 'meta.json'
+CHUNK_SIZE = 64 * 1024
+
+
+def get_test_path(test_name):
+    """
+    Get the file-system path of the nosetests test name
+
+    Test names can either be paths (``tests/foo.py:Foo.test``)
+    or dotted module names (``tests.foo:Foo.test``).
+    """
+    name = test_name.split(':', 1)[0]
+    if os.path.exists(name):
+        return name
+
+    path = name.replace('.', os.sep)
+    for candidate in (path, path + '.py'):
+        if os.path.exists(candidate):
+            return candidate
+
+    # module within a package which cannot be found
+    # falls back to hashing its package
+    if '.' in name:
+        return get_test_path(name.rsplit('.', 1)[0])
+    return None
+
+
+def get_source_paths(command):
+    """
+    Get all source paths the nosetests command depends on
+
+    These are the packages given via ``--cover-package`` and
+    all test paths. When no test paths are given, nosetests
+    discovers tests in the current directory and so
+    the current directory is used.
+    """
+    _, _, tests = split_command(command)
+    names = get_cover_packages([command]) + (tests or [os.curdir])
+    paths = [get_test_path(i) for i in names]
+    return sorted(set(i for i in paths if i))
+
+
+def is_ignored(name):
+    """
+    Check whether the file or directory should not be hashed
+    """
+    return any(fnmatch.fnmatch(name, i) for i in IGNORED_PATTERNS)
+
+
+def is_within(path, directory):
+    """
+    Whether the path is the directory itself or is within the directory
+    """
+    return (path == directory or
+            path.startswith(directory.rstrip(os.sep) + os.sep))
+
+
+def iter_files(paths, ignore=()):
+    """
+    Iterate over all non-ignored files within the given paths
+    in a deterministic order
+
+    Parameters
+    ----------
+    paths : list
+        Paths of files and directories
+    ignore : list, optional
+        Paths of files and directories which are skipped
+        such as reports written by multinosetests itself
+    """
+    ignore = [os.path.abspath(i) for i in ignore]
+
+    def is_skipped(path):
+        path = os.path.abspath(path)
+        return any(is_within(path, i) for i in ignore)
+
+    for path in paths:
+        if is_skipped(path):
+            continue
+        if os.path.isfile(path):
+            yield path
+            continue
+
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(i for i in dirs
+                             if not is_ignored(i) and
+                             not is_skipped(os.path.join(root, i)))
+            for name in sorted(files):
+                if (not is_ignored(name) and
+                        not is_skipped(os.path.join(root, name))):
+                    yield os.path.join(root, name)
+
+
+def hash_file(digest, path):
+    """
+    Update the digest with the path and the content of the file
+    """
+    digest.update(os.path.normpath(path).encode('utf-8') + b'\0')
+    with open(path, 'rb') as fid:
+        for chunk in iter(lambda: fid.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    digest.update(b'\0')
+
+
+def get_size(path):
+    """
+    Get the total size of all files within the directory
+    """
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, files in os.walk(path)
+               for name in files)
+
+
+def get_environment_fingerprint():
+    """
+    Get the fingerprint of the Python interpreter and
+    all the installed distributions
+    """
+    try:
+        from importlib import metadata
+        distributions = [
+            '{}=={}'.format(i.metadata['Name'], i.version)
+            for i in metadata.distributions()
+        ]
+    except ImportError:
+        import pkg_resources
+        distributions = [
+            '{}=={}'.format(i.project_name, i.version)
+            for i in pkg_resources.working_set
+        ]
+
+    return '\n'.join(
+        [sys.executable, sys.version] + sorted(distributions)
+    )
+
+
+class ResultCache(object):
+    """
+    Cache of nosetests suite results keyed by the content hash
+    of everything the suite depends on
+
+    Each suite is hashed by its command, the content of all of its
+    source files (see ``get_source_paths()``) and the fingerprint
+    of the Python environment. When the hash matches a stored
+    result, stored xunit report and coverage data are reused
+    instead of running the suite. Only successful suites are stored.
+
+    Least recently used results are evicted when the total size
+    of the cache exceeds ``max_size``.
+
+    Parameters
+    ----------
+    directory : str
+        Directory where results are stored
+    max_size : int
+        Maximum total size of the cache in bytes
+    ignore : list, optional
+        Paths of files and directories which are not hashed
+        (see ``iter_files()``)
+    """
+
+    def __init__(self, directory, max_size, ignore=()):
+        self.directory = directory
+        self.max_size = max_size
+        self.ignore = list(ignore)
+        self._fingerprint = None
+
+    @property
+    def fingerprint(self):
+        """
+        Fingerprint of the environment which is computed only once
+        """
+        if self._fingerprint is None:
+            self._fingerprint = get_environment_fingerprint()
+        return self._fingerprint
+
+    def get_key(self, nose_call):
+        """
+        Get the cache key of the nosetests suite
+        """
+        digest = hashlib.sha256()
+        digest.update(self.fingerprint.encode('utf-8') + b'\0')
+        digest.update(six.text_type(nose_call.command).encode('utf-8') + b'\0')
+        for path in iter_files(get_source_paths(nose_call.command),
+                               self.ignore):
+            hash_file(digest, path)
+        return digest.hexdigest()
+
+    def get_entry(self, key):
+        """
+        Get the directory where results for the key are stored
+        """
+        return os.path.join(self.directory, key)
+
+    def contains(self, key):
+        """
+        Check whether results for the key are stored
+        without restoring them
+        """
+        return os.path.exists(os.path.join(self.get_entry(key), META_FILE))
+
+    def restore(self, nose_call, key):
+        """
+        Restore stored results of the suite if they are available
+
+        Returns
+        -------
+        bool
+            Whether the results were restored
+        """
+        entry = self.get_entry(key)
+        try:
+            with io.open(os.path.join(entry, META_FILE), 'rb') as fid:
+                meta = json.loads(fid.read().decode('utf-8'))
+            nose_call.ensure_artifacts_dir()
+            shutil.copyfile(os.path.join(entry, XUNIT_FILE),
+                            nose_call.xunit_file)
+            nose_call.remove_coverage()
+            if meta.get('coverage'):
+                shutil.copyfile(os.path.join(entry, COVERAGE_FILE),
+                                nose_call.coverage_file)
+        except (IOError, OSError, ValueError):
+            return False
+
+        nose_call.return_code = meta['return_code']
+        nose_call.cached = True
+
+        # mark the entry as recently used
+        os.utime(entry, None)
+        return True
+
+    def store(self, nose_call, key):
+        """
+        Store results of the executed suite
+
+        Results are written into a temporary directory
+        which is then renamed so that partially stored results
+        are never restored.
+        """
+        if nose_call.return_code != 0 or nose_call.shards:
+            return
+
+        entry = self.get_entry(key)
+        tmp = '{}.{}.tmp'.format(entry, os.getpid())
+        if os.path.exists(entry):
+            shutil.rmtree(entry)
+        os.makedirs(tmp)
+
+        shutil.copyfile(nose_call.xunit_file, os.path.join(tmp, XUNIT_FILE))
+        has_coverage = nose_call.is_covered() and nose_call.has_coverage
+        if has_coverage:
+            shutil.copyfile(nose_call.coverage_file,
+                            os.path.join(tmp, COVERAGE_FILE))
+        with open(os.path.join(tmp, META_FILE), 'wb') as fid:
+            fid.write(json.dumps({
+                'command': nose_call.command,
+                'return_code': nose_call.return_code,
+                'coverage': has_coverage,
+                'created': time.time(),
+            }).encode('utf-8'))
+
+        os.rename(tmp, entry)
+
+    def evict(self):
+        """
+        Remove least recently used results until the total
+        size of the cache is within ``max_size``
+        """
+        if not os.path.isdir(self.directory):
+            return
+
+        entries = []
+        for name in os.listdir(self.directory):
+            entry = self.get_entry(name)
+            entries.append((os.path.getmtime(entry), get_size(entry), entry))
+
+        total = sum(i[1] for i in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_size:
+                break
+            shutil.rmtree(entry)
+            total -= size
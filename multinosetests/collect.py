@@ -0,0 +1,273 @@
+from __future__ import print_function, unicode_literals
+import os
+import pickle
+import shutil
+import tempfile
+from subprocess import call
+
+from .command import NoseCommand, join_command, split_command, strip_options
+
+
+# options which are not needed or are harmful while only
+# collecting tests (e.g. nosetests.xml would be overwritten)
+COLLECT_STRIP_OPTIONS = (
+    '--collect-only',
+    '--cover-',
+    '--id-file',
+    '--with-coverage',
+    '--with-id',
+    '--with-xunit',
+    '--xunit-',
+)
+
+# options which only select tests or change how their results are
+# reported rather than how tests run (see ``get_run_key()``)
+RUN_KEY_IGNORED_OPTIONS = COLLECT_STRIP_OPTIONS + (
+    '-A', '--eval-attr',
+    '-I', '--ignore-files',
+    '-a', '--attr',
+    '-e', '--exclude',
+    '-i', '--include',
+    '-m', '--match', '--testmatch',
+    '-q', '--quiet',
+    '-v', '--verbose', '--verbosity',
+    '--tests',
+)
+
+# classnames of testcases which are not actual tests
+UNADDRESSABLE_CLASSNAMES = (
+    # nose failed to load tests (e.g. ImportError)
+    'nose.failure.Failure',
+    # suite did not write its report (see xunit.write_error_report)
+    'multinosetests',
+)
+
+
+def get_collect_command(command, id_file):
+    """
+    Get the nosetests command which only collects tests of the
+    given command and stores their addresses in the ``id_file``
+
+    Collection is done via nose ``--collect-only`` together with
+    nose ``testid`` plugin which stores the exact address
+    of every collected test.
+    """
+    program, options, tests = split_command(command)
+    options = strip_options(options, COLLECT_STRIP_OPTIONS) + [
+        ['--collect-only'],
+        ['--with-id'],
+        ['--id-file={}'.format(id_file)],
+    ]
+    return join_command(program, options, tests)
+
+
+def make_address(address):
+    """
+    Convert nose ``testid`` address tuple ``(filename, module, call)``
+    into a test name which can be given to nosetests
+    (e.g. ``package.module:Class.test_method``)
+    """
+    filename, module, call_name = address
+    head = module or filename
+    if call_name:
+        return '{}:{}'.format(head, call_name)
+    return head
+
+
+def address_to_test_id(address):
+    """
+    Convert the test name as returned by ``make_address()`` into
+    the dotted test id as reported in xunit reports
+    (e.g. ``package.module.Class.test_method``)
+    """
+    return address.replace(':', '.')
+
+
+def get_testcase_address(classname, name):
+    """
+    Convert classname and name of the xunit testcase into
+    the test name which can be given to nosetests
+    (e.g. ``package.module:Class.test_method``)
+
+    Xunit reports do not tell where the module ends and the class
+    starts so by convention the last part of the classname
+    is considered to be the class when it is capitalized.
+    Arguments of generator tests (e.g. ``test_foo(1,)``) are removed
+    and therefore all tests of the generator are addressed.
+
+    Returns
+    -------
+    str
+        Test name or ``None`` when the testcase is not addressable
+        such as when nose failed to import a module
+    """
+    if not classname or not name or classname in UNADDRESSABLE_CLASSNAMES:
+        return None
+
+    name = name.split('(', 1)[0]
+    module, _, cls = classname.rpartition('.')
+    if module and cls[:1].isupper():
+        return '{}:{}.{}'.format(module, cls, name)
+    return '{}:{}'.format(classname, name)
+
+
+def read_test_addresses(id_file):
+    """
+    Read the addresses of all tests stored by the nose ``testid`` plugin
+
+    Returns
+    -------
+    list
+        Unique test names in the order they were collected
+    """
+    with open(id_file, 'rb') as fid:
+        data = pickle.load(fid)
+
+    ids = data.get('ids', data)
+    addresses = []
+    seen = set()
+    for key in sorted(ids):
+        address = make_address(ids[key])
+        # generator tests share the same address
+        if address not in seen:
+            seen.add(address)
+            addresses.append(address)
+    return addresses
+
+
+def collect_test_addresses(command, shell=False):
+    """
+    Collect the addresses of all tests the nosetests command would run
+    without running any of them
+
+    Parameters
+    ----------
+    command : str
+        Nosetests command string
+    shell : bool, optional
+        Whether the command is executed via shell
+
+    Returns
+    -------
+    list
+        Test names which can be given to nosetests or ``None``
+        if the tests could not be collected
+    """
+    tmpdir = tempfile.mkdtemp(prefix='multinosetests')
+    try:
+        id_file = os.path.join(tmpdir, 'noseids')
+        collect_command = get_collect_command(command, id_file)
+        if shell:
+            args, env = collect_command, None
+        else:
+            parsed = NoseCommand(collect_command)
+            args, env = parsed.get_argv(), parsed.get_environment()
+        with open(os.devnull, 'wb') as devnull:
+            try:
+                return_code = call(args,
+                                   shell=shell,
+                                   env=env,
+                                   stdout=devnull,
+                                   stderr=devnull)
+            except OSError:
+                return None
+        if return_code != 0 or not os.path.exists(id_file):
+            return None
+        return read_test_addresses(id_file)
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def get_run_key(command):
+    """
+    Get the key of how the nosetests command runs its tests
+
+    The same test is run the same way only by commands with the same
+    program, environment variables and options (e.g. ``--processes``)
+    except options which only select tests or change how their
+    results are reported (see ``RUN_KEY_IGNORED_OPTIONS``).
+    """
+    parsed = NoseCommand(command)
+    options = strip_options(parsed.options, RUN_KEY_IGNORED_OPTIONS)
+    return (tuple(parsed.program),
+            tuple(sorted(parsed.env.items())),
+            tuple(sorted(tuple(i) for i in options)))
+
+
+def find_overlaps(suites, keys=None):
+    """
+    Find tests which are run by multiple suites
+
+    Every test belongs to the first suite which runs it
+    and is an overlap in all following suites which run it too
+    the same way (with the same key).
+
+    Parameters
+    ----------
+    suites : list
+        Test names of every suite as returned by
+        ``collect_test_addresses()``. Suites whose tests could
+        not be collected (``None``) never overlap.
+    keys : list, optional
+        Key of how every suite runs its tests as returned by
+        ``get_run_key()``. Suites with different keys never overlap.
+        By default all suites run their tests the same way.
+
+    Returns
+    -------
+    list
+        For every suite, mapping of the index of an earlier suite
+        to test names which the earlier suite runs as well
+    """
+    keys = keys or [None] * len(suites)
+    owners = {}
+    overlaps = []
+    for index, (addresses, key) in enumerate(zip(suites, keys)):
+        overlap = {}
+        for address in addresses or []:
+            owner = owners.setdefault((key, address), index)
+            if owner != index:
+                overlap.setdefault(owner, []).append(address)
+        overlaps.append(overlap)
+    return overlaps
+
+
+def compact_addresses(addresses, keep):
+    """
+    Get test names which run only the kept tests out of all tests
+
+    Modules whose tests are all kept are given as a whole module
+    instead of listing all of their tests so that commands
+    do not get needlessly long.
+
+    Parameters
+    ----------
+    addresses : list
+        All test names of the suite as returned
+        by ``collect_test_addresses()``
+    keep : list
+        Test names which should still be run
+
+    Returns
+    -------
+    list
+        Test names which can be given to nosetests
+    """
+    keep = set(keep)
+    modules = []
+    tests = {}
+    for address in addresses:
+        module = address.split(':', 1)[0]
+        if module not in tests:
+            modules.append(module)
+            tests[module] = []
+        tests[module].append(address)
+
+    compacted = []
+    for module in modules:
+        kept = [i for i in tests[module] if i in keep]
+        if len(kept) == len(tests[module]):
+            compacted.append(module)
+        else:
+            compacted.extend(kept)
+    return compacted
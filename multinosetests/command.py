@@ -0,0 +1,343 @@
+from __future__ import print_function, unicode_literals
+import os
+import re
+import shlex
+
+import six
+from six.moves import shlex_quote
+
+
+ENV_ASSIGNMENT_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*=')
+# nose options which accept their value as a separate argument
+# (e.g. ``-a slow``) rather than only as ``--option=value``
+NOSE_VALUE_OPTIONS = {
+    '-A', '--eval-attr',
+    '-I', '--ignore-files',
+    '-a', '--attr',
+    '-c', '--config',
+    '-e', '--exclude',
+    '-i', '--include',
+    '-l', '--debug',
+    '-m', '--match', '--testmatch',
+    '-w', '--where',
+    '--cover-html-dir',
+    '--cover-min-percentage',
+    '--cover-package',
+    '--cover-xml-file',
+    '--debug-log',
+    '--doctest-extension',
+    '--doctest-fixtures',
+    '--doctest-options',
+    '--doctest-result-variable',
+    '--id-file',
+    '--log-config', '--logging-config',
+    '--logging-datefmt',
+    '--logging-filter',
+    '--logging-format',
+    '--logging-level',
+    '--process-timeout',
+    '--processes',
+    '--profile-restrict',
+    '--profile-sort',
+    '--profile-stats-file',
+    '--py3where',
+    '--tests',
+    '--verbosity',
+    '--xunit-file',
+    '--xunit-testsuite-name',
+}
+# characters of shell operators (e.g. ``&&`` or ``2>&1``) and of shell
+# expansions (variables, command substitutions and globs) which cannot
+# be used without executing the command via shell
+SHELL_OPERATOR_CHARS = '|&;<>()'
+SHELL_EXPANSION_CHARS = '$`*?['
+# expansions which are still done within double quotes
+SHELL_QUOTED_EXPANSION_CHARS = '$`'
+
+
+def get_program_length(tokens):
+    """
+    Get the number of leading tokens which invoke nosetests
+    (e.g. ``nosetests`` or ``python -m nose``) including
+    any leading environment variable assignments
+    """
+    index = 0
+    while index < len(tokens) and ENV_ASSIGNMENT_RE.match(tokens[index]):
+        index += 1
+
+    for i in range(index, len(tokens)):
+        if os.path.basename(tokens[i]).startswith('nosetests'):
+            return i + 1
+        if tokens[i] == 'nose' and i > index and tokens[i - 1] == '-m':
+            return i + 1
+
+    # options are never a program
+    if index < len(tokens) and not tokens[index].startswith('-'):
+        return index + 1
+    return index
+
+
+def get_shell_syntax(command):
+    """
+    Get shell operators and expansions used in the command string
+
+    The command string is scanned rather than its tokens since
+    shell syntax does not have to be a separate token
+    (e.g. ``a|b`` or ``tests/test_*.py``) and quoted
+    characters (e.g. ``'tests/test_*.py'``) are not shell syntax.
+    Tilde is only expanded at the start of a word (e.g. ``~/tests``)
+    and braces only when they contain a comma (e.g. ``{a,b}``).
+
+    Returns
+    -------
+    list
+        Unique operators and expansion characters in order
+        they are used in the command
+    """
+    syntax = []
+    quote = None
+    escaped = False
+    operator = ''
+    word_start = True
+    # whether braces are open and whether they contain a comma
+    braces = None
+    for char in command + ' ':
+        unquoted = not quote and not escaped
+        if char in SHELL_OPERATOR_CHARS and unquoted:
+            operator += char
+            word_start = True
+            braces = None
+            continue
+        if operator:
+            syntax.append(operator)
+            operator = ''
+
+        if unquoted and char == '~' and word_start:
+            syntax.append(char)
+        word_start = unquoted and char.isspace()
+
+        if unquoted and char.isspace():
+            braces = None
+        elif unquoted and char == '{':
+            braces = False
+        elif unquoted and char == ',' and braces is not None:
+            braces = True
+        elif unquoted and char == '}' and braces:
+            syntax.append('{')
+            braces = None
+
+        if quote == "'":
+            if char == "'":
+                quote = None
+        elif escaped:
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif quote == '"':
+            if char == '"':
+                quote = None
+            elif char in SHELL_QUOTED_EXPANSION_CHARS:
+                syntax.append(char)
+        elif char in '\'"':
+            quote = char
+        elif char in SHELL_EXPANSION_CHARS:
+            syntax.append(char)
+
+    return sorted(set(syntax), key=syntax.index)
+
+
+def split_command(command):
+    """
+    Split the nosetests command into its program, options and test names
+
+    Parameters
+    ----------
+    command : str
+        Nosetests command string
+
+    Returns
+    -------
+    tuple
+        Tuple of ``(program, options, tests)`` where ``program`` is
+        a list of tokens invoking nosetests, ``options`` is a list
+        of options where each option is a list of either the flag alone
+        or the flag with its value and ``tests`` is a list of
+        test names (paths, modules, etc) given to nosetests
+    """
+    tokens = shlex.split(command)
+    length = get_program_length(tokens)
+    program, tokens = tokens[:length], tokens[length:]
+
+    options = []
+    tests = []
+    tokens = iter(tokens)
+    for token in tokens:
+        if token in NOSE_VALUE_OPTIONS:
+            options.append([token, next(tokens, '')])
+        elif token.startswith('-'):
+            options.append([token])
+        else:
+            tests.append(token)
+
+    return program, options, tests
+
+
+def join_command(program, options=None, tests=None):
+    """
+    Join tokens of the nosetests command back into a shell command string
+
+    This is the inverse of ``split_command()``.
+    """
+    tokens = list(program)
+    for option in options or []:
+        tokens.extend(option)
+    tokens.extend(tests or [])
+    return ' '.join(shlex_quote(six.text_type(i)) for i in tokens)
+
+
+def get_option_name(option):
+    """
+    Get the name of the option without its ``=value`` part
+    """
+    return option[0].split('=', 1)[0]
+
+
+def get_option_value(option):
+    """
+    Get the value of the option given either as ``--option=value``
+    or as ``--option value``
+    """
+    if len(option) > 1:
+        return option[1]
+    if '=' in option[0]:
+        return option[0].split('=', 1)[1]
+    return None
+
+
+def strip_options(options, prefixes):
+    """
+    Remove all options which names start with any of the given prefixes
+    """
+    return [i for i in options
+            if not get_option_name(i).startswith(tuple(prefixes))]
+
+
+class NoseCommand(object):
+    """
+    Nosetests command string tokenized once into its parts
+
+    All checks of the command are done on its tokens rather than
+    on the raw command string so that for example a test named
+    ``test_with_coverage`` is not mistaken for ``--with-coverage`` flag.
+    Tokens can be executed directly without a shell (see ``get_argv()``).
+
+    Parameters
+    ----------
+    command : str
+        Nosetests command string
+
+    Attributes
+    ----------
+    command : str
+        Same as ``command`` parameter
+    env : dict
+        Environment variables assigned in front of the command
+        (e.g. ``FOO=bar nosetests``)
+    program : list
+        Tokens invoking nosetests (e.g. ``['python', '-m', 'nose']``)
+    options : list
+        Options where each option is a list of either the flag alone
+        or the flag with its value
+    tests : list
+        Test names given to nosetests
+    tokens : list
+        All tokens of the command
+    error : str
+        Why the command cannot be tokenized (e.g. unbalanced quotes)
+        in which case it has no tokens
+    """
+
+    def __init__(self, command):
+        self.command = command
+        self.error = None
+        try:
+            self.tokens = shlex.split(command)
+            program, self.options, self.tests = split_command(command)
+        except ValueError as e:
+            self.error = six.text_type(e)
+            self.tokens = program = self.options = self.tests = []
+
+        assignments = 0
+        while (assignments < len(program) and
+               ENV_ASSIGNMENT_RE.match(program[assignments])):
+            assignments += 1
+        self.env = dict(i.split('=', 1) for i in program[:assignments])
+        self.program = program[assignments:]
+
+    def is_nose(self):
+        """
+        Check whether the command runs nosetests itself
+        (``nosetests`` or ``python -m nose``) rather than
+        some other program which might wrap nosetests
+        """
+        if not self.program:
+            return False
+        return (os.path.basename(self.program[-1]).startswith('nosetests') or
+                self.program[-2:] == ['-m', 'nose'])
+
+    def has_option(self, name):
+        """
+        Check whether the option with the given name is provided
+        """
+        return any(get_option_name(i) == name for i in self.options)
+
+    def get_option_values(self, name):
+        """
+        Get values of all options with the given name
+        """
+        return [get_option_value(i) for i in self.options
+                if get_option_name(i) == name and get_option_value(i)]
+
+    def get_shell_syntax(self):
+        """
+        Get all shell operators and expansions used in the command
+
+        See ``get_shell_syntax()``.
+        """
+        return get_shell_syntax(self.command)
+
+    def get_argv(self, options=None):
+        """
+        Get arguments to execute the command without a shell
+
+        Parameters
+        ----------
+        options : list, optional
+            Additional options appended after all original arguments
+
+        Returns
+        -------
+        list
+            Arguments with the executable first
+        """
+        # tokens are kept in their order since options unknown to
+        # ``split_command()`` might take the following token as value
+        argv = list(self.tokens)
+        while argv and ENV_ASSIGNMENT_RE.match(argv[0]):
+            argv.pop(0)
+        for option in options or []:
+            argv.extend(option)
+        return argv
+
+    def get_environment(self, environ=None):
+        """
+        Get environment variables of the command
+
+        Parameters
+        ----------
+        environ : dict, optional
+            Base environment. Defaults to ``os.environ``.
+        """
+        env = dict(os.environ if environ is None else environ)
+        env.update((str(k), str(v)) for k, v in self.env.items())
+        return env
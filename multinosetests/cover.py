@@ -0,0 +1,446 @@
+from __future__ import print_function, unicode_literals
+import os
+import shutil
+import sqlite3
+from contextlib import closing
+
+import coverage
+
+from .artifacts import ensure_directory
+from .command import NoseCommand
+
+
+# separates the suite key from the original context
+# of the suite coverage data within the coverage baseline
+SUITE_CONTEXT_SEPARATOR = '|'
+# schema versions of coverage data files which tables can be edited
+# directly (all of coverage 5.x, 6.x and 7.x use version 7)
+SUPPORTED_SCHEMA_VERSIONS = {7}
+
+
+class CoverageSchemaError(Exception):
+    """
+    Coverage data file uses a schema which cannot be edited directly
+    """
+
+
+def get_cover_packages(commands):
+    """
+    Get all packages which are covered by the given nosetests commands
+
+    Packages are extracted from all ``--cover-package`` options
+    given either as ``--cover-package=foo,bar`` or
+    as ``--cover-package foo``.
+
+    Parameters
+    ----------
+    commands : list
+        Nosetests command strings
+
+    Returns
+    -------
+    list
+        Sorted list of unique package names
+    """
+    packages = set()
+    for command in commands:
+        for value in NoseCommand(command).get_option_values(
+                '--cover-package'):
+            packages.update(i for i in value.split(',') if i)
+    return sorted(packages)
+
+
+def get_include_patterns(packages):
+    """
+    Convert package names to file path patterns compatible
+    with coverage ``include`` option
+
+    For example package name ``foo`` is converted to filename
+    patterns ``foo/*`` and ``foo.py`` which match both packages
+    and single module packages while subpackage ``foo.bar``
+    is converted to ``foo/bar/*`` and ``foo/bar.py``.
+    Trailing wildcard such as ``foo*`` is not used since newer
+    versions of coverage do not match wildcards across
+    directory separators.
+    Returns ``None`` when no packages are given so that
+    coverage does not filter any files.
+    """
+    patterns = []
+    for package in packages:
+        path = package.replace('.', os.sep)
+        patterns.extend([os.path.join(path, '*'), '{}.py'.format(path)])
+    return patterns or None
+
+
+def close_data(data):
+    """
+    Close the database of the coverage data
+
+    ``CoverageData.close()`` is only available since coverage 7.
+    Older versions close the database once the data is garbage collected.
+    """
+    close = getattr(data, 'close', None)
+    if close is not None:
+        close()
+
+
+def check_schema_version(data_file):
+    """
+    Make sure tables of the coverage data file can be edited directly
+
+    Raises
+    ------
+    CoverageSchemaError
+        When the schema version of the data file is not supported
+        or the data file is not a coverage sqlite database
+    """
+    try:
+        with closing(sqlite3.connect(data_file)) as db:
+            version = db.execute(
+                'select version from coverage_schema'
+            ).fetchone()
+    except sqlite3.Error:
+        version = None
+    if not version or version[0] not in SUPPORTED_SCHEMA_VERSIONS:
+        raise CoverageSchemaError(
+            'Unsupported coverage data schema of {}'.format(data_file)
+        )
+
+
+def get_suite_context(key, context):
+    """
+    Get the context under which coverage data of the suite
+    is stored within the coverage baseline
+    """
+    return '{}{}{}'.format(key, SUITE_CONTEXT_SEPARATOR, context or '')
+
+
+def get_context_suite(context):
+    """
+    Get the suite key of the coverage baseline context
+    """
+    return context.split(SUITE_CONTEXT_SEPARATOR, 1)[0]
+
+
+def remove_suites(data_file, is_removed):
+    """
+    Remove coverage data of suite contexts from the coverage baseline
+
+    ``coverage`` API cannot remove measured data therefore
+    rows of the removed contexts are deleted from the
+    sqlite coverage data file directly together with files
+    which are not measured by any of the kept contexts.
+
+    Parameters
+    ----------
+    data_file : str
+        Path of the coverage baseline
+    is_removed : callable
+        Called with the suite key and the original context of the suite
+        (see ``get_suite_context()``) to decide whether it is removed
+
+    Returns
+    -------
+    set
+        Keys of suites which have any data left in the baseline
+
+    Raises
+    ------
+    CoverageSchemaError
+        When the schema of the baseline is not supported
+    """
+    check_schema_version(data_file)
+    with closing(sqlite3.connect(data_file)) as db:
+        with db:
+            contexts = [
+                (i, context.partition(SUITE_CONTEXT_SEPARATOR)[::2])
+                for i, context in db.execute(
+                    'select id, context from context'
+                ).fetchall()
+            ]
+            removed = [(i,) for i, context in contexts if is_removed(*context)]
+            for table in ('line_bits', 'arc'):
+                db.executemany(
+                    'delete from {} where context_id = ?'.format(table),
+                    removed,
+                )
+            db.executemany('delete from context where id = ?', removed)
+            measured = ('select file_id from line_bits '
+                        'union select file_id from arc')
+            db.execute('delete from tracer where file_id not in ({})'
+                       ''.format(measured))
+            db.execute('delete from file where id not in ({})'
+                       ''.format(measured))
+
+    return set(context[0]
+               for i, context in contexts
+               if (i,) not in removed)
+
+
+def get_measured_contexts(data_file):
+    """
+    Get files measured under every context of every suite
+    stored in the coverage baseline
+
+    Returns
+    -------
+    dict
+        Mapping of suite keys to mappings of the original
+        contexts of the suite to lists of measured files
+    """
+    with closing(sqlite3.connect(data_file)) as db:
+        rows = db.execute(
+            'select context.context, file.path '
+            'from (select file_id, context_id from line_bits '
+            '      union select file_id, context_id from arc) measured '
+            'join file on file.id = measured.file_id '
+            'join context on context.id = measured.context_id'
+        ).fetchall()
+
+    suites = {}
+    for context, path in rows:
+        key, _, original = context.partition(SUITE_CONTEXT_SEPARATOR)
+        suites.setdefault(key, {}).setdefault(original, []).append(path)
+    return suites
+
+
+def add_suite_data(data, key, path):
+    """
+    Add coverage data of the suite to the coverage baseline
+    under contexts prefixed with the suite key
+
+    Contexts are renamed within a copy of the suite data file
+    so that all of its data is added by a single
+    ``CoverageData.update()`` regardless of the number of contexts.
+    """
+    check_schema_version(path)
+    tmp = '{}.{}.tmp'.format(path, os.getpid())
+    shutil.copyfile(path, tmp)
+    try:
+        with closing(sqlite3.connect(tmp)) as db:
+            with db:
+                db.execute('update context set context = ? || context',
+                           (get_suite_context(key, ''),))
+        suite = coverage.CoverageData(basename=tmp)
+        suite.read()
+        data.update(suite)
+        close_data(suite)
+    finally:
+        os.unlink(tmp)
+
+
+def get_data_file_contexts(path):
+    """
+    Get contexts measured within the coverage data file
+    """
+    check_schema_version(path)
+    with closing(sqlite3.connect(path)) as db:
+        return set(context for context, in db.execute(
+            'select context from context'
+        ).fetchall())
+
+
+def update_coverage_baseline(data_file, data_files, unchanged=(),
+                             partial=None, merge=False):
+    """
+    Update combined coverage data of all suites which
+    is kept between ``multinosetests`` runs
+
+    Coverage data of every suite is stored under its own contexts
+    (see ``get_suite_context()``) so that data of a single suite
+    can be replaced without combining data of all other suites again.
+    Data of suites which did not change since they were added
+    (e.g. suites restored from the result cache) is kept while
+    data of all other suites is removed and the new data of suites
+    which were executed is added. When the baseline cannot be
+    updated (e.g. it was written by a different version of
+    coverage), it is rebuilt from scratch.
+
+    When ``merge``, data of suites which were not executed is kept
+    and suites which ran only some of their tests (see ``partial``)
+    replace only data of the tests they ran. Their data is added
+    under the key of their original suite so that the baseline
+    still covers all tests of the original suite.
+
+    Parameters
+    ----------
+    data_file : str
+        Path of the coverage baseline
+    data_files : dict
+        Mapping of suite keys to paths of coverage data files
+        of all suites of the current run. Data of suites which
+        are not given is removed from the baseline unless ``merge``.
+    unchanged : list, optional
+        Keys of suites whose data did not change
+    partial : dict, optional
+        Mapping of keys of suites which ran only some tests
+        to keys of their original suites
+    merge : bool, optional
+        Whether to keep data of suites which are not given
+        in ``data_files`` (e.g. suites which were not selected to run)
+
+    Returns
+    -------
+    list
+        Keys of suites whose data was added to the baseline
+
+    Raises
+    ------
+    CoverageSchemaError
+        When data of suites uses a schema which is not supported
+    """
+    partial = partial or {}
+    keep = set(unchanged) & set(data_files)
+    # data measured outside of tests is merged rather than replaced
+    # since partial suites import only some of the test modules
+    replaced = set()
+    for key in set(partial) & set(data_files):
+        replaced.update(get_data_file_contexts(data_files[key]) - {''})
+
+    def is_removed(key, context):
+        if key in keep:
+            return False
+        if key in data_files or not merge:
+            return True
+        return context in replaced
+
+    kept = set()
+    if os.path.exists(data_file):
+        try:
+            kept = remove_suites(data_file, is_removed)
+        except (sqlite3.Error, CoverageSchemaError):
+            pass
+    if not kept:
+        # start from a clean slate so that stale metadata
+        # such as whether branches are measured is not kept
+        if os.path.exists(data_file):
+            os.unlink(data_file)
+    ensure_directory(os.path.dirname(data_file) or os.curdir)
+
+    added = sorted(set(data_files) - kept)
+    data = coverage.CoverageData(basename=data_file)
+    # otherwise existing data would be erased
+    data.read()
+    try:
+        for key in added:
+            add_suite_data(data, partial.get(key, key), data_files[key])
+    except CoverageSchemaError:
+        close_data(data)
+        raise
+    except coverage.CoverageException:
+        if not kept:
+            raise
+        close_data(data)
+        os.unlink(data_file)
+        return update_coverage_baseline(data_file, data_files,
+                                        partial=partial)
+    data.write()
+    close_data(data)
+    return added
+
+
+def combine_data_files(data_file, paths):
+    """
+    Combine coverage data files into a new data file
+    without editing any of them
+    """
+    if os.path.exists(data_file):
+        os.unlink(data_file)
+    data = coverage.CoverageData(basename=data_file)
+    for path in paths:
+        suite = coverage.CoverageData(basename=path)
+        suite.read()
+        data.update(suite)
+        close_data(suite)
+    data.write()
+    close_data(data)
+
+
+def combine_coverage_incremental(data_files,
+                                 data_file,
+                                 baseline_file,
+                                 unchanged=(),
+                                 keep_data_files=False,
+                                 partial=None,
+                                 merge=False):
+    """
+    Combine coverage data files of suites into a single
+    data file via the coverage baseline
+
+    Only data of suites which changed since the previous run
+    are combined into the baseline (see ``update_coverage_baseline()``)
+    which is then copied to ``data_file``. As with ``coverage combine``,
+    combined data files are removed unless ``keep_data_files``.
+    When coverage data uses a schema which is not supported
+    (see ``SUPPORTED_SCHEMA_VERSIONS``), the baseline is removed and
+    all given data files are combined into ``data_file`` directly.
+
+    Parameters
+    ----------
+    data_files : dict
+        Mapping of suite keys to paths of their coverage data files
+    data_file : str
+        Path of the combined coverage data file
+    baseline_file : str
+        Path of the coverage baseline
+    unchanged : list, optional
+        Keys of suites whose data did not change
+    keep_data_files : bool, optional
+        Whether to keep data files of suites so that they can be
+        combined again as ``unchanged`` data files
+    partial : dict, optional
+        Mapping of keys of suites which ran only some tests
+        to keys of their original suites
+    merge : bool, optional
+        Whether to keep data of suites which are not given
+        in ``data_files`` within the baseline
+
+    Returns
+    -------
+    coverage.Coverage
+        Coverage instance with the combined data loaded which
+        can be used to generate coverage reports
+    """
+    try:
+        update_coverage_baseline(baseline_file, data_files, unchanged,
+                                 partial=partial, merge=merge)
+        shutil.copyfile(baseline_file, data_file)
+    except CoverageSchemaError:
+        # data of suites cannot be stored under their own contexts
+        # by this version of coverage so all of it is combined again
+        if os.path.exists(baseline_file):
+            os.unlink(baseline_file)
+        combine_data_files(data_file, data_files.values())
+    if not keep_data_files:
+        for path in data_files.values():
+            os.unlink(path)
+
+    cov = coverage.Coverage(data_file=data_file)
+    cov.load()
+    return cov
+
+
+def write_coverage_reports(cov, include=None, xml_file=None, html_dir=None):
+    """
+    Print out the coverage text report and optionally
+    write xml and html coverage reports
+
+    Parameters
+    ----------
+    cov : coverage.Coverage
+        Coverage instance with loaded coverage data
+    include : list, optional
+        File path patterns to be included in the reports.
+        See ``get_include_patterns()``.
+    xml_file : str, optional
+        Path where the xml (Cobertura) coverage report will be written
+    html_dir : str, optional
+        Directory where the html coverage report will be written
+    """
+    cov.report(include=include)
+
+    if xml_file:
+        cov.xml_report(include=include, outfile=xml_file)
+
+    if html_dir:
+        cov.html_report(include=include, directory=html_dir)
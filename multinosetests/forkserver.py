@@ -0,0 +1,445 @@
+from __future__ import print_function, unicode_literals
+import argparse
+import array
+import errno
+import fcntl
+import importlib
+import json
+import os
+import select
+import signal
+import socket
+import sys
+import threading
+import traceback
+from subprocess import PIPE, Popen
+
+from .process import RUNNING, SuiteProcess, get_return_code, get_usage
+from .profiling import PROFILE_ENV, run_profiled
+
+
+# maximum size of a single request
+MAX_REQUEST_SIZE = 1024 * 1024
+# file descriptors sent with every request
+REQUEST_FDS = 3
+READY = b'ready'
+# server is not executed via ``-m`` since its module is
+# already imported by the package before it could be executed
+SERVER_SCRIPT = 'from multinosetests.forkserver import main; main()'
+# fork server needs to pass file descriptors over unix sockets
+AVAILABLE = hasattr(socket, 'AF_UNIX') and hasattr(socket.socket, 'sendmsg')
+
+
+class ForkServerError(Exception):
+    """
+    Raised when the fork server cannot be started
+    """
+
+
+def send_fds(sock, data, fds):
+    """
+    Send data with file descriptors as a single message
+    """
+    sock.sendmsg([data], [(socket.SOL_SOCKET,
+                           socket.SCM_RIGHTS,
+                           array.array(str('i'), fds))])
+
+
+def receive_fds(sock, count):
+    """
+    Receive a single message sent via ``send_fds()``
+
+    Returns
+    -------
+    tuple
+        Tuple of ``(data, fds)``. Data is empty once
+        the other side closed the socket.
+    """
+    fds = array.array(str('i'))
+    data, ancdata, _, _ = sock.recvmsg(
+        MAX_REQUEST_SIZE, socket.CMSG_LEN(count * fds.itemsize)
+    )
+    for level, kind, payload in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(payload[:len(payload) - len(payload) % fds.itemsize])
+    return data, list(fds)
+
+
+def write_message(fd, message):
+    """
+    Write json message as a single line
+
+    Messages are small enough to be written atomically
+    so they are never interleaved.
+    """
+    os.write(fd, json.dumps(message).encode('utf-8') + b'\n')
+
+
+def read_message(fd):
+    """
+    Read a single line json message
+
+    Message is read byte by byte so that nothing after the message
+    is consumed and the descriptor only becomes readable again once
+    the next message is written.
+
+    Returns
+    -------
+    dict
+        Message or ``None`` when the descriptor was closed
+    """
+    line = b''
+    while not line.endswith(b'\n'):
+        try:
+            byte = os.read(fd, 1)
+        except OSError as e:
+            if e.errno == errno.EINTR:
+                continue
+            raise
+        if not byte:
+            return None
+        line += byte
+    return json.loads(line.decode('utf-8'))
+
+
+def run_nose(argv):
+    """
+    Run nosetests within the current process
+
+    Results of tests are streamed by ``ResultStream`` plugin
+    even when multinosetests is not installed as nose plugin.
+
+    Returns
+    -------
+    int
+        Return code same as of the ``nosetests`` executable
+    """
+    import nose
+    from .plugin import ResultStream
+    return 0 if nose.run(argv=argv, addplugins=[ResultStream()]) else 1
+
+
+def run_child(request, stdout, stderr):
+    """
+    Run the requested suite within the forked child and exit
+    """
+    code = 1
+    try:
+        # same as suites which are not forked (see ``SuiteProcess``)
+        os.setsid()
+        os.dup2(stdout, 1)
+        os.dup2(stderr, 2)
+        os.close(stdout)
+        os.close(stderr)
+        os.chdir(request['cwd'])
+        os.environ.clear()
+        os.environ.update((str(k), str(v))
+                          for k, v in request['env'].items())
+        sys.argv = list(request['argv'])
+        # the child does not start a new interpreter which would
+        # add PYTHONPATH of the suite to sys.path
+        sys.path[1:1] = [
+            i for i in os.environ.get(str('PYTHONPATH'), '').split(os.pathsep)
+            if i and i not in sys.path
+        ]
+        # neither would it load the profiling hook
+        # so it is profiled directly
+        code = run_profiled(os.environ.pop(str(PROFILE_ENV), None),
+                            run_nose,
+                            sys.argv)
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else int(bool(e.code))
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except Exception:
+                pass
+        os._exit(code)
+
+
+def reap_children(children):
+    """
+    Reap all exited children and report their exit status
+    """
+    while children:
+        try:
+            pid, status, rusage = os.wait4(-1, os.WNOHANG)
+        except OSError as e:
+            if e.errno == errno.EINTR:
+                continue
+            if e.errno != errno.ECHILD:
+                raise
+            return
+        if not pid:
+            return
+        fd = children.pop(pid, None)
+        if fd is None:
+            continue
+        try:
+            write_message(fd, {'return_code': get_return_code(status),
+                               'usage': get_usage(rusage)})
+        except OSError:
+            # coordinator is not interested anymore
+            pass
+        os.close(fd)
+
+
+def serve(sock, modules):
+    """
+    Preload the modules and fork a child for every received request
+
+    Every request is a json message with ``argv``, ``env`` and ``cwd``
+    of the suite sent together with descriptors of its stdout, stderr
+    and of its status pipe. Pid of the forked child is written to the
+    status pipe as soon as it is forked and its return code and
+    resource usage once it exits. Server exits when
+    the coordinator closes the socket.
+    """
+    import nose  # noqa
+    for module in modules:
+        importlib.import_module(module)
+
+    # children are reaped as soon as they exit
+    wakeup_read, wakeup_write = os.pipe()
+    for fd in (wakeup_read, wakeup_write):
+        flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+        fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+    signal.set_wakeup_fd(wakeup_write)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+
+    sock.sendall(READY)
+    children = {}
+
+    while True:
+        try:
+            readable, _, _ = select.select([sock, wakeup_read], [], [])
+        except (OSError, select.error) as e:
+            if e.args[0] == errno.EINTR:
+                continue
+            raise
+
+        if wakeup_read in readable:
+            try:
+                os.read(wakeup_read, 4096)
+            except OSError:
+                pass
+            reap_children(children)
+
+        if sock not in readable:
+            continue
+
+        data, fds = receive_fds(sock, REQUEST_FDS)
+        if not data:
+            break
+        if len(fds) != REQUEST_FDS:
+            list(map(os.close, fds))
+            continue
+        stdout, stderr, status = fds
+        request = json.loads(data.decode('utf-8'))
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if not pid:
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            signal.set_wakeup_fd(-1)
+            # child must not hold status pipes of other suites
+            inherited = [wakeup_read, wakeup_write, status]
+            for fd in inherited + list(children.values()):
+                os.close(fd)
+            sock.close()
+            run_child(request, stdout, stderr)
+
+        os.close(stdout)
+        os.close(stderr)
+        children[pid] = status
+        try:
+            write_message(status, {'pid': pid})
+        except OSError:
+            pass
+        reap_children(children)
+
+    # children outlive the server only until they finish
+    for fd in children.values():
+        os.close(fd)
+
+
+class ForkedProcess(SuiteProcess):
+    """
+    Nosetests suite forked by the fork server
+
+    Same as ``SuiteProcess`` except the process is a child
+    of the fork server rather than of this process and so its
+    exit status and resource usage are reported by the fork server.
+
+    Parameters
+    ----------
+    server : ForkServer
+        Running fork server
+    argv : list
+        Arguments of nosetests
+    env : dict
+        Environment variables of the suite
+    stdout, stderr : int, optional
+        ``subprocess.PIPE`` to read output of the suite
+        via ``stdout`` and ``stderr`` attributes.
+        By default output goes to the output of this process.
+    """
+
+    def __init__(self, server, argv, env=None, stdout=None, stderr=None):
+        self.popen = None
+        self.stdout = self.stderr = None
+        self.return_code = None
+        self.usage = None
+        self.timed_out = False
+        self.terminated_at = None
+
+        fds = []
+        close = []
+        for name, target, default in (('stdout', stdout, 1),
+                                      ('stderr', stderr, 2)):
+            if target == PIPE:
+                read, write = os.pipe()
+                setattr(self, name, os.fdopen(read, 'rb'))
+                fds.append(write)
+                close.append(write)
+            else:
+                fds.append(default if target is None else target)
+
+        self.status, write = os.pipe()
+        fds.append(write)
+        close.append(write)
+
+        try:
+            server.send({
+                'argv': argv,
+                'env': dict(os.environ if env is None else env),
+                'cwd': os.getcwd(),
+            }, fds)
+        finally:
+            list(map(os.close, close))
+
+        message = read_message(self.status)
+        if message is None:
+            self.close()
+            raise OSError(errno.ECHILD, 'Fork server is not running')
+        self.pid = message['pid']
+        RUNNING.add(self)
+
+    def close(self):
+        if self.status is not None:
+            os.close(self.status)
+            self.status = None
+
+    def open_exit_fd(self):
+        return os.dup(self.status)
+
+    def reap(self, block=False):
+        if not block:
+            readable, _, _ = select.select([self.status], [], [], 0)
+            if not readable:
+                return False
+        message = read_message(self.status)
+        self.close()
+        if message is None:
+            # fork server died so the exit status is unknown
+            self.return_code = 255
+        else:
+            self.return_code = message['return_code']
+            self.usage = message['usage']
+        RUNNING.discard(self)
+        return True
+
+
+class ForkServer(object):
+    """
+    Fork server process with preloaded modules
+
+    Server imports nose and all the given modules once so that
+    every suite forked from it starts without paying for
+    the interpreter startup and these imports again.
+
+    Parameters
+    ----------
+    modules : list
+        Names of modules to import within the server
+
+    Raises
+    ------
+    ForkServerError
+        When the server cannot be started or any
+        of the modules cannot be imported
+    """
+
+    def __init__(self, modules):
+        if not AVAILABLE:
+            raise ForkServerError('Fork server is not supported '
+                                  'on this platform')
+        self.modules = modules
+        self.lock = threading.Lock()
+        self.sock, child = socket.socketpair(socket.AF_UNIX,
+                                             socket.SOCK_SEQPACKET)
+        try:
+            self.process = Popen(
+                [sys.executable, '-c', SERVER_SCRIPT,
+                 '--fd', str(child.fileno()),
+                 '--preload', ','.join(modules)],
+                pass_fds=[child.fileno()],
+            )
+        finally:
+            child.close()
+
+        if self.sock.recv(len(READY)) != READY:
+            self.close()
+            raise ForkServerError('Fork server failed to preload {}'
+                                  ''.format(', '.join(modules)))
+
+    def send(self, request, fds):
+        """
+        Send the request to fork a suite
+        """
+        with self.lock:
+            try:
+                send_fds(self.sock,
+                         json.dumps(request).encode('utf-8'),
+                         fds)
+            except socket.error as e:
+                raise OSError(e.errno or errno.EPIPE,
+                              'Fork server is not running')
+
+    def start(self, argv, env=None, **kwargs):
+        """
+        Fork the nosetests suite
+
+        Returns
+        -------
+        ForkedProcess
+            Forked suite
+        """
+        return ForkedProcess(self, argv, env, **kwargs)
+
+    def close(self):
+        """
+        Stop the fork server
+        """
+        self.sock.close()
+        self.process.wait()
+
+
+parser = argparse.ArgumentParser(description='multinosetests fork server')
+parser.add_argument('--fd', type=int, required=True)
+parser.add_argument('--preload', default='')
+
+
+def main(argv=None):
+    args = parser.parse_args(argv)
+    sock = socket.fromfd(args.fd, socket.AF_UNIX, socket.SOCK_SEQPACKET)
+    os.close(args.fd)
+    try:
+        serve(sock, [i for i in args.preload.split(',') if i])
+    except Exception:
+        traceback.print_exc()
+        sys.exit(1)
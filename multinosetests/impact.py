@@ -0,0 +1,343 @@
+from __future__ import print_function, unicode_literals
+import io
+import json
+import os
+import subprocess
+
+import six
+from six.moves import configparser
+
+from .artifacts import ensure_directory
+from .cache import is_within
+
+
+# coverage configuration files in the order coverage reads them
+# together with the prefix of their coverage sections
+COVERAGE_CONFIG_FILES = (
+    ('.coveragerc', ''),
+    ('setup.cfg', 'coverage:'),
+    ('tox.ini', 'coverage:'),
+)
+# coverage configuration files which cannot be extended
+# since they are not ini files
+TOML_CONFIG_FILES = ('.coveragerc.toml', 'pyproject.toml')
+COVERAGE_PREFIX = 'coverage:'
+CONFIG_FILE = 'coveragerc'
+PLUGIN_MODULE = 'multinosetests_contexts'
+# plugin is imported by coverage within the suite therefore it cannot
+# import anything from multinosetests. Context is started once nose
+# starts running the test and ends when the test finishes.
+# ``dynamic_context = test_function`` cannot be used instead
+# since nose wraps every test into ``nose.case.Test.runTest``.
+PLUGIN = '''\
+import coverage
+
+
+class TestContexts(coverage.CoveragePlugin):
+    """
+    Record coverage of every nose test under the id of the test
+    """
+
+    def dynamic_context(self, frame):
+        if frame.f_code.co_name != 'runTest':
+            return None
+        test = frame.f_locals.get('self')
+        if type(test).__module__ != 'nose.case':
+            return None
+        try:
+            test_id = test.id()
+        except Exception:
+            return None
+        # all tests of a generator share the same context
+        return test_id.split('(', 1)[0]
+
+
+def coverage_init(reg, options):
+    # dynamic contexts are supported since coverage 5.0
+    if hasattr(reg, 'add_dynamic_context'):
+        reg.add_dynamic_context(TestContexts())
+'''
+
+
+class ChangeSetError(Exception):
+    """
+    Raised when files changed since a git ref cannot be determined
+    """
+
+
+def read_coverage_config(environ=None):
+    """
+    Read coverage configuration the same way as coverage does
+
+    Returns
+    -------
+    ConfigParser
+        Parsed configuration with ``coverage:`` prefix removed from
+        section names or ``None`` if the configuration cannot be read
+        (e.g. it is stored in ``pyproject.toml``)
+    """
+    environ = os.environ if environ is None else environ
+    rcfile = environ.get('COVERAGE_RCFILE')
+    candidates = [(rcfile, '')] if rcfile else COVERAGE_CONFIG_FILES
+
+    config = configparser.RawConfigParser()
+    for path, prefix in candidates:
+        if not os.path.exists(path):
+            continue
+        source = configparser.RawConfigParser()
+        try:
+            source.read(path)
+        except configparser.Error:
+            return None
+        sections = [i for i in source.sections()
+                    if i.startswith(prefix)]
+        if not sections:
+            continue
+        for section in sections:
+            name = section[len(prefix):]
+            if name.startswith(COVERAGE_PREFIX):
+                name = name[len(COVERAGE_PREFIX):]
+            config.add_section(name)
+            for key, value in source.items(section):
+                config.set(name, key, value)
+        return config
+
+    if not rcfile and any(is_toml_config(i) for i in TOML_CONFIG_FILES):
+        return None
+    return config
+
+
+def is_toml_config(path):
+    """
+    Whether the toml file contains coverage configuration
+    """
+    if not os.path.exists(path):
+        return False
+    with io.open(path, 'r') as fid:
+        content = fid.read()
+    return ('[tool.coverage' in content or
+            (not path.endswith('pyproject.toml') and '[run]' in content))
+
+
+def write_file(path, content):
+    """
+    Write the file atomically via a temporary file
+    so that suites which are already starting
+    never read partially written file
+    """
+    tmp = '{}.{}.tmp'.format(path, os.getpid())
+    with io.open(tmp, 'wb') as fid:
+        fid.write(content.encode('utf-8'))
+    os.rename(tmp, path)
+
+
+def write_context_config(directory, environ=None):
+    """
+    Write coverage configuration which records coverage of every
+    test under its own context together with its coverage plugin
+
+    Configuration of the project is kept and only the plugin
+    is added to ``[run] plugins`` unless the project
+    already sets ``[run] dynamic_context`` on its own.
+
+    Returns
+    -------
+    str
+        Absolute path of the directory which is given to suites
+        (see ``get_context_environment()``) or ``None`` if the
+        configuration of the project cannot be extended
+    """
+    config = read_coverage_config(environ)
+    if config is None:
+        return None
+    if not config.has_section('run'):
+        config.add_section('run')
+    if config.has_option('run', 'dynamic_context'):
+        return None
+    plugins = (config.get('run', 'plugins')
+               if config.has_option('run', 'plugins') else '')
+    config.set('run', 'plugins', '\n'.join(
+        [i for i in plugins.splitlines() if i.strip()] + [PLUGIN_MODULE]
+    ))
+
+    directory = os.path.abspath(directory)
+    ensure_directory(directory)
+    write_file(os.path.join(directory, PLUGIN_MODULE + '.py'), PLUGIN)
+    content = six.StringIO()
+    config.write(content)
+    write_file(os.path.join(directory, CONFIG_FILE), content.getvalue())
+    return directory
+
+
+def get_context_environment(env, context_dir):
+    """
+    Add variables which record test contexts into the suite environment
+
+    Parameters
+    ----------
+    env : dict
+        Environment variables of the suite which are updated in place
+    context_dir : str
+        Directory with the coverage configuration and its plugin
+        (see ``write_context_config()``)
+    """
+    python_path = env.get(str('PYTHONPATH'))
+    env[str('PYTHONPATH')] = str(
+        os.pathsep.join([python_path, context_dir])
+        if python_path else context_dir
+    )
+    env[str('COVERAGE_RCFILE')] = str(os.path.join(context_dir, CONFIG_FILE))
+    return env
+
+
+def build_index_entry(command, measured):
+    """
+    Build the impact index entry of the suite
+
+    Parameters
+    ----------
+    command : str
+        Nosetests command of the suite
+    measured : list
+        Measured files of every test context of the suite (or of every
+        shard of the suite) as returned by
+        ``cover.get_measured_contexts()``. Empty context holds files
+        executed outside of tests such as while importing modules.
+
+    Returns
+    -------
+    dict
+        Entry with ids of all ``tests`` of the suite, ``files`` mapping
+        files to indexes of tests which execute them and ``setup`` files
+        which are executed only outside of tests
+    """
+    tests = sorted(set(context
+                       for contexts in measured
+                       for context in contexts
+                       if context))
+    indexes = {test: i for i, test in enumerate(tests)}
+    files = {}
+    setup = set()
+    for contexts in measured:
+        for context, paths in contexts.items():
+            for path in paths:
+                if context:
+                    files.setdefault(path, set()).add(indexes[context])
+                else:
+                    setup.add(path)
+    return {
+        'command': command,
+        'tests': tests,
+        'files': {k: sorted(v) for k, v in files.items()},
+        'setup': sorted(setup - set(files)),
+    }
+
+
+def get_affected_tests(entry, changed_files, modules=None, sources=()):
+    """
+    Get tests of the suite affected by the changed files
+
+    Tests executing any of the changed files are affected together
+    with all tests of changed test modules. Files which are executed
+    only outside of tests (e.g. module level code) can affect any test
+    so all tests are affected by them. The same applies to changed
+    files within the suite sources the index does not know about
+    (e.g. test fixtures or modules not measured by coverage).
+
+    Parameters
+    ----------
+    entry : dict
+        Impact index entry of the suite (see ``build_index_entry()``)
+    changed_files : set
+        Real absolute paths of changed files
+    modules : dict, optional
+        Mapping of real absolute paths of test modules
+        to ids of their tests
+    sources : list, optional
+        Real absolute paths of files and directories
+        the suite depends on (see ``cache.get_source_paths()``)
+
+    Returns
+    -------
+    set
+        Ids of affected tests or ``None`` when all tests are affected
+    """
+    modules = modules or {}
+    affected = set()
+    for path in changed_files:
+        if path in entry['setup']:
+            return None
+        if path in entry['files']:
+            affected.update(entry['tests'][i] for i in entry['files'][path])
+        if path in modules:
+            affected.update(modules[path])
+        elif (path not in entry['files'] and
+                any(is_within(path, i) for i in sources)):
+            return None
+    return affected
+
+
+def load_impact_index(path):
+    """
+    Load the impact index which maps suite keys to their entries
+
+    Missing or corrupt index is considered empty
+    so that all suites run in full.
+    """
+    try:
+        with io.open(path, 'rb') as fid:
+            return json.loads(fid.read().decode('utf-8'))
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def save_impact_index(path, index):
+    """
+    Save the impact index
+
+    Index is first written to a temporary file which is then renamed
+    so that concurrent runs never see partially written index.
+    """
+    ensure_directory(os.path.dirname(path) or os.curdir)
+    tmp = '{}.{}.tmp'.format(path, os.getpid())
+    with io.open(tmp, 'wb') as fid:
+        fid.write(json.dumps(index, sort_keys=True).encode('utf-8'))
+    os.rename(tmp, path)
+
+
+def git(*args):
+    """
+    Execute git command and return its output
+    """
+    try:
+        with open(os.devnull, 'wb') as devnull:
+            output = subprocess.check_output(('git',) + args, stderr=devnull)
+    except (OSError, subprocess.CalledProcessError) as e:
+        raise ChangeSetError('git {} failed: {}'.format(' '.join(args), e))
+    return output.decode('utf-8')
+
+
+def get_changed_files(ref):
+    """
+    Get files which changed in the working tree since the git ref
+
+    Committed, staged and unstaged changes are included
+    together with untracked files.
+
+    Returns
+    -------
+    set
+        Real absolute paths of changed files
+        same as reported by coverage
+
+    Raises
+    ------
+    ChangeSetError
+        When the ref does not exist or git is not available
+    """
+    root = git('rev-parse', '--show-toplevel').strip()
+    paths = git('diff', '--name-only', '-z', six.text_type(ref), '--')
+    paths += git('ls-files', '--others', '--exclude-standard',
+                 '--full-name', '-z')
+    return set(os.path.realpath(os.path.join(root, i))
+               for i in paths.split('\0') if i)
@@ -1,19 +1,89 @@
 from __future__ import print_function, unicode_literals
+import copy
+import errno
+import functools
+import heapq
+import io
+import json
 import os
-import re
 import sys
-from subprocess import call
+import time
+from multiprocessing.pool import ThreadPool
+from xml.etree.ElementTree import ParseError
 
 import blessings
 import six
-import xunitparser
-from xunitmerge import merge_xunit
+from coverage import CoverageException
+
+from .artifacts import ensure_directory, get_artifact_key
+from .cache import get_source_paths, get_test_path, is_within
+from .collect import (
+    address_to_test_id,
+    collect_test_addresses,
+    compact_addresses,
+    find_overlaps,
+    get_run_key,
+    get_testcase_address,
+)
+from .command import NoseCommand, join_command, split_command, strip_options
+from .cover import (
+    combine_coverage_incremental,
+    get_cover_packages,
+    get_include_patterns,
+    get_measured_contexts,
+    write_coverage_reports,
+)
+from .impact import (
+    build_index_entry,
+    get_affected_tests,
+    get_context_environment,
+    load_impact_index,
+    save_impact_index,
+)
+from .process import SuiteProcess, combine_usage, get_signal_name
+from .profiling import (
+    get_hotspots,
+    get_profile_environment,
+    merge_profile_files,
+)
+from .remote import run_remote
+from .results import RESULTS_ENV, encode_record, iter_record_testcases
+from .resources import ResourceLimiter
+from .runner import DEFAULT_RUN_ENGINE, THREADS_ENGINE, run_async
+from .schedule import longest_first, pack_shards, plan_schedule
+from .xunit import (
+    COMPRESSIONS,
+    DEFAULT_MERGE_ENGINE,
+    get_testcase_id,
+    get_testcase_outcome,
+    is_valid_report,
+    iter_testcases,
+    merge_xunit_files,
+    replace_testcases,
+    truncate_output,
+    write_error_report,
+    write_testcases,
+)
 
 
 COVERAGE_FILE = '.coverage{}'
 NOSETESTS_FILE = 'nosetests{}.xml'
-COVER_PACKAGE_RE = re.compile(r'--cover-package=(?P<packages>[a-z0-9_,]+)',
-                              re.IGNORECASE)
+STATE_DIR = '.multinosetests'
+TIMINGS_FILE = os.path.join(STATE_DIR, 'timings.json')
+CACHE_DIR = os.path.join(STATE_DIR, 'cache')
+ARTIFACTS_DIR = os.path.join(STATE_DIR, 'artifacts')
+COVERAGE_BASELINE_FILE = os.path.join(STATE_DIR, 'coverage')
+PROFILE_HOOK_DIR = os.path.join(STATE_DIR, 'profile')
+PROFILE_FILE = 'nosetests{}.prof'
+RESULTS_FILE = 'nosetests{}.results'
+IMPACT_INDEX_FILE = os.path.join(STATE_DIR, 'impact.json')
+COVERAGE_CONTEXT_DIR = os.path.join(STATE_DIR, 'contexts')
+# return code of shells when the command cannot be executed
+COMMAND_NOT_FOUND = 127
+# options which are not given to reruns of failed tests
+RERUN_STRIP_OPTIONS = ('--cover-', '--with-coverage')
+# colors of tags which prefix output of suites
+TAG_COLORS = ('cyan', 'magenta', 'yellow', 'green', 'blue')
 
 terminal = blessings.Terminal()
 
@@ -45,20 +115,185 @@ def status_print(status, message=None):
     print(printout, file=sys.stderr)
 
 
-def get_nose_xml_report(path):
+# report keys which are summed when reports are combined
+REPORT_COUNTERS = ('total', 'errors', 'failures', 'skipped', 'time')
+# maps xunit testsuite attributes to report keys
+REPORT_OUTCOMES = {
+    'errors': 'errors',
+    'failures': 'failures',
+    'skip': 'skipped',
+}
+
+
+def empty_report():
+    """
+    Get a report without any tests
+    """
+    report = {key: 0 for key in REPORT_COUNTERS}
+    report['time'] = 0.0
+    report['failed'] = []
+    report['slowest'] = []
+    return report
+
+
+def finalize_report(report):
+    """
+    Compute the derived values of the report
+    from its counters and return the report
+    """
+    report['successful'] = (
+        report['total'] - report['errors'] - report['failures']
+    )
+    report['is_successful'] = not report['errors'] and not report['failures']
+    return report
+
+
+def get_testcases_report(testcases, slowest=0):
+    """
+    Get the report from testcase elements of the test suite
+
+    The report is a compact summary of the test suite computed
+    in a single streaming pass over its testcases.
+    Besides the test counts it contains the total ``time``
+    of all tests and ``failed`` list of ids of all the
+    tests which either failed or errored.
+
+    Parameters
+    ----------
+    testcases : iterable
+        Testcase elements either from the xml nosetests report
+        or converted from records streamed by the suite
+        (see ``multinosetests.results``)
+    slowest : int, optional
+        Number of the slowest tests to include in the report
+        as ``slowest`` list of ``(time, test_id)`` tuples sorted
+        from the slowest test. Only that many tests are kept
+        in memory at any time.
+    """
+    report = empty_report()
+    heap = report['slowest']
+
+    for testcase in testcases:
+        duration = float(testcase.get('time') or 0)
+        report['total'] += 1
+        report['time'] += duration
+
+        if slowest:
+            item = (duration, get_testcase_id(testcase))
+            if len(heap) < slowest:
+                heapq.heappush(heap, item)
+            else:
+                heapq.heappushpop(heap, item)
+
+        outcome = REPORT_OUTCOMES.get(get_testcase_outcome(testcase))
+        if outcome:
+            report[outcome] += 1
+            if outcome != 'skipped':
+                report['failed'].append(get_testcase_id(testcase))
+
+    heap.sort(reverse=True)
+    return finalize_report(report)
+
+
+def get_nose_xml_report(path, slowest=0):
     """
     Get the report from the xml nosetests report
+    (see ``get_testcases_report()``)
+    """
+    return get_testcases_report(iter_testcases(path), slowest)
+
+
+def combine_reports(reports, slowest=0):
+    """
+    Combine multiple test suite reports into a single overall report
+
+    This allows to compute the overall report without
+    parsing the merged xml report again. Slowest tests overall
+    are selected from the slowest tests of individual reports.
+    """
+    combined = empty_report()
+
+    for report in reports:
+        for key in REPORT_COUNTERS:
+            combined[key] += report[key]
+        combined['failed'].extend(report['failed'])
+
+    combined['slowest'] = heapq.nlargest(
+        slowest, (i for report in reports for i in report['slowest'])
+    )
+    return finalize_report(combined)
+
+
+def get_report_summary(report, call=None):
+    """
+    Get json serializable summary of the test suite report
+    and of the executed suite
     """
-    report = xunitparser.parse(open(path))[1]
-    errors = len(report.errors)
-    failures = len(report.failures)
-    return {
-        'total': report.testsRun,
-        'errors': errors,
-        'failures': failures,
-        'successful': report.testsRun - errors - failures,
-        'is_successful': report.wasSuccessful(),
+    summary = {
+        key: report[key]
+        for key in REPORT_COUNTERS + ('successful', 'is_successful')
     }
+    summary['slowest'] = [{'id': test_id, 'time': duration}
+                          for duration, test_id in report['slowest']]
+    if call is not None:
+        summary.update({
+            'command': call.command,
+            'return_code': call.return_code,
+            'cached': call.cached,
+            'timed_out': call.timed_out,
+            'duration': call.duration,
+            'usage': call.usage,
+        })
+    return summary
+
+
+def write_summary_file(path, reports, nose_calls, overall):
+    """
+    Write json summary of all suites and of the overall report
+    """
+    with io.open(path, 'wb') as fid:
+        fid.write(json.dumps({
+            'suites': [get_report_summary(report, call)
+                       for report, call in zip(reports, nose_calls)],
+            'overall': get_report_summary(overall),
+        }, indent=2, sort_keys=True).encode('utf-8'))
+
+
+def get_tags(count):
+    """
+    Get colored tags which prefix output of ``count`` suites
+
+    Tags are numbered from 1 and are padded to the same width
+    so that output of all suites is aligned.
+    """
+    width = len(str(count))
+    return [
+        getattr(terminal, TAG_COLORS[i % len(TAG_COLORS)])(
+            '[{:>{}}]'.format(i + 1, width)
+        )
+        for i in range(count)
+    ]
+
+
+def get_usage_lines(call):
+    """
+    Get report lines with resources used by the executed suite
+    """
+    lines = []
+    if call is None or call.cached or call.duration is None:
+        return lines
+
+    lines.append('  wall time: {:.2f}s'.format(call.duration))
+    if call.usage:
+        lines.append('   cpu time: {:.2f}s user, {:.2f}s system'
+                     ''.format(call.usage['user'], call.usage['system']))
+        lines.append('    max rss: {:.1f} MB'
+                     ''.format(call.usage['max_rss'] / 1024.0 / 1024.0))
+    if call.timed_out:
+        lines.append(terminal.red('  timed out: after {}s'
+                                  ''.format(call.timeout)))
+    # braces would otherwise be formatted with the report
+    return [i.replace('{', '{{').replace('}', '}}') for i in lines]
 
 
 def status_print_report(name, report, call=None):
@@ -68,6 +303,8 @@ def status_print_report(name, report, call=None):
     command = ''
     if call:
         command = call.get_final_command() + '\n'
+        if call.cached:
+            command = '{} {}'.format(terminal.bold('[cached]'), command)
 
     _ = lambda x: x  # noqa
     c = getattr(terminal, 'green' if report['is_successful'] else 'red')
@@ -82,11 +319,76 @@ def status_print_report(name, report, call=None):
         _(' successful: {successful}'),
         _('   failures: {failures}'),
         _('     errors: {errors}'),
-    ]).format(command=command, success=success, **report)
+    ] + get_usage_lines(call)).format(command=command,
+                                      success=success,
+                                      **report)
 
     status_print(name, message)
 
 
+def status_print_durations(name, report, call=None):
+    """
+    Print out the total time and the slowest tests of the test suite report
+    """
+    lines = ['']
+    if call:
+        lines.append(call.get_final_command())
+    lines.append(' total time: {:.2f}s'.format(report['time']))
+    lines.extend('{:>10.2f}s {}'.format(duration, test_id)
+                 for duration, test_id in report['slowest'])
+
+    status_print(name, '\n'.join(lines))
+
+
+def status_print_hotspots(name, hotspots, path):
+    """
+    Print out functions with the largest cumulative time in the profile
+    """
+    header = '{:>11} {:>10} {:>9} {}'.format('cumulative',
+                                             'total',
+                                             'calls',
+                                             'function')
+    lines = ['', path, header]
+    lines.extend('{:>10.2f}s {:>9.2f}s {:>9} {}'.format(*i)
+                 for i in hotspots)
+
+    status_print(name, '\n'.join(lines))
+
+
+def status_print_plan(nose_calls, durations, jobs, known=None):
+    """
+    Print out the schedule plan of how nosetests suites
+    will be distributed across workers
+
+    Parameters
+    ----------
+    nose_calls : list
+        List of ``NosetestsCall`` class instances
+    durations : list
+        Estimated durations of the suites in seconds
+    jobs : int
+        Number of workers
+    known : list, optional
+        Whether the estimate of each suite is based on its history
+    """
+    known = known or [True] * len(nose_calls)
+    workers, makespan = plan_schedule(durations, jobs)
+
+    lines = ['']
+    for i, worker in enumerate(workers):
+        lines.append(terminal.bold('worker {}:'.format(i + 1)))
+        for index in worker:
+            lines.append('  {:>10} {}'.format(
+                '{:.1f}s'.format(durations[index])
+                if known[index] else 'unknown',
+                nose_calls[index].command,
+            ))
+    lines.append('')
+    lines.append('estimated makespan: {:.1f}s'.format(makespan))
+
+    status_print('Schedule plan', '\n'.join(lines))
+
+
 class NosetestsCall(object):
     """
     Interface class for executing a single nosetests command
@@ -94,22 +396,98 @@ class NosetestsCall(object):
     Parameters
     ----------
     command : str
-        Shell command as string to be executed to run nosetests suite.
+        Command as string to be executed to run nosetests suite.
         The command must contain ``--with-xunit`` nosetests flag
+    shell : bool, optional
+        Whether the command is executed via shell. By default
+        the command is tokenized and executed directly which
+        does not support shell features such as pipes.
+    timeout : float, optional
+        Maximum number of seconds the suite can run for
+        before it is terminated
+    fork_server : multinosetests.forkserver.ForkServer, optional
+        Fork server with preloaded modules. When given, the suite
+        is forked from the server instead of being executed
+        unless it is executed via shell or does not
+        run nosetests directly.
+    weight : float, optional
+        Number of jobs the suite occupies while it runs
+        (e.g. the number of CPUs it uses). Default is 1.
+    memory : int, optional
+        Memory in bytes the suite is expected to use. Suite is not
+        started until that much memory is available.
+        See ``multinosetests.resources.ResourceLimiter``.
 
     Attributes
     ----------
     command : str
         Same as ``command`` parameter
+    parsed : NoseCommand
+        Tokenized ``command``
+    shell : bool
+        Same as ``shell`` parameter
     errors : list
         List of error strings if the input command is not valid
+    duration : float
+        Wall time in seconds of the nosetests command once executed
+    usage : dict
+        CPU times and maximum rss of the nosetests command once executed
+        (see ``process.get_usage()``)
+    timed_out : bool
+        Whether the nosetests command was terminated
+        because it exceeded its ``timeout``
+    shards : list
+        ``NosetestsCall`` instances which together run all the tests
+        of this nosetests command when the suite is sharded.
+        See ``shard()``.
+    expected_duration : float
+        Estimated duration of the shard in seconds
+    cached : bool
+        Whether results of the suite were restored from the result cache
+        instead of executing the nosetests command
+    rerun_ids : set
+        Ids of failed testcases the suite reruns
+        when it is a rerun (see ``get_rerun()``)
+    profile_hook : str
+        Directory with the profiling hook when the suite is profiled
+        (see ``multinosetests.profiling.write_hook()``)
+    context_dir : str
+        Directory with the coverage configuration covered suites
+        are executed with so that coverage of every test is recorded
+        under its own context
+        (see ``multinosetests.impact.write_context_config()``)
+    partial : str
+        Key of the original suite when the suite
+        runs only some of its tests (see ``select_changed()``)
     """
 
-    def __init__(self, command):
+    def __init__(self,
+                 command,
+                 shell=False,
+                 timeout=None,
+                 fork_server=None,
+                 weight=1,
+                 memory=None):
         self.command = command
+        self.parsed = NoseCommand(command)
+        self.shell = shell
+        self.timeout = timeout
+        self.fork_server = fork_server
+        self.weight = weight
+        self.memory = memory
+        self.usage = None
+        self.timed_out = False
         self.errors = []
         self.return_code = None
-        self.coverage_data = None
+        self.duration = None
+        self.shards = []
+        self.expected_duration = None
+        self.cached = False
+        self.rerun_ids = set()
+        self.profile_hook = None
+        self.context_dir = None
+        self.partial = None
+        self._start = None
 
     def is_valid(self):
         """
@@ -124,24 +502,47 @@ class NosetestsCall(object):
           xml reports are required to be combined
         * ``--xunit-file`` cannot be provided since multinosetests
           will use a unique filename for the xml report
+        * shell operators such as pipes and expansions such as
+          variables or globs can only be used when the command
+          is executed via shell
         """
         self.errors = []
 
-        if '--with-xunit' not in self.command:
+        if self.parsed.error:
+            self.errors.append('`{}` is not a valid command: {}'
+                               ''.format(self.command, self.parsed.error))
+            return False
+
+        if not self.parsed.has_option('--with-xunit'):
             self.errors.append('--with-xunit must be provided in `{}`'
                                ''.format(self.command))
 
-        if '--xunit-file' in self.command:
+        if self.parsed.has_option('--xunit-file'):
             self.errors.append('--xunit-file cannot be provided in `{}`'
                                ''.format(self.command))
 
+        syntax = self.parsed.get_shell_syntax()
+        if syntax and not self.shell:
+            self.errors.append('{} can only be used with --shell in `{}`'
+                               ''.format(', '.join(syntax), self.command))
+
         return not bool(self.errors)
 
     def is_covered(self):
         """
         Return boolean if the nosetests command should run with coverage
         """
-        return '--with-coverage' in self.command
+        return self.parsed.has_option('--with-coverage')
+
+    @property
+    def key(self):
+        """
+        Return stable key of the nosetests command
+        used in names of its artifacts
+
+        See ``multinosetests.artifacts.get_artifact_key()``.
+        """
+        return get_artifact_key(self.command)
 
     @property
     def coverage_file(self):
@@ -149,71 +550,116 @@ class NosetestsCall(object):
         Return unique name of the coverage file where the coverage
         data will be stored
 
-        Why a unique filename is required, please refer to ``write_coverage()``
-        """
-        return COVERAGE_FILE.format('.' + six.text_type(abs(hash(self))))
-
-    def read_coverage(self):
-        """
-        Read the coverage binary data into memory and
-        store it in attribute ``coverage_data``,
-        then remove the coverage file
-
-        The reason why above has to happen is primarily to handle
-        multiple nosetests suites. Coverage is a clever package
-        so if after the first test suite run, the generated
-        .coverage file is renamed to something else, on the
-        second tests suite run, coverage will notice existing
-        coverage file (even if it not called .coverage) and wont
-        create a new .coverage file. It will simply append coverage
-        data to coverage file from first test suite. As a result,
-        when the coverage report will be printed for the second
-        test suite, its coverage data will be skewed since it will
-        include data from different coverage run. The solution is to
-        remove the coverage file between the test suites and once
-        all test suites are executed, all coverage data is written
-        out to unique files and merged to generate a single complete
-        and accurate overall coverage report via
-        ``coverage combine`` command.
-        """
-        with open(COVERAGE_FILE.format(''), 'rb') as fid:
-            self.coverage_data = fid.read()
-        os.unlink(COVERAGE_FILE.format(''))
-
-    def write_coverage(self):
-        """
-        Write coverage binary data stored in ``coverage_data``
-        attribute back to a unique file
-
-        As described in ``read_coverage()``, coverage files are
-        removed in between test suites however after all suites
-        are executes, all the coverage data needs to be written
-        back to file-system. However if each test suite would
-        write back coverage data to ``.coverage`` file, that
-        would result in conflicts. Therefore each test suite
-        needs to write data back into unique filenames.
-        Then all coverage files can be merged into a single
-        report via ``coverage combine`` command since it is
-        able to find all coverage-like files in a directory.
+        Why a unique filename is required, please refer
+        to ``collect_coverage()``
+        """
+        return os.path.join(ARTIFACTS_DIR,
+                            COVERAGE_FILE.format('.' + self.key))
+
+    def ensure_artifacts_dir(self):
+        """
+        Create the directory where artifacts of the suite
+        such as its xunit report and coverage data are written
+        """
+        ensure_directory(ARTIFACTS_DIR)
+
+    @property
+    def has_coverage(self):
+        """
+        Return boolean if coverage data of the suite is stored
+        in its ``coverage_file``
+        """
+        return os.path.exists(self.coverage_file)
+
+    def remove_coverage(self):
+        """
+        Remove coverage data left in ``coverage_file``
+        by a previous run of the same suite
+
+        Coverage is a clever package so if the coverage file is
+        left on the file-system, on the next run of the same suite,
+        coverage will notice existing coverage file and wont create
+        a new one. It will simply append coverage data to the
+        existing file. As a result, when the coverage report will be
+        printed, coverage data will be skewed since it will include
+        data from different coverage run. Therefore the file is
+        removed right before the suite is executed.
+        """
+        try:
+            os.unlink(self.coverage_file)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+
+    def collect_coverage(self):
+        """
+        Make sure coverage data of the executed suite
+        is stored in its unique ``coverage_file``
+
+        Each suite writes its coverage data directly to
+        ``coverage_file`` (see ``get_environment()``) instead of
+        the shared ``.coverage`` file so that multiple suites
+        can be executed at the same time without overwriting
+        each other's coverage data. Coverage data is never read
+        into memory. Once all suites are executed, all unique
+        coverage files are merged into a single report via
+        ``coverage`` API (see ``merge_calls()``).
+
+        Data written into the shared ``.coverage`` file (e.g. by suites
+        which ignore ``COVERAGE_FILE``) is not collected since it
+        cannot be told apart from data of other suites or from
+        data combined by previous runs.
 
         There is one catch how unique filenames are generated.
         Instead of generating completely random filenames
         which would clog the directory if for some reason
         coverage files would not be combined, the filenames
-        are deterministically generated by using a Python
-        string hash of the given nosetests command.
+        are deterministically generated from the sha256 hash
+        of the given nosetests command (see ``key``).
         This way the same nosetests suite will always generate
-        the same unique coverage file.
+        the same unique coverage file. Files of suites which are
+        not executed anymore are eventually removed by
+        ``multinosetests.artifacts.ArtifactStore``.
+
+        Returns
+        -------
+        bool
+            Whether the suite produced coverage data
+        """
+        return self.has_coverage
+
+    @property
+    def profile_file(self):
+        """
+        Return unique name of the file where
+        the profile of the suite will be written
         """
-        with open(self.coverage_file, 'wb') as fid:
-            fid.write(self.coverage_data)
+        return os.path.join(ARTIFACTS_DIR,
+                            PROFILE_FILE.format('.' + self.key))
+
+    @property
+    def has_profile(self):
+        """
+        Whether the profile of the executed suite exists
+        """
+        return os.path.exists(self.profile_file)
 
     @property
     def xunit_file(self):
         """
         Return unique name for nosetests xml xml report
         """
-        return NOSETESTS_FILE.format('.{}'.format(abs(hash(self))))
+        return os.path.join(ARTIFACTS_DIR,
+                            NOSETESTS_FILE.format('.' + self.key))
+
+    @property
+    def results_file(self):
+        """
+        Return unique name of the file where the suite
+        streams results of its tests (see ``multinosetests.results``)
+        """
+        return os.path.join(ARTIFACTS_DIR,
+                            RESULTS_FILE.format('.' + self.key))
 
     def get_final_command(self):
         """
@@ -228,50 +674,1031 @@ class NosetestsCall(object):
                 ''.format(self.command,
                           self.xunit_file))
 
+    def get_final_argv(self):
+        """
+        Get arguments of the final nosetests command which
+        are executed when the command is not executed via shell
+
+        Same as ``get_final_command()`` except the command
+        is not joined into a single string.
+        """
+        return self.parsed.get_argv(
+            [['--xunit-file={}'.format(self.xunit_file)]]
+        )
+
+    def get_nose_argv(self):
+        """
+        Get arguments of the final nosetests command which
+        are given to nose when the suite is forked from the fork server
+
+        Same as ``get_final_argv()`` except the program which
+        invokes nosetests is replaced by ``nosetests``
+        since nose runs within the forked process.
+        """
+        return ['nosetests'] + self.get_final_argv()[len(self.parsed.program):]
+
+    def is_forked(self):
+        """
+        Return boolean if the suite is forked from the fork server
+        """
+        return (self.fork_server is not None and
+                not self.shell and
+                self.parsed.is_nose())
+
+    def get_environment(self):
+        """
+        Get the environment variables the nosetests command
+        will be executed with
+
+        ``COVERAGE_FILE`` is pointed to the unique ``coverage_file``
+        so that concurrently running suites never share
+        the same coverage data file. Variables assigned in front
+        of the command (e.g. ``FOO=bar nosetests``) are included
+        unless the command is executed via shell which
+        assigns them on its own. Profiled suites load the profiling
+        hook via ``PYTHONPATH`` and covered suites record test contexts
+        when ``context_dir`` is given. ``RESULTS_ENV`` enables
+        the ``multinosetests.plugin.ResultStream`` nose plugin
+        which streams results of tests into ``results_file``.
+        """
+        if self.shell:
+            env = os.environ.copy()
+        else:
+            env = self.parsed.get_environment()
+        env[str('COVERAGE_FILE')] = str(self.coverage_file)
+        # absolute since suites may change their working directory
+        env[str(RESULTS_ENV)] = str(os.path.abspath(self.results_file))
+        if self.context_dir and self.is_covered():
+            get_context_environment(env, self.context_dir)
+        if self.profile_hook:
+            get_profile_environment(env, self.profile_hook, self.profile_file)
+        return env
+
     def __hash__(self):
         """
         Return hash of the given command.
-        This hash is used to generate unique files
-        related to the nosetests command.
 
-        By hashing a known constant string, its hash result
-        is deterministic. Practically this means that if
-        multiple nosetests are executed, their unique
-        filenames for coverage data and nosetests report
-        will always be the same.
+        Python string hashes are randomized between runs
+        so the hash is not used in names of files related to
+        the nosetests command. See ``key`` instead.
         """
         return hash(self.command)
 
     def __str__(self):
         return str(self.command)
 
+    def start_process(self, **kwargs):
+        """
+        Start the final nosetests command
+
+        Parameters
+        ----------
+        **kwargs
+            Any other ``subprocess.Popen`` arguments
+
+        Returns
+        -------
+        SuiteProcess
+            Started process of the nosetests command
+        """
+        if self.is_forked():
+            return self.fork_server.start(self.get_nose_argv(),
+                                          env=self.get_environment(),
+                                          **kwargs)
+        return SuiteProcess(
+            self.get_final_command() if self.shell
+            else self.get_final_argv(),
+            shell=self.shell,
+            env=self.get_environment(),
+            **kwargs
+        )
+
+    def get_failure_message(self):
+        """
+        Get the message why the executed nosetests command
+        did not produce its xml report
+        """
+        if self.timed_out:
+            return ('Suite timed out after {}s and was terminated'
+                    ''.format(self.timeout))
+        if self.return_code is not None and self.return_code < 0:
+            return ('Suite was killed by {} before writing its xml report'
+                    ''.format(get_signal_name(-self.return_code)))
+        return ('Suite exited with code {} without writing its xml report'
+                ''.format(self.return_code))
+
+    def ensure_xunit_file(self):
+        """
+        Make sure the xml report of the executed nosetests command exists
+
+        When the suite crashed, was killed or timed out before
+        nosetests wrote its xml report, a report with a single
+        error is written instead so that the failure is reported
+        and reports of all other suites can still be merged.
+        Results of tests which finished before the suite crashed
+        are kept when the suite streamed them into ``results_file``.
+
+        Returns
+        -------
+        bool
+            Whether the report had to be written
+        """
+        if is_valid_report(self.xunit_file):
+            return False
+
+        message = self.get_failure_message()
+        status_print('Missing xml report', '{}: {}'.format(self.command,
+                                                           message))
+        if os.path.exists(self.results_file):
+            # error is streamed as well so that the report
+            # built from records matches the written xml report
+            with io.open(self.results_file, 'ab') as fid:
+                fid.write(encode_record({
+                    'classname': 'multinosetests',
+                    'name': self.command,
+                    'time': self.duration or 0.0,
+                    'outcome': 'error',
+                    'type': 'Timeout' if self.timed_out else 'Crash',
+                    'message': message,
+                    'traceback': message,
+                }))
+            write_testcases(iter_record_testcases(self.results_file),
+                            self.xunit_file)
+            return True
+
+        write_error_report(
+            self.xunit_file,
+            classname='multinosetests',
+            name=self.command,
+            error_type='Timeout' if self.timed_out else 'Crash',
+            message=message,
+            time=self.duration,
+        )
+        return True
+
+    def replace_invalid_report(self):
+        """
+        Replace the xml report which cannot be parsed
+        with a report with a single error
+
+        Results the suite streamed into ``results_file`` are discarded
+        so that the suite is reported from its replaced report.
+
+        Returns
+        -------
+        bool
+            Whether the report had to be replaced
+        """
+        try:
+            for _ in iter_testcases(self.xunit_file):
+                pass
+        except ParseError as e:
+            error = e
+        else:
+            return False
+
+        message = 'Suite wrote invalid xml report: {}'.format(error)
+        status_print('Invalid xml report', '{}: {}'.format(self.command,
+                                                           error))
+        if os.path.exists(self.results_file):
+            os.unlink(self.results_file)
+        write_error_report(
+            self.xunit_file,
+            classname='multinosetests',
+            name=self.command,
+            error_type='InvalidReport',
+            message=message,
+            time=self.duration,
+        )
+        return True
+
+    def before_run(self, tag=None):
+        """
+        Prepare the nosetests command to be executed
+
+        Announces the suite and starts measuring its wall time.
+        Used by all run engines so that suites are executed the same
+        way regardless of how their subprocess is managed.
+
+        Parameters
+        ----------
+        tag : str, optional
+            Tag which prefixes output of the suite
+
+        Returns
+        -------
+        str
+            Final nosetests command to be executed
+        """
+        command = self.get_final_command()
+        self.ensure_artifacts_dir()
+        if self.is_covered():
+            # stale coverage data would be appended to
+            self.remove_coverage()
+        if self.profile_hook and self.has_profile:
+            # suite which crashes does not write its profile
+            os.unlink(self.profile_file)
+        if os.path.exists(self.results_file):
+            # results are appended to
+            os.unlink(self.results_file)
+        status_print('Running', '{} {}'.format(tag, command)
+                     if tag else command)
+        self._start = time.time()
+        return command
+
+    def after_run(self, return_code, usage=None, timed_out=False):
+        """
+        Record results of the executed nosetests command
+
+        Parameters
+        ----------
+        return_code : int
+            Return code of the nosetests command
+        usage : dict, optional
+            Resource usage of the nosetests command
+        timed_out : bool, optional
+            Whether the nosetests command was terminated
+            because of its timeout
+
+        If the nosetests command includes coverage,
+        its coverage data is left in the unique coverage file.
+        Please refer to ``collect_coverage()`` for more info.
+
+        Returns
+        -------
+        int
+            Return code of the nosetests command
+        """
+        self.return_code = return_code
+        self.duration = time.time() - self._start
+        self.usage = usage
+        self.timed_out = timed_out
+        self.ensure_xunit_file()
+
+        if self.is_covered():
+            self.collect_coverage()
+
+        return self.return_code
+
+    def get_report(self, slowest=0):
+        """
+        Get the report of the executed suite
+        (see ``get_testcases_report()``)
+
+        The report is built from results the suite streamed
+        into ``results_file`` so that its xml report does not have
+        to be parsed. The xml report is used instead when the suite
+        did not stream its results such as when it was restored
+        from the cache, stitched from its shards or executed
+        by a remote worker, or when its failed tests were rerun.
+        """
+        if (self._start is not None and not self.cached and
+                os.path.exists(self.results_file)):
+            return get_testcases_report(
+                iter_record_testcases(self.results_file), slowest,
+            )
+        return get_nose_xml_report(self.xunit_file, slowest=slowest)
+
     def __call__(self):
         """
         Execute the nosetests command to run test suite
         and return the return code of the nosetests command
 
-        If the nosetests command includes coverage,
-        coverage file is temporarily read into memory
-        and is removed from the filesystem.
-        Please refer to ``read_coverage()`` for more info.
+        Output of the suite is not captured and goes
+        directly to the terminal.
         """
-        command = self.get_final_command()
+        command = self.before_run()
+        try:
+            process = self.start_process()
+        except OSError as e:
+            # same as when the shell cannot find the command
+            status_print('Failed to execute', '{}: {}'.format(command, e))
+            return self.after_run(COMMAND_NOT_FOUND)
+        process.wait(self.timeout)
+        return self.after_run(process.return_code,
+                              usage=process.usage,
+                              timed_out=process.timed_out)
 
-        status_print('Running', command)
-        self.return_code = call(command, shell=True)
+    def shard(self, count, timings):
+        """
+        Split the test suite into at most ``count`` shards which
+        can be executed at the same time
 
-        if self.is_covered():
-            # coverage report has to be opened and removed
-            # because coverage for other suite runs is smart
-            # enough to combine the coverage reports
-            # on the spot which can cause funny reports
-            # for non-first nosetests calls
-            self.read_coverage()
+        All tests the nosetests command would run are collected
+        via ``nosetests --collect-only`` and are bin-packed into shards
+        with roughly equal total durations by using durations
+        of individual tests recorded from previous xunit reports.
+        Each shard is its own ``NosetestsCall`` which runs only
+        its tests and therefore has its own xunit and coverage files.
+        Once executed, shards are stitched back together
+        into this suite via ``stitch_shards()``.
+
+        Parameters
+        ----------
+        count : int
+            Maximum number of shards
+        timings : multinosetests.schedule.TimingCache
+            Timings history with durations of individual tests
+
+        Returns
+        -------
+        list
+            Created shards. If the tests could not be collected
+            or there are not enough tests, the suite is not sharded.
+        """
+        status_print('Collecting', self.command)
+        addresses = collect_test_addresses(self.command, self.shell)
+        self.shards = []
+
+        if not addresses or len(addresses) < 2 or count < 2:
+            return self.shards
+
+        durations = timings.estimate_tests(
+            [address_to_test_id(i) for i in addresses]
+        )
+        program, options, _ = split_command(self.command)
+
+        for indexes in pack_shards(durations, count):
+            shard = self.clone(join_command(program,
+                                            options,
+                                            [addresses[i] for i in indexes]))
+            shard.expected_duration = sum(durations[i] for i in indexes)
+            self.shards.append(shard)
+
+        status_print('Sharded',
+                     '{} tests into {} shards'
+                     ''.format(len(addresses), len(self.shards)))
+        return self.shards
+
+    def stitch_shards(self):
+        """
+        Stitch already executed shards back into a single suite
+
+        Xunit reports of all shards are merged into ``xunit_file``
+        of this suite so that the suite can be reported as a single
+        logical suite. Coverage data is left in the shards
+        (see ``merge_calls()``). Since shards run at the same time,
+        duration of the suite is the wall time from the start
+        of its first shard until the end of its last shard
+        while CPU times of all shards are summed in its ``usage``.
+
+        Returns
+        -------
+        int
+            Return code of the suite which is non-zero
+            if any of the shards failed
+        """
+        xunit_files = [i.xunit_file for i in self.shards]
+        merge_xunit_files(xunit_files, self.xunit_file)
+        list(map(os.unlink, xunit_files))
+        for shard in self.shards:
+            if os.path.exists(shard.results_file):
+                os.unlink(shard.results_file)
+
+        codes = [i.return_code for i in self.shards]
+        self.return_code = next((i for i in codes if i), 0)
+        spans = [(i._start, i._start + i.duration) for i in self.shards
+                 if i._start is not None and i.duration is not None]
+        if spans:
+            self.duration = (max(end for _, end in spans) -
+                             min(start for start, _ in spans))
+        else:
+            self.duration = None
+        self.usage = combine_usage(i.usage for i in self.shards)
+        self.timed_out = any(i.timed_out for i in self.shards)
+        return self.return_code
+
+    def get_failed_tests(self):
+        """
+        Get all failed and errored tests of the executed suite
+        from its xml report
+
+        Returns
+        -------
+        dict
+            Mapping of testcase ids to their test names which
+            can be given to nosetests (see ``get_testcase_address()``).
+            Testcases which cannot be addressed are not included.
+        """
+        failed = {}
+        try:
+            for testcase in iter_testcases(self.xunit_file):
+                if get_testcase_outcome(testcase) not in ('errors',
+                                                          'failures'):
+                    continue
+                address = get_testcase_address(testcase.get('classname'),
+                                               testcase.get('name'))
+                if address:
+                    failed[get_testcase_id(testcase)] = address
+        except ParseError:
+            # invalid reports are replaced once they are merged
+            return {}
+        return failed
+
+    def get_rerun(self):
+        """
+        Get the nosetests suite which reruns only failed tests
+        of this suite
+
+        Rerun uses the same command with the same options except
+        it runs only the failed tests and without coverage since
+        coverage of these tests was already measured.
+
+        Returns
+        -------
+        NosetestsCall
+            Rerun suite or ``None`` when there are no
+            failed tests which can be rerun
+        """
+        failed = self.get_failed_tests()
+        if not failed:
+            return None
+
+        program, options, _ = split_command(self.command)
+        rerun = self.clone(
+            join_command(program,
+                         strip_options(options, RERUN_STRIP_OPTIONS),
+                         sorted(set(failed.values())))
+        )
+        rerun.rerun_ids = set(failed)
+        return rerun
+
+    def apply_rerun(self, rerun, attempt):
+        """
+        Replace failed testcases in the xml report of this suite
+        by their results from the executed rerun
+
+        Every replaced testcase is marked by ``reruns`` attribute
+        with the number of times it was rerun and testcases which
+        passed only when rerun are marked as ``flaky``.
+        When no test fails anymore, the suite is considered successful.
+
+        Parameters
+        ----------
+        rerun : NosetestsCall
+            Executed rerun suite as returned by ``get_rerun()``
+        attempt : int
+            Number of the rerun attempt starting from 1
+
+        Returns
+        -------
+        int
+            Return code of the suite
+        """
+        results = {}
+        for testcase in iter_testcases(rerun.xunit_file):
+            testcase_id = get_testcase_id(testcase)
+            if testcase_id in rerun.rerun_ids:
+                results[testcase_id] = copy.deepcopy(testcase)
+        os.unlink(rerun.xunit_file)
+        # streamed results no longer match the updated xml report
+        for suite in (self, rerun):
+            if os.path.exists(suite.results_file):
+                os.unlink(suite.results_file)
+
+        def replace(testcase):
+            result = results.get(get_testcase_id(testcase))
+            if result is None:
+                return testcase
+            result.set('reruns', six.text_type(attempt))
+            if get_testcase_outcome(result) is None:
+                result.set('flaky', 'true')
+            return result
+
+        counts = replace_testcases(self.xunit_file, replace)
+        if (rerun.return_code == 0 and
+                not counts['errors'] and not counts['failures']):
+            self.return_code = 0
 
+        status_print('Rerun',
+                     '{}: {} of {} failed tests passed'
+                     ''.format(self.command,
+                               len([i for i in results.values()
+                                    if get_testcase_outcome(i) is None]),
+                               len(rerun.rerun_ids)))
         return self.return_code
 
+    def select_tests(self, addresses, keep):
+        """
+        Get a copy of the suite which runs only some of its tests
+
+        Parameters
+        ----------
+        addresses : list
+            Addresses of all tests of the suite
+            (see ``collect.collect_test_addresses()``)
+        keep : list
+            Addresses of tests the copy should run
+
+        Returns
+        -------
+        NosetestsCall
+            Suite which runs only ``keep`` tests
+        """
+        program, options, _ = split_command(self.command)
+        return self.clone(join_command(program,
+                                       options,
+                                       compact_addresses(addresses, keep)))
+
+    def clone(self, command=None):
+        """
+        Get a new suite which is executed the same way as this suite
+
+        Parameters
+        ----------
+        command : str, optional
+            Nosetests command of the new suite.
+            Same as of this suite when not given.
+
+        Returns
+        -------
+        NosetestsCall
+            Suite which was not executed yet
+        """
+        return NosetestsCall(
+            self.command if command is None else command,
+            shell=self.shell,
+            timeout=self.timeout,
+            fork_server=self.fork_server,
+            weight=self.weight,
+            memory=self.memory,
+        )
+
+    @staticmethod
+    def collect_tests(nose_calls, jobs=1):
+        """
+        Helper static method to collect tests of all nosetests suites
+
+        Returns
+        -------
+        list
+            Addresses of tests of every suite as returned by
+            ``collect.collect_test_addresses()``
+        """
+        status_print('Collecting',
+                     'tests of {} suites'.format(len(nose_calls)))
+        pool = ThreadPool(max(1, min(jobs, len(nose_calls))))
+        try:
+            return pool.map(
+                lambda nose: collect_test_addresses(nose.command, nose.shell),
+                nose_calls,
+                chunksize=1,
+            )
+        finally:
+            pool.close()
+            pool.join()
+
+    @staticmethod
+    def dedupe_calls(nose_calls, rewrite=False, jobs=1):
+        """
+        Helper static method to find tests which
+        are run by multiple nosetests suites
+
+        Tests of all suites are collected via ``nosetests --collect-only``
+        (see ``collect.collect_test_addresses()``) and tests which
+        are run by more than one suite the same way (e.g. with the same
+        environment variables) are reported. When ``rewrite``
+        is given, every suite which runs nose directly is rewritten
+        to run only tests which are not run by any earlier suite
+        so that every test runs exactly once.
+
+        Parameters
+        ----------
+        nose_calls : list
+            List of ``NosetestsCall`` class instances
+        rewrite : bool, optional
+            Whether to rewrite suites to not run overlapping tests
+        jobs : int, optional
+            Maximum number of suites to collect at the same time
+
+        Returns
+        -------
+        list
+            List of ``NosetestsCall`` class instances to be executed.
+            Suites which were left without any tests are removed.
+        """
+        suites = NosetestsCall.collect_tests(nose_calls, jobs=jobs)
+
+        deduped = []
+        overlaps = find_overlaps(
+            suites, [get_run_key(nose.command) for nose in nose_calls],
+        )
+        for nose, addresses, overlap in zip(nose_calls, suites, overlaps):
+            for index, tests in sorted(overlap.items()):
+                status_print('Overlapping tests',
+                             '{}: {} of {} tests are also run by {}'
+                             ''.format(nose.command,
+                                       len(tests),
+                                       len(addresses),
+                                       nose_calls[index].command))
+            if not rewrite or not overlap or not nose.parsed.is_nose():
+                deduped.append(nose)
+                continue
+
+            overlapping = set(i for tests in overlap.values() for i in tests)
+            remaining = [i for i in addresses if i not in overlapping]
+            if not remaining:
+                status_print('Removed',
+                             '{}: all of its tests are run by other suites'
+                             ''.format(nose.command))
+                continue
+
+            deduped.append(nose.select_tests(addresses, remaining))
+            status_print('Deduplicated',
+                         '{}: runs {} of {} tests'.format(nose.command,
+                                                          len(remaining),
+                                                          len(addresses)))
+        return deduped
+
+    @staticmethod
+    def select_changed(nose_calls, changed_files, index, jobs=1, ignore=()):
+        """
+        Helper static method to select only tests
+        affected by the changed files
+
+        Tests of every suite are collected and only tests which
+        execute any of the changed files according to the impact
+        index are run together with tests of changed test modules
+        and tests which are not in the index yet (e.g. new tests).
+        Suites left without any tests are not executed at all.
+        Suites are run in full when:
+
+        * the suite is not in the index yet
+        * the suite does not run nose directly or its tests
+          cannot be collected
+        * any of the changed files is executed only outside of tests
+          or is within the suite sources but unknown to the index
+          (see ``impact.get_affected_tests()``)
+
+        Parameters
+        ----------
+        nose_calls : list
+            List of ``NosetestsCall`` class instances
+        changed_files : set
+            Real absolute paths of changed files
+            (see ``impact.get_changed_files()``)
+        index : dict
+            Impact index (see ``impact.load_impact_index()``)
+        jobs : int, optional
+            Maximum number of suites to collect at the same time
+        ignore : list, optional
+            Paths of files and directories written by multinosetests
+            which are never considered as changed
+
+        Returns
+        -------
+        list
+            List of ``NosetestsCall`` class instances to be executed
+        """
+        ignore = [os.path.realpath(i) for i in ignore]
+        changed_files = set(i for i in changed_files
+                            if not any(is_within(i, j) for j in ignore))
+        indexed = [nose for nose in nose_calls
+                   if nose.key in index and nose.parsed.is_nose()]
+        suites = dict(zip(indexed,
+                          NosetestsCall.collect_tests(indexed, jobs=jobs)
+                          if indexed else []))
+
+        selected = []
+        for nose in nose_calls:
+            addresses = suites.get(nose)
+            entry = index.get(nose.key)
+            affected = None
+            if addresses:
+                modules = {}
+                for address in addresses:
+                    path = get_test_path(address)
+                    if path:
+                        modules.setdefault(os.path.realpath(path), set()).add(
+                            address_to_test_id(address)
+                        )
+                sources = [os.path.realpath(i)
+                           for i in get_source_paths(nose.command)]
+                affected = get_affected_tests(entry, changed_files,
+                                              modules, sources)
+            if affected is None:
+                selected.append(nose)
+                continue
+
+            known = set(entry['tests'])
+            keep = [i for i in addresses
+                    if address_to_test_id(i) in affected or
+                    address_to_test_id(i) not in known]
+            if not keep:
+                status_print('Skipped',
+                             '{}: none of its tests is affected by changes'
+                             ''.format(nose.command))
+                continue
+            if len(keep) == len(addresses):
+                selected.append(nose)
+                continue
+
+            partial = nose.select_tests(addresses, keep)
+            partial.partial = nose.key
+            selected.append(partial)
+            status_print('Selected',
+                         '{}: runs {} of {} tests affected by changes'
+                         ''.format(nose.command, len(keep), len(addresses)))
+        return selected
+
+    @staticmethod
+    def update_impact_index(nose_calls, index_file=IMPACT_INDEX_FILE):
+        """
+        Helper static method to update the impact index from coverage
+        contexts of suites stored in the coverage baseline
+
+        Only suites which were executed in full are indexed
+        since partial suites do not run all of the tests.
+        Sharded suites are indexed from contexts of all their shards.
+
+        Parameters
+        ----------
+        nose_calls : list
+            List of already merged ``NosetestsCall`` class instances
+            (see ``merge_calls()``)
+        index_file : str, optional
+            Path of the impact index
+
+        Returns
+        -------
+        dict
+            Updated impact index or ``None`` if no suite can be indexed
+        """
+        indexed = [nose for nose in nose_calls
+                   if nose.is_covered() and
+                   not nose.cached and
+                   not nose.partial]
+        if not indexed or not os.path.exists(COVERAGE_BASELINE_FILE):
+            return None
+
+        contexts = get_measured_contexts(COVERAGE_BASELINE_FILE)
+        index = load_impact_index(index_file)
+        for nose in indexed:
+            units = nose.shards or [nose]
+            if any(i.key not in contexts for i in units):
+                continue
+            entry = build_index_entry(nose.command,
+                                      [contexts[i.key] for i in units])
+            # suites which were not executed with test contexts
+            # (e.g. on remote workers) cannot select their tests
+            if entry['tests']:
+                index[nose.key] = entry
+            else:
+                index.pop(nose.key, None)
+        save_impact_index(index_file, index)
+        return index
+
+    @staticmethod
+    def get_units(nose_calls, durations=None):
+        """
+        Helper static method to get all units of execution of
+        the nosetests suites
+
+        Each suite is a single unit unless it is sharded
+        in which case each of its shards is a unit.
+        Suites restored from the result cache are not executed at all.
+
+        Parameters
+        ----------
+        nose_calls : list
+            List of ``NosetestsCall`` class instances
+        durations : list, optional
+            Estimated durations of the suites
+
+        Returns
+        -------
+        tuple
+            Tuple of ``(units, durations)`` with ``NosetestsCall``
+            instances to be executed and their estimated durations
+        """
+        units = []
+        unit_durations = []
+        for i, nose in enumerate(nose_calls):
+            if nose.cached:
+                continue
+            elif nose.shards:
+                units.extend(nose.shards)
+                unit_durations.extend(j.expected_duration
+                                      for j in nose.shards)
+            else:
+                units.append(nose)
+                unit_durations.append(durations[i] if durations else 0.0)
+        return units, unit_durations
+
+    @staticmethod
+    def run_locally(nose_calls,
+                    tags,
+                    jobs=1,
+                    engine=DEFAULT_RUN_ENGINE,
+                    adaptive=False):
+        """
+        Helper static method to execute nosetests suites
+        on this machine in the given order
+
+        See ``run_calls()`` for the description of run engines
+        and of ``adaptive``.
+
+        Returns
+        -------
+        list
+            Return codes of all suites in the same order as ``nose_calls``
+        """
+        jobs = min(jobs, len(nose_calls))
+        limiter = ResourceLimiter(jobs, adaptive=adaptive)
+        if engine != THREADS_ENGINE:
+            return run_async(nose_calls, tags, jobs, limiter=limiter)
+        elif jobs <= 1:
+            return [nose() for nose in nose_calls]
+
+        def run(nose):
+            limiter.acquire(nose.weight, nose.memory)
+            try:
+                return nose()
+            finally:
+                limiter.release(nose.weight, nose.memory)
+
+        pool = ThreadPool(jobs)
+        try:
+            # chunksize of 1 makes sure suites are started
+            # in the same order as they were given
+            return pool.map(run, nose_calls, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+    @staticmethod
+    def run_calls(nose_calls,
+                  jobs=1,
+                  durations=None,
+                  engine=DEFAULT_RUN_ENGINE,
+                  workers=None,
+                  worker_token=None,
+                  adaptive=False):
+        """
+        Helper static method to execute all nosetests test suites
+
+        All suites are always executed even if any of them fails.
+        Suites can be executed by either of two engines:
+
+        ``asyncio``
+            A single event loop supervises all suites and reads
+            their output from non-blocking pipes. Every line of output
+            is prefixed by a tag of its suite so that output of suites
+            running at the same time is never mixed up
+            (see ``runner.run_async()``).
+        ``threads``
+            Suites are executed on a pool of ``jobs`` worker threads.
+            Each worker simply blocks on its nosetests subprocess
+            which writes directly to the terminal.
+
+        When ``workers`` are given, suites are executed on remote
+        ``multinosetests-worker`` processes instead
+        (see ``remote.run_remote()``). Suites which could not
+        be executed remotely because all workers disconnected
+        are executed locally.
+
+        Parameters
+        ----------
+        nose_calls : list
+            List of ``NosetestsCall`` class instances to be executed
+        jobs : int
+            Maximum number of nosetests suites to execute at the same time
+        durations : list, optional
+            Estimated durations of the suites. When provided, suites are
+            started longest-processing-time-first which minimizes
+            the total wall time when multiple workers are used.
+            Shards of sharded suites are scheduled individually.
+        engine : str, optional
+            Engine used to execute suites. Either ``asyncio``
+            (default on Python 3) or ``threads``.
+        workers : list, optional
+            ``(host, port)`` addresses of remote workers
+        worker_token : str, optional
+            Token shared with remote workers
+        adaptive : bool, optional
+            Whether the number of suites executed locally at the same
+            time adapts to the load and memory of the machine.
+            See ``multinosetests.resources.ResourceLimiter``.
+
+        Returns
+        -------
+        list
+            Return codes of all suites in the same order as ``nose_calls``
+        """
+        units, unit_durations = NosetestsCall.get_units(nose_calls, durations)
+        order = longest_first(unit_durations)
+        ordered = [units[i] for i in order]
+        # tags follow the order of suites as given
+        # rather than the order they are started in
+        tags = get_tags(len(units))
+        ordered_tags = [tags[i] for i in order]
+
+        if workers:
+            codes = run_remote(ordered, ordered_tags, workers, worker_token,
+                               status_print)
+        else:
+            codes = [None] * len(ordered)
+
+        local = [i for i, code in enumerate(codes) if code is None]
+        if workers and local:
+            status_print('Running locally',
+                         '{} suites could not be executed by any worker'
+                         ''.format(len(local)))
+        local_codes = NosetestsCall.run_locally(
+            [ordered[i] for i in local],
+            [ordered_tags[i] for i in local],
+            jobs,
+            engine,
+            adaptive,
+        )
+        for i, code in zip(local, local_codes):
+            codes[i] = code
+
+        unit_codes = [None] * len(units)
+        for index, code in zip(order, codes):
+            unit_codes[index] = code
+        unit_codes = iter(unit_codes)
+
+        return_codes = []
+        for nose in nose_calls:
+            if nose.cached:
+                return_codes.append(nose.return_code)
+            elif nose.shards:
+                [next(unit_codes) for _ in nose.shards]
+                return_codes.append(nose.stitch_shards())
+            else:
+                return_codes.append(next(unit_codes))
+        return return_codes
+
+    @staticmethod
+    def rerun_calls(nose_calls,
+                    count,
+                    jobs=1,
+                    engine=DEFAULT_RUN_ENGINE,
+                    adaptive=False):
+        """
+        Helper static method to rerun failed tests of all
+        failed nosetests suites up to ``count`` times
+
+        Only failed tests are rerun and their results replace
+        the failed testcases in the xml report of their suite
+        (see ``apply_rerun()``). Reruns of all suites
+        are executed at the same time.
+
+        Parameters
+        ----------
+        nose_calls : list
+            List of already executed ``NosetestsCall`` class instances
+        count : int
+            Maximum number of times failed tests are rerun
+        jobs : int
+            Maximum number of reruns to execute at the same time
+        engine : str, optional
+            Engine used to execute reruns (see ``run_calls()``)
+        adaptive : bool, optional
+            Whether to adapt to load and memory (see ``run_calls()``)
+
+        Returns
+        -------
+        list
+            Return codes of all suites in the same order as ``nose_calls``
+        """
+        for attempt in range(1, count + 1):
+            reruns = []
+            for nose in nose_calls:
+                if nose.return_code and not nose.cached:
+                    rerun = nose.get_rerun()
+                    if rerun is not None:
+                        reruns.append((nose, rerun))
+            if not reruns:
+                break
+
+            status_print('Rerunning',
+                         'failed tests of {} suites (attempt {} of {})'
+                         ''.format(len(reruns), attempt, count))
+            NosetestsCall.run_locally([i[1] for i in reruns],
+                                      get_tags(len(reruns)),
+                                      jobs,
+                                      engine,
+                                      adaptive)
+            for nose, rerun in reruns:
+                nose.apply_rerun(rerun, attempt)
+
+        return [nose.return_code for nose in nose_calls]
+
     @staticmethod
-    def merge_calls(nose_calls, report_coverage=True):
+    def merge_calls(nose_calls,
+                    report_coverage=True,
+                    merge_engine=DEFAULT_MERGE_ENGINE,
+                    coverage_xml=None,
+                    coverage_html=None,
+                    timings=None,
+                    durations=0,
+                    summary_file=None,
+                    compression=None,
+                    max_output=None,
+                    keep_reports=False,
+                    keep_coverage=False):
         """
         Helper static method to combine all nosetests test suites
 
@@ -284,49 +1711,177 @@ class NosetestsCall(object):
             List of ``NosetestsCall`` class instances to be merged
         report_report_coverage : bool
             Whether to print out the final combined coverage report
+        merge_engine : str
+            Name of the engine used to merge xunit reports.
+            See ``multinosetests.xunit.MERGE_ENGINES``.
+        coverage_xml : str, optional
+            Path where to write the combined xml coverage report
+        coverage_html : str, optional
+            Directory where to write the combined html coverage report
+        timings : multinosetests.schedule.TimingCache, optional
+            When provided, durations of all tests are recorded
+            while merging the xml reports
+        durations : int, optional
+            Number of the slowest tests to print out
+            for each suite and overall
+        summary_file : str, optional
+            Path where to write json summary of all suites
+        compression : str, optional
+            Name of the compression with which the merged xml
+            report is written. See ``multinosetests.xunit.COMPRESSIONS``.
+        max_output : int, optional
+            Maximum number of characters of captured output
+            of every test in the merged xml report
+        keep_reports : bool, optional
+            Whether to keep xml reports and coverage data files
+            of individual suites so that they can be merged again
+            without executing the suites (see ``--watch``)
+        keep_coverage : bool, optional
+            Whether to keep coverage data of suites which were
+            not executed (e.g. not affected by changes) in the coverage
+            baseline. Data of partial suites is then merged into data
+            of their original suites (see ``select_changed()``).
         """
+        # merge all xml reports and remove individual xml reports
+        xunit_files = [i.xunit_file for i in nose_calls]
+        callbacks = []
+        if max_output is not None:
+            callbacks.append(functools.partial(truncate_output,
+                                               limit=max_output))
+        if timings:
+            callbacks.append(timings.record_testcase)
+
+        def callback(testcase):
+            for i in callbacks:
+                i(testcase)
+
+        output = NOSETESTS_FILE.format('')
+        if compression:
+            output += COMPRESSIONS[compression]
+
+        def merge():
+            reports = [suite.get_report(slowest=durations)
+                       for suite in nose_calls]
+            merge_xunit_files(xunit_files,
+                              output,
+                              merge_engine,
+                              callback=callback if callbacks else None,
+                              compression=compression)
+            return reports
+
+        try:
+            reports = merge()
+        except ParseError:
+            # only ends of reports are checked once suites finish
+            # (see ``ensure_xunit_file()``) therefore reports which
+            # cannot be parsed are found only while they are merged
+            for suite in nose_calls:
+                suite.replace_invalid_report()
+            reports = merge()
+
         # if any of the test suites had coverage
-        # coverage data should be combined
-        if any((i.is_covered() for i in nose_calls)):
-            [i.write_coverage() for i in nose_calls]
-            call('coverage combine', shell=True)
+        # coverage data should be combined.
+        # it is reported only after the xml reports are merged
+        # so that a failing coverage report cannot leave them stale.
+        # coverage data of sharded suites is stored in their shards
+        covered = [i
+                   for nose in nose_calls
+                   for i in (nose.shards or [nose])
+                   if i.is_covered()]
+        # suites which crashed before coverage saved its data
+        # do not have any coverage file to combine
+        data_files = {i.key: i.coverage_file
+                      for i in covered
+                      if i.has_coverage}
+        if data_files:
+            # only data of suites which were executed is combined
+            # with the coverage data of cached suites from previous runs
+            cov = combine_coverage_incremental(
+                data_files,
+                COVERAGE_FILE.format(''),
+                COVERAGE_BASELINE_FILE,
+                unchanged=[i.key for i in covered if i.cached],
+                keep_data_files=keep_reports,
+                partial={i.key: nose.partial
+                         for nose in nose_calls if nose.partial
+                         for i in (nose.shards or [nose])},
+                merge=keep_coverage,
+            )
 
             if report_coverage:
                 # find all packages which need to be covered
                 # from all nosetests suites and convert to
-                # file path patterns compatible with ``--include``
-                # coverage flag vs just a list of package names
-                # for example package names ``--include=foo,bar``
-                # vs filename patterns ``--include=foo*,bar*``
-                packages = []
-                for nose in nose_calls:
-                    find_packages = COVER_PACKAGE_RE.findall(nose.command)
-                    if find_packages:
-                        packages += find_packages[0].split(',')
-                packages = map(lambda j: '{}*'.format(j), list(set(packages)))
-
-                coverage_command = [
-                    'coverage',
-                    'report',
-                    '--include="{}"'.format(','.join(packages)),
-                ]
-                call(' '.join(coverage_command), shell=True)
+                # file path patterns compatible with coverage ``include``
+                packages = get_cover_packages([i.command for i in nose_calls])
+                try:
+                    write_coverage_reports(
+                        cov,
+                        include=get_include_patterns(packages),
+                        xml_file=coverage_xml,
+                        html_dir=coverage_html,
+                    )
+                except CoverageException as e:
+                    # e.g. none of the covered packages were measured
+                    status_print('Failed to report coverage', str(e))
 
         # print out the test report for each test suite
-        for suite in nose_calls:
-            status_print_report(
-                'Test suite report',
-                get_nose_xml_report(suite.xunit_file),
-                suite,
-            )
+        for suite, report in zip(nose_calls, reports):
+            status_print_report('Test suite report', report, suite)
+            if durations:
+                status_print_durations('Slowest tests', report, suite)
 
-        # merge all xml reports and remove individual xml reports
-        xunit_files = [i.xunit_file for i in nose_calls]
-        merge_xunit(xunit_files, NOSETESTS_FILE.format(''))
-        list(map(os.unlink, xunit_files))
+        if not keep_reports:
+            list(map(os.unlink, xunit_files))
+            for suite in nose_calls:
+                if os.path.exists(suite.results_file):
+                    os.unlink(suite.results_file)
 
-        # print out the overall tests report
-        status_print_report(
-            'Overall test suite report',
-            get_nose_xml_report(NOSETESTS_FILE.format('')),
-        )
+        # print out the overall tests report which is computed
+        # from individual suite reports so that the merged
+        # xml report does not have to be parsed again
+        overall = combine_reports(reports, slowest=durations)
+        if durations:
+            status_print_durations('Overall slowest tests', overall)
+        status_print_report('Overall test suite report', overall)
+
+        if summary_file:
+            write_summary_file(summary_file, reports, nose_calls, overall)
+
+    @staticmethod
+    def merge_profiles(nose_calls, hotspots=0):
+        """
+        Helper static method to merge profiles of all nosetests
+        suites into a single ``pstats`` file
+
+        Profiles of individual suites are removed once merged.
+        Suites restored from the result cache or executed
+        on remote workers do not have any profile.
+
+        Parameters
+        ----------
+        nose_calls : list
+            List of ``NosetestsCall`` class instances
+        hotspots : int, optional
+            Number of functions with the largest cumulative
+            time to print out
+
+        Returns
+        -------
+        pstats.Stats
+            Merged profile or ``None`` if no suite was profiled
+        """
+        profile_files = [i.profile_file
+                         for nose in nose_calls
+                         for i in (nose.shards or [nose])
+                         if not i.cached and i.has_profile]
+        output = PROFILE_FILE.format('')
+        stats = merge_profile_files(profile_files, output)
+        list(map(os.unlink, profile_files))
+
+        if stats is None:
+            status_print('Profile', 'No suite was profiled')
+        elif hotspots:
+            status_print_hotspots('Profile hotspots',
+                                  get_hotspots(stats, hotspots),
+                                  output)
+        return stats
@@ -0,0 +1,89 @@
+from __future__ import print_function, unicode_literals
+import io
+import os
+import time
+
+from nose.exc import SkipTest
+from nose.plugins.base import Plugin
+from nose.plugins.xunit import exc_message, id_split, nice_classname
+from nose.pyversion import format_exception
+
+from .results import RESULTS_ENV, encode_record
+
+
+class ResultStream(Plugin):
+    """
+    Append a record with the result of every finished test
+    to the file given by multinosetests
+
+    Records contain the same data as testcases of xunit
+    reports except captured output. Plugin is only enabled when
+    the path of the file is given in ``RESULTS_ENV``.
+    """
+
+    name = 'multinosetests'
+    encoding = 'UTF-8'
+    # same as xunit plugin, called before error class plugins
+    # such as skip plugin which stop other plugins from seeing errors
+    score = 1500
+
+    def options(self, parser, env):
+        """
+        Plugin is enabled by multinosetests via the environment
+        therefore it does not have any command line options
+        """
+
+    def configure(self, options, conf):
+        self.conf = conf
+        # removed so that nose runs within tests of the suite
+        # do not write their results into the same file
+        self.path = os.environ.pop(str(RESULTS_ENV), None)
+        self.enabled = bool(self.path)
+        self.stream = None
+        self._start = None
+
+    def begin(self):
+        self.stream = io.open(self.path, 'ab')
+
+    def startTest(self, test):
+        self._start = time.time()
+
+    def write(self, test, outcome=None, err=None):
+        """
+        Write the record of the finished test
+        """
+        # same as the classname and the name of xunit testcases
+        parts = id_split(test.id())
+        record = {
+            'classname': parts[0],
+            'name': parts[-1],
+            'time': time.time() - self._start if self._start else 0.0,
+            'outcome': outcome,
+        }
+        if err is not None:
+            record.update({
+                'type': nice_classname(err[0]),
+                'message': exc_message(err),
+                'traceback': format_exception(err, self.encoding),
+            })
+        self._start = None
+        # flushed so that results can be read while the suite is running
+        self.stream.write(encode_record(record))
+        self.stream.flush()
+
+    def addSuccess(self, test, capt=None):
+        self.write(test)
+
+    def addFailure(self, test, err, capt=None, tb_info=None):
+        self.write(test, 'failure', err)
+
+    def addError(self, test, err, capt=None):
+        if issubclass(err[0], SkipTest):
+            self.write(test, 'skipped', err)
+        else:
+            self.write(test, 'error', err)
+
+    def finalize(self, result):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
@@ -0,0 +1,297 @@
+from __future__ import print_function, unicode_literals
+import errno
+import os
+import signal
+import sys
+import time
+from subprocess import Popen
+
+import six
+
+
+# how often children are polled while waiting with a timeout
+POLL_INTERVAL = 0.05
+# how long a suite has to exit after SIGTERM before it is killed
+TERMINATE_GRACE_PERIOD = 10.0
+# suite processes which were not reaped yet
+RUNNING = set()
+
+
+def get_return_code(status):
+    """
+    Convert the wait status of the process to its return code
+
+    Same as ``subprocess`` return codes, processes killed
+    by a signal have a negative return code of the signal number.
+    """
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def get_usage(rusage):
+    """
+    Get resource usage of the process from its ``rusage``
+
+    Returns
+    -------
+    dict
+        Dictionary with user and system CPU time in seconds
+        and maximum resident set size in bytes
+    """
+    # linux reports maximum rss in kilobytes while macOS in bytes
+    max_rss = rusage.ru_maxrss
+    if not sys.platform.startswith('darwin'):
+        max_rss *= 1024
+    return {
+        'user': rusage.ru_utime,
+        'system': rusage.ru_stime,
+        'max_rss': max_rss,
+    }
+
+
+def combine_usage(usages):
+    """
+    Combine resource usage of multiple processes
+
+    CPU times are summed while maximum rss is the maximum
+    of all processes.
+    """
+    usages = [i for i in usages if i]
+    if not usages:
+        return None
+    return {
+        'user': sum(i['user'] for i in usages),
+        'system': sum(i['system'] for i in usages),
+        'max_rss': max(i['max_rss'] for i in usages),
+    }
+
+
+def get_signal_name(signum):
+    """
+    Get the name of the signal number (e.g. ``SIGSEGV``)
+    """
+    for name in dir(signal):
+        if (name.startswith('SIG') and not name.startswith('SIG_') and
+                getattr(signal, name) == signum):
+            return name
+    return 'signal {}'.format(signum)
+
+
+def open_pidfd(pid):
+    """
+    Open a file descriptor of the process which becomes readable
+    once the process exits
+
+    Returns
+    -------
+    int
+        File descriptor or ``None`` when pid file descriptors
+        are not supported
+    """
+    try:
+        return os.pidfd_open(pid)
+    except (AttributeError, OSError):
+        return None
+
+
+def interrupt_suites(signum=signal.SIGINT, frame=None):
+    """
+    Forward the interrupt to all suites which are still running
+    and raise ``KeyboardInterrupt``
+
+    Suites run in their own sessions (see ``SuiteProcess``)
+    and therefore do not receive interrupts from the terminal.
+    Can be used as the ``SIGINT`` handler.
+    """
+    for process in list(RUNNING):
+        process.signal(signum)
+    signal.default_int_handler(signum, frame)
+
+
+class SuiteProcess(object):
+    """
+    Child process of a single nosetests suite
+
+    Unlike ``subprocess.Popen.wait()`` the process is reaped via
+    ``os.wait4()`` so that resource usage of the process is known
+    once it exits. Process which exceeds its timeout is asked to
+    terminate via ``SIGTERM`` and is killed via ``SIGKILL`` when it does
+    not exit within ``TERMINATE_GRACE_PERIOD``.
+    Process is started in its own session so that signals reach
+    all of its children (e.g. ``nosetests | cat`` or nose
+    ``--processes``) rather than only the suite process itself.
+
+    Parameters
+    ----------
+    args : list or str
+        Arguments of the command or a command string
+        when it is executed via shell
+    shell : bool
+        Whether to execute the command via shell
+    env : dict
+        Environment variables of the command
+    **kwargs
+        Any other ``subprocess.Popen`` arguments
+
+    Attributes
+    ----------
+    return_code : int
+        Return code of the process once it exited
+    usage : dict
+        Resource usage of the process once it exited (see ``get_usage()``)
+    timed_out : bool
+        Whether the process was terminated because of its timeout
+    """
+
+    def __init__(self, args, shell=False, env=None, **kwargs):
+        if six.PY2:
+            kwargs.setdefault('preexec_fn', os.setsid)
+        else:
+            kwargs.setdefault('start_new_session', True)
+        self.popen = Popen(args, shell=shell, env=env, **kwargs)
+        self.pid = self.popen.pid
+        self.stdout = self.popen.stdout
+        self.stderr = self.popen.stderr
+        self.return_code = None
+        self.usage = None
+        self.timed_out = False
+        self.terminated_at = None
+        RUNNING.add(self)
+
+    def open_exit_fd(self):
+        """
+        Open a file descriptor which becomes readable once
+        the process exits so that it can be waited for
+        by an event loop
+
+        Returns
+        -------
+        int
+            File descriptor or ``None`` when it is not supported
+            in which case the process has to be polled
+        """
+        return open_pidfd(self.pid)
+
+    def reap(self, block=False):
+        """
+        Collect the return code and resource usage
+        of the process if it exited
+
+        Parameters
+        ----------
+        block : bool
+            Whether to wait for the process to exit
+
+        Returns
+        -------
+        bool
+            Whether the process was reaped
+        """
+        try:
+            pid, status, rusage = os.wait4(self.pid,
+                                           0 if block else os.WNOHANG)
+        except OSError as e:
+            if e.errno == errno.EINTR:
+                return False
+            if e.errno != errno.ECHILD:
+                raise
+            # already reaped elsewhere so its status is unknown
+            pid, status, rusage = self.pid, 255 << 8, None
+        if not pid:
+            return False
+
+        self.return_code = get_return_code(status)
+        self.usage = get_usage(rusage) if rusage else None
+        # process is reaped so Popen must not wait for it anymore
+        self.popen.returncode = self.return_code
+        RUNNING.discard(self)
+        return True
+
+    def poll(self):
+        """
+        Reap the process if it exited
+
+        Returns
+        -------
+        int
+            Return code of the process or ``None`` if it is still running
+        """
+        if self.return_code is None:
+            self.reap()
+        return self.return_code
+
+    def signal(self, signum):
+        """
+        Send the signal to the process group of the process
+        unless the process already exited
+        """
+        if self.poll() is None:
+            try:
+                os.killpg(self.pid, signum)
+            except OSError as e:
+                # macOS does not allow signalling groups of zombies
+                if e.errno not in (errno.ESRCH, errno.EPERM):
+                    raise
+
+    def terminate(self):
+        """
+        Ask the process to terminate because it timed out
+
+        Process is killed on the next call of ``escalate()``
+        after ``TERMINATE_GRACE_PERIOD``.
+        """
+        self.timed_out = True
+        self.terminated_at = time.time()
+        self.signal(signal.SIGTERM)
+
+    def kill(self):
+        """
+        Kill the process unless it already exited
+        """
+        self.signal(signal.SIGKILL)
+        self.terminated_at = None
+
+    def escalate(self):
+        """
+        Kill the process if it did not exit within
+        ``TERMINATE_GRACE_PERIOD`` since it was terminated
+
+        Returns
+        -------
+        bool
+            Whether the process was killed
+        """
+        if (self.terminated_at is None or
+                time.time() - self.terminated_at < TERMINATE_GRACE_PERIOD):
+            return False
+        self.kill()
+        return True
+
+    def wait(self, timeout=None):
+        """
+        Block until the process exits
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum number of seconds the process can run for.
+            When exceeded, the process is terminated.
+
+        Returns
+        -------
+        int
+            Return code of the process
+        """
+        if timeout is None:
+            while self.return_code is None:
+                self.reap(block=True)
+            return self.return_code
+
+        deadline = time.time() + timeout
+        while self.poll() is None:
+            if not self.timed_out and time.time() >= deadline:
+                self.terminate()
+            self.escalate()
+            time.sleep(POLL_INTERVAL)
+        return self.return_code
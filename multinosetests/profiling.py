@@ -0,0 +1,169 @@
+from __future__ import print_function, unicode_literals
+import cProfile
+import io
+import os
+import pstats
+
+from .artifacts import ensure_directory
+
+
+# environment variable with the path where the profile
+# of the suite is written
+PROFILE_ENV = 'MULTINOSETESTS_PROFILE'
+HOOK_FILE = 'sitecustomize.py'
+# hook is executed by the interpreter of the suite therefore
+# it cannot import anything from multinosetests. Only the suite
+# process itself is profiled since the variable is removed before
+# any of its subprocesses can inherit it.
+HOOK = '''\
+import atexit
+import os
+import sys
+
+
+def _load_sitecustomize():
+    """
+    Load sitecustomize module which is shadowed by this hook
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    path = [i for i in sys.path
+            if os.path.abspath(i or os.curdir) != here]
+    try:
+        from importlib.machinery import PathFinder
+        from importlib.util import module_from_spec
+    except ImportError:
+        import imp
+        try:
+            found = imp.find_module('sitecustomize', path)
+        except ImportError:
+            return
+        imp.load_module('sitecustomize', *found)
+    else:
+        spec = PathFinder.find_spec('sitecustomize', path)
+        if spec is None or spec.loader is None:
+            return
+        module = module_from_spec(spec)
+        sys.modules['sitecustomize'] = module
+        spec.loader.exec_module(module)
+
+
+def _start_profile():
+    path = os.environ.pop('{env}', None)
+    if not path:
+        return
+    import cProfile
+    profiler = cProfile.Profile()
+    atexit.register(lambda: (profiler.disable(), profiler.dump_stats(path)))
+    profiler.enable()
+
+
+_load_sitecustomize()
+_start_profile()
+'''.format(env=PROFILE_ENV)
+
+
+def write_hook(directory):
+    """
+    Write the profiling ``sitecustomize`` hook into the directory
+
+    Hook is first written to a temporary file which is then
+    renamed so that suites which are already starting never
+    import partially written hook.
+
+    Returns
+    -------
+    str
+        Absolute path of the directory which needs
+        to be added to ``PYTHONPATH`` of suites
+    """
+    directory = os.path.abspath(directory)
+    ensure_directory(directory)
+
+    path = os.path.join(directory, HOOK_FILE)
+    tmp = '{}.{}.tmp'.format(path, os.getpid())
+    with io.open(tmp, 'wb') as fid:
+        fid.write(HOOK.encode('utf-8'))
+    os.rename(tmp, path)
+    return directory
+
+
+def get_profile_environment(env, hook_dir, profile_file):
+    """
+    Add variables which profile the suite into its environment
+
+    Parameters
+    ----------
+    env : dict
+        Environment variables of the suite which are updated in place
+    hook_dir : str
+        Directory with the profiling hook (see ``write_hook()``)
+    profile_file : str
+        Path where the profile of the suite will be written
+    """
+    python_path = env.get(str('PYTHONPATH'))
+    env[str('PYTHONPATH')] = str(
+        os.pathsep.join([hook_dir, python_path]) if python_path else hook_dir
+    )
+    env[str(PROFILE_ENV)] = str(os.path.abspath(profile_file))
+    return env
+
+
+def run_profiled(profile_file, func, *args):
+    """
+    Call the function and write its profile into ``profile_file``
+
+    The function is called without profiling
+    when ``profile_file`` is not given.
+    """
+    if not profile_file:
+        return func(*args)
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args)
+    finally:
+        profiler.dump_stats(profile_file)
+
+
+def merge_profile_files(profile_files, output):
+    """
+    Merge profiles of multiple suites into a single ``pstats`` file
+
+    Parameters
+    ----------
+    profile_files : list
+        Paths of the profiles to be merged
+    output : str
+        Path where the merged profile will be written
+
+    Returns
+    -------
+    pstats.Stats
+        Merged profile or ``None`` if there are no profiles
+    """
+    if not profile_files:
+        return None
+
+    stats = pstats.Stats(profile_files[0], stream=io.StringIO())
+    for path in profile_files[1:]:
+        stats.add(path)
+    stats.dump_stats(output)
+    return stats
+
+
+def get_hotspots(stats, count):
+    """
+    Get functions with the largest cumulative time in the profile
+
+    Returns
+    -------
+    list
+        List of ``(cumulative_time, total_time, calls, function)``
+        tuples sorted from the largest cumulative time
+    """
+    hotspots = [
+        (cumulative, total, calls, pstats.func_std_string(func))
+        for func, (_, calls, total, cumulative, _) in stats.stats.items()
+    ]
+    hotspots.sort(key=lambda i: i[0], reverse=True)
+    return hotspots[:count]
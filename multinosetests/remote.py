@@ -0,0 +1,488 @@
+from __future__ import print_function, unicode_literals
+import hmac
+import io
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+
+import six
+from six.moves import queue, socketserver
+
+
+# version of the protocol spoken between coordinator and workers
+PROTOCOL_VERSION = 2
+DEFAULT_PORT = 8757
+DEFAULT_HOST = '127.0.0.1'
+# environment variable with the token shared by coordinator and workers
+TOKEN_ENV = 'MULTINOSETESTS_WORKER_TOKEN'
+# every message is prefixed by its length as 4 byte unsigned integer
+HEADER = struct.Struct(str('>I'))
+# files are sent in chunks of at most this many bytes
+CHUNK_SIZE = 64 * 1024
+SENDING_SUFFIX = '.sending'
+# how long the coordinator waits for a worker to accept its connection
+CONNECT_TIMEOUT = 10.0
+# how often workers tell the coordinator that they are still running a suite
+HEARTBEAT_INTERVAL = 5.0
+# how long the coordinator waits for any message from a worker
+# before its suite is put back into the queue
+READ_TIMEOUT = 6 * HEARTBEAT_INTERVAL
+# how often idle connections check whether all suites are finished
+IDLE_INTERVAL = 0.1
+
+
+class ProtocolError(Exception):
+    """
+    Raised when the other side sends an unexpected message
+    """
+
+
+# errors which mean that the connection cannot be used anymore
+CONNECTION_ERRORS = (socket.error, EOFError, ProtocolError, ValueError)
+
+
+def parse_address(value):
+    """
+    Parse ``HOST:PORT`` worker address
+
+    Port defaults to ``DEFAULT_PORT`` when it is omitted.
+
+    Returns
+    -------
+    tuple
+        Tuple of ``(host, port)``
+    """
+    host, _, port = value.rpartition(':')
+    if not host:
+        host, port = port, DEFAULT_PORT
+    try:
+        port = int(port)
+    except ValueError:
+        raise ValueError('Invalid port in worker address {}'.format(value))
+    return host.strip('[]'), port
+
+
+def format_address(address):
+    return '{}:{}'.format(*address[:2])
+
+
+def send_message(sock, message):
+    """
+    Send json serializable message prefixed by its length
+    """
+    payload = json.dumps(message).encode('utf-8')
+    sock.sendall(HEADER.pack(len(payload)) + payload)
+
+
+def receive_exactly(sock, size):
+    """
+    Receive exactly ``size`` bytes from the socket
+
+    Raises
+    ------
+    EOFError
+        When the connection is closed before all bytes are received
+    """
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1024 * 1024))
+        if not chunk:
+            raise EOFError('Connection closed')
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def receive_message(sock):
+    """
+    Receive a single message sent via ``send_message()``
+    """
+    size, = HEADER.unpack(receive_exactly(sock, HEADER.size))
+    return json.loads(receive_exactly(sock, size).decode('utf-8'))
+
+
+def receive_reply(sock, expected):
+    """
+    Receive the next message other than heartbeats
+
+    Raises
+    ------
+    ProtocolError
+        When the message is not of the ``expected`` type
+    """
+    while True:
+        message = receive_message(sock)
+        if message.get('type') != 'heartbeat':
+            break
+    if message.get('type') == 'error':
+        raise ProtocolError(message.get('message'))
+    if message.get('type') != expected:
+        raise ProtocolError('Unexpected message {}'
+                            ''.format(message.get('type')))
+    return message
+
+
+def send_file(sock, path):
+    """
+    Send the file as chunks prefixed by their length
+    followed by an empty chunk so that the file
+    is never loaded into memory as a whole
+    """
+    with io.open(path, 'rb') as fid:
+        for chunk in iter(lambda: fid.read(CHUNK_SIZE), b''):
+            sock.sendall(HEADER.pack(len(chunk)) + chunk)
+    sock.sendall(HEADER.pack(0))
+
+
+def receive_file(sock, path):
+    """
+    Receive the file sent via ``send_file()`` chunk by chunk into the path
+    """
+    with io.open(path, 'wb') as fid:
+        while True:
+            size, = HEADER.unpack(receive_exactly(sock, HEADER.size))
+            if not size:
+                return
+            fid.write(receive_exactly(sock, size))
+
+
+def is_valid_token(token, expected):
+    """
+    Compare tokens in constant time
+    """
+    return (isinstance(token, six.text_type) and
+            hmac.compare_digest(token.encode('utf-8'),
+                                expected.encode('utf-8')))
+
+
+def run_suite(nose_class, request):
+    """
+    Execute the requested nosetests suite on the worker
+
+    Parameters
+    ----------
+    nose_class : type
+        Class used to create the suite, usually ``NosetestsCall``
+    request : dict
+        ``run`` message received from the coordinator
+
+    Returns
+    -------
+    tuple
+        Tuple of ``(result, files)`` where ``result`` is the ``result``
+        message with the return code and resource usage of the suite
+        and ``files`` is a list of ``(name, path)`` of files with the
+        xml report and coverage data of the suite sent after the message
+    """
+    nose = nose_class(request['command'],
+                      shell=request.get('shell', False),
+                      timeout=request.get('timeout'))
+    return_code = nose()
+
+    if os.path.exists(nose.results_file):
+        # coordinator builds the report from the xml report
+        os.unlink(nose.results_file)
+    paths = [('xunit', nose.xunit_file)]
+    if nose.is_covered() and nose.has_coverage:
+        paths.append(('coverage', nose.coverage_file))
+    # moved aside so that files are not overwritten by the next suite
+    # or by the coordinator when it runs within the same directory
+    files = []
+    for name, path in paths:
+        os.rename(path, path + SENDING_SUFFIX)
+        files.append((name, path + SENDING_SUFFIX))
+
+    return {
+        'type': 'result',
+        'return_code': return_code,
+        'usage': nose.usage,
+        'timed_out': nose.timed_out,
+        'files': [name for name, _ in files],
+    }, files
+
+
+class WorkerHandler(socketserver.BaseRequestHandler):
+    """
+    Serve a single coordinator connection
+
+    Coordinator first sends ``hello`` with the token shared with
+    the worker which is answered with the number of suites the worker
+    runs at the same time and then any number of ``run`` requests
+    which are executed one by one. Coordinator opens one connection
+    for every job of the worker.
+
+    While a suite is running, ``heartbeat`` messages are sent every
+    ``HEARTBEAT_INTERVAL`` seconds. The ``result`` message is followed
+    by files of the suite (see ``send_file()``).
+    """
+
+    def reject(self, message):
+        send_message(self.request, {'type': 'error', 'message': message})
+        raise ProtocolError(message)
+
+    def run(self, request):
+        """
+        Execute the suite on another thread while sending heartbeats
+        """
+        server = self.server
+        outcome = {}
+
+        def target():
+            try:
+                with server.slots:
+                    outcome['result'] = run_suite(server.nose_class, request)
+            except Exception as e:
+                outcome['error'] = e
+
+        thread = threading.Thread(target=target)
+        thread.daemon = True
+        thread.start()
+        thread.join(HEARTBEAT_INTERVAL)
+        while thread.is_alive():
+            send_message(self.request, {'type': 'heartbeat'})
+            thread.join(HEARTBEAT_INTERVAL)
+
+        if 'error' in outcome:
+            raise outcome['error']
+        result, files = outcome['result']
+        try:
+            send_message(self.request, result)
+            for _, path in files:
+                send_file(self.request, path)
+        finally:
+            for _, path in files:
+                os.unlink(path)
+
+    def handle(self):
+        server = self.server
+        authenticated = False
+        try:
+            while True:
+                try:
+                    request = receive_message(self.request)
+                except EOFError:
+                    return
+                if request.get('type') == 'hello':
+                    if not is_valid_token(request.get('token'),
+                                          server.token):
+                        self.reject('Invalid token')
+                    authenticated = True
+                    send_message(self.request, {
+                        'type': 'hello',
+                        'version': PROTOCOL_VERSION,
+                        'jobs': server.jobs,
+                    })
+                elif not authenticated:
+                    self.reject('Missing hello')
+                elif request.get('type') == 'run':
+                    if request.get('shell') and not server.shell:
+                        self.reject('Worker does not execute suites '
+                                    'via shell (see its --shell option)')
+                    self.run(request)
+                else:
+                    raise ProtocolError('Unexpected message {}'
+                                        ''.format(request.get('type')))
+        except CONNECTION_ERRORS as e:
+            print('Connection from {} failed: {}'
+                  ''.format(format_address(self.client_address), e),
+                  file=sys.stderr)
+
+
+class WorkerServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """
+    Worker which executes nosetests suites sent by coordinators
+
+    Every connection is served on its own thread however at most
+    ``jobs`` suites are executed at the same time.
+
+    Parameters
+    ----------
+    address : tuple
+        ``(host, port)`` to listen on. Port ``0`` picks any free port.
+    nose_class : type
+        Class used to create suites, usually ``NosetestsCall``
+    jobs : int
+        Maximum number of suites to execute at the same time
+    token : str
+        Token coordinators have to send in their ``hello``
+    shell : bool, optional
+        Whether suites can be executed via shell
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, nose_class, jobs=1, token=None, shell=False):
+        if not token:
+            raise ValueError('Worker requires a token')
+        self.nose_class = nose_class
+        self.jobs = jobs
+        self.token = token
+        self.shell = shell
+        self.slots = threading.BoundedSemaphore(jobs)
+        socketserver.TCPServer.__init__(self, address, WorkerHandler)
+
+
+def connect(address, token):
+    """
+    Connect to the worker and get the number of its jobs
+
+    Returns
+    -------
+    tuple
+        Tuple of ``(sock, jobs)``
+    """
+    sock = socket.create_connection(address, timeout=CONNECT_TIMEOUT)
+    try:
+        send_message(sock, {'type': 'hello',
+                            'version': PROTOCOL_VERSION,
+                            'token': token})
+        reply = receive_reply(sock, 'hello')
+        if reply.get('version') != PROTOCOL_VERSION:
+            raise ProtocolError('Worker speaks protocol version {} '
+                                'instead of {}'.format(reply.get('version'),
+                                                       PROTOCOL_VERSION))
+    except Exception:
+        sock.close()
+        raise
+    # workers send heartbeats so silence means the worker is stuck
+    sock.settimeout(READ_TIMEOUT)
+    return sock, reply['jobs']
+
+
+def connect_all(addresses, token, status=None):
+    """
+    Connect to all workers with one connection for every job
+
+    Workers which cannot be connected to are skipped.
+
+    Returns
+    -------
+    list
+        List of ``(address, sock)`` connections
+    """
+    connections = []
+    for address in addresses:
+        try:
+            sock, jobs = connect(address, token)
+            connections.append((address, sock))
+            for _ in range(jobs - 1):
+                connections.append((address, connect(address, token)[0]))
+        except CONNECTION_ERRORS as e:
+            if status:
+                status('Worker unavailable',
+                       '{}: {}'.format(format_address(address), e))
+    return connections
+
+
+def run_remote(nose_calls, tags, addresses, token, status=None):
+    """
+    Execute nosetests suites on remote workers
+
+    Suites are queued in the given order and every connection
+    to a worker takes the next suite from the queue as soon as its
+    previous suite finishes. Results of the suite (its xml report and
+    coverage data) are written into the files of the suite on the
+    coordinator so that suites are recorded exactly as when they
+    were executed locally (see ``NosetestsCall.after_run()``).
+
+    When a worker disconnects, rejects the suite or does not send
+    anything for ``READ_TIMEOUT`` seconds, its suite is put back into
+    the queue and is executed by any of the remaining workers.
+    Suites which could not be executed remotely because no workers
+    are left are not executed at all and their return code is ``None``.
+
+    Parameters
+    ----------
+    nose_calls : list
+        List of ``NosetestsCall`` class instances to be executed
+        in the given order
+    tags : list
+        Tag of every suite
+    addresses : list
+        ``(host, port)`` of every worker
+    token : str
+        Token shared with workers
+    status : callable, optional
+        Called with status and message about workers
+
+    Returns
+    -------
+    list
+        Return codes of all suites in the same order as ``nose_calls``
+    """
+    codes = [None] * len(nose_calls)
+    pending = queue.Queue()
+    for index in range(len(nose_calls)):
+        pending.put(index)
+    lock = threading.Lock()
+    remaining = [len(nose_calls)]
+    finished = threading.Event()
+    errors = []
+    if not nose_calls:
+        finished.set()
+
+    def execute(index, address, sock):
+        nose = nose_calls[index]
+        nose.before_run('{} {}'.format(tags[index], format_address(address)))
+        send_message(sock, {
+            'type': 'run',
+            'command': nose.command,
+            'shell': nose.shell,
+            'timeout': nose.timeout,
+        })
+        result = receive_reply(sock, 'result')
+
+        paths = {'xunit': nose.xunit_file, 'coverage': nose.coverage_file}
+        for name in result.get('files', []):
+            if name not in paths:
+                raise ProtocolError('Unexpected file {}'.format(name))
+            receive_file(sock, paths[name])
+        return nose.after_run(result['return_code'],
+                              usage=result.get('usage'),
+                              timed_out=result.get('timed_out', False))
+
+    def serve(address, sock):
+        try:
+            while not finished.is_set():
+                try:
+                    index = pending.get(timeout=IDLE_INTERVAL)
+                except queue.Empty:
+                    continue
+                try:
+                    code = execute(index, address, sock)
+                except CONNECTION_ERRORS as e:
+                    pending.put(index)
+                    if status:
+                        status('Worker disconnected',
+                               '{}: {}. Suite is re-queued.'
+                               ''.format(format_address(address), e))
+                    return
+                except Exception as e:
+                    errors.append(e)
+                    finished.set()
+                    return
+                with lock:
+                    codes[index] = code
+                    remaining[0] -= 1
+                    if not remaining[0]:
+                        finished.set()
+        finally:
+            sock.close()
+
+    threads = [
+        threading.Thread(target=serve, args=connection)
+        for connection in connect_all(addresses, token, status)
+    ]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+    return codes
@@ -0,0 +1,406 @@
+from __future__ import print_function, unicode_literals
+import io
+import math
+import os
+import threading
+import time
+from multiprocessing import cpu_count
+
+
+CGROUP_ROOT = '/sys/fs/cgroup'
+PROC_CGROUP = '/proc/self/cgroup'
+PROC_MEMINFO = '/proc/meminfo'
+# cgroup v1 reports unlimited memory as the largest page aligned number
+UNLIMITED_MEMORY = 1 << 60
+# new suites are not started while less than this fraction
+# of memory is available
+MEMORY_PRESSURE = 0.1
+# period in seconds of the load average which is compared
+# with the load caused by suites
+LOAD_PERIOD = 60.0
+# how often suites waiting for resources check them again
+RESOURCE_POLL_INTERVAL = 1.0
+
+
+def read_file(path):
+    """
+    Read the stripped content of the file
+
+    Returns
+    -------
+    str
+        Content of the file or ``None`` if it cannot be read
+    """
+    try:
+        with io.open(path, 'r') as fid:
+            return fid.read().strip()
+    except (IOError, OSError):
+        return None
+
+
+def read_stat(path, name):
+    """
+    Read the value of the key from ``key value`` formatted file
+    such as ``memory.stat`` or ``/proc/meminfo``
+    """
+    for line in (read_file(path) or '').splitlines():
+        parts = line.replace(':', ' ').split()
+        if len(parts) >= 2 and parts[0] == name:
+            try:
+                return int(parts[1])
+            except ValueError:
+                return None
+    return None
+
+
+def get_cgroups():
+    """
+    Get cgroups of the current process
+
+    Returns
+    -------
+    dict
+        Mapping of cgroup v1 controllers to their cgroup paths.
+        cgroup v2 path is stored under an empty controller.
+    """
+    cgroups = {}
+    for line in (read_file(PROC_CGROUP) or '').splitlines():
+        parts = line.split(':', 2)
+        if len(parts) != 3:
+            continue
+        for controller in parts[1].split(','):
+            cgroups[controller] = parts[2]
+    return cgroups
+
+
+def get_cgroup_file(name, controller=''):
+    """
+    Get the path of the cgroup file of the current process
+
+    Within containers cgroup of the process is usually mounted
+    as the cgroup root so the root is used when the path
+    of the cgroup does not exist.
+
+    Parameters
+    ----------
+    name : str
+        Name of the file such as ``memory.max``
+    controller : str, optional
+        cgroup v1 controller of the file. cgroup v2 when not given.
+
+    Returns
+    -------
+    str
+        Path of the file or ``None`` if the file does not exist
+    """
+    cgroups = get_cgroups()
+    if controller not in cgroups:
+        return None
+    root = os.path.join(CGROUP_ROOT, controller)
+    if (controller and not os.path.isdir(root) and
+            os.path.isdir(CGROUP_ROOT)):
+        # controllers are often co-mounted such as cpu,cpuacct
+        root = next((os.path.join(CGROUP_ROOT, i)
+                     for i in sorted(os.listdir(CGROUP_ROOT))
+                     if controller in i.split(',')), root)
+
+    for directory in (os.path.join(root, cgroups[controller].lstrip('/')),
+                      root):
+        path = os.path.join(directory, name)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def read_cgroup(v2_name, v1_controller, v1_name):
+    """
+    Read the cgroup file of the current process
+
+    cgroup v2 file is preferred over cgroup v1 file.
+    """
+    for name, controller in ((v2_name, ''), (v1_name, v1_controller)):
+        path = get_cgroup_file(name, controller)
+        if path:
+            return path, read_file(path)
+    return None, None
+
+
+def get_cpu_limit():
+    """
+    Get the number of CPUs the cgroup quota of the current process allows
+
+    Returns
+    -------
+    float
+        Number of CPUs or ``None`` if the CPU time is not limited
+    """
+    path, value = read_cgroup('cpu.max', 'cpu', 'cpu.cfs_quota_us')
+    if value is None:
+        return None
+    try:
+        if path.endswith('cpu.max'):
+            quota, period = value.split()[:2]
+        else:
+            quota = value
+            period = read_file(os.path.join(os.path.dirname(path),
+                                            'cpu.cfs_period_us'))
+        quota, period = int(quota), int(period)
+    except (TypeError, ValueError):
+        # cgroup v2 reports unlimited quota as "max"
+        return None
+    if quota <= 0 or period <= 0:
+        return None
+    return float(quota) / period
+
+
+def get_cpu_count():
+    """
+    Get the number of CPUs the current process can use
+
+    Unlike ``multiprocessing.cpu_count()`` CPU affinity
+    and cgroup CPU quota are taken into account.
+    """
+    counts = [cpu_count()]
+    if hasattr(os, 'sched_getaffinity'):
+        counts.append(len(os.sched_getaffinity(0)))
+    limit = get_cpu_limit()
+    if limit is not None:
+        counts.append(int(math.ceil(limit)))
+    return max(1, min(counts))
+
+
+def get_memory_limit():
+    """
+    Get cgroup memory limit of the current process in bytes
+
+    Returns
+    -------
+    int
+        Memory limit or ``None`` if memory is not limited
+    """
+    _, value = read_cgroup('memory.max', 'memory', 'memory.limit_in_bytes')
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        # cgroup v2 reports unlimited memory as "max"
+        return None
+    return limit if 0 < limit < UNLIMITED_MEMORY else None
+
+
+def get_memory_usage():
+    """
+    Get memory used by the cgroup of the current process in bytes
+
+    Inactive page cache is not counted since it
+    is reclaimed before processes are killed.
+
+    Returns
+    -------
+    int
+        Used memory or ``None`` if it is not known
+    """
+    path, value = read_cgroup('memory.current',
+                              'memory',
+                              'memory.usage_in_bytes')
+    try:
+        usage = int(value)
+    except (TypeError, ValueError):
+        return None
+    stat = os.path.join(os.path.dirname(path), 'memory.stat')
+    inactive = (read_stat(stat, 'inactive_file') or
+                read_stat(stat, 'total_inactive_file') or 0)
+    return max(0, usage - inactive)
+
+
+def get_total_memory():
+    """
+    Get total memory the current process can use in bytes
+
+    Returns
+    -------
+    int
+        Total memory or ``None`` if it is not known
+    """
+    values = [get_memory_limit()]
+    total = read_stat(PROC_MEMINFO, 'MemTotal')
+    if total is not None:
+        values.append(total * 1024)
+    values = [i for i in values if i is not None]
+    return min(values) if values else None
+
+
+def get_available_memory():
+    """
+    Get memory which is still available to the current process in bytes
+
+    Returns
+    -------
+    int
+        Available memory or ``None`` if it is not known
+    """
+    values = []
+    available = read_stat(PROC_MEMINFO, 'MemAvailable')
+    if available is not None:
+        values.append(available * 1024)
+    limit = get_memory_limit()
+    usage = get_memory_usage()
+    if limit is not None and usage is not None:
+        values.append(max(0, limit - usage))
+    return min(values) if values else None
+
+
+def get_load_average():
+    """
+    Get 1 minute load average of the machine
+
+    Returns
+    -------
+    float
+        Load average or ``None`` if it is not available
+    """
+    try:
+        return os.getloadavg()[0]
+    except (AttributeError, OSError):
+        return None
+
+
+class ResourceLimiter(object):
+    """
+    Limit how many nosetests suites run at the same time
+
+    Every suite has a ``weight`` (usually the number of CPUs it uses)
+    and optionally ``memory`` it is expected to use. Suites are started
+    as long as the total weight of running suites is within ``jobs``.
+    When ``adaptive``, suites are additionally held back when:
+
+    * the machine is loaded by other processes. Load caused by
+      suites is estimated the same way as the load average itself
+      (exponentially weighted total weight of running suites)
+      and the rest of the load reduces the number of jobs.
+    * less than ``MEMORY_PRESSURE`` of memory is available
+    * expected memory of the suite does not fit
+      into currently available memory or together with expected
+      memory of running suites into memory which was
+      available when the limiter was created.
+
+    A suite is always started when no other suite
+    is running so that all suites are eventually executed.
+
+    Parameters
+    ----------
+    jobs : float
+        Maximum total weight of suites running at the same time
+    adaptive : bool, optional
+        Whether to adapt to load and memory of the machine
+    """
+
+    def __init__(self, jobs, adaptive=True):
+        self.jobs = jobs
+        self.adaptive = adaptive
+        self.weight = 0.0
+        self.memory = 0
+        self.running = 0
+        self.own_load = 0.0
+        self.memory_total = None
+        self.memory_budget = None
+        if adaptive:
+            self.memory_total = get_total_memory()
+            self.memory_budget = get_available_memory()
+        self.condition = threading.Condition()
+        self._updated = time.time()
+
+    def update_own_load(self):
+        """
+        Update the estimated load caused by running suites
+        """
+        now = time.time()
+        decay = math.exp(-(now - self._updated) / LOAD_PERIOD)
+        self.own_load = self.own_load * decay + self.weight * (1 - decay)
+        self._updated = now
+
+    def get_capacity(self):
+        """
+        Get the maximum total weight of suites
+        which can currently run at the same time
+        """
+        if not self.adaptive:
+            return self.jobs
+        load = get_load_average()
+        if load is None:
+            return self.jobs
+        self.update_own_load()
+        external = max(0.0, load - self.own_load)
+        return max(1.0, self.jobs - round(external))
+
+    def is_under_pressure(self):
+        """
+        Whether less than ``MEMORY_PRESSURE`` of memory is available
+        """
+        available = get_available_memory()
+        if available is None or not self.memory_total:
+            return False
+        return available < self.memory_total * MEMORY_PRESSURE
+
+    def can_start(self, weight, memory=None):
+        """
+        Whether a suite with the weight and expected memory can be started
+        """
+        if not self.running:
+            return True
+        if self.weight + weight > self.get_capacity():
+            return False
+        if not self.adaptive:
+            return True
+        if self.is_under_pressure():
+            return False
+        if memory:
+            if (self.memory_budget is not None and
+                    self.memory + memory > self.memory_budget):
+                return False
+            available = get_available_memory()
+            if available is not None and memory > available:
+                return False
+        return True
+
+    def _start(self, weight, memory):
+        self.update_own_load()
+        self.weight += weight
+        self.memory += memory or 0
+        self.running += 1
+
+    def try_acquire(self, weight, memory=None):
+        """
+        Reserve resources for a suite if it can be started
+
+        Returns
+        -------
+        bool
+            Whether the suite can be started
+        """
+        with self.condition:
+            if not self.can_start(weight, memory):
+                return False
+            self._start(weight, memory)
+            return True
+
+    def acquire(self, weight, memory=None):
+        """
+        Wait until a suite can be started and reserve resources for it
+        """
+        with self.condition:
+            while not self.can_start(weight, memory):
+                # resources are checked periodically since load
+                # and memory can change without any suite finishing
+                self.condition.wait(RESOURCE_POLL_INTERVAL)
+            self._start(weight, memory)
+
+    def release(self, weight, memory=None):
+        """
+        Release resources of the finished suite
+        """
+        with self.condition:
+            self.update_own_load()
+            self.weight -= weight
+            self.memory -= memory or 0
+            self.running -= 1
+            self.condition.notify_all()
@@ -0,0 +1,120 @@
+from __future__ import print_function, unicode_literals
+import io
+import json
+import struct
+from xml.etree.ElementTree import Element, SubElement
+
+import six
+
+
+# environment variable with the path where records
+# of finished tests of the suite are appended
+RESULTS_ENV = 'MULTINOSETESTS_RESULTS'
+# every record is prefixed by its length as 4 byte unsigned integer
+HEADER = struct.Struct(str('>I'))
+CHUNK_SIZE = 64 * 1024
+
+
+def encode_record(record):
+    """
+    Encode the record into its length prefixed binary form
+
+    Parameters
+    ----------
+    record : dict
+        Result of a single test with ``classname``, ``name``
+        and ``time`` of the test and ``outcome`` which is either
+        ``None`` for successful tests or the tag of the xunit element
+        of the outcome (``error``, ``failure`` or ``skipped``)
+        together with exception ``type``, ``message`` and ``traceback``
+    """
+    data = json.dumps(record, separators=(',', ':')).encode('utf-8')
+    return HEADER.pack(len(data)) + data
+
+
+class RecordDecoder(object):
+    """
+    Incrementally decode length prefixed records
+
+    Data can be fed in chunks of any size such as when it is read
+    from a file which is still being written. Incomplete records
+    are kept until the rest of their data is fed. Decoded data is
+    only dropped from the buffer once it makes up most of the buffer
+    so that decoding stays linear in the size of the data.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.offset = 0
+
+    def feed(self, data):
+        """
+        Feed more data into the decoder
+
+        Returns
+        -------
+        list
+            Records which were completed by the data
+        """
+        self.buffer += data
+        records = []
+        while len(self.buffer) - self.offset >= HEADER.size:
+            length, = HEADER.unpack_from(self.buffer, self.offset)
+            start = self.offset + HEADER.size
+            if len(self.buffer) < start + length:
+                break
+            records.append(json.loads(
+                self.buffer[start:start + length].decode('utf-8')
+            ))
+            self.offset = start + length
+
+        if self.offset * 2 >= len(self.buffer):
+            del self.buffer[:self.offset]
+            self.offset = 0
+        return records
+
+
+def read_records(path):
+    """
+    Iterate over all complete records of the file
+
+    Records are decoded while the file is read so that
+    records of the whole file are never kept in memory.
+    Record truncated by a crashing suite is ignored and
+    file which does not exist has no records.
+    """
+    decoder = RecordDecoder()
+    try:
+        fid = io.open(path, 'rb')
+    except (IOError, OSError):
+        return
+    with fid:
+        for chunk in iter(lambda: fid.read(CHUNK_SIZE), b''):
+            for record in decoder.feed(chunk):
+                yield record
+
+
+def record_to_testcase(record):
+    """
+    Convert the record into the same testcase element
+    as the one nose writes into xunit reports
+    """
+    testcase = Element('testcase', {
+        'classname': record['classname'],
+        'name': record['name'],
+        'time': '{:.3f}'.format(record.get('time') or 0.0),
+    })
+    if record.get('outcome'):
+        outcome = SubElement(testcase, record['outcome'], {
+            'type': record.get('type') or '',
+            'message': record.get('message') or '',
+        })
+        outcome.text = record.get('traceback') or None
+    return testcase
+
+
+def iter_record_testcases(path):
+    """
+    Iterate over testcase elements of all records in the file
+    """
+    return six.moves.map(record_to_testcase, read_records(path))
@@ -0,0 +1,393 @@
+from __future__ import print_function, unicode_literals
+import functools
+import os
+import sys
+from subprocess import PIPE
+
+from .process import POLL_INTERVAL, TERMINATE_GRACE_PERIOD
+from .resources import RESOURCE_POLL_INTERVAL, ResourceLimiter
+
+try:
+    import asyncio
+except ImportError:  # pragma: no cover - Python 2
+    asyncio = None
+
+
+THREADS_ENGINE = 'threads'
+ASYNCIO_ENGINE = 'asyncio'
+RUN_ENGINES = {THREADS_ENGINE}
+if asyncio is not None:
+    RUN_ENGINES.add(ASYNCIO_ENGINE)
+DEFAULT_RUN_ENGINE = ASYNCIO_ENGINE if asyncio is not None else THREADS_ENGINE
+
+STDOUT = 1
+STDERR = 2
+# return code of shells when the command cannot be executed
+COMMAND_NOT_FOUND = 127
+# how long output left in pipes of the reaped suite is read before
+# its pipes are closed since its children might still hold them
+OUTPUT_GRACE_PERIOD = 1.0
+
+
+def get_binary_stream(stream):
+    """
+    Get the binary stream underlying the text stream if there is one
+    """
+    return getattr(stream, 'buffer', stream)
+
+
+def write_lines(stream, tag, lines):
+    """
+    Write lines to the stream with every line prefixed by the tag
+    """
+    # anything printed as text has to be written first
+    stream.flush()
+    binary = get_binary_stream(stream)
+    binary.write(b''.join(tag + i + b'\n' for i in lines))
+    binary.flush()
+
+
+class PrefixedOutputProtocol(object):
+    """
+    Pipe protocol which writes output of the nosetests
+    suite line by line with every line prefixed by the suite tag
+
+    Output is read from a non-blocking pipe by the event loop and
+    only complete lines are written so that lines of suites
+    running at the same time are never interleaved.
+    Partial line is kept until it is completed or
+    until the pipe is closed.
+
+    Parameters
+    ----------
+    tag : bytes
+        Prefix of every line of the suite output
+    stream : file
+        Stream where output is written
+    closed : asyncio.Future
+        Future which is resolved once the pipe is closed
+        and all of its output was written
+    """
+
+    def __init__(self, tag, stream, closed):
+        self.tag = tag
+        self.stream = stream
+        self.closed = closed
+        self.partial = b''
+
+    def connection_made(self, transport):
+        pass
+
+    def data_received(self, data):
+        lines = (self.partial + data).split(b'\n')
+        self.partial = lines.pop()
+        if lines:
+            write_lines(self.stream, self.tag, lines)
+
+    def eof_received(self):
+        pass
+
+    def connection_lost(self, exc):
+        if self.partial:
+            write_lines(self.stream, self.tag, [self.partial])
+            self.partial = b''
+        if not self.closed.done():
+            self.closed.set_result(None)
+
+
+def watch_process(loop, process, timeout=None):
+    """
+    Wait for the suite process to exit without blocking the event loop
+
+    Process is reaped as soon as its exit file descriptor
+    (e.g. pid file descriptor) becomes readable or,
+    where such descriptors are not supported,
+    by polling it every ``POLL_INTERVAL`` seconds.
+    When the process exceeds its ``timeout``, it is terminated and
+    killed if it does not exit within ``TERMINATE_GRACE_PERIOD``.
+
+    Returns
+    -------
+    asyncio.Future
+        Future resolved with the process once it is reaped
+    """
+    reaped = loop.create_future()
+    pidfd = process.open_exit_fd()
+    handles = []
+
+    def on_timeout():
+        process.terminate()
+        handles.append(
+            loop.call_later(TERMINATE_GRACE_PERIOD, process.kill)
+        )
+
+    def check():
+        if process.poll() is None:
+            if pidfd is None:
+                handles.append(loop.call_later(POLL_INTERVAL, check))
+            return
+        if pidfd is not None:
+            loop.remove_reader(pidfd)
+            os.close(pidfd)
+        for handle in handles:
+            handle.cancel()
+        reaped.set_result(process)
+
+    if timeout is not None:
+        handles.append(loop.call_later(timeout, on_timeout))
+    if pidfd is not None:
+        loop.add_reader(pidfd, check)
+    else:
+        handles.append(loop.call_later(POLL_INTERVAL, check))
+    return reaped
+
+
+def watch_suite(loop, process, timeout, tag, streams):
+    """
+    Watch the output and the exit of the suite process
+
+    Once the suite is reaped, its remaining output is read for at
+    most ``OUTPUT_GRACE_PERIOD`` seconds after which its pipes are
+    closed so that the suite does not wait for its children
+    (e.g. daemons started by tests) which inherited its pipes.
+
+    Returns
+    -------
+    asyncio.Future
+        Future resolved with the process once it is reaped
+        and all of its output was written
+    """
+    done = loop.create_future()
+    transports = []
+    closed = []
+    for fd, pipe in ((STDOUT, process.stdout),
+                     (STDERR, process.stderr)):
+        future = loop.create_future()
+        closed.append(future)
+        task = loop.create_task(loop.connect_read_pipe(
+            functools.partial(PrefixedOutputProtocol,
+                              tag,
+                              streams[fd],
+                              future),
+            pipe,
+        ))
+        task.add_done_callback(
+            lambda task: transports.append(task.result()[0])
+        )
+
+    def close():
+        for transport in transports:
+            transport.close()
+
+    def reaped(future):
+        if process.timed_out:
+            # children of the killed suite might still hold its pipes
+            close()
+            handle = None
+        else:
+            handle = loop.call_later(OUTPUT_GRACE_PERIOD, close)
+        asyncio.gather(*closed).add_done_callback(
+            functools.partial(finished, handle)
+        )
+
+    def finished(handle, future):
+        if handle is not None:
+            handle.cancel()
+        if not done.done():
+            done.set_result(process)
+
+    watch_process(loop, process, timeout).add_done_callback(reaped)
+    return done
+
+
+def stop_suites(loop, suites):
+    """
+    Terminate suites which are still running and wait
+    until they are reaped and their pipes are closed
+
+    Suites which do not exit within ``TERMINATE_GRACE_PERIOD``
+    are killed.
+
+    Parameters
+    ----------
+    suites : dict
+        Mapping of started suite processes to futures
+        returned by ``watch_suite()``
+    """
+    running = {process: suite
+               for process, suite in suites.items()
+               if not suite.done()}
+    if not running:
+        return
+    for process in running:
+        process.terminate()
+    loop.run_until_complete(asyncio.wait(list(running.values()),
+                                         timeout=TERMINATE_GRACE_PERIOD))
+    for process, suite in running.items():
+        if not suite.done():
+            process.kill()
+    loop.run_until_complete(asyncio.wait(list(running.values())))
+
+
+def supervise(loop, nose_calls, tags, limiter, streams, suites=None):
+    """
+    Start all nosetests suites as long as the limiter
+    has resources for them
+
+    Suites are started in the given order except when the next
+    suite does not fit into the available resources in which
+    case the first following suite which fits is started.
+    Every time a suite finishes, resources are checked again
+    and they are also checked periodically while suites
+    are waiting since load and memory of the machine
+    can change without any suite finishing.
+
+    Started suites are added to ``suites`` as a mapping of their
+    processes to futures returned by ``watch_suite()`` so that they
+    can be stopped when supervising them fails (see ``stop_suites()``).
+
+    Returns
+    -------
+    asyncio.Future
+        Future resolved with return codes of all suites
+        in the same order as ``nose_calls``
+    """
+    done = loop.create_future()
+    suites = {} if suites is None else suites
+    codes = [None] * len(nose_calls)
+    pending = list(enumerate(nose_calls))
+    running = set()
+    retry = []
+
+    def start_next():
+        for position, (index, nose) in enumerate(pending):
+            if limiter.try_acquire(nose.weight, nose.memory):
+                del pending[position]
+                break
+        else:
+            if pending and not retry:
+                retry.append(loop.call_later(RESOURCE_POLL_INTERVAL,
+                                             start_waiting))
+            if not running and not done.done():
+                for handle in retry:
+                    handle.cancel()
+                done.set_result(codes)
+            return False
+
+        running.add(index)
+        command = nose.before_run(tags[index])
+        tag = (tags[index] + ' ').encode('utf-8')
+        try:
+            process = nose.start_process(stdout=PIPE, stderr=PIPE)
+        except OSError as e:
+            # same as when the shell cannot find the command
+            write_lines(streams[STDERR], tag, [
+                'Failed to execute {}: {}'.format(command, e)
+                .encode('utf-8')
+            ])
+            suite = loop.create_future()
+            suite.set_result(None)
+        else:
+            suite = watch_suite(loop, process, nose.timeout, tag, streams)
+            suites[process] = suite
+        suite.add_done_callback(functools.partial(finished, index))
+        return True
+
+    def start_waiting():
+        del retry[:]
+        if not done.done():
+            start()
+
+    def finished(index, suite):
+        if done.done():
+            return
+        try:
+            process = suite.result()
+            nose = nose_calls[index]
+            limiter.release(nose.weight, nose.memory)
+            if process is None:
+                codes[index] = nose.after_run(COMMAND_NOT_FOUND)
+            else:
+                codes[index] = nose.after_run(process.return_code,
+                                              usage=process.usage,
+                                              timed_out=process.timed_out)
+            running.discard(index)
+            start()
+        except Exception as e:
+            done.set_exception(e)
+
+    def start():
+        try:
+            while start_next():
+                pass
+        except Exception as e:
+            if not done.done():
+                done.set_exception(e)
+
+    loop.call_soon(start)
+    return done
+
+
+def run_async(nose_calls,
+              tags,
+              jobs=1,
+              stdout=None,
+              stderr=None,
+              limiter=None):
+    """
+    Execute nosetests suites as children of a single asyncio event loop
+
+    Unlike running each suite on its own thread, a single event loop
+    reads output of all suites from non-blocking pipes and writes it
+    line by line with every line prefixed by the tag of its suite
+    so that output of suites running at the same time
+    can be told apart. The same loop reaps the suites
+    and enforces their timeouts.
+
+    Suites are executed directly from their arguments unless
+    they are marked to be executed via shell.
+    Suites which cannot be executed return ``127``
+    same as when the shell cannot find the command.
+    When executing suites fails (e.g. their results cannot be
+    processed), suites which are still running are stopped.
+
+    Parameters
+    ----------
+    nose_calls : list
+        List of ``NosetestsCall`` class instances to be executed
+        in the given order
+    tags : list
+        Output prefix of every suite
+    jobs : int
+        Maximum number of nosetests suites to execute at the same time
+    stdout, stderr : file, optional
+        Streams where output of suites is written.
+        Default to ``sys.stdout`` and ``sys.stderr``.
+    limiter : multinosetests.resources.ResourceLimiter, optional
+        Limiter which decides when suites can be started
+        by their weights and expected memory.
+        By default at most ``jobs`` suites run at the same time.
+
+    Returns
+    -------
+    list
+        Return codes of all suites in the same order as ``nose_calls``
+    """
+    streams = {
+        STDOUT: stdout or sys.stdout,
+        STDERR: stderr or sys.stderr,
+    }
+    if limiter is None:
+        limiter = ResourceLimiter(jobs, adaptive=False)
+    loop = asyncio.new_event_loop()
+    suites = {}
+    try:
+        return loop.run_until_complete(
+            supervise(loop, nose_calls, tags, limiter, streams, suites)
+        )
+    finally:
+        # suites are still running when supervising them failed
+        try:
+            stop_suites(loop, suites)
+        finally:
+            loop.close()
@@ -0,0 +1,218 @@
+from __future__ import print_function, unicode_literals
+import heapq
+import io
+import json
+import os
+
+from .xunit import get_testcase_id
+
+
+class TimingCache(object):
+    """
+    Local history of how long each nosetests suite took to execute
+
+    Timings are stored as a json file and are keyed by
+    the nosetests command so that the same suite
+    can be recognized between ``multinosetests`` runs.
+
+    Parameters
+    ----------
+    path : str
+        Path of the json file where timings are stored
+
+    Attributes
+    ----------
+    suites : dict
+        Mapping of nosetests commands to their last wall time in seconds
+    tests : dict
+        Mapping of test ids to their last duration in seconds
+        as reported in xunit reports
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.suites = {}
+        self.tests = {}
+
+    def load(self):
+        """
+        Load the timings from the file-system
+
+        Missing or corrupt timing files are ignored since the
+        timings are only used as a scheduling hint.
+        """
+        try:
+            with io.open(self.path, 'r', encoding='utf-8') as fid:
+                data = json.load(fid)
+        except (IOError, OSError, ValueError):
+            return self
+        self.suites = data.get('suites', {})
+        self.tests = data.get('tests', {})
+        return self
+
+    def save(self):
+        """
+        Save the timings to the file-system
+
+        Timings are first written to a temporary file which
+        is then renamed so that concurrent ``multinosetests``
+        runs never see partially written timings.
+        """
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        tmp = '{}.{}.tmp'.format(self.path, os.getpid())
+        with io.open(tmp, 'wb') as fid:
+            fid.write(json.dumps(
+                {'suites': self.suites, 'tests': self.tests},
+                indent=2,
+                sort_keys=True,
+            ).encode('utf-8'))
+        os.rename(tmp, self.path)
+
+    def record(self, command, duration):
+        """
+        Record the wall time of the nosetests command
+        """
+        if duration is not None:
+            self.suites[command] = duration
+
+    def record_test(self, test_id, duration):
+        """
+        Record the duration of a single test
+        """
+        self.tests[test_id] = duration
+
+    def record_testcase(self, testcase):
+        """
+        Record the duration of a single xunit report testcase element
+        """
+        self.record_test(get_testcase_id(testcase),
+                         float(testcase.get('time') or 0))
+
+    def estimate(self, commands):
+        """
+        Estimate how long each of the given nosetests commands will take
+
+        Commands without any history are estimated as the average
+        of all known commands so that they are neither always
+        started first nor always started last.
+
+        Returns
+        -------
+        list
+            Estimated durations in seconds in the same order as ``commands``
+        """
+        return estimate_durations(self.suites, commands)
+
+    def estimate_tests(self, test_ids):
+        """
+        Estimate how long each of the given tests will take
+
+        Same as ``estimate()`` except for individual tests.
+        """
+        return estimate_durations(self.tests, test_ids)
+
+
+def estimate_durations(history, keys):
+    """
+    Estimate durations of the keys from their history
+
+    Keys without history are estimated as the average of all known keys.
+    """
+    known = [history[i] for i in keys if i in history]
+    default = sum(known) / len(known) if known else 0.0
+    return [history.get(i, default) for i in keys]
+
+
+def longest_first(durations):
+    """
+    Get the indexes of the durations ordered longest-processing-time-first
+
+    Items with equal durations keep their original relative order.
+    """
+    return sorted(range(len(durations)), key=lambda i: -durations[i])
+
+
+def assign_longest_first(durations, bins):
+    """
+    Assign items to bins longest-processing-time-first
+
+    Each item, starting with the longest, is assigned to the bin
+    with the smallest total duration so far. Bins with equal
+    durations are filled evenly so that items without any known
+    duration are still spread across all bins.
+
+    Returns
+    -------
+    tuple
+        Tuple of ``(assigned, loads)`` where ``assigned`` is a list
+        with a list of item indexes assigned to each bin and
+        ``loads`` is a list of total durations of each bin
+    """
+    bins = max(1, min(bins, len(durations)))
+    assigned = [[] for _ in range(bins)]
+    # heap of (total duration of the bin, number of items, bin index)
+    heap = [(0.0, 0, i) for i in range(bins)]
+
+    for index in longest_first(durations):
+        load, count, i = heapq.heappop(heap)
+        assigned[i].append(index)
+        heapq.heappush(heap, (load + durations[index], count + 1, i))
+
+    loads = [0.0] * bins
+    for load, _, i in heap:
+        loads[i] = load
+    return assigned, loads
+
+
+def plan_schedule(durations, jobs):
+    """
+    Simulate the longest-processing-time-first schedule of
+    the durations across ``jobs`` workers
+
+    This simulates exactly how the worker pool will pick up items:
+    items are started in longest-first order and each item is started
+    on whichever worker becomes available first.
+
+    Parameters
+    ----------
+    durations : list
+        Estimated durations of all items in seconds
+    jobs : int
+        Number of workers
+
+    Returns
+    -------
+    tuple
+        Tuple of ``(workers, makespan)`` where ``workers`` is a list
+        with a list of item indexes assigned to each worker and
+        ``makespan`` is the estimated wall time of the whole schedule
+    """
+    # worker which becomes available first is the one
+    # with the smallest total duration of its suites
+    workers, loads = assign_longest_first(durations, jobs)
+    return workers, max(loads)
+
+
+def pack_shards(durations, count):
+    """
+    Bin-pack items into at most ``count`` shards with
+    roughly equal total durations
+
+    Parameters
+    ----------
+    durations : list
+        Estimated durations of all items in seconds
+    count : int
+        Maximum number of shards
+
+    Returns
+    -------
+    list
+        List of shards where each shard is a list of item indexes.
+        Items within a shard keep their original relative order.
+    """
+    shards, _ = assign_longest_first(durations, count)
+    return [sorted(i) for i in shards if i]
@@ -0,0 +1,117 @@
+from __future__ import print_function, unicode_literals
+import os
+import time
+
+from .cache import is_within, iter_files
+
+
+# how often sources are polled for changes in seconds
+WATCH_INTERVAL = 1.0
+# changes are reported only once files stop changing for this long
+# so that saving multiple files at once triggers a single run
+SETTLE_INTERVAL = 0.2
+
+
+def take_snapshot(paths, ignore=()):
+    """
+    Get modification times and sizes of all files within the paths
+
+    Parameters
+    ----------
+    paths : list
+        Absolute paths of files and directories
+    ignore : list
+        Absolute paths of files and directories which are not included
+        such as reports written by multinosetests itself
+
+    Returns
+    -------
+    dict
+        Mapping of absolute paths of files to their
+        ``(modification time, size)`` tuples
+    """
+    snapshot = {}
+    for path in iter_files(paths, ignore):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            # file was removed while walking the directory
+            continue
+        snapshot[path] = (stat.st_mtime, stat.st_size)
+    return snapshot
+
+
+def get_changed_files(before, after):
+    """
+    Get files which were added, removed or modified between snapshots
+    """
+    return set(i for i in set(before) | set(after)
+               if before.get(i) != after.get(i))
+
+
+class SourceWatcher(object):
+    """
+    Watch sources of nosetests suites for changes
+
+    Sources are snapshotted when the watcher is created
+    so that changes made while suites are running
+    are reported by the next ``wait()``.
+
+    Parameters
+    ----------
+    sources : list
+        Source paths of every suite
+        (see ``multinosetests.cache.get_source_paths()``)
+    interval : float, optional
+        How often sources are polled in seconds
+    ignore : list, optional
+        Paths of files and directories whose changes are ignored
+    """
+
+    def __init__(self, sources, interval=WATCH_INTERVAL, ignore=()):
+        self.sources = [[os.path.abspath(i) for i in paths]
+                        for paths in sources]
+        self.paths = sorted(set(i for paths in self.sources for i in paths))
+        self.interval = interval
+        self.ignore = [os.path.abspath(i) for i in ignore]
+        self.snapshot = take_snapshot(self.paths, self.ignore)
+
+    def poll(self):
+        """
+        Get files which changed since the last poll
+        """
+        snapshot = take_snapshot(self.paths, self.ignore)
+        changed = get_changed_files(self.snapshot, snapshot)
+        self.snapshot = snapshot
+        return changed
+
+    def wait(self):
+        """
+        Wait until any of the sources changes
+
+        Returns
+        -------
+        set
+            Absolute paths of changed files
+        """
+        changed = self.poll()
+        while not changed:
+            time.sleep(self.interval)
+            changed = self.poll()
+
+        while True:
+            time.sleep(min(self.interval, SETTLE_INTERVAL))
+            settling = self.poll()
+            if not settling:
+                return changed
+            changed |= settling
+
+    def get_changed_suites(self, changed_files):
+        """
+        Get indexes of suites whose sources contain any of the changed files
+        """
+        return [index
+                for index, paths in enumerate(self.sources)
+                if any(is_within(i, path)
+                       for i in changed_files
+                       for path in paths)]
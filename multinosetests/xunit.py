@@ -0,0 +1,452 @@
+from __future__ import print_function, unicode_literals
+import gzip
+import os
+import re
+import shutil
+import tempfile
+from xml.etree.ElementTree import iterparse, tostring
+from xml.sax.saxutils import escape, quoteattr
+
+import six
+from xunitmerge import merge_xunit
+
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+TESTCASE_TAG = 'testcase'
+# testcase children with captured output of the test
+OUTPUT_TAGS = ('system-out', 'system-err')
+TRUNCATED_OUTPUT = '\n[{} characters truncated by multinosetests]'
+# maps supported compressions to extensions of compressed reports
+COMPRESSIONS = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+GZIP_LEVEL = 6
+# complete reports end with the closing tag of the testsuite
+# or with an empty testsuite element
+REPORT_END_RE = re.compile(br'(</testsuite>|<testsuite\b[^<>]*/>)\s*$')
+REPORT_TAIL_SIZE = 1024
+CHUNK_SIZE = 64 * 1024
+# maps testcase children tags to the testsuite attribute
+# which counts testcases with that outcome
+OUTCOME_ATTRIBUTES = {
+    'error': 'errors',
+    'failure': 'failures',
+    'skipped': 'skip',
+}
+TESTSUITE_ATTRIBUTES = ('tests', 'errors', 'failures', 'skip')
+
+
+def is_compression_available(compression):
+    """
+    Check whether reports can be compressed with the given compression
+
+    ``zstd`` compression requires optional ``zstandard`` package.
+    """
+    if compression == 'zstd':
+        return zstandard is not None
+    return compression in COMPRESSIONS
+
+
+def get_compression(fid):
+    """
+    Get the compression of the opened report from its magic bytes
+
+    Returns
+    -------
+    str
+        Name of the compression from ``COMPRESSIONS``
+        or ``None`` when the report is not compressed
+    """
+    magic = fid.read(len(ZSTD_MAGIC))
+    fid.seek(0)
+    if magic.startswith(GZIP_MAGIC):
+        return 'gzip'
+    if magic == ZSTD_MAGIC:
+        return 'zstd'
+    return None
+
+
+def open_report(path):
+    """
+    Open the xunit report for reading
+
+    Reports compressed by gzip or zstd are recognized
+    by their magic bytes and are decompressed transparently
+    while they are read.
+
+    Returns
+    -------
+    file
+        Binary file-like object with the uncompressed report
+    """
+    fid = open(path, 'rb')
+    compression = get_compression(fid)
+
+    if compression == 'gzip':
+        fid.close()
+        return gzip.open(path, 'rb')
+
+    if compression == 'zstd':
+        if zstandard is None:
+            fid.close()
+            raise IOError('zstandard package is required to read {}'
+                          ''.format(path))
+        return zstandard.ZstdDecompressor().stream_reader(fid)
+
+    return fid
+
+
+def open_output(path, compression=None):
+    """
+    Open the file where the xunit report will be written
+
+    Parameters
+    ----------
+    path : str
+        Path of the report
+    compression : str, optional
+        Name of the compression from ``COMPRESSIONS``
+        with which the report is compressed while it is written
+
+    Returns
+    -------
+    file
+        Binary file-like object
+    """
+    if compression == 'gzip':
+        return gzip.open(path, 'wb', compresslevel=GZIP_LEVEL)
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor().stream_writer(open(path, 'wb'))
+    return open(path, 'wb')
+
+
+def truncate_output(testcase, limit):
+    """
+    Truncate captured output of the testcase element to
+    at most ``limit`` characters per output element
+
+    Truncated output ends with a note how many
+    characters were removed.
+    """
+    for child in testcase:
+        if child.tag not in OUTPUT_TAGS or not child.text:
+            continue
+        extra = len(child.text) - limit
+        if extra > 0:
+            child.text = (child.text[:limit] +
+                          TRUNCATED_OUTPUT.format(extra))
+
+
+def iter_testcases(path):
+    """
+    Iterate over all testcase elements of the xunit report
+    without loading the whole report into memory
+
+    Every yielded element is fully parsed (including all of its
+    children such as ``<system-out>``) however as soon as the
+    consumer requests the next element, the previous one is
+    discarded. This keeps memory usage proportional to the size
+    of a single testcase rather than to the size of the report.
+
+    Parameters
+    ----------
+    path : str
+        Path of the xunit xml report which can be
+        compressed (see ``open_report()``)
+    """
+    # stack of currently open elements which allows to detach
+    # processed testcases from their parent which otherwise
+    # would keep accumulating empty testcase elements
+    stack = []
+    with open_report(path) as fid:
+        for event, elem in iterparse(fid, events=(str('start'),
+                                                  str('end'))):
+            if event == 'start':
+                stack.append(elem)
+                continue
+
+            stack.pop()
+            if elem.tag != TESTCASE_TAG:
+                continue
+
+            yield elem
+
+            if stack:
+                stack[-1].remove(elem)
+            elem.clear()
+
+
+def get_testcase_outcome(testcase):
+    """
+    Get the testsuite attribute which counts the outcome of the testcase
+
+    Returns ``None`` for successful testcases.
+    """
+    for child in testcase:
+        if child.tag in OUTCOME_ATTRIBUTES:
+            return OUTCOME_ATTRIBUTES[child.tag]
+    return None
+
+
+def get_testcase_id(testcase):
+    """
+    Get the dotted id of the testcase as reported by nosetests
+    (e.g. ``package.module.Class.test_method``)
+    """
+    return '.'.join(filter(None, [testcase.get('classname'),
+                                  testcase.get('name')]))
+
+
+def read_tail(path, size=REPORT_TAIL_SIZE):
+    """
+    Read at most ``size`` last bytes of the uncompressed report
+
+    Compressed reports cannot be read from their end
+    so they are decompressed up to the end without being parsed.
+    """
+    with open(path, 'rb') as fid:
+        if get_compression(fid) is None:
+            fid.seek(0, os.SEEK_END)
+            fid.seek(max(fid.tell() - size, 0))
+            return fid.read()
+
+    tail = b''
+    with open_report(path) as fid:
+        for chunk in iter(lambda: fid.read(CHUNK_SIZE), b''):
+            tail = (tail + chunk)[-size:]
+    return tail
+
+
+def is_valid_report(path):
+    """
+    Check whether the xunit report exists and was completely written
+
+    Reports of suites which crashed or were killed might be
+    missing or only partially written. Only the end of the report
+    is checked so that reports are not parsed twice. Reports which
+    are complete yet cannot be parsed fail when they are merged.
+    """
+    try:
+        tail = read_tail(path)
+    except (IOError, OSError, EOFError):
+        return False
+    return REPORT_END_RE.search(tail) is not None
+
+
+def write_error_report(path, classname, name, error_type, message, time=0.0):
+    """
+    Write xunit report with a single errored testcase
+
+    Used in place of the report of a suite which did not
+    write its own report so that the suite is still reported
+    as failed and all reports can be merged.
+    """
+    testcase = (
+        '<testcase classname={classname} name={name} time={time}>'
+        '<error type={type} message={message}>{text}</error>'
+        '</testcase>'
+    ).format(
+        classname=quoteattr(classname),
+        name=quoteattr(name),
+        time=quoteattr('{:.3f}'.format(time or 0.0)),
+        type=quoteattr(error_type),
+        message=quoteattr(message),
+        text=escape(message),
+    )
+    with open(path, 'wb') as fid:
+        fid.write(b'<?xml version="1.0" encoding="UTF-8"?>\n')
+        fid.write('<testsuite name="nosetests" tests="1" errors="1" '
+                  'failures="0" skip="0">\n{}\n</testsuite>\n'
+                  ''.format(testcase).encode('utf-8'))
+
+
+def write_testcases(testcases, output, compression=None):
+    """
+    Write the given testcase elements into a single xunit xml report
+
+    The testsuite attributes (``tests``, ``errors``, etc)
+    are computed from the testcases themselves while they are written.
+    Since the testsuite attributes have to be written before the testcases,
+    testcases are spooled into a temporary file which is then
+    copied in chunks to the output file.
+
+    Parameters
+    ----------
+    testcases : iterable
+        Testcase elements
+    output : str
+        Path where the xunit report will be written
+    compression : str, optional
+        Name of the compression from ``COMPRESSIONS``
+        with which the report is written
+
+    Returns
+    -------
+    dict
+        Computed testsuite attributes of the written report
+    """
+    counts = {i: 0 for i in TESTSUITE_ATTRIBUTES}
+
+    with tempfile.TemporaryFile() as body:
+        for testcase in testcases:
+            counts['tests'] += 1
+            outcome = get_testcase_outcome(testcase)
+            if outcome:
+                counts[outcome] += 1
+
+            testcase.tail = None
+            body.write(tostring(testcase, encoding=str('utf-8')))
+            body.write(b'\n')
+
+        body.seek(0)
+
+        attributes = ' '.join(
+            '{}={}'.format(key, quoteattr(six.text_type(counts[key])))
+            for key in TESTSUITE_ATTRIBUTES
+        )
+        with open_output(output, compression) as fid:
+            fid.write(b'<?xml version="1.0" encoding="UTF-8"?>\n')
+            fid.write('<testsuite name="nosetests" {}>\n'
+                      ''.format(attributes).encode('utf-8'))
+            shutil.copyfileobj(body, fid)
+            fid.write(b'</testsuite>\n')
+
+    return counts
+
+
+def merge_xunit_stream(files, output, callback=None, compression=None):
+    """
+    Merge the given xunit xml files into a single output xml file
+
+    Unlike ``xunitmerge.merge_xunit`` which builds complete DOM trees
+    of all the reports, this merges the reports in a streaming fashion.
+    Testcases are written out as soon as they are parsed and
+    the testsuite attributes (``tests``, ``errors``, etc)
+    are recomputed from the testcases themselves in the same pass
+    (see ``write_testcases()``).
+
+    Parameters
+    ----------
+    files : list
+        Paths of the xunit xml reports to be merged
+    output : str
+        Path where the merged xunit report will be written
+    callback : callable, optional
+        Function which is called with every testcase element
+        as it is merged
+    compression : str, optional
+        Name of the compression from ``COMPRESSIONS``
+        with which the merged report is written
+
+    Returns
+    -------
+    dict
+        Computed testsuite attributes of the merged report
+    """
+    def testcases():
+        for path in files:
+            for testcase in iter_testcases(path):
+                if callback is not None:
+                    callback(testcase)
+                yield testcase
+
+    return write_testcases(testcases(), output, compression)
+
+
+def replace_testcases(path, replace):
+    """
+    Replace testcases of the xunit report in place
+
+    Report is streamed into a temporary report next to it
+    which then replaces the original report so that
+    the report is never left partially written.
+
+    Parameters
+    ----------
+    path : str
+        Path of the xunit xml report
+    replace : callable
+        Function which is called with every testcase element
+        and returns the element which is written in its place
+
+    Returns
+    -------
+    dict
+        Computed testsuite attributes of the rewritten report
+    """
+    tmp = '{}.tmp'.format(path)
+    counts = write_testcases(
+        (replace(i) for i in iter_testcases(path)),
+        tmp,
+    )
+    os.rename(tmp, path)
+    return counts
+
+
+def merge_xunit_dom(files, output, callback=None, compression=None):
+    """
+    Merge the given xunit xml files via ``xunitmerge`` which
+    loads all the reports into memory
+
+    The callback is called with every testcase element
+    of the merged report before it is written.
+    ``xunitmerge`` can only read and write uncompressed reports
+    therefore the merged report is compressed afterwards.
+    """
+    def tree_callback(tree):
+        for testcase in tree.iter(TESTCASE_TAG):
+            callback(testcase)
+
+    merged = '{}.tmp'.format(output) if compression else output
+    merge_xunit(files, merged, callback=tree_callback if callback else None)
+
+    if compression:
+        with open(merged, 'rb') as source:
+            with open_output(output, compression) as fid:
+                shutil.copyfileobj(source, fid)
+        os.unlink(merged)
+
+
+MERGE_ENGINES = {
+    'stream': merge_xunit_stream,
+    'xunitmerge': merge_xunit_dom,
+}
+DEFAULT_MERGE_ENGINE = 'stream'
+
+
+def merge_xunit_files(files,
+                      output,
+                      engine=DEFAULT_MERGE_ENGINE,
+                      callback=None,
+                      compression=None):
+    """
+    Merge the given xunit xml files with the given merge engine
+
+    Parameters
+    ----------
+    files : list
+        Paths of the xunit xml reports to be merged
+    output : str
+        Path where the merged xunit report will be written
+    engine : str
+        Name of the merge engine from ``MERGE_ENGINES``.
+        By default the streaming merge is used and ``xunitmerge``
+        is only available as a fallback.
+    callback : callable, optional
+        Function which is called with every merged testcase element
+    compression : str, optional
+        Name of the compression from ``COMPRESSIONS``
+        with which the merged report is written
+    """
+    MERGE_ENGINES[engine](files,
+                          output,
+                          callback=callback,
+                          compression=compression)
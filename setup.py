@@ -31,13 +31,20 @@ setup(
                 'Useful for makefile scripts.',
     long_description='\n\n'.join([readme, history, authors, licence]),
     url='https://github.com/Dealertrack/multinosetests',
-    packages=find_packages(exclude=['tests', 'tests.*']),
+    packages=find_packages(exclude=['benchmarks', 'tests', 'tests.*']),
     entry_points={
         'console_scripts': [
             'multinosetests = multinosetests:main',
-        ]
+            'multinosetests-worker = multinosetests:worker_main',
+        ],
+        'nose.plugins.0.10': [
+            'multinosetests = multinosetests.plugin:ResultStream',
+        ],
     },
     install_requires=requirements,
+    extras_require={
+        'zstd': ['zstandard'],
+    },
     test_suite='tests',
     tests_require=test_requirements,
     keywords=' '.join([
@@ -0,0 +1,93 @@
+from __future__ import print_function, unicode_literals
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from multinosetests.artifacts import (
+    ArtifactStore,
+    get_artifact_key,
+    get_path_key,
+)
+from multinosetests.multinosetests import NosetestsCall
+
+
+class TestArtifacts(unittest.TestCase):
+    """
+    Tests for the store of per-suite artifacts
+    """
+
+    def setUp(self):
+        super(TestArtifacts, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.store = ArtifactStore(self.tmpdir, 60, 100)
+
+    def write(self, name, size, age=0):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'wb') as fid:
+            fid.write(b'x' * size)
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_get_artifact_key(self):
+        key = get_artifact_key('nosetests foo')
+
+        self.assertEqual(len(key), 16)
+        self.assertEqual(key, get_artifact_key('nosetests foo'))
+        self.assertNotEqual(key, get_artifact_key('nosetests bar'))
+
+    def test_get_path_key(self):
+        key = get_artifact_key('nosetests foo')
+
+        self.assertEqual(get_path_key('a/nosetests.{}.xml'.format(key)), key)
+        self.assertEqual(get_path_key('.coverage.{}'.format(key)), key)
+        self.assertEqual(get_path_key('.coverage.{}-journal'.format(key)),
+                         key)
+        self.assertIsNone(get_path_key('nosetests.123.xml'))
+        self.assertIsNone(get_path_key('manifest.json'))
+
+    def test_register(self):
+        nose = NosetestsCall('nosetests foo')
+        self.assertDictEqual(self.store.load_manifest(), {})
+
+        self.store.register([nose])
+
+        manifest = self.store.load_manifest()
+        self.assertListEqual(list(manifest), [nose.key])
+        self.assertEqual(manifest[nose.key]['command'], 'nosetests foo')
+
+    def test_collect_missing(self):
+        store = ArtifactStore(os.path.join(self.tmpdir, 'missing'), 60, 100)
+        self.assertListEqual(store.collect(), [])
+
+    def test_collect_age(self):
+        old = NosetestsCall('nosetests old')
+        new = NosetestsCall('nosetests new')
+        self.store.register([old, new])
+        stale = self.write('nosetests.{}.xml'.format(old.key), 10, age=120)
+        self.write('nosetests.{}.xml'.format(new.key), 10)
+
+        self.assertListEqual(self.store.collect(), [stale])
+        self.assertListEqual(list(self.store.load_manifest()), [new.key])
+
+    def test_collect_size(self):
+        paths = [
+            self.write('nosetests.{}.xml'.format(get_artifact_key(i)),
+                       40,
+                       age=10 - i)
+            for i in range(4)
+        ]
+
+        self.assertListEqual(self.store.collect(), paths[:2])
+        self.assertTrue(all(os.path.exists(i) for i in paths[2:]))
+
+    def test_collect_keep(self):
+        key = get_artifact_key('nosetests foo')
+        path = self.write('.coverage.{}'.format(key), 200, age=120)
+
+        self.assertListEqual(self.store.collect(keep=[key]), [])
+        self.assertTrue(os.path.exists(path))
+        self.assertListEqual(self.store.collect(), [path])
@@ -0,0 +1,52 @@
+from __future__ import print_function, unicode_literals
+import os
+import shutil
+import tempfile
+import unittest
+
+from benchmarks.generate import write_coverage_files, write_xunit_files
+from benchmarks.run import run_case
+from multinosetests.xunit import is_valid_report, merge_xunit_stream
+
+
+class TestBenchmarks(unittest.TestCase):
+    """
+    Tests for the benchmark harness
+    """
+
+    def setUp(self):
+        super(TestBenchmarks, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        super(TestBenchmarks, self).tearDown()
+        shutil.rmtree(self.tmpdir)
+
+    def test_write_xunit_files(self):
+        files = write_xunit_files(self.tmpdir, 1001, 3, system_out=100)
+
+        self.assertEqual(len(files), 3)
+        self.assertTrue(all(is_valid_report(i) for i in files))
+        actual = merge_xunit_stream(
+            files, os.path.join(self.tmpdir, 'merged.xml')
+        )
+        self.assertDictEqual(
+            actual,
+            {'tests': 1001, 'errors': 7, 'failures': 10, 'skip': 5}
+        )
+
+    def test_run_case(self):
+        files = write_xunit_files(self.tmpdir, 10, 2)
+        coverage_files = write_coverage_files(self.tmpdir, 2, 2, 10, 3)
+
+        for case in [{'benchmark': 'report', 'files': files},
+                     {'benchmark': 'merge',
+                      'files': files,
+                      'engine': 'stream'},
+                     {'benchmark': 'merge_calls',
+                      'files': files,
+                      'engine': 'stream'},
+                     {'benchmark': 'coverage', 'files': coverage_files}]:
+            actual = run_case(case)
+            self.assertGreaterEqual(actual['seconds'], 0)
+            self.assertTrue(all(os.path.exists(i) for i in files))
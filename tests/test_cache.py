@@ -0,0 +1,175 @@
+from __future__ import print_function, unicode_literals
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from multinosetests.cache import (
+    ResultCache,
+    get_source_paths,
+    get_test_path,
+    iter_files,
+)
+from multinosetests.multinosetests import NosetestsCall
+
+
+TESTING_MODULE = 'multinosetests.cache'
+
+
+class CacheTestCase(unittest.TestCase):
+    """
+    Base test case which runs within a temporary project directory
+    """
+
+    def setUp(self):
+        super(CacheTestCase, self).setUp()
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.mkdtemp()
+        os.chdir(self.tmpdir)
+        for path in ('foo/__init__.py',
+                     'foo/bar.py',
+                     'foo/__pycache__/bar.pyc',
+                     'tests/__init__.py',
+                     'tests/test_foo.py',
+                     'tests/nosetests.xml',
+                     'tests/.hidden/data.py'):
+            self.write(path, path)
+
+    def tearDown(self):
+        super(CacheTestCase, self).tearDown()
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, path, content):
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(path, 'wb') as fid:
+            fid.write(content.encode('utf-8'))
+
+
+class TestSources(CacheTestCase):
+    """
+    Tests for finding source files of nosetests suites
+    """
+
+    def test_get_test_path(self):
+        self.assertEqual(get_test_path('tests'), 'tests')
+        self.assertEqual(get_test_path('tests/test_foo.py:Foo.test'),
+                         'tests/test_foo.py')
+        self.assertEqual(get_test_path('tests.test_foo:Foo.test'),
+                         os.path.join('tests', 'test_foo.py'))
+        self.assertEqual(get_test_path('tests.test_missing'), 'tests')
+        self.assertIsNone(get_test_path('missing'))
+
+    def test_get_source_paths(self):
+        self.assertListEqual(
+            get_source_paths('nosetests tests --cover-package=foo,missing'),
+            ['foo', 'tests'],
+        )
+        self.assertListEqual(get_source_paths('nosetests'), ['.'])
+
+    def test_iter_files(self):
+        actual = list(iter_files(['foo', 'tests/test_foo.py', 'tests'],
+                                 ignore=['tests/nosetests.xml']))
+
+        self.assertListEqual(actual, [
+            os.path.join('foo', '__init__.py'),
+            os.path.join('foo', 'bar.py'),
+            'tests/test_foo.py',
+            os.path.join('tests', '__init__.py'),
+            os.path.join('tests', 'test_foo.py'),
+        ])
+
+
+@mock.patch(TESTING_MODULE + '.get_environment_fingerprint',
+            mock.MagicMock(return_value='python'))
+class TestResultCache(CacheTestCase):
+    """
+    Tests for storing and restoring suite results
+    """
+
+    def setUp(self):
+        super(TestResultCache, self).setUp()
+        self.cache = ResultCache('.cache', 1024)
+        self.cmd = 'nosetests tests --with-xunit --cover-package=foo'
+
+    def test_get_key(self):
+        nose = NosetestsCall(self.cmd)
+        key = self.cache.get_key(nose)
+
+        self.assertEqual(key, self.cache.get_key(nose))
+
+        # unrelated files do not change the key
+        self.write('other/baz.py', 'baz')
+        self.write('tests/__pycache__/foo.pyc', 'baz')
+        self.assertEqual(key, self.cache.get_key(nose))
+
+        self.write('foo/bar.py', 'changed')
+        self.assertNotEqual(key, self.cache.get_key(nose))
+
+    def test_get_key_ignore(self):
+        # suite without test paths hashes the current directory
+        # which contains outputs of multinosetests
+        nose = NosetestsCall('nosetests --with-xunit')
+        cache = ResultCache('.cache', 1024,
+                            ignore=['nosetests.xml.gz', 'summary.json'])
+        key = cache.get_key(nose)
+
+        self.write('nosetests.xml.gz', 'report')
+        self.write('summary.json', '{}')
+
+        self.assertEqual(key, cache.get_key(nose))
+
+    def test_get_key_command(self):
+        self.assertNotEqual(
+            self.cache.get_key(NosetestsCall(self.cmd)),
+            self.cache.get_key(NosetestsCall(self.cmd + ' -v')),
+        )
+
+    def test_store_restore(self):
+        nose = NosetestsCall(self.cmd + ' --with-coverage')
+        nose.return_code = 0
+        self.write(nose.xunit_file, '<testsuite/>')
+        self.write(nose.coverage_file, 'coverage')
+
+        self.assertFalse(self.cache.contains('key'))
+        self.cache.store(nose, 'key')
+        self.assertTrue(self.cache.contains('key'))
+        os.unlink(nose.xunit_file)
+        os.unlink(nose.coverage_file)
+
+        restored = NosetestsCall(self.cmd + ' --with-coverage')
+        self.assertTrue(self.cache.restore(restored, 'key'))
+        self.assertTrue(restored.cached)
+        self.assertEqual(restored.return_code, 0)
+        with open(restored.coverage_file, 'rb') as fid:
+            self.assertEqual(fid.read(), b'coverage')
+        with open(restored.xunit_file, 'rb') as fid:
+            self.assertEqual(fid.read(), b'<testsuite/>')
+
+    def test_store_failed(self):
+        nose = NosetestsCall(self.cmd)
+        nose.return_code = 1
+
+        self.cache.store(nose, 'key')
+
+        self.assertFalse(os.path.exists(self.cache.get_entry('key')))
+
+    def test_restore_missing(self):
+        nose = NosetestsCall(self.cmd)
+
+        self.assertFalse(self.cache.restore(nose, 'missing'))
+        self.assertFalse(nose.cached)
+
+    def test_evict(self):
+        for i, key in enumerate(['old', 'new', 'newest']):
+            self.write(os.path.join('.cache', key, 'data'), 'x' * 500)
+            os.utime(self.cache.get_entry(key), (i, i))
+
+        self.cache.evict()
+
+        self.assertListEqual(sorted(os.listdir('.cache')),
+                             ['new', 'newest'])
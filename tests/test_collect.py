@@ -0,0 +1,154 @@
+from __future__ import print_function, unicode_literals
+import os
+import pickle
+import unittest
+
+import mock
+
+from multinosetests.collect import (
+    address_to_test_id,
+    collect_test_addresses,
+    compact_addresses,
+    find_overlaps,
+    get_collect_command,
+    get_run_key,
+    make_address,
+    read_test_addresses,
+    get_testcase_address,
+)
+
+
+TESTING_MODULE = 'multinosetests.collect'
+
+
+class TestCollect(unittest.TestCase):
+    """
+    Tests for collecting test addresses of nosetests commands
+    """
+
+    def test_get_collect_command(self):
+        actual = get_collect_command(
+            'nosetests tests -sv --with-xunit --with-coverage '
+            '--cover-package=foo --with-id',
+            '/tmp/ids',
+        )
+
+        self.assertEqual(
+            actual,
+            'nosetests -sv --collect-only --with-id '
+            '--id-file=/tmp/ids tests'
+        )
+
+    def test_make_address(self):
+        self.assertEqual(make_address(('/a/b.py', 'a.b', 'Foo.test')),
+                         'a.b:Foo.test')
+        self.assertEqual(make_address(('/a/b.py', None, 'test')),
+                         '/a/b.py:test')
+        self.assertEqual(make_address(('/a/b.py', 'a.b', None)), 'a.b')
+
+    def test_address_to_test_id(self):
+        self.assertEqual(address_to_test_id('a.b:Foo.test'), 'a.b.Foo.test')
+
+    def test_get_testcase_address(self):
+        self.assertEqual(get_testcase_address('a.b.Foo', 'test'),
+                         'a.b:Foo.test')
+        self.assertEqual(get_testcase_address('a.b', 'test_gen(1, 2)'),
+                         'a.b:test_gen')
+        self.assertIsNone(get_testcase_address('nose.failure.Failure',
+                                               'runTest'))
+        self.assertIsNone(get_testcase_address('multinosetests', 'nosetests'))
+        self.assertIsNone(get_testcase_address('', 'test'))
+
+    def test_read_test_addresses(self):
+        data = pickle.dumps({
+            'ids': {
+                2: ('/a/b.py', 'a.b', 'test_gen'),
+                1: ('/a/b.py', 'a.b', 'Foo.test'),
+                3: ('/a/b.py', 'a.b', 'test_gen'),
+            },
+            'failed': [],
+            'source_names': [],
+        })
+        mock_open = mock.mock_open(read_data=data)
+
+        with mock.patch(TESTING_MODULE + '.open', mock_open, create=True):
+            actual = read_test_addresses('ids')
+
+        self.assertListEqual(actual, ['a.b:Foo.test', 'a.b:test_gen'])
+
+    @mock.patch(TESTING_MODULE + '.read_test_addresses')
+    @mock.patch(TESTING_MODULE + '.call')
+    def test_collect_test_addresses(self, mock_call, mock_read):
+        def collect(argv, **kwargs):
+            id_file = argv[-2].split('--id-file=')[1]
+            open(id_file, 'wb').close()
+            return 0
+
+        mock_call.side_effect = collect
+
+        actual = collect_test_addresses('FOO=bar nosetests tests')
+
+        self.assertEqual(actual, mock_read.return_value)
+        id_file = mock_read.call_args[0][0]
+        self.assertFalse(os.path.exists(id_file))
+        self.assertEqual(mock_call.call_args[0][0][:4],
+                         ['nosetests', '--collect-only', '--with-id',
+                          '--id-file={}'.format(id_file)])
+        self.assertFalse(mock_call.call_args[1]['shell'])
+        self.assertEqual(mock_call.call_args[1]['env']['FOO'], 'bar')
+
+    @mock.patch(TESTING_MODULE + '.read_test_addresses')
+    @mock.patch(TESTING_MODULE + '.call')
+    def test_collect_test_addresses_not_found(self, mock_call, mock_read):
+        mock_call.side_effect = OSError
+
+        self.assertIsNone(collect_test_addresses('nosetests tests'))
+        self.assertFalse(mock_read.called)
+
+    @mock.patch(TESTING_MODULE + '.read_test_addresses')
+    @mock.patch(TESTING_MODULE + '.call')
+    def test_collect_test_addresses_failure(self, mock_call, mock_read):
+        mock_call.return_value = 1
+
+        self.assertIsNone(collect_test_addresses('nosetests tests'))
+        self.assertFalse(mock_read.called)
+
+    def test_find_overlaps(self):
+        actual = find_overlaps([
+            ['a:test_1', 'b:test_1'],
+            None,
+            ['a:test_1', 'a:test_2', 'b:test_1', 'c:test_1'],
+            ['c:test_1', 'a:test_2'],
+        ])
+
+        self.assertListEqual(actual, [
+            {},
+            {},
+            {0: ['a:test_1', 'b:test_1']},
+            {2: ['c:test_1', 'a:test_2']},
+        ])
+
+    def test_find_overlaps_keys(self):
+        actual = find_overlaps(
+            [['a:test_1'], ['a:test_1'], ['a:test_1']],
+            ['foo', 'bar', 'foo'],
+        )
+
+        self.assertListEqual(actual, [{}, {}, {0: ['a:test_1']}])
+
+    def test_get_run_key(self):
+        key = get_run_key('nosetests tests -v --with-xunit -a slow')
+
+        # selection and reporting options do not change how tests run
+        self.assertEqual(get_run_key('nosetests api --with-coverage'), key)
+        self.assertNotEqual(get_run_key('FOO=1 nosetests tests'), key)
+        self.assertNotEqual(get_run_key('nosetests tests --processes=2'), key)
+        self.assertNotEqual(get_run_key('python -m nose tests'), key)
+
+    def test_compact_addresses(self):
+        actual = compact_addresses(
+            ['a:Foo.test_1', 'a:Foo.test_2', 'b:test_1', 'c', 'd:test_1'],
+            ['a:Foo.test_2', 'b:test_1', 'c'],
+        )
+
+        self.assertListEqual(actual, ['a:Foo.test_2', 'b', 'c'])
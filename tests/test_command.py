@@ -0,0 +1,156 @@
+from __future__ import print_function, unicode_literals
+import unittest
+
+from multinosetests.command import (
+    NoseCommand,
+    get_option_value,
+    get_program_length,
+    get_shell_syntax,
+    join_command,
+    split_command,
+    strip_options,
+)
+
+
+class TestCommand(unittest.TestCase):
+    """
+    Tests for nosetests command parsing helpers
+    """
+
+    def test_get_program_length(self):
+        self.assertEqual(get_program_length(['nosetests', '-v']), 1)
+        self.assertEqual(get_program_length(['/bin/nosetests-3', 'foo']), 1)
+        self.assertEqual(
+            get_program_length(['FOO=bar', 'python', '-m', 'nose', 'foo']),
+            4
+        )
+        self.assertEqual(get_program_length(['runtests', 'foo']), 1)
+        self.assertEqual(get_program_length(['--with-xunit']), 0)
+        self.assertEqual(get_program_length([]), 0)
+
+    def test_split_command(self):
+        actual = split_command(
+            'nosetests tests/foo -sv -a slow --with-xunit '
+            '--cover-package=foo "tests/with space"'
+        )
+
+        self.assertEqual(actual, (
+            ['nosetests'],
+            [['-sv'], ['-a', 'slow'], ['--with-xunit'],
+             ['--cover-package=foo']],
+            ['tests/foo', 'tests/with space'],
+        ))
+
+    def test_join_command(self):
+        program, options, tests = split_command(
+            'nosetests tests/foo -a slow "tests/with space"'
+        )
+
+        actual = join_command(program, options, tests)
+
+        self.assertEqual(
+            actual,
+            "nosetests -a slow tests/foo 'tests/with space'"
+        )
+        self.assertEqual(join_command(['nosetests']), 'nosetests')
+
+    def test_strip_options(self):
+        options = [['-sv'], ['--with-xunit'], ['--xunit-file', 'foo.xml'],
+                   ['--cover-package=foo']]
+
+        actual = strip_options(options, ['--xunit', '--cover-'])
+
+        self.assertListEqual(actual, [['-sv'], ['--with-xunit']])
+
+    def test_get_option_value(self):
+        self.assertEqual(get_option_value(['--foo=bar']), 'bar')
+        self.assertEqual(get_option_value(['--foo', 'bar']), 'bar')
+        self.assertIsNone(get_option_value(['--foo']))
+
+
+class TestNoseCommand(unittest.TestCase):
+    """
+    Tests for the tokenized nosetests command
+    """
+
+    def setUp(self):
+        super(TestNoseCommand, self).setUp()
+        self.command = NoseCommand(
+            'FOO=bar python -m nose tests -sv --with-coverage '
+            '--cover-package=foo,bar --cover-package baz "with space"'
+        )
+
+    def test_init(self):
+        self.assertDictEqual(self.command.env, {'FOO': 'bar'})
+        self.assertListEqual(self.command.program,
+                             ['python', '-m', 'nose'])
+        self.assertListEqual(self.command.tests, ['tests', 'with space'])
+
+    def test_is_nose(self):
+        self.assertTrue(self.command.is_nose())
+        self.assertTrue(NoseCommand('/venv/bin/nosetests-3.6').is_nose())
+        self.assertFalse(NoseCommand('python -m pytest').is_nose())
+        self.assertFalse(NoseCommand('--with-xunit').is_nose())
+
+    def test_has_option(self):
+        self.assertTrue(self.command.has_option('--with-coverage'))
+        self.assertTrue(self.command.has_option('--cover-package'))
+        self.assertFalse(self.command.has_option('--with-xunit'))
+
+    def test_get_option_values(self):
+        self.assertListEqual(
+            self.command.get_option_values('--cover-package'),
+            ['foo,bar', 'baz'],
+        )
+
+    def test_get_shell_syntax(self):
+        self.assertListEqual(self.command.get_shell_syntax(), [])
+        self.assertListEqual(
+            NoseCommand('nosetests && echo ok > out').get_shell_syntax(),
+            ['&&', '>'],
+        )
+
+    def test_get_shell_syntax_string(self):
+        for command, expected in [
+                ('nosetests a|b 2>&1', ['|', '>&']),
+                ('nosetests;echo `id`', [';', '`']),
+                ('FOO=$BAR nosetests tests/test_*.py', ['$', '*']),
+                ('nosetests "$HOME/tests" test_?.py [ab]', ['$', '?', '[']),
+                ('nosetests ~/tests tests/{a,b}.py', ['~', '{']),
+                # tilde is expanded only at the start of words
+                # and braces only with a comma
+                ('nosetests tests~ --where=~/a {a} \\~ "~"', []),
+                # quoted and escaped characters are literal
+                ('nosetests \'tests/test_*.py\' "a|b" \\$x', []),
+                ('nosetests "it\'s" \'$HOME\'', [])]:
+            self.assertListEqual(get_shell_syntax(command), expected,
+                                 command)
+
+    def test_invalid_command(self):
+        command = NoseCommand('nosetests "tests')
+
+        self.assertEqual(command.error, 'No closing quotation')
+        self.assertListEqual(command.tokens, [])
+        self.assertFalse(command.is_nose())
+        self.assertIsNone(self.command.error)
+
+    def test_get_argv(self):
+        self.assertListEqual(self.command.get_argv([['--with-xunit']]), [
+            'python', '-m', 'nose', 'tests',
+            '-sv', '--with-coverage', '--cover-package=foo,bar',
+            '--cover-package', 'baz', 'with space', '--with-xunit',
+        ])
+
+    def test_get_argv_unknown_option(self):
+        command = NoseCommand('nosetests tests/ --tc-file cfg.ini '
+                              '--with-xunit')
+
+        # value of the option unknown to nosetests stays after the option
+        self.assertListEqual(command.get_argv([['--xunit-file=a.xml']]), [
+            'nosetests', 'tests/', '--tc-file', 'cfg.ini', '--with-xunit',
+            '--xunit-file=a.xml',
+        ])
+
+    def test_get_environment(self):
+        actual = self.command.get_environment({'PATH': '/bin'})
+        self.assertDictEqual(actual, {'PATH': '/bin', 'FOO': 'bar'})
@@ -0,0 +1,261 @@
+from __future__ import print_function, unicode_literals
+import os
+import shutil
+import tempfile
+import unittest
+
+import coverage
+import mock
+
+from multinosetests.cover import (
+    close_data,
+    combine_coverage_incremental,
+    get_cover_packages,
+    get_include_patterns,
+    get_measured_contexts,
+    update_coverage_baseline,
+    write_coverage_reports,
+)
+
+
+TESTING_MODULE = 'multinosetests.cover'
+
+
+class TestCover(unittest.TestCase):
+    """
+    Tests for in-process coverage helpers
+    """
+
+    def test_get_cover_packages(self):
+        actual = get_cover_packages([
+            'nosetests --with-coverage --cover-package=foo,bar',
+            'nosetests --with-coverage --cover-package=bar,baz_1',
+            'nosetests --with-coverage --cover-package qux',
+            'nosetests --with-coverage',
+        ])
+
+        self.assertListEqual(actual, ['bar', 'baz_1', 'foo', 'qux'])
+
+    def test_get_include_patterns(self):
+        self.assertListEqual(get_include_patterns(['foo', 'bar']),
+                             ['foo/*', 'foo.py', 'bar/*', 'bar.py'])
+        self.assertListEqual(get_include_patterns(['foo.bar']),
+                             [os.path.join('foo', 'bar', '*'),
+                              os.path.join('foo', 'bar.py')])
+        self.assertIsNone(get_include_patterns([]))
+
+    def test_write_coverage_reports(self):
+        cov = mock.MagicMock()
+
+        write_coverage_reports(cov, ['foo*'])
+
+        cov.report.assert_called_once_with(include=['foo*'])
+        self.assertFalse(cov.xml_report.called)
+        self.assertFalse(cov.html_report.called)
+
+    def test_write_coverage_reports_xml_html(self):
+        cov = mock.MagicMock()
+
+        write_coverage_reports(cov, ['foo*'], 'coverage.xml', 'htmlcov')
+
+        cov.report.assert_called_once_with(include=['foo*'])
+        cov.xml_report.assert_called_once_with(include=['foo*'],
+                                               outfile='coverage.xml')
+        cov.html_report.assert_called_once_with(include=['foo*'],
+                                                directory='htmlcov')
+
+
+class TestCoverageBaseline(unittest.TestCase):
+    """
+    Tests for incremental combining of coverage data
+    """
+
+    def setUp(self):
+        super(TestCoverageBaseline, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.baseline = os.path.join(self.tmpdir, 'state', 'coverage')
+
+    def write(self, name, lines, context=None):
+        path = os.path.join(self.tmpdir, name)
+        data = coverage.CoverageData(basename=path)
+        data.set_context(context)
+        data.add_lines({os.path.join(self.tmpdir, k): v
+                        for k, v in lines.items()})
+        data.write()
+        close_data(data)
+        return path
+
+    def read(self, path):
+        data = coverage.CoverageData(basename=path)
+        data.read()
+        lines = {os.path.basename(i): sorted(data.lines(i))
+                 for i in data.measured_files()}
+        contexts = data.measured_contexts()
+        close_data(data)
+        return lines, contexts
+
+    def test_update_coverage_baseline(self):
+        data_files = {'a': self.write('a', {'foo.py': [1, 2]}),
+                      'b': self.write('b', {'bar.py': [1]}, 'test_bar')}
+
+        added = update_coverage_baseline(self.baseline, data_files)
+
+        self.assertListEqual(added, ['a', 'b'])
+        self.assertEqual(self.read(self.baseline), (
+            {'foo.py': [1, 2], 'bar.py': [1]},
+            {'a|', 'b|test_bar'},
+        ))
+
+    def test_update_coverage_baseline_arcs(self):
+        path = os.path.join(self.tmpdir, 'a')
+        data = coverage.CoverageData(basename=path)
+        for context in ('', 'test_foo'):
+            data.set_context(context)
+            data.add_arcs({os.path.join(self.tmpdir, 'foo.py'):
+                           [(-1, 1), (1, 2), (2, -1)]})
+        data.write()
+        close_data(data)
+
+        update_coverage_baseline(self.baseline, {'a': path})
+
+        self.assertEqual(self.read(self.baseline),
+                         ({'foo.py': [1, 2]}, {'a|', 'a|test_foo'}))
+        self.assertListEqual(sorted(os.listdir(self.tmpdir)), ['a', 'state'])
+
+    def test_update_coverage_baseline_unchanged(self):
+        update_coverage_baseline(self.baseline, {
+            'a': self.write('a', {'foo.py': [1, 2]}),
+            'b': self.write('b', {'foo.py': [3], 'bar.py': [1]}),
+            'c': self.write('c', {'baz.py': [1]}),
+        })
+
+        # suite "c" is removed
+        added = update_coverage_baseline(
+            self.baseline,
+            {'a': self.write('a', {'foo.py': [4]}),
+             'b': os.path.join(self.tmpdir, 'missing')},
+            unchanged=['b'],
+        )
+
+        self.assertListEqual(added, ['a'])
+        self.assertEqual(self.read(self.baseline), (
+            {'foo.py': [3, 4], 'bar.py': [1]},
+            {'a|', 'b|'},
+        ))
+
+    def test_update_coverage_baseline_partial(self):
+        path = os.path.join(self.tmpdir, 'a')
+        data = coverage.CoverageData(basename=path)
+        for context, lines in (('', [1]), ('test_1', [2]), ('test_2', [3])):
+            data.set_context(context)
+            data.add_lines({os.path.join(self.tmpdir, 'foo.py'): lines})
+        data.write()
+        close_data(data)
+        update_coverage_baseline(self.baseline, {
+            'a': path,
+            'b': self.write('b', {'bar.py': [1]}),
+        })
+
+        # suite "b" was not affected by changes
+        # and its data is kept together with data of test_2
+        added = update_coverage_baseline(
+            self.baseline,
+            {'p': self.write('p', {'foo.py': [4]}, 'test_1')},
+            partial={'p': 'a'},
+            merge=True,
+        )
+
+        self.assertListEqual(added, ['p'])
+        self.assertEqual(self.read(self.baseline), (
+            {'foo.py': [1, 3, 4], 'bar.py': [1]},
+            {'a|', 'a|test_1', 'a|test_2', 'b|'},
+        ))
+
+    def test_update_coverage_baseline_corrupt(self):
+        os.makedirs(os.path.dirname(self.baseline))
+        with open(self.baseline, 'wb') as fid:
+            fid.write(b'corrupt')
+
+        added = update_coverage_baseline(
+            self.baseline,
+            {'a': self.write('a', {'foo.py': [1]})},
+            unchanged=['a'],
+        )
+
+        self.assertListEqual(added, ['a'])
+        self.assertEqual(self.read(self.baseline)[0], {'foo.py': [1]})
+
+    def test_combine_coverage_incremental(self):
+        data_files = {'a': self.write('a', {'foo.py': [1, 2]})}
+        data_file = os.path.join(self.tmpdir, '.coverage')
+
+        cov = combine_coverage_incremental(data_files,
+                                           data_file,
+                                           self.baseline)
+
+        self.assertFalse(os.path.exists(data_files['a']))
+        self.assertEqual(self.read(data_file)[0], {'foo.py': [1, 2]})
+        self.assertEqual(
+            sorted(cov.get_data().lines(os.path.join(self.tmpdir, 'foo.py'))),
+            [1, 2],
+        )
+
+    def test_combine_coverage_incremental_unsupported_schema(self):
+        update_coverage_baseline(self.baseline,
+                                 {'a': self.write('a', {'foo.py': [1]})})
+        data_files = {'a': self.write('a', {'foo.py': [2]}, 'test_foo'),
+                      'b': self.write('b', {'bar.py': [1]})}
+        data_file = os.path.join(self.tmpdir, '.coverage')
+
+        with mock.patch(TESTING_MODULE + '.SUPPORTED_SCHEMA_VERSIONS', ()):
+            combine_coverage_incremental(data_files, data_file, self.baseline)
+
+        # data files are combined as they are without the baseline
+        self.assertFalse(os.path.exists(self.baseline))
+        self.assertEqual(self.read(data_file), (
+            {'foo.py': [2], 'bar.py': [1]},
+            {'', 'test_foo'},
+        ))
+
+    def test_get_measured_contexts(self):
+        path = os.path.join(self.tmpdir, 'a')
+        data = coverage.CoverageData(basename=path)
+        for context, lines in (('', {'foo.py': [1]}),
+                               ('test_foo', {'foo.py': [2], 'bar.py': [1]}),
+                               ('test_bar', {'bar.py': [2]})):
+            data.set_context(context)
+            data.add_lines({os.path.join(self.tmpdir, k): v
+                            for k, v in lines.items()})
+        data.write()
+        close_data(data)
+        update_coverage_baseline(self.baseline, {
+            'a': path,
+            'b': self.write('b', {'baz.py': [1]}),
+        })
+
+        contexts = get_measured_contexts(self.baseline)
+
+        self.assertEqual(
+            {key: {context: sorted(os.path.basename(i) for i in paths)
+                   for context, paths in suite.items()}
+             for key, suite in contexts.items()},
+            {'a': {'': ['foo.py'],
+                   'test_foo': ['bar.py', 'foo.py'],
+                   'test_bar': ['bar.py']},
+             'b': {'': ['baz.py']}},
+        )
+
+    def test_combine_coverage_incremental_keep_data_files(self):
+        data_files = {'a': self.write('a', {'foo.py': [1]})}
+        data_file = os.path.join(self.tmpdir, '.coverage')
+        combine_coverage_incremental(data_files, data_file, self.baseline,
+                                     keep_data_files=True)
+        data_files['b'] = self.write('b', {'bar.py': [1]})
+
+        combine_coverage_incremental(data_files, data_file, self.baseline,
+                                     unchanged=['a'], keep_data_files=True)
+
+        self.assertTrue(os.path.exists(data_files['a']))
+        self.assertEqual(self.read(data_file)[0],
+                         {'foo.py': [1], 'bar.py': [1]})
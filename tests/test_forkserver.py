@@ -0,0 +1,100 @@
+from __future__ import print_function, unicode_literals
+import io
+import os
+import pstats
+import shutil
+import tempfile
+import unittest
+from subprocess import PIPE
+
+import mock
+
+from multinosetests.forkserver import AVAILABLE, ForkServer, ForkServerError
+from multinosetests.runner import asyncio, run_async
+
+
+@unittest.skipUnless(AVAILABLE, 'fork server is not available')
+class TestForkServer(unittest.TestCase):
+    """
+    Tests for forking nosetests suites from the fork server
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ForkServer(['json'])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+
+    def test_preload_error(self):
+        with self.assertRaises(ForkServerError):
+            ForkServer(['multinosetests_no_such_module'])
+
+    def test_start(self):
+        process = self.server.start(['nosetests', '--version'],
+                                    stdout=PIPE,
+                                    stderr=PIPE)
+
+        self.assertEqual(process.wait(), 0)
+        self.assertIn(b'version', process.stdout.read())
+        self.assertNotEqual(process.pid, self.server.process.pid)
+        self.assertIn('max_rss', process.usage)
+
+    def test_start_failure(self):
+        process = self.server.start(['nosetests', '--no-such-option'],
+                                    stdout=PIPE,
+                                    stderr=PIPE)
+
+        self.assertEqual(process.wait(1), 2)
+        self.assertIn(b'no such option', process.stderr.read())
+        self.assertFalse(process.timed_out)
+
+    def test_start_environment(self):
+        process = self.server.start(
+            ['nosetests', '--version'],
+            env={'NOSE_NOCAPTURE': '1'},
+            stdout=PIPE,
+            stderr=PIPE,
+        )
+
+        self.assertEqual(process.wait(), 0)
+
+    def test_start_profile(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'nose.prof')
+
+        process = self.server.start(
+            ['nosetests', '--version'],
+            env={'MULTINOSETESTS_PROFILE': path},
+            stdout=PIPE,
+            stderr=PIPE,
+        )
+
+        self.assertEqual(process.wait(), 0)
+        stats = pstats.Stats(path)
+        self.assertTrue(any(i[2] == 'run_nose' for i in stats.stats))
+
+    def test_start_closed(self):
+        server = ForkServer([])
+        server.close()
+
+        with self.assertRaises(OSError):
+            server.start(['nosetests', '--version'])
+
+    @unittest.skipIf(asyncio is None, 'asyncio is not available')
+    def test_run_async(self):
+        stdout = io.BytesIO()
+        nose = mock.MagicMock(timeout=None)
+        nose.before_run.return_value = 'nosetests --version'
+        nose.start_process.side_effect = lambda **kwargs: self.server.start(
+            ['nosetests', '--version'], **kwargs
+        )
+        nose.after_run.side_effect = lambda code, **kwargs: code
+
+        actual = run_async([nose], ['[1]'], 1, stdout, io.BytesIO())
+
+        self.assertListEqual(actual, [0])
+        self.assertIn(b'[1] ', stdout.getvalue())
+        self.assertIn(b'version', stdout.getvalue())
@@ -0,0 +1,213 @@
+from __future__ import print_function, unicode_literals
+import importlib
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import mock
+from six.moves import configparser
+
+from multinosetests.impact import (
+    ChangeSetError,
+    build_index_entry,
+    get_affected_tests,
+    get_changed_files,
+    get_context_environment,
+    load_impact_index,
+    read_coverage_config,
+    save_impact_index,
+    write_context_config,
+)
+
+
+class TestImpact(unittest.TestCase):
+    """
+    Tests for test impact analysis helpers
+    """
+
+    def setUp(self):
+        super(TestImpact, self).setUp()
+        self.tmpdir = os.path.realpath(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        cwd = os.getcwd()
+        os.chdir(self.tmpdir)
+        self.addCleanup(os.chdir, cwd)
+
+    def write(self, name, content):
+        with io.open(name, 'w') as fid:
+            fid.write(content)
+
+    def read_config(self, path):
+        config = configparser.RawConfigParser()
+        config.read(path)
+        return {i: dict(config.items(i)) for i in config.sections()}
+
+    def test_read_coverage_config(self):
+        self.write('setup.cfg', '[metadata]\nname = foo\n'
+                                '[coverage:run]\nbranch = True\n')
+        self.write('tox.ini', '[coverage:run]\nsource = bar\n')
+
+        config = read_coverage_config({})
+
+        self.assertListEqual(config.sections(), ['run'])
+        self.assertEqual(config.get('run', 'branch'), 'True')
+
+    def test_read_coverage_config_rcfile(self):
+        self.write('.coveragerc', '[run]\nbranch = True\n')
+        self.write('custom', '[report]\nprecision = 2\n')
+
+        config = read_coverage_config({'COVERAGE_RCFILE': 'custom'})
+
+        self.assertListEqual(config.sections(), ['report'])
+
+    def test_read_coverage_config_toml(self):
+        self.write('pyproject.toml', '[tool.coverage.run]\nbranch = true\n')
+
+        self.assertIsNone(read_coverage_config({}))
+        self.assertIsNone(write_context_config('contexts', {}))
+
+    def test_write_context_config(self):
+        self.write('.coveragerc', '[run]\nbranch = True\nplugins = foo\n')
+
+        directory = write_context_config(os.path.join('state', 'contexts'),
+                                         {})
+
+        self.assertEqual(directory, os.path.join(self.tmpdir, 'state',
+                                                 'contexts'))
+        config = self.read_config(os.path.join(directory, 'coveragerc'))
+        self.assertEqual(config['run']['branch'], 'True')
+        self.assertEqual(config['run']['plugins'].split(),
+                         ['foo', 'multinosetests_contexts'])
+        self.assertTrue(os.path.exists(
+            os.path.join(directory, 'multinosetests_contexts.py')
+        ))
+
+    def test_write_context_config_existing_context(self):
+        self.write('.coveragerc', '[run]\ndynamic_context = test_function\n')
+
+        self.assertIsNone(write_context_config('contexts', {}))
+
+    def test_get_context_environment(self):
+        env = get_context_environment({}, '/contexts')
+
+        self.assertDictEqual(env, {
+            'PYTHONPATH': '/contexts',
+            'COVERAGE_RCFILE': os.path.join('/contexts', 'coveragerc'),
+        })
+
+    def test_plugin(self):
+        directory = write_context_config('contexts', {})
+        sys.path.insert(0, directory)
+        self.addCleanup(sys.path.remove, directory)
+        plugin = importlib.import_module('multinosetests_contexts')
+        self.addCleanup(sys.modules.pop, 'multinosetests_contexts')
+        registry = mock.MagicMock()
+        plugin.coverage_init(registry, {})
+        switcher = registry.add_dynamic_context.call_args[0][0]
+
+        def runTest(self):
+            return switcher.dynamic_context(sys._getframe())
+
+        # nose wraps every test into nose.case.Test
+        Test = type(str('Test'), (object,), {
+            '__module__': 'nose.case',
+            'id': lambda self: 'tests.test_foo(1, 2)',
+            'runTest': runTest,
+        })
+        Other = type(str('Other'), (Test,), {'__module__': 'tests'})
+
+        self.assertEqual(Test().runTest(), 'tests.test_foo')
+        self.assertIsNone(Other().runTest())
+        self.assertIsNone(switcher.dynamic_context(sys._getframe()))
+
+    def test_build_index_entry(self):
+        entry = build_index_entry('nosetests tests', [
+            {'': ['/a.py', '/b.py', '/setup.py'], 't.test_a': ['/a.py']},
+            {'': ['/b.py'], 't.test_b': ['/a.py', '/b.py']},
+        ])
+
+        self.assertDictEqual(entry, {
+            'command': 'nosetests tests',
+            'tests': ['t.test_a', 't.test_b'],
+            'files': {'/a.py': [0, 1], '/b.py': [1]},
+            'setup': ['/setup.py'],
+        })
+
+    def test_get_affected_tests(self):
+        entry = build_index_entry('nosetests tests', [
+            {'': ['/setup.py'], 't.test_a': ['/a.py'], 't.test_b': ['/b.py']},
+        ])
+
+        self.assertSetEqual(get_affected_tests(entry, {'/a.py', '/c.py'}),
+                            {'t.test_a'})
+        self.assertSetEqual(get_affected_tests(entry, {'/c.py'}), set())
+        self.assertIsNone(get_affected_tests(entry, {'/a.py', '/setup.py'}))
+
+    def test_get_affected_tests_modules(self):
+        entry = build_index_entry('nosetests tests', [
+            {'t.test_a': ['/pkg/a.py']},
+        ])
+        modules = {'/tests/t.py': {'t.test_a', 't.test_b'}}
+        sources = ['/pkg', '/tests']
+
+        # test modules are not measured with --cover-package
+        self.assertSetEqual(
+            get_affected_tests(entry, {'/tests/t.py'}, modules, sources),
+            {'t.test_a', 't.test_b'},
+        )
+        self.assertSetEqual(
+            get_affected_tests(entry, {'/pkg/a.py', '/docs/index.rst'},
+                               modules, sources),
+            {'t.test_a'},
+        )
+        # e.g. test fixtures or modules not imported by any test
+        self.assertIsNone(get_affected_tests(entry, {'/tests/data.json'},
+                                             modules, sources))
+        self.assertIsNone(get_affected_tests(entry, {'/pkg/b.py'},
+                                             modules, sources))
+
+    def test_impact_index(self):
+        path = os.path.join('state', 'impact.json')
+        self.assertDictEqual(load_impact_index(path), {})
+
+        save_impact_index(path, {'abc': {'tests': ['t.test_a']}})
+
+        self.assertDictEqual(load_impact_index(path),
+                             {'abc': {'tests': ['t.test_a']}})
+
+        self.write(path, '{corrupt')
+        self.assertDictEqual(load_impact_index(path), {})
+
+    def git(self, *args):
+        with open(os.devnull, 'wb') as devnull:
+            subprocess.check_call(
+                ('git', '-c', 'user.name=test', '-c', 'user.email=test@test')
+                + args,
+                stdout=devnull,
+                stderr=devnull,
+            )
+
+    def test_get_changed_files(self):
+        try:
+            self.git('init', '-q')
+        except OSError:
+            self.skipTest('git is not available')
+        os.makedirs('pkg')
+        for name in ('a.py', 'b.py', os.path.join('pkg', 'c.py')):
+            self.write(name, 'a = 1\n')
+        self.git('add', '.')
+        self.git('commit', '-q', '-m', 'initial')
+        self.write('a.py', 'a = 2\n')
+        self.write(os.path.join('pkg', 'd.py'), 'd = 1\n')
+        os.chdir('pkg')
+
+        self.assertSetEqual(get_changed_files('HEAD'), {
+            os.path.join(self.tmpdir, 'a.py'),
+            os.path.join(self.tmpdir, 'pkg', 'd.py'),
+        })
+        with self.assertRaises(ChangeSetError):
+            get_changed_files('missing')
@@ -1,9 +1,11 @@
 from __future__ import print_function, unicode_literals
+import os
 import unittest
 
 import mock
 
-from multinosetests import main
+from multinosetests import main, parser
+from multinosetests.impact import ChangeSetError
 
 
 TESTING_MODULE = 'multinosetests'
@@ -26,11 +28,30 @@ class TestMultiNoseTests(unittest.TestCase):
         super(TestMultiNoseTests, self).setUp()
         self.invalid_cmd = 'nosetests foo bar'
         self.valid_cmd = 'nosetests foo bar --with-xunit --with-coverage'
+        patcher = mock.patch(TESTING_MODULE + '.ArtifactStore')
+        self.mock_artifacts = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch(TESTING_MODULE + '.write_context_config')
+        self.mock_context_config = patcher.start()
+        self.addCleanup(patcher.stop)
+        # handler of interrupts is not installed into the test runner
+        patcher = mock.patch('signal.signal')
+        self.mock_signal = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_args(self, *argv, **kwargs):
+        """
+        Get parsed arguments of the real parser for the given
+        argv with any of the parsed values overwritten by kwargs
+        """
+        args = parser.parse_args(list(argv))
+        for key, value in kwargs.items():
+            setattr(args, key, value)
+        return args
 
     @mock.patch(TESTING_MODULE + '.parser')
     def test_main_invalid(self, mock_parser):
-        mock_parser.parse_args.return_value = mock_parser
-        mock_parser.command = [self.invalid_cmd]
+        mock_parser.parse_args.return_value = self.get_args(self.invalid_cmd)
         mock_parser.error.side_effect = mock_error
 
         regex = r'^\n\nErrors found in nosetests commands:.*'
@@ -39,44 +60,622 @@ class TestMultiNoseTests(unittest.TestCase):
 
     @mock.patch(TESTING_MODULE + '.status_print', mock.MagicMock())
     @mock.patch('sys.exit')
+    @mock.patch(TESTING_MODULE + '.TimingCache')
     @mock.patch(TESTING_MODULE + '.NosetestsCall')
     @mock.patch(TESTING_MODULE + '.parser')
     def test_main_valid_success(self,
                                 mock_parser,
                                 mock_nosetests,
+                                mock_timings,
                                 mock_sys_exit):
-        mock_parser.parse_args.return_value = mock_parser
-        mock_parser.command = [self.valid_cmd]
+        mock_parser.parse_args.return_value = self.get_args(
+            self.valid_cmd,
+            '--jobs=4',
+            '--coverage-html=htmlcov',
+        )
         mock_nose = mock.MagicMock()
-        mock_nose.return_value = 0
         mock_nosetests.return_value = mock_nose
+        mock_nosetests.run_calls.return_value = [0]
 
         main()
 
+        mock_timings.assert_called_once_with('.multinosetests/timings.json')
+        timings = mock_timings.return_value.load.return_value
+        mock_nosetests.run_calls.assert_called_once_with(
+            [mock_nose],
+            jobs=4,
+            durations=timings.estimate.return_value,
+            engine='asyncio',
+            workers=[],
+            worker_token=None,
+            adaptive=True,
+        )
+        timings.record.assert_called_once_with(mock_nose.command,
+                                               mock_nose.duration)
+        timings.save.assert_called_once_with()
+
         mock_nosetests.merge_calls.assert_called_once_with(
             [mock_nose],
-            report_coverage=True
+            report_coverage=True,
+            merge_engine='stream',
+            coverage_xml=None,
+            coverage_html='htmlcov',
+            timings=timings,
+            durations=0,
+            summary_file=None,
+            compression=None,
+            max_output=None,
+            keep_reports=False,
+            keep_coverage=False,
         )
         mock_sys_exit.assert_called_once_with(0)
 
     @mock.patch(TESTING_MODULE + '.status_print', mock.MagicMock())
     @mock.patch('sys.exit')
+    @mock.patch(TESTING_MODULE + '.TimingCache')
     @mock.patch(TESTING_MODULE + '.NosetestsCall')
     @mock.patch(TESTING_MODULE + '.parser')
     def test_main_valid_failure(self,
                                 mock_parser,
                                 mock_nosetests,
+                                mock_timings,
                                 mock_sys_exit):
-        mock_parser.parse_args.return_value = mock_parser
-        mock_parser.command = [self.valid_cmd]
+        mock_parser.parse_args.return_value = self.get_args(
+            self.valid_cmd,
+            '--jobs=4',
+            '--coverage-html=htmlcov',
+        )
         mock_nose = mock.MagicMock()
-        mock_nose.return_value = 5
         mock_nosetests.return_value = mock_nose
+        mock_nosetests.run_calls.return_value = [5]
 
         main()
 
+        mock_timings.assert_called_once_with('.multinosetests/timings.json')
+        timings = mock_timings.return_value.load.return_value
+        mock_nosetests.run_calls.assert_called_once_with(
+            [mock_nose],
+            jobs=4,
+            durations=timings.estimate.return_value,
+            engine='asyncio',
+            workers=[],
+            worker_token=None,
+            adaptive=True,
+        )
+        timings.record.assert_called_once_with(mock_nose.command,
+                                               mock_nose.duration)
+        timings.save.assert_called_once_with()
+
         mock_nosetests.merge_calls.assert_called_once_with(
             [mock_nose],
-            report_coverage=False
+            report_coverage=False,
+            merge_engine='stream',
+            coverage_xml=None,
+            coverage_html='htmlcov',
+            timings=timings,
+            durations=0,
+            summary_file=None,
+            compression=None,
+            max_output=None,
+            keep_reports=False,
+            keep_coverage=False,
         )
         mock_sys_exit.assert_called_once_with(1)
+
+    @mock.patch(TESTING_MODULE + '.parser')
+    def test_main_invalid_jobs(self, mock_parser):
+        mock_parser.parse_args.return_value = self.get_args(self.valid_cmd,
+                                                            jobs=0)
+        mock_parser.error.side_effect = mock_error
+
+        with self.assertRaisesRegexp(ValueError, '--jobs'):
+            main()
+
+    @mock.patch(TESTING_MODULE + '.status_print', mock.MagicMock())
+    @mock.patch('sys.exit', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.TimingCache', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.get_cpu_count')
+    @mock.patch(TESTING_MODULE + '.NosetestsCall')
+    @mock.patch(TESTING_MODULE + '.parser')
+    def test_main_default_jobs(self,
+                               mock_parser,
+                               mock_nosetests,
+                               mock_cpu_count):
+        args = self.get_args(self.valid_cmd)
+        # CPUs are not counted when the parser is created
+        self.assertIsNone(args.jobs)
+        mock_parser.parse_args.return_value = args
+        mock_nosetests.run_calls.return_value = [0]
+        mock_cpu_count.return_value = 7
+
+        main()
+
+        self.assertEqual(mock_nosetests.run_calls.call_args[1]['jobs'], 7)
+
+    @mock.patch(TESTING_MODULE + '.parser')
+    def test_main_invalid_timeout(self, mock_parser):
+        mock_parser.parse_args.return_value = self.get_args(
+            self.valid_cmd, self.valid_cmd, self.valid_cmd,
+            '--timeout=1', '--timeout=2',
+        )
+        mock_parser.error.side_effect = mock_error
+
+        with self.assertRaisesRegexp(ValueError, '--timeout'):
+            main()
+
+    @mock.patch(TESTING_MODULE + '.sys.exit', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.TimingCache', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.NosetestsCall')
+    @mock.patch(TESTING_MODULE + '.parser')
+    def test_main_timeout(self, mock_parser, mock_nosetests):
+        mock_parser.parse_args.return_value = self.get_args(
+            'foo', 'bar', '--timeout=1', '--timeout=2',
+        )
+        mock_nosetests.return_value.is_valid.return_value = True
+        mock_nosetests.run_calls.return_value = [0, 0]
+
+        main()
+
+        mock_nosetests.assert_has_calls([
+            mock.call('foo', shell=False, timeout=1.0, weight=1, memory=None),
+            mock.call('bar', shell=False, timeout=2.0, weight=1, memory=None),
+        ])
+
+    @mock.patch(TESTING_MODULE + '.sys.exit', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.TimingCache', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.NosetestsCall')
+    @mock.patch(TESTING_MODULE + '.parser')
+    def test_main_weights(self, mock_parser, mock_nosetests):
+        mock_parser.parse_args.return_value = self.get_args(
+            'foo', 'bar', '--weight=2', '--memory=1', '--memory=3',
+            '--fixed-jobs',
+        )
+        mock_nosetests.return_value.is_valid.return_value = True
+        mock_nosetests.run_calls.return_value = [0, 0]
+
+        main()
+
+        mock_nosetests.assert_has_calls([
+            mock.call('foo', shell=False, timeout=None,
+                      weight=2.0, memory=1024 * 1024),
+            mock.call('bar', shell=False, timeout=None,
+                      weight=2.0, memory=3 * 1024 * 1024),
+        ])
+        self.assertFalse(mock_nosetests.run_calls.call_args[1]['adaptive'])
+
+    @mock.patch(TESTING_MODULE + '.sys.exit', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.TimingCache', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.NosetestsCall')
+    @mock.patch(TESTING_MODULE + '.parser')
+    def test_main_dedupe(self, mock_parser, mock_nosetests):
+        mock_parser.parse_args.return_value = self.get_args(
+            self.valid_cmd, self.valid_cmd, '--dedupe', '--jobs=3',
+        )
+        mock_nose = mock.MagicMock()
+        mock_nosetests.dedupe_calls.return_value = [mock_nose]
+        mock_nosetests.run_calls.return_value = [0]
+
+        main()
+
+        mock_nosetests.dedupe_calls.assert_called_once_with(
+            [mock_nosetests.return_value] * 2, rewrite=True, jobs=3,
+        )
+        self.assertListEqual(mock_nosetests.run_calls.call_args[0][0],
+                             [mock_nose])
+
+    @mock.patch(TESTING_MODULE + '.status_print', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.sys.exit', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.TimingCache', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.load_impact_index')
+    @mock.patch(TESTING_MODULE + '.get_changed_files')
+    @mock.patch(TESTING_MODULE + '.NosetestsCall')
+    @mock.patch(TESTING_MODULE + '.parser')
+    def test_main_changed_since(self,
+                                mock_parser,
+                                mock_nosetests,
+                                mock_changed,
+                                mock_index):
+        mock_parser.parse_args.return_value = self.get_args(
+            self.valid_cmd, '--changed-since=master', '--jobs=3',
+        )
+        mock_nose = mock.MagicMock()
+        mock_nosetests.select_changed.return_value = [mock_nose]
+        mock_nosetests.get_units.return_value = ([mock_nose], [0])
+        mock_nosetests.run_calls.return_value = [0]
+
+        main()
+
+        mock_changed.assert_called_once_with('master')
+        mock_index.assert_called_once_with('.multinosetests/impact.json')
+        mock_nosetests.select_changed.assert_called_once_with(
+            [mock_nosetests.return_value],
+            mock_changed.return_value,
+            mock_index.return_value,
+            jobs=3,
+            ignore=['nosetests.xml', 'nosetests.prof',
+                    '.multinosetests/timings.json', '.multinosetests/cache'],
+        )
+        self.assertTrue(
+            mock_nosetests.merge_calls.call_args[1]['keep_coverage']
+        )
+        self.assertListEqual(mock_nosetests.run_calls.call_args[0][0],
+                             [mock_nose])
+        self.mock_context_config.assert_called_once_with(
+            '.multinosetests/contexts'
+        )
+        self.assertIs(mock_nose.context_dir,
+                      self.mock_context_config.return_value)
+        mock_nosetests.update_impact_index.assert_called_once_with(
+            [mock_nose]
+        )
+
+    @mock.patch(TESTING_MODULE + '.status_print', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.sys.exit')
+    @mock.patch(TESTING_MODULE + '.get_changed_files', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.NosetestsCall')
+    @mock.patch(TESTING_MODULE + '.parser')
+    def test_main_changed_since_nothing_affected(self,
+                                                 mock_parser,
+                                                 mock_nosetests,
+                                                 mock_sys_exit):
+        mock_parser.parse_args.return_value = self.get_args(
+            self.valid_cmd, '--changed-since=master',
+        )
+        mock_nosetests.select_changed.return_value = []
+        mock_sys_exit.side_effect = SystemExit
+
+        with self.assertRaises(SystemExit):
+            main()
+
+        mock_sys_exit.assert_called_once_with(0)
+        self.assertFalse(mock_nosetests.run_calls.called)
+
+    @mock.patch(TESTING_MODULE + '.get_changed_files')
+    @mock.patch(TESTING_MODULE + '.parser')
+    def test_main_changed_since_invalid(self, mock_parser, mock_changed):
+        mock_parser.parse_args.return_value = self.get_args(
+            self.valid_cmd, '--changed-since=foo',
+        )
+        mock_parser.error.side_effect = mock_error
+        mock_changed.side_effect = ChangeSetError('git diff failed')
+
+        with self.assertRaisesRegexp(ValueError, 'git diff failed'):
+            main()
+
+    @mock.patch(TESTING_MODULE + '.status_print', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.sys.exit')
+    @mock.patch(TESTING_MODULE + '.TimingCache', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.SourceWatcher')
+    @mock.patch(TESTING_MODULE + '.get_source_paths')
+    @mock.patch(TESTING_MODULE + '.NosetestsCall')
+    @mock.patch(TESTING_MODULE + '.parser')
+    def test_main_watch(self,
+                        mock_parser,
+                        mock_nosetests,
+                        mock_source_paths,
+                        mock_watcher,
+                        mock_sys_exit):
+        mock_parser.parse_args.return_value = self.get_args(
+            'nosetests foo --with-xunit --cover-package=bar',
+            self.valid_cmd,
+            '--watch',
+            '--watch-interval=0.5',
+            '--coverage-xml=coverage.xml',
+        )
+        changed = mock.MagicMock(cached=False, shards=[], return_code=0,
+                                 command='nosetests foo')
+        unchanged = mock.MagicMock(cached=False, shards=[], return_code=1,
+                                   command='nosetests bar')
+        mock_nosetests.side_effect = [changed, unchanged]
+        mock_nosetests.run_calls.side_effect = [[0, 1], [0, 1]]
+        watcher = mock_watcher.return_value
+        watcher.wait.side_effect = [{'/foo/a.py'}, KeyboardInterrupt]
+        watcher.get_changed_suites.return_value = [0]
+
+        main()
+
+        mock_source_paths.assert_has_calls([mock.call('nosetests foo'),
+                                            mock.call('nosetests bar')])
+        self.assertListEqual(mock_watcher.call_args[0][0],
+                             [mock_source_paths.return_value] * 2)
+        self.assertEqual(mock_watcher.call_args[1]['interval'], 0.5)
+        self.assertIn('coverage.xml', mock_watcher.call_args[1]['ignore'])
+        self.assertListEqual(mock_nosetests.run_calls.call_args[0][0],
+                             [changed.clone.return_value, unchanged])
+        self.assertTrue(unchanged.cached)
+        self.assertTrue(
+            mock_nosetests.merge_calls.call_args[1]['keep_reports']
+        )
+        mock_sys_exit.assert_called_once_with(1)
+
+    @mock.patch(TESTING_MODULE + '.parser')
+    def test_main_invalid_weight(self, mock_parser):
+        mock_parser.parse_args.return_value = self.get_args(
+            self.valid_cmd, '--weight=0',
+        )
+        mock_parser.error.side_effect = mock_error
+
+        with self.assertRaisesRegexp(ValueError, '--weight'):
+            main()
+
+    @mock.patch(TESTING_MODULE + '.sys.exit', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.TimingCache', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.NosetestsCall')
+    @mock.patch(TESTING_MODULE + '.parser')
+    def test_main_workers(self, mock_parser, mock_nosetests):
+        mock_parser.parse_args.return_value = self.get_args(
+            self.valid_cmd, '--worker=foo:1234', '--worker=bar',
+        )
+        mock_nosetests.run_calls.return_value = [0]
+
+        with mock.patch.dict(os.environ,
+                             {'MULTINOSETESTS_WORKER_TOKEN': 'secret'}):
+            main()
+
+        self.assertListEqual(
+            mock_nosetests.run_calls.call_args[1]['workers'],
+            [('foo', 1234), ('bar', 8757)],
+        )
+        self.assertEqual(
+            mock_nosetests.run_calls.call_args[1]['worker_token'], 'secret',
+        )
+
+    @mock.patch(TESTING_MODULE + '.parser')
+    def test_main_worker_without_token(self, mock_parser):
+        mock_parser.parse_args.return_value = self.get_args(
+            self.valid_cmd, '--worker=foo:1234',
+        )
+        mock_parser.error.side_effect = mock_error
+
+        with mock.patch.dict(os.environ, clear=True):
+            with self.assertRaisesRegexp(ValueError, '--worker-token'):
+                main()
+
+    @mock.patch(TESTING_MODULE + '.sys.exit', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.TimingCache', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.ForkServer')
+    @mock.patch(TESTING_MODULE + '.NosetestsCall')
+    @mock.patch(TESTING_MODULE + '.parser')
+    def test_main_preload(self, mock_parser, mock_nosetests, mock_server):
+        mock_parser.parse_args.return_value = self.get_args(
+            self.valid_cmd, '--preload=django, sqlalchemy',
+        )
+        mock_nose = mock.MagicMock()
+        mock_nosetests.get_units.return_value = ([mock_nose], [0])
+        closed = []
+        mock_nosetests.run_calls.side_effect = lambda *args, **kwargs: (
+            closed.append(mock_server.return_value.close.called) or [0]
+        )
+
+        main()
+
+        mock_server.assert_called_once_with(['django', 'sqlalchemy'])
+        self.assertIs(mock_nose.fork_server, mock_server.return_value)
+        # server is running while suites are executed
+        self.assertListEqual(closed, [False])
+        mock_server.return_value.close.assert_called_once_with()
+
+    @mock.patch(TESTING_MODULE + '.sys.exit', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.TimingCache', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.write_hook')
+    @mock.patch(TESTING_MODULE + '.NosetestsCall')
+    @mock.patch(TESTING_MODULE + '.parser')
+    def test_main_profile(self, mock_parser, mock_nosetests, mock_write_hook):
+        mock_parser.parse_args.return_value = self.get_args(
+            self.valid_cmd, '--profile', '--profile-hotspots=5',
+        )
+        mock_nose = mock.MagicMock()
+        mock_nosetests.get_units.return_value = ([mock_nose], [0])
+        mock_nosetests.run_calls.return_value = [0]
+
+        main()
+
+        mock_write_hook.assert_called_once_with('.multinosetests/profile')
+        self.assertIs(mock_nose.profile_hook, mock_write_hook.return_value)
+        mock_nosetests.merge_profiles.assert_called_once_with(
+            [mock_nosetests.return_value], hotspots=5,
+        )
+
+    @mock.patch(TESTING_MODULE + '.status_print', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.sys.exit')
+    @mock.patch(TESTING_MODULE + '.TimingCache', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.NosetestsCall')
+    @mock.patch(TESTING_MODULE + '.parser')
+    def test_main_rerun_failures(self,
+                                 mock_parser,
+                                 mock_nosetests,
+                                 mock_sys_exit):
+        mock_parser.parse_args.return_value = self.get_args(
+            self.valid_cmd, '--rerun-failures=2', '--jobs=3',
+        )
+        mock_nose = mock.MagicMock()
+        mock_nosetests.return_value = mock_nose
+        mock_nosetests.run_calls.return_value = [1]
+        mock_nosetests.rerun_calls.return_value = [0]
+
+        main()
+
+        mock_nosetests.rerun_calls.assert_called_once_with(
+            [mock_nose], 2, jobs=3, engine='asyncio', adaptive=True,
+        )
+        self.assertTrue(
+            mock_nosetests.merge_calls.call_args[1]['report_coverage']
+        )
+        mock_sys_exit.assert_called_once_with(0)
+
+    @mock.patch(TESTING_MODULE + '.status_print', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.sys.exit', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.TimingCache', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.NosetestsCall')
+    @mock.patch(TESTING_MODULE + '.parser')
+    def test_main_artifacts(self, mock_parser, mock_nosetests):
+        mock_parser.parse_args.return_value = self.get_args(
+            self.valid_cmd, '--artifacts-age=2', '--artifacts-size=3',
+        )
+        mock_nose = mock.MagicMock(key='abc')
+        mock_shard = mock.MagicMock()
+        mock_nosetests.return_value = mock_nose
+        mock_nosetests.get_units.return_value = ([mock_shard], [0])
+        mock_nosetests.run_calls.return_value = [0]
+
+        main()
+
+        self.mock_artifacts.assert_called_once_with(
+            '.multinosetests/artifacts', 2 * 60 * 60, 3 * 1024 * 1024,
+        )
+        store = self.mock_artifacts.return_value
+        store.collect.assert_called_once_with(keep=['abc'])
+        store.register.assert_called_once_with([mock_nose, mock_shard])
+
+    @mock.patch(TESTING_MODULE + '.parser')
+    def test_main_invalid_worker(self, mock_parser):
+        mock_parser.parse_args.return_value = self.get_args(
+            self.valid_cmd, '--worker=foo:bar',
+        )
+        mock_parser.error.side_effect = mock_error
+
+        with self.assertRaisesRegexp(ValueError, 'Invalid port'):
+            main()
+
+    @mock.patch(TESTING_MODULE + '.status_print_plan')
+    @mock.patch('sys.exit')
+    @mock.patch(TESTING_MODULE + '.TimingCache')
+    @mock.patch(TESTING_MODULE + '.NosetestsCall')
+    @mock.patch(TESTING_MODULE + '.parser')
+    def test_main_plan(self,
+                       mock_parser,
+                       mock_nosetests,
+                       mock_timings,
+                       mock_sys_exit,
+                       mock_status_print_plan):
+        mock_parser.parse_args.return_value = self.get_args(
+            self.valid_cmd,
+            '--jobs=2',
+            '--plan',
+        )
+        mock_sys_exit.side_effect = SystemExit
+        mock_nose = mock.MagicMock()
+        mock_nose.command = self.valid_cmd
+        mock_nosetests.return_value = mock_nose
+        mock_shard = mock.MagicMock()
+        mock_nosetests.get_units.return_value = (
+            [mock_nose, mock_shard],
+            [10, 5],
+        )
+        timings = mock_timings.return_value.load.return_value
+        timings.suites = {}
+
+        with self.assertRaises(SystemExit):
+            main()
+
+        mock_nosetests.get_units.assert_called_once_with(
+            [mock_nose],
+            timings.estimate.return_value,
+        )
+        mock_status_print_plan.assert_called_once_with(
+            [mock_nose, mock_shard],
+            [10, 5],
+            2,
+            known=[False, True],
+        )
+        mock_sys_exit.assert_called_once_with(0)
+        self.assertFalse(mock_nosetests.run_calls.called)
+        self.assertFalse(mock_nose.shard.called)
+        self.assertFalse(self.mock_artifacts.return_value.collect.called)
+
+    @mock.patch(TESTING_MODULE + '.status_print_plan', mock.MagicMock())
+    @mock.patch('sys.exit')
+    @mock.patch(TESTING_MODULE + '.TimingCache', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.ResultCache')
+    @mock.patch(TESTING_MODULE + '.NosetestsCall')
+    @mock.patch(TESTING_MODULE + '.parser')
+    def test_main_plan_cache(self,
+                             mock_parser,
+                             mock_nosetests,
+                             mock_cache,
+                             mock_sys_exit):
+        mock_parser.parse_args.return_value = self.get_args(
+            self.valid_cmd,
+            '--plan',
+            '--cache',
+        )
+        mock_sys_exit.side_effect = SystemExit
+        mock_nose = mock.MagicMock(cached=False)
+        mock_nosetests.return_value = mock_nose
+        mock_nosetests.get_units.return_value = ([], [])
+        cache = mock_cache.return_value
+
+        with self.assertRaises(SystemExit):
+            main()
+
+        # cached suites are looked up without being restored
+        cache.contains.assert_called_once_with(
+            cache.get_key.return_value,
+        )
+        self.assertIs(mock_nose.cached, cache.contains.return_value)
+        self.assertFalse(cache.restore.called)
+
+    @mock.patch(TESTING_MODULE + '.status_print', mock.MagicMock())
+    @mock.patch('sys.exit', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.TimingCache')
+    @mock.patch(TESTING_MODULE + '.NosetestsCall')
+    @mock.patch(TESTING_MODULE + '.parser')
+    def test_main_shard_suite(self,
+                              mock_parser,
+                              mock_nosetests,
+                              mock_timings):
+        mock_parser.parse_args.return_value = self.get_args(
+            self.valid_cmd,
+            '--shard-suite=3',
+        )
+        mock_nose = mock.MagicMock(cached=False)
+        mock_nosetests.return_value = mock_nose
+        mock_nosetests.run_calls.return_value = [0]
+
+        main()
+
+        mock_nose.shard.assert_called_once_with(
+            3,
+            mock_timings.return_value.load.return_value,
+        )
+
+    @mock.patch(TESTING_MODULE + '.status_print', mock.MagicMock())
+    @mock.patch('sys.exit', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.TimingCache', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.ResultCache')
+    @mock.patch(TESTING_MODULE + '.NosetestsCall')
+    @mock.patch(TESTING_MODULE + '.parser')
+    def test_main_cache(self,
+                        mock_parser,
+                        mock_nosetests,
+                        mock_cache):
+        mock_parser.parse_args.return_value = self.get_args(
+            self.valid_cmd,
+            self.valid_cmd + ' --collect-only',
+            '--cache',
+            '--cache-size=2',
+        )
+        cached = mock.MagicMock(cached=False)
+        executed = mock.MagicMock(cached=False)
+        mock_nosetests.side_effect = [cached, executed]
+        mock_nosetests.run_calls.return_value = [0, 0]
+        cache = mock_cache.return_value
+        cache.get_key.side_effect = ['foo', 'bar']
+        cache.restore.side_effect = (
+            lambda nose, key: setattr(nose, 'cached', key == 'foo')
+        )
+
+        main()
+
+        mock_cache.assert_called_once_with(
+            '.multinosetests/cache',
+            2 * 1024 * 1024,
+            ignore=['nosetests.xml', 'nosetests.prof',
+                    '.multinosetests/timings.json', '.multinosetests/cache'],
+        )
+        cache.restore.assert_has_calls([
+            mock.call(cached, 'foo'),
+            mock.call(executed, 'bar'),
+        ])
+        cache.store.assert_called_once_with(executed, 'bar')
+        cache.evict.assert_called_once_with()
@@ -1,20 +1,53 @@
 from __future__ import print_function, unicode_literals
+import cProfile
+import errno
+import json
+import os
+import pstats
+import shutil
 import sys
+import tempfile
+import time
 import unittest
 
 import mock
+from coverage import CoverageException
 
 from multinosetests.multinosetests import (
+    ARTIFACTS_DIR,
     NosetestsCall,
+    combine_reports,
     get_nose_xml_report,
     status_print,
+    status_print_plan,
+    status_print_durations,
+    status_print_hotspots,
     status_print_report,
     terminal,
+    write_summary_file,
 )
+from multinosetests.impact import load_impact_index, save_impact_index
+from multinosetests.results import encode_record, read_records
+from multinosetests.xunit import get_testcase_outcome, iter_testcases
 
 
 TESTING_MODULE = 'multinosetests.multinosetests'
 
+REPORT = """<?xml version="1.0" encoding="UTF-8"?>
+<testsuite name="nosetests" tests="4" errors="1" failures="1" skip="1">
+<testcase classname="foo.Foo" name="test_ok" time="0.250"/>
+<testcase classname="foo.Foo" name="test_error" time="0.500">
+<error type="KeyError" message="bad">Traceback</error>
+</testcase>
+<testcase classname="foo.Foo" name="test_failure" time="0.750">
+<failure type="AssertionError" message="nope">Traceback</failure>
+</testcase>
+<testcase classname="foo.Foo" name="test_skipped" time="0">
+<skipped type="unittest.case.SkipTest" message="skip">skip</skipped>
+</testcase>
+</testsuite>
+"""
+
 
 class TestNosetestsCall(unittest.TestCase):
     """
@@ -34,7 +67,7 @@ class TestNosetestsCall(unittest.TestCase):
         self.assertEqual(nose.command, 'foo')
         self.assertListEqual(nose.errors, [])
         self.assertIsNone(nose.return_code)
-        self.assertIsNone(nose.coverage_data)
+        self.assertIsNone(nose.duration)
 
     def test_is_valid(self):
         nose = NosetestsCall('')
@@ -72,6 +105,32 @@ class TestNosetestsCall(unittest.TestCase):
         self.assertTrue(actual)
         self.assertListEqual(nose.errors, [])
 
+        cmd = 'nosetests --with-xunit | tee out'
+        nose = NosetestsCall(cmd)
+        actual = nose.is_valid()
+        self.assertFalse(actual)
+        self.assertListEqual(
+            nose.errors,
+            ['| can only be used with --shell in `{}`'.format(cmd)]
+        )
+        self.assertTrue(NosetestsCall(cmd, shell=True).is_valid())
+
+        cmd = 'nosetests --with-xunit tests/test_*.py $EXTRA'
+        nose = NosetestsCall(cmd)
+        self.assertFalse(nose.is_valid())
+        self.assertListEqual(
+            nose.errors,
+            ['*, $ can only be used with --shell in `{}`'.format(cmd)]
+        )
+
+        cmd = 'nosetests --with-xunit "tests'
+        nose = NosetestsCall(cmd)
+        self.assertFalse(nose.is_valid())
+        self.assertListEqual(
+            nose.errors,
+            ['`{}` is not a valid command: No closing quotation'.format(cmd)]
+        )
+
     def test_is_covered(self):
         cmd = 'nosetests'
         nose = NosetestsCall(cmd)
@@ -81,39 +140,76 @@ class TestNosetestsCall(unittest.TestCase):
         nose = NosetestsCall(cmd)
         self.assertTrue(nose.is_covered())
 
-    def test_coverage_file(self):
-        cmd = 'nosetests foo bar rainbows'
+        cmd = 'nosetests tests/test_with_coverage.py'
         nose = NosetestsCall(cmd)
+        self.assertFalse(nose.is_covered())
+
+    def test_key(self):
+        nose = NosetestsCall('nosetests foo bar rainbows')
+        self.assertEqual(nose.key, 'a933cb3cfdb27226')
+        self.assertEqual(nose.key, NosetestsCall(nose.command).key)
+        self.assertNotEqual(nose.key, NosetestsCall('nosetests foo').key)
+
+    def test_coverage_file(self):
+        nose = NosetestsCall('nosetests foo bar rainbows')
         self.assertEqual(nose.coverage_file,
-                         '.coverage.{}'.format(abs(hash(cmd))))
+                         '.multinosetests/artifacts/.coverage.{}'
+                         ''.format(nose.key))
 
-    @mock.patch('os.unlink')
-    def test_read_coverage(self, mock_unlink):
-        mock_open = mock.mock_open(read_data='foo bar')
+    def test_ensure_artifacts_dir(self):
+        self.chdir_tmp()
+        os.rmdir(ARTIFACTS_DIR)
+        nose = NosetestsCall(self.cmd)
+        nose.ensure_artifacts_dir()
+        nose.ensure_artifacts_dir()
+
+        self.assertTrue(os.path.isdir(ARTIFACTS_DIR))
+
+    @mock.patch('os.path.exists')
+    def test_has_coverage(self, mock_exists):
+        nose = NosetestsCall(self.cmd)
 
+        self.assertEqual(nose.has_coverage, mock_exists.return_value)
+        mock_exists.assert_called_once_with(nose.coverage_file)
+
+    @mock.patch('os.unlink')
+    def test_remove_coverage(self, mock_unlink):
         nose = NosetestsCall(self.cmd)
-        with mock.patch(TESTING_MODULE + '.open', mock_open, create=True):
-            nose.read_coverage()
+        nose.remove_coverage()
+
+        mock_unlink.assert_called_once_with(nose.coverage_file)
 
-        mock_open.assert_any_call('.coverage', 'rb')
-        mock_unlink.assert_called_once_with('.coverage')
-        self.assertEqual(nose.coverage_data, 'foo bar')
+        mock_unlink.side_effect = OSError(errno.ENOENT, 'missing')
+        nose.remove_coverage()
 
-    def test_write_coverage(self):
-        mock_open = mock.mock_open()
+        mock_unlink.side_effect = OSError(errno.EACCES, 'denied')
+        with self.assertRaises(OSError):
+            nose.remove_coverage()
 
+    def test_collect_coverage(self):
+        self.chdir_tmp()
         nose = NosetestsCall(self.cmd)
-        nose.coverage_data = 'foo bar'
-        with mock.patch(TESTING_MODULE + '.open', mock_open, create=True):
-            nose.write_coverage()
+        self.assertFalse(nose.collect_coverage())
 
-        mock_open.assert_any_call(nose.coverage_file, 'wb')
-        mock_open.return_value.write.assert_called_once_with('foo bar')
+        with open(nose.coverage_file, 'wb') as fid:
+            fid.write(b'suite')
+        with open('.coverage', 'wb') as fid:
+            fid.write(b'other')
+        self.assertTrue(nose.collect_coverage())
+        with open(nose.coverage_file, 'rb') as fid:
+            self.assertEqual(fid.read(), b'suite')
+
+        # combined data of previous runs is not taken as data of the suite
+        os.unlink(nose.coverage_file)
+        self.assertFalse(nose.collect_coverage())
+        with open('.coverage', 'rb') as fid:
+            self.assertEqual(fid.read(), b'other')
 
     def test_xunit_file(self):
         nose = NosetestsCall(self.cmd)
         self.assertEqual(nose.xunit_file,
-                         'nosetests.{}.xml'.format(abs(hash(self.cmd))))
+                         '.multinosetests/artifacts/nosetests.{}.xml'
+                         ''.format(nose.key))
 
     def test_get_final_command(self):
         nose = NosetestsCall(self.cmd)
@@ -123,6 +219,94 @@ class TestNosetestsCall(unittest.TestCase):
             self.cmd + ' --xunit-file={}'.format(nose.xunit_file)
         )
 
+    def test_get_final_argv(self):
+        nose = NosetestsCall('FOO=bar ' + self.cmd)
+        actual = nose.get_final_argv()
+        self.assertListEqual(actual, [
+            'nosetests', 'foo', 'bar', 'rainbows',
+            '--xunit-file={}'.format(nose.xunit_file),
+        ])
+
+    def test_get_nose_argv(self):
+        nose = NosetestsCall('FOO=bar python -m nose foo')
+        actual = nose.get_nose_argv()
+        self.assertListEqual(actual, [
+            'nosetests', 'foo',
+            '--xunit-file={}'.format(nose.xunit_file),
+        ])
+
+    def test_start_process_forked(self):
+        server = mock.MagicMock()
+
+        nose = NosetestsCall(self.cmd, fork_server=server)
+        actual = nose.start_process(stdout=-1)
+
+        self.assertIs(actual, server.start.return_value)
+        server.start.assert_called_once_with(nose.get_nose_argv(),
+                                             env=mock.ANY,
+                                             stdout=-1)
+        # suites which do not run nose directly are never forked
+        self.assertFalse(NosetestsCall(self.cmd, shell=True,
+                                       fork_server=server).is_forked())
+        self.assertFalse(NosetestsCall('make test',
+                                       fork_server=server).is_forked())
+
+    def test_get_environment(self):
+        nose = NosetestsCall('FOO=bar ' + self.cmd)
+        actual = nose.get_environment()
+        self.assertEqual(actual['COVERAGE_FILE'], nose.coverage_file)
+        self.assertEqual(actual['MULTINOSETESTS_RESULTS'],
+                         os.path.abspath(nose.results_file))
+        self.assertEqual(actual['FOO'], 'bar')
+
+        nose = NosetestsCall('FOO=bar ' + self.cmd, shell=True)
+        actual = nose.get_environment()
+        self.assertNotIn('FOO', actual)
+
+    def test_get_environment_profile(self):
+        nose = NosetestsCall(self.cmd)
+        nose.profile_hook = '/hook'
+
+        actual = nose.get_environment()
+
+        self.assertEqual(actual['PYTHONPATH'].split(os.pathsep)[0], '/hook')
+        self.assertEqual(actual['MULTINOSETESTS_PROFILE'],
+                         os.path.abspath(nose.profile_file))
+        self.assertNotIn('MULTINOSETESTS_PROFILE',
+                         NosetestsCall(self.cmd).get_environment())
+
+    def test_get_environment_context_dir(self):
+        nose = NosetestsCall('PYTHONPATH=/lib nosetests --with-xunit '
+                             '--with-coverage')
+        nose.context_dir = '/contexts'
+        uncovered = NosetestsCall('nosetests --with-xunit')
+        uncovered.context_dir = '/contexts'
+
+        actual = nose.get_environment()
+
+        self.assertEqual(actual['COVERAGE_RCFILE'], '/contexts/coveragerc')
+        self.assertEqual(actual['PYTHONPATH'],
+                         os.pathsep.join(['/lib', '/contexts']))
+        self.assertEqual(uncovered.get_environment().get('COVERAGE_RCFILE'),
+                         os.environ.get('COVERAGE_RCFILE'))
+
+    def test_clone(self):
+        nose = NosetestsCall(self.cmd, shell=True, timeout=5, weight=2)
+        nose.return_code = 1
+        nose.cached = True
+
+        clone = nose.clone()
+        other = nose.clone('nosetests foo')
+
+        self.assertEqual(clone.command, self.cmd)
+        self.assertEqual(other.command, 'nosetests foo')
+        for i in (clone, other):
+            self.assertTrue(i.shell)
+            self.assertEqual(i.timeout, 5)
+            self.assertEqual(i.weight, 2)
+            self.assertIsNone(i.return_code)
+            self.assertFalse(i.cached)
+
     def test_hash(self):
         nose = NosetestsCall(self.cmd)
         self.assertEqual(hash(nose), hash(self.cmd))
@@ -132,61 +316,881 @@ class TestNosetestsCall(unittest.TestCase):
         self.assertEqual(str(nose), str(self.cmd))
 
     @mock.patch(TESTING_MODULE + '.status_print', mock.MagicMock())
-    @mock.patch(TESTING_MODULE + '.call')
-    @mock.patch.object(NosetestsCall, 'read_coverage')
+    @mock.patch.object(NosetestsCall, 'ensure_artifacts_dir', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.is_valid_report', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.SuiteProcess')
+    @mock.patch.object(NosetestsCall, 'remove_coverage')
+    @mock.patch.object(NosetestsCall, 'collect_coverage')
     @mock.patch.object(NosetestsCall, 'is_covered')
     def test_call(self,
                   mock_is_covered,
-                  mock_read_coverage,
-                  mock_call):
+                  mock_collect_coverage,
+                  mock_remove_coverage,
+                  mock_process):
         mock_is_covered.return_value = True
-        mock_call.return_value = 0
+        process = mock_process.return_value
+        process.return_code = 0
+        process.timed_out = False
 
-        nose = NosetestsCall(self.cmd)
+        nose = NosetestsCall(self.cmd, timeout=5)
         actual = nose()
 
         self.assertEqual(actual, 0)
-        mock_call.assert_called_once_with(nose.get_final_command(), shell=True)
-        mock_is_covered.assert_called_once_with()
-        mock_read_coverage.assert_called_once_with()
+        self.assertIsNotNone(nose.duration)
+        self.assertEqual(nose.usage, process.usage)
+        mock_process.assert_called_once_with(nose.get_final_argv(),
+                                             shell=False,
+                                             env=mock.ANY)
+        self.assertEqual(mock_process.call_args[1]['env']['COVERAGE_FILE'],
+                         nose.coverage_file)
+        process.wait.assert_called_once_with(5)
+        mock_remove_coverage.assert_called_once_with()
+        mock_collect_coverage.assert_called_once_with()
+
+    @mock.patch(TESTING_MODULE + '.status_print', mock.MagicMock())
+    @mock.patch.object(NosetestsCall, 'ensure_artifacts_dir', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.is_valid_report', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.SuiteProcess')
+    def test_call_shell(self, mock_process):
+        mock_process.return_value.return_code = 0
+
+        nose = NosetestsCall(self.cmd, shell=True)
+        actual = nose()
+
+        self.assertEqual(actual, 0)
+        mock_process.assert_called_once_with(nose.get_final_command(),
+                                             shell=True,
+                                             env=mock.ANY)
+
+    @mock.patch(TESTING_MODULE + '.status_print', mock.MagicMock())
+    @mock.patch.object(NosetestsCall, 'ensure_artifacts_dir', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.write_error_report')
+    @mock.patch(TESTING_MODULE + '.is_valid_report')
+    @mock.patch(TESTING_MODULE + '.SuiteProcess')
+    def test_call_not_found(self,
+                            mock_process,
+                            mock_is_valid_report,
+                            mock_write_error_report):
+        mock_process.side_effect = OSError
+        mock_is_valid_report.return_value = False
+
+        nose = NosetestsCall(self.cmd)
+        actual = nose()
+
+        self.assertEqual(actual, 127)
+        self.assertEqual(nose.return_code, 127)
+        mock_write_error_report.assert_called_once_with(
+            nose.xunit_file,
+            classname='multinosetests',
+            name=self.cmd,
+            error_type='Crash',
+            message='Suite exited with code 127 without writing '
+                    'its xml report',
+            time=nose.duration,
+        )
+
+    @mock.patch(TESTING_MODULE + '.status_print', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.write_error_report')
+    @mock.patch(TESTING_MODULE + '.is_valid_report')
+    def test_ensure_xunit_file(self,
+                               mock_is_valid_report,
+                               mock_write_error_report):
+        nose = NosetestsCall(self.cmd, timeout=5)
+
+        mock_is_valid_report.return_value = True
+        self.assertFalse(nose.ensure_xunit_file())
+        self.assertFalse(mock_write_error_report.called)
+
+        mock_is_valid_report.return_value = False
+        nose.return_code = -11
+        self.assertTrue(nose.ensure_xunit_file())
+        self.assertEqual(
+            mock_write_error_report.call_args[1]['message'],
+            'Suite was killed by SIGSEGV before writing its xml report',
+        )
+
+        nose.timed_out = True
+        self.assertTrue(nose.ensure_xunit_file())
+        self.assertEqual(
+            mock_write_error_report.call_args[1]['error_type'],
+            'Timeout',
+        )
+        self.assertEqual(
+            mock_write_error_report.call_args[1]['message'],
+            'Suite timed out after 5s and was terminated',
+        )
+
+    @mock.patch(TESTING_MODULE + '.status_print', mock.MagicMock())
+    def test_ensure_xunit_file_results(self):
+        self.chdir_tmp()
+        nose = NosetestsCall(self.cmd)
+        nose.return_code = -9
+        nose.duration = 2.0
+        with open(nose.results_file, 'wb') as fid:
+            fid.write(encode_record({'classname': 'foo.Foo',
+                                     'name': 'test_ok',
+                                     'time': 0.5,
+                                     'outcome': None}))
+
+        self.assertTrue(nose.ensure_xunit_file())
+
+        self.assertListEqual(
+            [(i.get('name'), get_testcase_outcome(i))
+             for i in iter_testcases(nose.xunit_file)],
+            [('test_ok', None), (self.cmd, 'errors')],
+        )
+        self.assertEqual(list(read_records(nose.results_file))[-1]['type'],
+                         'Crash')
+
+    def test_get_report(self):
+        self.chdir_tmp()
+        nose = NosetestsCall(self.cmd)
+        with open(nose.xunit_file, 'wb') as fid:
+            fid.write(REPORT.encode('utf-8'))
+        with open(nose.results_file, 'wb') as fid:
+            fid.write(encode_record({'classname': 'foo.Foo',
+                                     'name': 'test_error',
+                                     'time': 0.5,
+                                     'outcome': 'error'}))
+
+        # results are not used unless the suite streamed them
+        self.assertEqual(nose.get_report()['total'], 4)
+
+        nose._start = time.time()
+        report = nose.get_report(slowest=1)
+
+        self.assertEqual(report['total'], 1)
+        self.assertListEqual(report['failed'], ['foo.Foo.test_error'])
+        self.assertListEqual(report['slowest'], [(0.5, 'foo.Foo.test_error')])
+
+        nose.cached = True
+        self.assertEqual(nose.get_report()['total'], 4)
+
+    def chdir_tmp(self):
+        cwd = os.getcwd()
+        tmpdir = tempfile.mkdtemp()
+        os.chdir(tmpdir)
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.addCleanup(os.chdir, cwd)
+        os.makedirs(ARTIFACTS_DIR)
+
+    def test_get_rerun(self):
+        self.chdir_tmp()
+        nose = NosetestsCall('nosetests tests -sv --with-xunit '
+                             '--with-coverage --cover-package=foo',
+                             timeout=5)
+        with open(nose.xunit_file, 'wb') as fid:
+            fid.write(REPORT.encode('utf-8'))
+
+        actual = nose.get_rerun()
+
+        self.assertEqual(actual.command,
+                         'nosetests -sv --with-xunit '
+                         'foo:Foo.test_error foo:Foo.test_failure')
+        self.assertEqual(actual.timeout, 5)
+        self.assertSetEqual(actual.rerun_ids,
+                            {'foo.Foo.test_error', 'foo.Foo.test_failure'})
+
+    @mock.patch(TESTING_MODULE + '.status_print', mock.MagicMock())
+    def test_apply_rerun(self):
+        self.chdir_tmp()
+        nose = NosetestsCall(self.cmd)
+        nose.return_code = 1
+        with open(nose.xunit_file, 'wb') as fid:
+            fid.write(REPORT.encode('utf-8'))
+        rerun = nose.get_rerun()
+        rerun.return_code = 0
+        with open(rerun.xunit_file, 'wb') as fid:
+            fid.write(
+                '<testsuite>'
+                '<testcase classname="foo.Foo" name="test_error"/>'
+                '<testcase classname="foo.Foo" name="test_failure"/>'
+                '</testsuite>'.encode('utf-8')
+            )
+
+        self.assertEqual(nose.apply_rerun(rerun, 1), 0)
+
+        self.assertFalse(os.path.exists(rerun.xunit_file))
+        self.assertListEqual(
+            [(i.get('name'), i.get('reruns'), i.get('flaky'))
+             for i in iter_testcases(nose.xunit_file)],
+            [('test_ok', None, None),
+             ('test_error', '1', 'true'),
+             ('test_failure', '1', 'true'),
+             ('test_skipped', None, None)],
+        )
+
+    @mock.patch(TESTING_MODULE + '.status_print', mock.MagicMock())
+    @mock.patch.object(NosetestsCall, 'run_locally')
+    def test_rerun_calls(self, mock_run_locally):
+        passed = mock.MagicMock(return_code=0, cached=False)
+        flaky = mock.MagicMock(return_code=1, cached=False)
+        broken = mock.MagicMock(return_code=1, cached=False)
+        broken.apply_rerun.return_value = 1
+        flaky.apply_rerun.side_effect = (
+            lambda rerun, attempt: setattr(flaky, 'return_code', 0)
+        )
+
+        actual = NosetestsCall.rerun_calls([passed, flaky, broken], 3,
+                                           jobs=2, engine='threads')
+
+        self.assertListEqual(actual, [0, 0, 1])
+        self.assertEqual(mock_run_locally.call_count, 3)
+        mock_run_locally.assert_any_call(
+            [flaky.get_rerun.return_value, broken.get_rerun.return_value],
+            mock.ANY,
+            2,
+            'threads',
+            False,
+        )
+        self.assertFalse(passed.get_rerun.called)
+        flaky.apply_rerun.assert_called_once_with(flaky.get_rerun.return_value,
+                                                  1)
+        self.assertEqual(broken.apply_rerun.call_count, 3)
+        broken.apply_rerun.assert_called_with(broken.get_rerun.return_value,
+                                              3)
+
+    def test_run_calls_sequential(self):
+        calls = [mock.MagicMock(return_value=i, shards=[], cached=False)
+                 for i in range(3)]
+
+        actual = NosetestsCall.run_calls(calls, jobs=1, engine='threads')
+
+        self.assertListEqual(actual, [0, 1, 2])
+        for i in calls:
+            i.assert_called_once_with()
+
+    def test_run_calls_parallel(self):
+        calls = [mock.MagicMock(return_value=i, shards=[], cached=False,
+                                weight=1, memory=None)
+                 for i in range(5)]
+
+        actual = NosetestsCall.run_calls(calls, jobs=3, engine='threads')
+
+        self.assertListEqual(actual, [0, 1, 2, 3, 4])
+        for i in calls:
+            i.assert_called_once_with()
+
+    def test_run_calls_weights(self):
+        running = []
+        peak = []
+
+        def run():
+            running.append(None)
+            peak.append(len(running))
+            time.sleep(0.05)
+            running.pop()
+            return 0
+
+        calls = [mock.MagicMock(side_effect=run, shards=[], cached=False,
+                                weight=2, memory=None)
+                 for i in range(3)]
+
+        actual = NosetestsCall.run_calls(calls, jobs=3, engine='threads')
+
+        self.assertListEqual(actual, [0, 0, 0])
+        # suites with weight of 2 do not fit into 3 jobs together
+        self.assertEqual(max(peak), 1)
+
+    @mock.patch(TESTING_MODULE + '.status_print', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.collect_test_addresses')
+    def test_shard(self, mock_collect):
+        mock_collect.return_value = ['a:test_1', 'a:test_2', 'a:test_3']
+        timings = mock.MagicMock()
+        timings.estimate_tests.return_value = [5.0, 3.0, 2.0]
+
+        nose = NosetestsCall('nosetests tests --with-xunit')
+        actual = nose.shard(2, timings)
+
+        self.assertIs(actual, nose.shards)
+        timings.estimate_tests.assert_called_once_with(
+            ['a.test_1', 'a.test_2', 'a.test_3']
+        )
+        self.assertListEqual(
+            [(i.command, i.expected_duration) for i in nose.shards],
+            [('nosetests --with-xunit a:test_1', 5.0),
+             ('nosetests --with-xunit a:test_2 a:test_3', 5.0)],
+        )
+
+    @mock.patch(TESTING_MODULE + '.status_print')
+    @mock.patch(TESTING_MODULE + '.collect_test_addresses')
+    def test_dedupe_calls(self, mock_collect, mock_status_print):
+        tests = {
+            'tests/api': ['api:test_1', 'api:test_2'],
+            'tests': ['api:test_1', 'api:test_2', 'core:test_1'],
+            'tests/api/test_api.py': ['api:test_1'],
+            'tests/other': None,
+        }
+        mock_collect.side_effect = lambda command, shell: tests[
+            command.split()[-1]
+        ]
+        calls = [NosetestsCall('nosetests --with-xunit ' + i, timeout=5)
+                 for i in ('tests/api', 'tests', 'tests/api/test_api.py',
+                           'tests/other')]
+
+        actual = NosetestsCall.dedupe_calls(calls, rewrite=True, jobs=2)
+
+        self.assertListEqual([i.command for i in actual], [
+            'nosetests --with-xunit tests/api',
+            'nosetests --with-xunit core',
+            'nosetests --with-xunit tests/other',
+        ])
+        self.assertIs(actual[0], calls[0])
+        self.assertEqual(actual[1].timeout, 5)
+        mock_status_print.assert_any_call(
+            'Overlapping tests',
+            'nosetests --with-xunit tests: 2 of 3 tests are also run by '
+            'nosetests --with-xunit tests/api',
+        )
+
+    @mock.patch(TESTING_MODULE + '.status_print', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.collect_test_addresses')
+    def test_dedupe_calls_environment(self, mock_collect):
+        mock_collect.return_value = ['a:test_1']
+        calls = [NosetestsCall('FOO=1 nosetests tests --with-xunit'),
+                 NosetestsCall('FOO=2 nosetests tests --with-xunit')]
+
+        actual = NosetestsCall.dedupe_calls(calls, rewrite=True)
+
+        # the same tests run with different environment do not overlap
+        self.assertListEqual(actual, calls)
+
+    @mock.patch(TESTING_MODULE + '.status_print', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.collect_test_addresses')
+    def test_dedupe_calls_report_only(self, mock_collect):
+        mock_collect.return_value = ['a:test_1']
+        calls = [NosetestsCall('nosetests foo --with-xunit'),
+                 NosetestsCall('nosetests bar --with-xunit')]
+
+        actual = NosetestsCall.dedupe_calls(calls)
+
+        self.assertListEqual(actual, calls)
+
+    @mock.patch(TESTING_MODULE + '.status_print', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.collect_test_addresses')
+    def test_select_changed(self, mock_collect):
+        tests = {
+            'tests/api': ['api:test_1', 'api:test_2', 'core:test_1'],
+            'tests/core': ['core:test_1', 'core:test_2'],
+            'tests/new': ['new:test_1'],
+            'tests/setup': ['setup:test_1', 'setup:test_2'],
+        }
+        mock_collect.side_effect = lambda command, shell: tests[
+            command.split()[-1]
+        ]
+        calls = [NosetestsCall('nosetests --with-xunit ' + i, weight=2)
+                 for i in sorted(tests)]
+        index = {
+            calls[0].key: {'tests': ['api.test_1', 'api.test_2'],
+                           'files': {'/api.py': [0]},
+                           'setup': []},
+            calls[1].key: {'tests': ['core.test_1', 'core.test_2'],
+                           'files': {'/core.py': [0, 1]},
+                           'setup': []},
+            calls[3].key: {'tests': ['setup.test_1', 'setup.test_2'],
+                           'files': {},
+                           'setup': ['/api.py']},
+        }
+
+        actual = NosetestsCall.select_changed(calls, {'/api.py'}, index)
+
+        self.assertListEqual([i.command for i in actual], [
+            # core:test_1 is not in the index yet
+            'nosetests --with-xunit api:test_1 core',
+            'nosetests --with-xunit tests/new',
+            'nosetests --with-xunit tests/setup',
+        ])
+        self.assertTrue(actual[0].partial)
+        self.assertEqual(actual[0].weight, 2)
+        self.assertIs(actual[1], calls[2])
+        self.assertIs(actual[2], calls[3])
+        # suites which are not indexed are not collected
+        self.assertEqual(mock_collect.call_count, 3)
+
+    @mock.patch(TESTING_MODULE + '.status_print', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.collect_test_addresses')
+    def test_select_changed_test_modules(self, mock_collect):
+        self.chdir_tmp()
+        os.makedirs('tests')
+        for name in ('test_a.py', 'test_b.py', 'data.json'):
+            with open(os.path.join('tests', name), 'w'):
+                pass
+        mock_collect.return_value = ['tests.test_a:test_1',
+                                     'tests.test_b:test_2']
+        nose = NosetestsCall('nosetests --with-xunit --cover-package=pkg '
+                             'tests')
+        # test modules are not measured due to --cover-package
+        index = {nose.key: {'tests': ['tests.test_a.test_1',
+                                      'tests.test_b.test_2'],
+                            'files': {},
+                            'setup': []}}
+
+        def select(*names, **kwargs):
+            changed = set(os.path.realpath(os.path.join('tests', i))
+                          for i in names)
+            return NosetestsCall.select_changed([nose], changed, index,
+                                                **kwargs)
+
+        actual = select('test_b.py')
+        self.assertListEqual(
+            [i.command for i in actual],
+            ['nosetests --with-xunit --cover-package=pkg tests.test_b'],
+        )
+        self.assertEqual(actual[0].partial, nose.key)
+        # files unknown to the index run the suite in full
+        self.assertListEqual(select('data.json'), [nose])
+        self.assertListEqual(select('nosetests.xml',
+                                    ignore=['tests/nosetests.xml']), [])
+
+    @mock.patch(TESTING_MODULE + '.COVERAGE_BASELINE_FILE', 'baseline')
+    @mock.patch(TESTING_MODULE + '.get_measured_contexts')
+    def test_update_impact_index(self, mock_contexts):
+        self.chdir_tmp()
+        with open('baseline', 'wb'):
+            pass
+        cmd = 'nosetests --with-xunit --with-coverage'
+        sharded = NosetestsCall(cmd + ' tests/api')
+        sharded.shards = [NosetestsCall(cmd + ' api:test_1'),
+                          NosetestsCall(cmd + ' api:test_2')]
+        partial = NosetestsCall(cmd + ' api:test_1')
+        partial.partial = True
+        cached = NosetestsCall(cmd + ' tests/cached')
+        cached.cached = True
+        remote = NosetestsCall(cmd + ' tests/remote')
+        mock_contexts.return_value = {
+            sharded.shards[0].key: {'': ['/a.py'], 'api.test_1': ['/b.py']},
+            sharded.shards[1].key: {'api.test_2': ['/b.py']},
+            remote.key: {'': ['/a.py']},
+        }
+        save_impact_index('impact.json', {remote.key: {}, 'old': {}})
+
+        NosetestsCall.update_impact_index(
+            [sharded, partial, cached, remote, NosetestsCall('foo')],
+            'impact.json',
+        )
+
+        self.assertDictEqual(load_impact_index('impact.json'), {
+            'old': {},
+            sharded.key: {
+                'command': sharded.command,
+                'tests': ['api.test_1', 'api.test_2'],
+                'files': {'/b.py': [0, 1]},
+                'setup': ['/a.py'],
+            },
+        })
+
+    @mock.patch(TESTING_MODULE + '.status_print', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.collect_test_addresses')
+    def test_shard_not_enough_tests(self, mock_collect):
+        mock_collect.return_value = ['a:test_1']
+
+        nose = NosetestsCall(self.cmd)
+
+        self.assertListEqual(nose.shard(2, mock.MagicMock()), [])
+
+    @mock.patch(TESTING_MODULE + '.merge_xunit_files')
+    @mock.patch('os.unlink')
+    def test_stitch_shards(self, mock_unlink, mock_merge_xunit):
+        nose = NosetestsCall(self.cmd)
+        nose.shards = [NosetestsCall('foo'), NosetestsCall('bar')]
+        nose.shards[0].return_code = 0
+        nose.shards[0]._start = 100
+        nose.shards[0].duration = 2
+        nose.shards[1].return_code = 1
+        nose.shards[1]._start = 101
+        nose.shards[1].duration = 3
+        nose.shards[1].timed_out = True
+        nose.shards[0].usage = {'user': 1, 'system': 2, 'max_rss': 10}
+        nose.shards[1].usage = {'user': 3, 'system': 4, 'max_rss': 5}
+
+        actual = nose.stitch_shards()
+
+        self.assertEqual(actual, 1)
+        self.assertEqual(nose.return_code, 1)
+        # shards ran at the same time
+        self.assertEqual(nose.duration, 4)
+        self.assertTrue(nose.timed_out)
+        self.assertDictEqual(nose.usage,
+                             {'user': 4, 'system': 6, 'max_rss': 10})
+        xunit_files = [i.xunit_file for i in nose.shards]
+        mock_merge_xunit.assert_called_once_with(xunit_files,
+                                                 nose.xunit_file)
+        mock_unlink.assert_has_calls([mock.call(i) for i in xunit_files])
+
+    def test_get_units(self):
+        cached = NosetestsCall('baz')
+        cached.cached = True
+        nose = NosetestsCall('foo')
+        sharded = NosetestsCall('bar')
+        sharded.shards = [NosetestsCall('bar 1'), NosetestsCall('bar 2')]
+        sharded.shards[0].expected_duration = 2
+        sharded.shards[1].expected_duration = 3
+
+        actual = NosetestsCall.get_units([cached, nose, sharded], [1, 10, 5])
+
+        self.assertEqual(actual, ([nose] + sharded.shards, [10, 2, 3]))
+
+    @mock.patch.object(NosetestsCall, 'stitch_shards')
+    def test_run_calls_shards(self, mock_stitch_shards):
+        mock_stitch_shards.return_value = 7
+        nose = mock.MagicMock(return_value=1, shards=[], cached=False,
+                              weight=1, memory=None)
+        cached = NosetestsCall('bar')
+        cached.cached = True
+        cached.return_code = 0
+        sharded = NosetestsCall('foo')
+        sharded.shards = [
+            mock.MagicMock(return_value=0, expected_duration=1,
+                           weight=1, memory=None),
+            mock.MagicMock(return_value=0, expected_duration=1,
+                           weight=1, memory=None),
+        ]
+
+        actual = NosetestsCall.run_calls([sharded, cached, nose],
+                                         jobs=2,
+                                         engine='threads')
+
+        self.assertListEqual(actual, [7, 0, 1])
+        for i in sharded.shards + [nose]:
+            i.assert_called_once_with()
+        mock_stitch_shards.assert_called_once_with()
+
+    def test_run_calls_longest_first(self):
+        started = []
+        calls = [
+            mock.MagicMock(side_effect=lambda i=i: started.append(i) or i,
+                           shards=[],
+                           cached=False)
+            for i in range(4)
+        ]
+
+        actual = NosetestsCall.run_calls(calls,
+                                         jobs=1,
+                                         durations=[1, 10, 5, 1],
+                                         engine='threads')
+
+        self.assertListEqual(actual, [0, 1, 2, 3])
+        self.assertListEqual(started, [1, 2, 0, 3])
+
+    @mock.patch(TESTING_MODULE + '.get_tags')
+    @mock.patch(TESTING_MODULE + '.run_async')
+    def test_run_calls_asyncio(self, mock_run_async, mock_get_tags):
+        mock_run_async.return_value = [1, 2, 0]
+        mock_get_tags.return_value = ['[1]', '[2]', '[3]']
+        calls = [mock.MagicMock(shards=[], cached=False) for i in range(3)]
+
+        actual = NosetestsCall.run_calls(calls,
+                                         jobs=2,
+                                         durations=[1, 5, 2],
+                                         engine='asyncio')
+
+        self.assertListEqual(actual, [0, 1, 2])
+        mock_run_async.assert_called_once_with(
+            [calls[1], calls[2], calls[0]],
+            ['[2]', '[3]', '[1]'],
+            2,
+            limiter=mock.ANY,
+        )
+        limiter = mock_run_async.call_args[1]['limiter']
+        self.assertEqual(limiter.jobs, 2)
+        self.assertFalse(limiter.adaptive)
+
+    @mock.patch(TESTING_MODULE + '.status_print', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.get_tags')
+    @mock.patch(TESTING_MODULE + '.run_remote')
+    def test_run_calls_workers(self, mock_run_remote, mock_get_tags):
+        mock_run_remote.return_value = [1, None, 0]
+        mock_get_tags.return_value = ['[1]', '[2]', '[3]']
+        calls = [mock.MagicMock(return_value=i, shards=[], cached=False)
+                 for i in range(3)]
+
+        actual = NosetestsCall.run_calls(calls,
+                                         jobs=2,
+                                         durations=[1, 5, 2],
+                                         engine='threads',
+                                         workers=[('foo', 1234)],
+                                         worker_token='secret')
+
+        # suite which no worker executed is executed locally
+        self.assertListEqual(actual, [0, 1, 2])
+        mock_run_remote.assert_called_once_with(
+            [calls[1], calls[2], calls[0]],
+            ['[2]', '[3]', '[1]'],
+            [('foo', 1234)],
+            'secret',
+            mock.ANY,
+        )
+        calls[2].assert_called_once_with()
+        self.assertFalse(calls[0].called)
+        self.assertFalse(calls[1].called)
 
     @mock.patch(TESTING_MODULE + '.status_print_report')
+    @mock.patch(TESTING_MODULE + '.combine_reports')
     @mock.patch(TESTING_MODULE + '.get_nose_xml_report')
-    @mock.patch(TESTING_MODULE + '.merge_xunit')
-    @mock.patch(TESTING_MODULE + '.call')
+    @mock.patch(TESTING_MODULE + '.merge_xunit_files')
+    @mock.patch(TESTING_MODULE + '.write_coverage_reports')
+    @mock.patch(TESTING_MODULE + '.combine_coverage_incremental')
     @mock.patch('os.unlink')
-    @mock.patch.object(NosetestsCall, 'write_coverage')
+    @mock.patch('os.path.exists')
     def test_merge_calls(self,
-                         mock_write_coverage,
+                         mock_exists,
                          mock_unlink,
-                         mock_call,
+                         mock_combine_coverage,
+                         mock_write_coverage_reports,
                          mock_merge_xunit,
                          mock_get_tests_xml_report,
+                         mock_combine_reports,
                          mock_status_print_report):
         cmd = 'nosetests foo --with-xunit --with-coverage --cover-package=bar'
         nose = NosetestsCall(cmd)
+        not_covered = NosetestsCall('nosetests foo --with-xunit')
+        mock_exists.return_value = True
 
-        NosetestsCall.merge_calls([nose], True)
+        NosetestsCall.merge_calls([nose, not_covered],
+                                  True,
+                                  coverage_xml='coverage.xml')
 
-        mock_call.assert_any_call('coverage combine', shell=True)
-        mock_call.assert_any_call('coverage report --include="bar*"',
-                                  shell=True)
-        mock_write_coverage.assert_called_once_with()
-        mock_unlink.assert_called_once_with(nose.xunit_file)
-        mock_merge_xunit.assert_called_once_with([nose.xunit_file],
-                                                 'nosetests.xml')
-        mock_get_tests_xml_report.assert_has_calls([
+        mock_combine_coverage.assert_called_once_with(
+            {nose.key: nose.coverage_file},
+            '.coverage',
+            '.multinosetests/coverage',
+            unchanged=[],
+            keep_data_files=False,
+            partial={},
+            merge=False,
+        )
+        mock_write_coverage_reports.assert_called_once_with(
+            mock_combine_coverage.return_value,
+            include=['bar/*', 'bar.py'],
+            xml_file='coverage.xml',
+            html_dir=None,
+        )
+        mock_unlink.assert_has_calls([
             mock.call(nose.xunit_file),
-            mock.call('nosetests.xml'),
+            mock.call(not_covered.xunit_file),
         ])
+        mock_merge_xunit.assert_called_once_with(
+            [nose.xunit_file, not_covered.xunit_file],
+            'nosetests.xml',
+            'stream',
+            callback=None,
+            compression=None,
+        )
+        mock_get_tests_xml_report.assert_has_calls([
+            mock.call(nose.xunit_file, slowest=0),
+            mock.call(not_covered.xunit_file, slowest=0),
+        ])
+        mock_combine_reports.assert_called_once_with([
+            mock_get_tests_xml_report.return_value,
+            mock_get_tests_xml_report.return_value,
+        ], slowest=0)
         mock_status_print_report.assert_has_calls([
             mock.call('Test suite report',
                       mock_get_tests_xml_report.return_value,
                       nose),
+            mock.call('Test suite report',
+                      mock_get_tests_xml_report.return_value,
+                      not_covered),
             mock.call('Overall test suite report',
-                      mock_get_tests_xml_report.return_value,)
+                      mock_combine_reports.return_value)
         ])
 
+    @mock.patch(TESTING_MODULE + '.status_print_report', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.get_nose_xml_report', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.combine_reports', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.merge_xunit_files', mock.MagicMock())
+    @mock.patch('os.unlink', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.write_coverage_reports')
+    @mock.patch(TESTING_MODULE + '.combine_coverage_incremental')
+    def test_merge_calls_without_coverage_report(self,
+                                                 mock_combine_coverage,
+                                                 mock_write_coverage_reports):
+        nose = NosetestsCall('nosetests foo --with-xunit')
+
+        NosetestsCall.merge_calls([nose], False)
+
+        self.assertFalse(mock_combine_coverage.called)
+        self.assertFalse(mock_write_coverage_reports.called)
+
+    @mock.patch(TESTING_MODULE + '.status_print_report', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.get_nose_xml_report', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.combine_reports', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.merge_xunit_files', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.write_coverage_reports', mock.MagicMock())
+    @mock.patch('os.unlink', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.combine_coverage_incremental')
+    @mock.patch('os.path.exists')
+    def test_merge_calls_missing_coverage(self,
+                                          mock_exists,
+                                          mock_combine_coverage):
+        cmd = 'nosetests foo --with-xunit --with-coverage'
+        nose = NosetestsCall(cmd)
+        crashed = NosetestsCall(cmd + ' -v')
+        cached = NosetestsCall(cmd + ' -vv')
+        cached.cached = True
+        mock_exists.side_effect = lambda path: path != crashed.coverage_file
+
+        NosetestsCall.merge_calls([nose, crashed, cached], True)
+
+        mock_combine_coverage.assert_called_once_with(
+            {nose.key: nose.coverage_file,
+             cached.key: cached.coverage_file},
+            '.coverage',
+            '.multinosetests/coverage',
+            unchanged=[cached.key],
+            keep_data_files=False,
+            partial={},
+            merge=False,
+        )
+
+    @mock.patch(TESTING_MODULE + '.status_print_report', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.get_nose_xml_report', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.combine_reports', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.combine_coverage_incremental',
+                mock.MagicMock())
+    @mock.patch('os.unlink', mock.MagicMock())
+    @mock.patch('os.path.exists', mock.MagicMock(return_value=True))
+    @mock.patch(TESTING_MODULE + '.status_print')
+    @mock.patch(TESTING_MODULE + '.merge_xunit_files')
+    @mock.patch(TESTING_MODULE + '.write_coverage_reports')
+    def test_merge_calls_coverage_report_error(self,
+                                               mock_write_coverage_reports,
+                                               mock_merge_xunit,
+                                               mock_status_print):
+        manager = mock.MagicMock()
+        manager.attach_mock(mock_merge_xunit, 'merge')
+        manager.attach_mock(mock_write_coverage_reports, 'report')
+        mock_write_coverage_reports.side_effect = CoverageException('No data')
+        nose = NosetestsCall('nosetests --with-xunit --with-coverage '
+                             '--cover-package=foo.bar foo')
+
+        NosetestsCall.merge_calls([nose], True)
+
+        # xml reports are merged even when coverage cannot be reported
+        self.assertListEqual([i[0] for i in manager.mock_calls],
+                             ['merge', 'report'])
+        self.assertListEqual(
+            mock_write_coverage_reports.call_args[1]['include'],
+            [os.path.join('foo', 'bar', '*'), os.path.join('foo', 'bar.py')],
+        )
+        mock_status_print.assert_called_once_with('Failed to report coverage',
+                                                  'No data')
+
+    @mock.patch(TESTING_MODULE + '.status_print_report', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.get_nose_xml_report', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.combine_reports', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.merge_xunit_files', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.write_coverage_reports', mock.MagicMock())
+    @mock.patch('os.unlink', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.combine_coverage_incremental')
+    @mock.patch('os.path.exists', mock.MagicMock(return_value=True))
+    def test_merge_calls_keep_coverage(self, mock_combine_coverage):
+        cmd = 'nosetests --with-xunit --with-coverage'
+        original = NosetestsCall(cmd + ' tests')
+        partial = original.select_tests(['a:test_1', 'a:test_2', 'b:test_1'],
+                                        ['a:test_1', 'b:test_1'])
+        partial.partial = original.key
+        partial.shards = [NosetestsCall(cmd + ' a:test_1'),
+                          NosetestsCall(cmd + ' b')]
+
+        NosetestsCall.merge_calls([partial], True, keep_coverage=True)
+
+        kwargs = mock_combine_coverage.call_args[1]
+        # shards of partial suites are merged into the original suite
+        self.assertDictEqual(kwargs['partial'], {
+            partial.shards[0].key: original.key,
+            partial.shards[1].key: original.key,
+        })
+        self.assertTrue(kwargs['merge'])
+
+    @mock.patch(TESTING_MODULE + '.status_print', mock.MagicMock())
+    def test_merge_calls_compressed(self):
+        self.chdir_tmp()
+        nose = NosetestsCall('nosetests foo --with-xunit')
+        with open(nose.xunit_file, 'wb') as fid:
+            fid.write(REPORT.replace(
+                '<testcase classname="foo.Foo" name="test_ok" time="0.250"/>',
+                '<testcase classname="foo.Foo" name="test_ok" time="0.250">'
+                '<system-out>0123456789</system-out></testcase>',
+            ).encode('utf-8'))
+        timings = mock.MagicMock()
+
+        NosetestsCall.merge_calls([nose],
+                                  report_coverage=False,
+                                  timings=timings,
+                                  compression='gzip',
+                                  max_output=4)
+
+        self.assertFalse(os.path.exists('nosetests.xml'))
+        outputs = [[j.text for j in i]
+                   for i in iter_testcases('nosetests.xml.gz')]
+        self.assertEqual(len(outputs), 4)
+        self.assertTrue(outputs[0][0].startswith('0123\n'))
+        self.assertEqual(timings.record_testcase.call_count, 4)
+
+    @mock.patch(TESTING_MODULE + '.status_print', mock.MagicMock())
+    @mock.patch(TESTING_MODULE + '.status_print_report')
+    def test_merge_calls_invalid_report(self, mock_status_print_report):
+        self.chdir_tmp()
+        foo = NosetestsCall('nosetests foo --with-xunit')
+        bar = NosetestsCall('nosetests bar --with-xunit')
+        with open(foo.xunit_file, 'wb') as fid:
+            fid.write(REPORT.encode('utf-8'))
+        # complete report which still cannot be parsed
+        with open(bar.xunit_file, 'wb') as fid:
+            fid.write(REPORT.replace('<testcase', '<testcase <', 1)
+                      .encode('utf-8'))
+        self.assertFalse(foo.replace_invalid_report())
+
+        NosetestsCall.merge_calls([foo, bar], report_coverage=False)
+
+        self.assertListEqual(
+            [(i.get('name'), get_testcase_outcome(i))
+             for i in iter_testcases('nosetests.xml')][-1:],
+            [(bar.command, 'errors')],
+        )
+        self.assertEqual(mock_status_print_report.call_args_list[1][0][1]
+                         ['errors'], 1)
+
+    @mock.patch(TESTING_MODULE + '.status_print_hotspots')
+    def test_merge_profiles(self, mock_status_print_hotspots):
+        self.chdir_tmp()
+        foo = NosetestsCall('nosetests foo --with-xunit')
+        bar = NosetestsCall('nosetests bar --with-xunit')
+        cached = NosetestsCall('nosetests baz --with-xunit')
+        cached.cached = True
+        for nose in (foo, bar, cached):
+            profiler = cProfile.Profile()
+            profiler.runcall(sorted, [2, 1])
+            profiler.dump_stats(nose.profile_file)
+
+        stats = NosetestsCall.merge_profiles([foo, bar, cached], hotspots=1)
+
+        self.assertTrue(os.path.exists('nosetests.prof'))
+        self.assertEqual(stats.total_calls,
+                         pstats.Stats('nosetests.prof').total_calls)
+        self.assertFalse(foo.has_profile)
+        self.assertFalse(bar.has_profile)
+        # stale profile of a cached suite is not merged
+        self.assertTrue(cached.has_profile)
+        hotspots = mock_status_print_hotspots.call_args[0][1]
+        self.assertEqual(len(hotspots), 1)
+        self.assertIn('sorted', hotspots[0][3])
+        self.assertEqual(hotspots[0][2], 2)
+
+    @mock.patch(TESTING_MODULE + '.status_print')
+    def test_merge_profiles_missing(self, mock_status_print):
+        self.chdir_tmp()
+
+        actual = NosetestsCall.merge_profiles(
+            [NosetestsCall('nosetests foo --with-xunit')],
+        )
+
+        self.assertIsNone(actual)
+        self.assertFalse(os.path.exists('nosetests.prof'))
+        mock_status_print.assert_called_once_with('Profile',
+                                                  'No suite was profiled')
+
 
 class TestUtils(unittest.TestCase):
     """
@@ -223,37 +1227,183 @@ class TestUtils(unittest.TestCase):
             file=sys.stderr
         )
 
-    @mock.patch(TESTING_MODULE + '.open', create=True)
-    @mock.patch('xunitparser.parse')
-    def test_get_nose_xml_report(self,
-                                 mock_parse,
-                                 mock_open):
-        report = mock.MagicMock()
-        report.errors = [None] * 5
-        report.failures = [None] * 7
-        report.wasSuccessful.return_value = True
-        report.testsRun = 20
-        mock_parse.return_value = None, report
+    def test_get_nose_xml_report(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'nosetests.xml')
+        with open(path, 'wb') as fid:
+            fid.write(REPORT.encode('utf-8'))
 
-        actual = get_nose_xml_report('foo')
+        actual = get_nose_xml_report(path)
 
-        mock_open.assert_called_once_with('foo')
-        mock_parse.assert_called_once_with(mock_open.return_value)
         self.assertDictEqual(
             actual,
             {
-                'total': 20,
-                'errors': 5,
-                'failures': 7,
-                'successful': 8,
-                'is_successful': True,
+                'total': 4,
+                'errors': 1,
+                'failures': 1,
+                'skipped': 1,
+                'successful': 2,
+                'is_successful': False,
+                'time': 1.5,
+                'failed': ['foo.Foo.test_error', 'foo.Foo.test_failure'],
+                'slowest': [],
             }
         )
 
+    def test_get_nose_xml_report_slowest(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'nosetests.xml')
+        with open(path, 'wb') as fid:
+            fid.write(REPORT.encode('utf-8'))
+
+        actual = get_nose_xml_report(path, slowest=2)
+
+        self.assertListEqual(actual['slowest'], [
+            (0.75, 'foo.Foo.test_failure'),
+            (0.5, 'foo.Foo.test_error'),
+        ])
+
+    def test_combine_reports(self):
+        reports = [
+            {
+                'total': 4,
+                'errors': 1,
+                'failures': 0,
+                'skipped': 1,
+                'time': 1.5,
+                'failed': ['foo'],
+                'slowest': [(1.0, 'foo'), (0.5, 'qux')],
+            },
+            {
+                'total': 6,
+                'errors': 0,
+                'failures': 2,
+                'skipped': 0,
+                'time': 0.5,
+                'failed': ['bar', 'baz'],
+                'slowest': [(0.25, 'bar'), (0.2, 'baz')],
+            },
+        ]
+
+        actual = combine_reports(reports, slowest=3)
+
+        self.assertDictEqual(
+            actual,
+            {
+                'total': 10,
+                'errors': 1,
+                'failures': 2,
+                'skipped': 1,
+                'successful': 7,
+                'is_successful': False,
+                'time': 2.0,
+                'failed': ['foo', 'bar', 'baz'],
+                'slowest': [(1.0, 'foo'), (0.5, 'qux'), (0.25, 'bar')],
+            }
+        )
+
+    def test_combine_reports_empty(self):
+        actual = combine_reports([])
+
+        self.assertEqual(actual['total'], 0)
+        self.assertTrue(actual['is_successful'])
+
     @mock.patch(TESTING_MODULE + '.status_print')
-    def test_status_print_report_with_call(self, mock_status_print):
+    def test_status_print_durations(self, mock_status_print):
         mock_call = mock.MagicMock()
         mock_call.get_final_command.return_value = 'hello'
+        report = {'time': 2.5, 'slowest': [(2.0, 'foo'), (0.5, 'bar')]}
+
+        status_print_durations('Foo', report, mock_call)
+
+        mock_status_print.assert_called_once_with(
+            'Foo',
+            '\n'.join([
+                '',
+                'hello',
+                ' total time: 2.50s',
+                '      2.00s foo',
+                '      0.50s bar',
+            ])
+        )
+
+    @mock.patch(TESTING_MODULE + '.status_print')
+    def test_status_print_hotspots(self, mock_status_print):
+        status_print_hotspots('Foo',
+                              [(2.0, 0.5, 3, 'foo.py:1(foo)')],
+                              'nosetests.prof')
+
+        mock_status_print.assert_called_once_with(
+            'Foo',
+            '\n'.join([
+                '',
+                'nosetests.prof',
+                ' cumulative      total     calls function',
+                '      2.00s      0.50s         3 foo.py:1(foo)',
+            ])
+        )
+
+    def test_write_summary_file(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'nosetests.xml')
+        with open(path, 'wb') as fid:
+            fid.write(REPORT.encode('utf-8'))
+        nose = NosetestsCall('nosetests foo --with-xunit')
+        nose.return_code = 1
+        nose.duration = 3.0
+        report = get_nose_xml_report(path, slowest=1)
+        summary_file = os.path.join(tmpdir, 'summary.json')
+
+        write_summary_file(summary_file,
+                           [report],
+                           [nose],
+                           combine_reports([report], slowest=1))
+
+        with open(summary_file, 'rb') as fid:
+            summary = json.loads(fid.read().decode('utf-8'))
+        suite = summary['suites'][0]
+        self.assertEqual(suite['command'], 'nosetests foo --with-xunit')
+        self.assertEqual(suite['return_code'], 1)
+        self.assertEqual(suite['duration'], 3.0)
+        self.assertEqual(suite['failures'], 1)
+        self.assertEqual(suite['time'], 1.5)
+        self.assertListEqual(suite['slowest'],
+                             [{'id': 'foo.Foo.test_failure', 'time': 0.75}])
+        self.assertEqual(summary['overall']['total'], 4)
+        self.assertFalse(summary['overall']['is_successful'])
+        self.assertNotIn('command', summary['overall'])
+
+    @mock.patch(TESTING_MODULE + '.status_print')
+    def test_status_print_plan(self, mock_status_print):
+        calls = [NosetestsCall('foo'), NosetestsCall('bar')]
+
+        status_print_plan(calls, [5, 2], 1, known=[True, False])
+
+        mock_status_print.assert_called_once_with(
+            'Schedule plan',
+            '\n'.join([
+                '',
+                terminal.bold('worker 1:'),
+                '        5.0s foo',
+                '     unknown bar',
+                '',
+                'estimated makespan: 7.0s',
+            ])
+        )
+
+    @mock.patch(TESTING_MODULE + '.status_print')
+    def test_status_print_report_with_call(self, mock_status_print):
+        mock_call = mock.MagicMock(cached=False,
+                                   duration=12.5,
+                                   usage={'user': 10.0,
+                                          'system': 0.25,
+                                          'max_rss': 64 * 1024 * 1024},
+                                   timed_out=True,
+                                   timeout=10)
+        mock_call.get_final_command.return_value = 'hello'
 
         report = {
             'total': 20,
@@ -276,9 +1426,31 @@ class TestUtils(unittest.TestCase):
                 ' successful: 8',
                 '   failures: 7',
                 '     errors: 5',
+                '  wall time: 12.50s',
+                '   cpu time: 10.00s user, 0.25s system',
+                '    max rss: 64.0 MB',
+                terminal.red('  timed out: after 10s'),
             ])
         )
 
+    @mock.patch(TESTING_MODULE + '.status_print')
+    def test_status_print_report_cached(self, mock_status_print):
+        mock_call = mock.MagicMock(cached=True)
+        mock_call.get_final_command.return_value = 'hello'
+
+        report = {
+            'total': 20,
+            'errors': 0,
+            'failures': 0,
+            'successful': 20,
+            'is_successful': True,
+        }
+
+        status_print_report('Foo', report, mock_call)
+
+        message = mock_status_print.call_args[0][1]
+        self.assertIn('{} hello'.format(terminal.bold('[cached]')), message)
+
     @mock.patch(TESTING_MODULE + '.status_print')
     def test_status_print_report_without_call(self, mock_status_print):
         report = {
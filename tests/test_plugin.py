@@ -0,0 +1,89 @@
+from __future__ import print_function, unicode_literals
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import mock
+from nose.exc import SkipTest
+from nose.plugins.skip import Skip
+
+from multinosetests.plugin import ResultStream
+from multinosetests.results import RESULTS_ENV, read_records
+
+
+class FakeTest(object):
+    def __init__(self, test_id):
+        self.test_id = test_id
+
+    def id(self):
+        return self.test_id
+
+
+def get_err(exception):
+    try:
+        raise exception
+    except Exception:
+        return sys.exc_info()
+
+
+class TestResultStream(unittest.TestCase):
+    """
+    Tests for the nose plugin streaming results of tests
+    """
+
+    def setUp(self):
+        super(TestResultStream, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = os.path.join(self.tmpdir, 'nosetests.results')
+
+    def test_score(self):
+        # skip plugin stops errors from reaching plugins called after it
+        self.assertGreater(ResultStream.score, Skip.score)
+
+    def test_configure_disabled(self):
+        plugin = ResultStream()
+
+        with mock.patch.dict(os.environ, clear=True):
+            plugin.configure(mock.MagicMock(), mock.MagicMock())
+
+        self.assertFalse(plugin.enabled)
+
+    def test_stream(self):
+        plugin = ResultStream()
+        with mock.patch.dict(os.environ, {str(RESULTS_ENV): self.path}):
+            plugin.configure(mock.MagicMock(), mock.MagicMock())
+            # nested nose runs do not stream into the same file
+            self.assertNotIn(str(RESULTS_ENV), os.environ)
+        self.assertTrue(plugin.enabled)
+
+        plugin.begin()
+        for test_id, method, err in [
+                ('foo.Foo.test_ok', plugin.addSuccess, None),
+                ('foo.Foo.test_error', plugin.addError, KeyError('bad')),
+                ('foo.Foo.test_failure', plugin.addFailure,
+                 AssertionError('nope')),
+                ('foo.test_skipped', plugin.addError, SkipTest('skip'))]:
+            test = FakeTest(test_id)
+            plugin.startTest(test)
+            if err is None:
+                method(test)
+            else:
+                method(test, get_err(err))
+        plugin.finalize(mock.MagicMock())
+
+        records = list(read_records(self.path))
+        self.assertListEqual(
+            [(i['classname'], i['name'], i['outcome']) for i in records],
+            [('foo.Foo', 'test_ok', None),
+             ('foo.Foo', 'test_error', 'error'),
+             ('foo.Foo', 'test_failure', 'failure'),
+             ('foo', 'test_skipped', 'skipped')],
+        )
+        self.assertTrue(records[1]['type'].endswith('KeyError'))
+        self.assertEqual(records[1]['message'], "'bad'")
+        self.assertIn('Traceback', records[1]['traceback'])
+        self.assertNotIn('type', records[0])
+        self.assertIsNone(plugin.stream)
@@ -0,0 +1,79 @@
+from __future__ import print_function, unicode_literals
+import select
+import signal
+import unittest
+from subprocess import PIPE
+
+import mock
+
+from multinosetests.process import (
+    RUNNING,
+    SuiteProcess,
+    combine_usage,
+    get_signal_name,
+    interrupt_suites,
+)
+
+
+TESTING_MODULE = 'multinosetests.process'
+
+
+class TestProcess(unittest.TestCase):
+    """
+    Tests for suite process helpers
+    """
+
+    def test_combine_usage(self):
+        actual = combine_usage([
+            {'user': 1, 'system': 2, 'max_rss': 10},
+            None,
+            {'user': 3, 'system': 4, 'max_rss': 5},
+        ])
+
+        self.assertDictEqual(actual, {'user': 4, 'system': 6, 'max_rss': 10})
+        self.assertIsNone(combine_usage([None]))
+
+    def test_get_signal_name(self):
+        self.assertEqual(get_signal_name(signal.SIGKILL), 'SIGKILL')
+        self.assertEqual(get_signal_name(1000), 'signal 1000')
+
+    def test_wait(self):
+        process = SuiteProcess('exit 3', shell=True)
+
+        self.assertEqual(process.wait(), 3)
+        self.assertEqual(process.popen.returncode, 3)
+        self.assertFalse(process.timed_out)
+        self.assertGreater(process.usage['max_rss'], 0)
+
+    def test_wait_timeout(self):
+        process = SuiteProcess(['sleep', '10'])
+
+        self.assertEqual(process.wait(0.1), -signal.SIGTERM)
+        self.assertTrue(process.timed_out)
+
+    @mock.patch(TESTING_MODULE + '.TERMINATE_GRACE_PERIOD', 0.1)
+    def test_wait_timeout_kill(self):
+        process = SuiteProcess('trap "" TERM; sleep 10', shell=True)
+
+        self.assertEqual(process.wait(0.1), -signal.SIGKILL)
+        self.assertTrue(process.timed_out)
+
+    def test_wait_timeout_group(self):
+        # cat would keep the pipe open if only the shell was terminated
+        process = SuiteProcess('sleep 10 | cat', shell=True, stdout=PIPE)
+
+        self.assertEqual(process.wait(0.1), -signal.SIGTERM)
+        readable, _, _ = select.select([process.stdout], [], [], 5)
+        self.assertListEqual(readable, [process.stdout])
+        self.assertEqual(process.stdout.read(), b'')
+        process.stdout.close()
+
+    def test_interrupt_suites(self):
+        process = SuiteProcess(['sleep', '10'])
+        self.assertIn(process, RUNNING)
+
+        with self.assertRaises(KeyboardInterrupt):
+            interrupt_suites()
+
+        self.assertEqual(process.wait(), -signal.SIGINT)
+        self.assertNotIn(process, RUNNING)
@@ -0,0 +1,92 @@
+from __future__ import print_function, unicode_literals
+import cProfile
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from multinosetests.profiling import (
+    PROFILE_ENV,
+    get_hotspots,
+    get_profile_environment,
+    merge_profile_files,
+    run_profiled,
+    write_hook,
+)
+
+
+class TestProfiling(unittest.TestCase):
+    """
+    Tests for profiling of nosetests suites
+    """
+
+    def setUp(self):
+        super(TestProfiling, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def dump_profile(self, name, func, *args):
+        path = os.path.join(self.tmpdir, name)
+        profiler = cProfile.Profile()
+        profiler.runcall(func, *args)
+        profiler.dump_stats(path)
+        return path
+
+    def test_get_profile_environment(self):
+        env = get_profile_environment({}, '/hook', 'foo.prof')
+
+        self.assertEqual(env['PYTHONPATH'], '/hook')
+        self.assertEqual(env[PROFILE_ENV], os.path.abspath('foo.prof'))
+
+        env = get_profile_environment({'PYTHONPATH': '/lib'},
+                                      '/hook',
+                                      'foo.prof')
+
+        self.assertEqual(env['PYTHONPATH'],
+                         os.pathsep.join(['/hook', '/lib']))
+
+    def test_write_hook(self):
+        # existing sitecustomize is still loaded
+        existing = os.path.join(self.tmpdir, 'existing')
+        os.makedirs(existing)
+        with open(os.path.join(existing, 'sitecustomize.py'), 'w') as fid:
+            fid.write('print("existing")\n')
+        hook = write_hook(os.path.join(self.tmpdir, 'hook'))
+        path = os.path.join(self.tmpdir, 'suite.prof')
+        env = get_profile_environment(
+            dict(os.environ, PYTHONPATH=existing), hook, path,
+        )
+
+        output = subprocess.check_output(
+            [sys.executable, '-c', 'import os; print(os.environ.get("{}"))'
+                                   ''.format(PROFILE_ENV)],
+            env=env,
+        )
+
+        self.assertEqual(output.split(), [b'existing', b'None'])
+        self.assertTrue(os.path.exists(path))
+
+    def test_run_profiled(self):
+        path = os.path.join(self.tmpdir, 'foo.prof')
+
+        self.assertEqual(run_profiled(None, sorted, [2, 1]), [1, 2])
+        self.assertFalse(os.path.exists(path))
+        with self.assertRaises(SystemExit):
+            run_profiled(path, sys.exit, 1)
+        self.assertTrue(os.path.exists(path))
+
+    def test_merge_profile_files(self):
+        output = os.path.join(self.tmpdir, 'merged.prof')
+        profiles = [self.dump_profile('foo.prof', sorted, [2, 1]),
+                    self.dump_profile('bar.prof', sorted, [3, 1])]
+
+        stats = merge_profile_files(profiles, output)
+
+        self.assertTrue(os.path.exists(output))
+        hotspots = get_hotspots(stats, 1)
+        self.assertEqual(len(hotspots), 1)
+        self.assertEqual(hotspots[0][2], 2)
+        self.assertIn('sorted', hotspots[0][3])
+        self.assertIsNone(merge_profile_files([], output))
@@ -0,0 +1,240 @@
+from __future__ import print_function, unicode_literals
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import unittest
+
+import mock
+
+from multinosetests.multinosetests import NosetestsCall
+from multinosetests.remote import (
+    PROTOCOL_VERSION,
+    WorkerServer,
+    connect,
+    parse_address,
+    receive_file,
+    receive_message,
+    run_remote,
+    send_file,
+    send_message,
+)
+
+
+TOKEN = 'secret'
+
+
+REPORT = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<testsuite name="nosetests" tests="1" errors="0" failures="0" skip="0">'
+    '<testcase classname="remote" name="test_{}" time="0"/>'
+    '</testsuite>'
+)
+SUITE = (
+    '{python} -c "import sys, time; time.sleep({sleep}); '
+    'open(sys.argv[-1].split(\'=\', 1)[1], \'w\').write(\'{report}\'); '
+    'sys.exit({code})" --with-xunit'
+)
+
+
+def get_command(code, sleep=0):
+    return SUITE.format(python=sys.executable,
+                        report=REPORT.format(code).replace('"', '\\"'),
+                        code=code,
+                        sleep=sleep)
+
+
+class TestRemote(unittest.TestCase):
+    """
+    Tests for executing suites on workers running on localhost
+    """
+
+    def setUp(self):
+        super(TestRemote, self).setUp()
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.mkdtemp()
+        os.chdir(self.tmp)
+        self.servers = []
+        patcher = mock.patch('multinosetests.multinosetests.status_print')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        super(TestRemote, self).tearDown()
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmp)
+
+    def start_server(self, server):
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.servers.append(server)
+        return server.server_address
+
+    def start_worker(self, jobs=1, shell=False):
+        return self.start_server(
+            WorkerServer(('127.0.0.1', 0), NosetestsCall, jobs,
+                         token=TOKEN, shell=shell)
+        )
+
+    def start_broken_worker(self, stall=False):
+        """
+        Start a worker which either disconnects or stops responding
+        as soon as it gets a suite
+        """
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(5)
+        self.addCleanup(listener.close)
+
+        def serve():
+            while True:
+                try:
+                    sock, _ = listener.accept()
+                except socket.error:
+                    return
+                receive_message(sock)
+                send_message(sock, {'type': 'hello',
+                                    'version': PROTOCOL_VERSION,
+                                    'jobs': 1})
+                receive_message(sock)
+                if stall:
+                    self.addCleanup(sock.close)
+                else:
+                    sock.close()
+
+        thread = threading.Thread(target=serve)
+        thread.daemon = True
+        thread.start()
+        return listener.getsockname()
+
+    def test_parse_address(self):
+        self.assertEqual(parse_address('foo:1234'), ('foo', 1234))
+        self.assertEqual(parse_address('foo'), ('foo', 8757))
+        self.assertEqual(parse_address('[::1]:1234'), ('::1', 1234))
+        with self.assertRaises(ValueError):
+            parse_address('foo:bar')
+
+    def test_messages(self):
+        a, b = socket.socketpair()
+        self.addCleanup(a.close)
+        self.addCleanup(b.close)
+
+        send_message(a, {'type': 'run', 'command': 'nosetests ☃'})
+        a.close()
+
+        self.assertDictEqual(receive_message(b),
+                             {'type': 'run', 'command': 'nosetests ☃'})
+        with self.assertRaises(EOFError):
+            receive_message(b)
+
+    def test_files(self):
+        a, b = socket.socketpair()
+        self.addCleanup(a.close)
+        self.addCleanup(b.close)
+        data = os.urandom(3 * 64 * 1024 + 5)
+        with open('source', 'wb') as fid:
+            fid.write(data)
+
+        thread = threading.Thread(target=send_file, args=(a, 'source'))
+        thread.start()
+        receive_file(b, 'target')
+        thread.join()
+
+        with open('target', 'rb') as fid:
+            self.assertEqual(fid.read(), data)
+
+    def test_connect_invalid_token(self):
+        address = self.start_worker()
+
+        with self.assertRaisesRegexp(Exception, 'Invalid token'):
+            connect(address, 'wrong')
+
+        sock, jobs = connect(address, TOKEN)
+        sock.close()
+        self.assertEqual(jobs, 1)
+
+    def test_worker_requires_token(self):
+        with self.assertRaises(ValueError):
+            WorkerServer(('127.0.0.1', 0), NosetestsCall)
+
+    def test_run_remote(self):
+        workers = [self.start_worker(1), self.start_worker(2)]
+        calls = [NosetestsCall(get_command(i)) for i in range(4)]
+
+        actual = run_remote(calls, ['a', 'b', 'c', 'd'], workers, TOKEN)
+
+        self.assertListEqual(actual, [0, 1, 2, 3])
+        for i, nose in enumerate(calls):
+            self.assertEqual(nose.return_code, i)
+            self.assertIn('max_rss', nose.usage)
+            with open(nose.xunit_file) as fid:
+                self.assertEqual(fid.read(), REPORT.format(i))
+
+    def test_run_remote_disconnect(self):
+        status = mock.MagicMock()
+        workers = [self.start_broken_worker(), self.start_worker(1)]
+        calls = [NosetestsCall(get_command(i)) for i in range(3)]
+
+        actual = run_remote(calls, ['a', 'b', 'c'], workers, TOKEN, status)
+
+        self.assertListEqual(actual, [0, 1, 2])
+        status.assert_called_once_with('Worker disconnected', mock.ANY)
+
+    @mock.patch('multinosetests.remote.READ_TIMEOUT', 0.5)
+    def test_run_remote_stalled(self):
+        status = mock.MagicMock()
+        workers = [self.start_broken_worker(stall=True), self.start_worker(1)]
+        calls = [NosetestsCall(get_command(i)) for i in range(2)]
+
+        actual = run_remote(calls, ['a', 'b'], workers, TOKEN, status)
+
+        self.assertListEqual(actual, [0, 1])
+        status.assert_called_once_with('Worker disconnected', mock.ANY)
+
+    @mock.patch('multinosetests.remote.HEARTBEAT_INTERVAL', 0.05)
+    @mock.patch('multinosetests.remote.READ_TIMEOUT', 0.3)
+    def test_run_remote_heartbeat(self):
+        workers = [self.start_worker(1)]
+
+        actual = run_remote([NosetestsCall(get_command(0, sleep=1))],
+                            ['a'], workers, TOKEN)
+
+        self.assertListEqual(actual, [0])
+
+    def test_run_remote_shell(self):
+        status = mock.MagicMock()
+        workers = [self.start_worker(1)]
+        calls = [NosetestsCall(get_command(0), shell=True)]
+
+        self.assertListEqual(
+            run_remote(calls, ['a'], workers, TOKEN, status), [None],
+        )
+        status.assert_called_once_with('Worker disconnected', mock.ANY)
+
+        workers = [self.start_worker(1, shell=True)]
+
+        self.assertListEqual(
+            run_remote(calls, ['a'], workers, TOKEN), [0],
+        )
+
+    def test_run_remote_unavailable(self):
+        status = mock.MagicMock()
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        address = listener.getsockname()
+        listener.close()
+
+        actual = run_remote([NosetestsCall(get_command(0))],
+                            ['a'],
+                            [address],
+                            TOKEN,
+                            status)
+
+        self.assertListEqual(actual, [None])
+        status.assert_called_once_with('Worker unavailable', mock.ANY)
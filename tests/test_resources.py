@@ -0,0 +1,157 @@
+from __future__ import print_function, unicode_literals
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from multinosetests import resources
+from multinosetests.resources import (
+    ResourceLimiter,
+    get_available_memory,
+    get_cpu_count,
+    get_cpu_limit,
+    get_memory_limit,
+    get_memory_usage,
+    get_total_memory,
+)
+
+
+TESTING_MODULE = 'multinosetests.resources'
+GB = 1024 * 1024 * 1024
+
+
+class TestResources(unittest.TestCase):
+    """
+    Tests for reading resources from fake cgroup and proc files
+    """
+
+    def setUp(self):
+        super(TestResources, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.root = os.path.join(self.tmpdir, 'cgroup')
+        for name, path in (('CGROUP_ROOT', self.root),
+                           ('PROC_CGROUP', self.path('self_cgroup')),
+                           ('PROC_MEMINFO', self.path('meminfo'))):
+            patcher = mock.patch.object(resources, name, path)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.write(self.path('meminfo'),
+                   'MemTotal: 8388608 kB\nMemAvailable: 4194304 kB\n')
+
+    def path(self, *parts):
+        return os.path.join(self.tmpdir, *parts)
+
+    def write(self, path, content):
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with io.open(path, 'w') as fid:
+            fid.write(content)
+
+    def test_cgroup_v2(self):
+        self.write(self.path('self_cgroup'), '0::/build\n')
+        self.write(os.path.join(self.root, 'build', 'cpu.max'),
+                   '150000 100000\n')
+        self.write(os.path.join(self.root, 'build', 'memory.max'),
+                   '{}\n'.format(2 * GB))
+        self.write(os.path.join(self.root, 'build', 'memory.current'),
+                   '{}\n'.format(GB))
+        self.write(os.path.join(self.root, 'build', 'memory.stat'),
+                   'anon 1\ninactive_file {}\n'.format(GB // 2))
+
+        self.assertEqual(get_cpu_limit(), 1.5)
+        self.assertLessEqual(get_cpu_count(), 2)
+        self.assertEqual(get_memory_limit(), 2 * GB)
+        self.assertEqual(get_memory_usage(), GB // 2)
+        self.assertEqual(get_total_memory(), 2 * GB)
+        self.assertEqual(get_available_memory(), 3 * GB // 2)
+
+    def test_cgroup_v2_unlimited(self):
+        self.write(self.path('self_cgroup'), '0::/\n')
+        self.write(os.path.join(self.root, 'cpu.max'), 'max 100000\n')
+        self.write(os.path.join(self.root, 'memory.max'), 'max\n')
+
+        self.assertIsNone(get_cpu_limit())
+        self.assertIsNone(get_memory_limit())
+        self.assertEqual(get_total_memory(), 8 * GB)
+        self.assertEqual(get_available_memory(), 4 * GB)
+
+    def test_cgroup_v1(self):
+        self.write(self.path('self_cgroup'),
+                   '4:memory:/docker/abc\n2:cpu,cpuacct:/\n')
+        self.write(os.path.join(self.root, 'cpu,cpuacct', 'cpu.cfs_quota_us'),
+                   '200000\n')
+        self.write(os.path.join(self.root, 'cpu,cpuacct',
+                                'cpu.cfs_period_us'),
+                   '100000\n')
+        self.write(os.path.join(self.root, 'memory', 'docker', 'abc',
+                                'memory.limit_in_bytes'),
+                   '9223372036854771712\n')
+
+        self.assertEqual(get_cpu_limit(), 2.0)
+        self.assertIsNone(get_memory_limit())
+
+    def test_missing(self):
+        self.assertIsNone(get_cpu_limit())
+        self.assertIsNone(get_memory_limit())
+        self.assertIsNone(get_memory_usage())
+        self.assertGreaterEqual(get_cpu_count(), 1)
+
+
+class TestResourceLimiter(unittest.TestCase):
+    """
+    Tests for deciding when suites can be started
+    """
+
+    def setUp(self):
+        super(TestResourceLimiter, self).setUp()
+        self.available = 4 * GB
+        self.load = 0.0
+        for name, value in (
+                ('get_total_memory', lambda: 8 * GB),
+                ('get_available_memory', lambda: self.available),
+                ('get_load_average', lambda: self.load)):
+            patcher = mock.patch(TESTING_MODULE + '.' + name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_weights(self):
+        limiter = ResourceLimiter(3, adaptive=False)
+
+        self.assertTrue(limiter.try_acquire(2))
+        self.assertFalse(limiter.try_acquire(2))
+        self.assertTrue(limiter.try_acquire(1))
+        limiter.release(2)
+        self.assertTrue(limiter.try_acquire(2))
+        self.assertEqual(limiter.running, 2)
+
+    def test_heavy_suite_starts_alone(self):
+        limiter = ResourceLimiter(2)
+
+        self.assertTrue(limiter.try_acquire(4, 16 * GB))
+
+    def test_load(self):
+        limiter = ResourceLimiter(4)
+        self.load = 3.0
+
+        self.assertTrue(limiter.try_acquire(1))
+        # other processes occupy 3 of 4 jobs
+        self.assertEqual(limiter.get_capacity(), 1)
+        self.assertFalse(limiter.try_acquire(1))
+        self.assertEqual(ResourceLimiter(4, adaptive=False).get_capacity(),
+                         4)
+
+    def test_memory(self):
+        limiter = ResourceLimiter(4)
+
+        self.assertTrue(limiter.try_acquire(1, 3 * GB))
+        # does not fit with memory expected by the running suite
+        self.assertFalse(limiter.try_acquire(1, 2 * GB))
+        self.assertTrue(limiter.try_acquire(1, GB))
+        self.available = GB // 2
+        self.assertFalse(limiter.try_acquire(1, GB))
+        # memory pressure
+        self.assertFalse(limiter.try_acquire(1))
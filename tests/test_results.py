@@ -0,0 +1,83 @@
+from __future__ import print_function, unicode_literals
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from multinosetests.results import (
+    RecordDecoder,
+    encode_record,
+    iter_record_testcases,
+    read_records,
+    record_to_testcase,
+)
+
+
+RECORDS = [
+    {'classname': 'foo.Foo', 'name': 'test_ok', 'time': 0.25,
+     'outcome': None},
+    {'classname': 'foo.Foo', 'name': 'test_error', 'time': 0.5,
+     'outcome': 'error', 'type': 'KeyError', 'message': 'bad',
+     'traceback': 'Traceback'},
+]
+
+
+class TestResults(unittest.TestCase):
+    """
+    Tests for encoding and decoding of streamed test results
+    """
+
+    def setUp(self):
+        super(TestResults, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = os.path.join(self.tmpdir, 'nosetests.results')
+
+    def test_decoder_chunks(self):
+        data = b''.join(map(encode_record, RECORDS))
+        decoder = RecordDecoder()
+
+        records = []
+        for i in range(0, len(data), 3):
+            records.extend(decoder.feed(data[i:i + 3]))
+
+        self.assertListEqual(records, RECORDS)
+        self.assertEqual(decoder.buffer, b'')
+        self.assertEqual(decoder.offset, 0)
+
+    def test_read_records(self):
+        self.assertListEqual(list(read_records(self.path)), [])
+
+        with io.open(self.path, 'wb') as fid:
+            fid.write(encode_record(RECORDS[0]))
+            # record truncated by a crashing suite
+            fid.write(encode_record(RECORDS[1])[:-5])
+
+        self.assertListEqual(list(read_records(self.path)), RECORDS[:1])
+
+    def test_record_to_testcase(self):
+        testcase = record_to_testcase(RECORDS[0])
+
+        self.assertDictEqual(dict(testcase.attrib), {
+            'classname': 'foo.Foo', 'name': 'test_ok', 'time': '0.250',
+        })
+        self.assertEqual(len(testcase), 0)
+
+        testcase = record_to_testcase(RECORDS[1])
+
+        error = testcase.find('error')
+        self.assertDictEqual(dict(error.attrib),
+                             {'type': 'KeyError', 'message': 'bad'})
+        self.assertEqual(error.text, 'Traceback')
+
+    def test_iter_record_testcases(self):
+        self.assertListEqual(list(iter_record_testcases(self.path)), [])
+
+        with io.open(self.path, 'wb') as fid:
+            fid.write(b''.join(map(encode_record, RECORDS)))
+
+        self.assertListEqual(
+            [i.get('name') for i in iter_record_testcases(self.path)],
+            ['test_ok', 'test_error'],
+        )
@@ -0,0 +1,145 @@
+from __future__ import print_function, unicode_literals
+import io
+import time
+import unittest
+
+import mock
+
+from multinosetests.process import SuiteProcess
+from multinosetests.resources import ResourceLimiter
+from multinosetests.runner import asyncio, run_async
+
+
+@unittest.skipIf(asyncio is None, 'asyncio is not available')
+class TestRunAsync(unittest.TestCase):
+    """
+    Tests for the asyncio run engine
+    """
+
+    def get_call(self, command, shell=True, timeout=None):
+        nose = mock.MagicMock(timeout=timeout, weight=1, memory=None)
+        nose.before_run.return_value = command
+        nose.start_process.side_effect = lambda **kwargs: SuiteProcess(
+            command if shell else command.split(), shell=shell, **kwargs
+        )
+        nose.after_run.side_effect = lambda code, **kwargs: code
+        return nose
+
+    def test_run_async(self):
+        stdout = io.BytesIO()
+        stderr = io.BytesIO()
+        calls = [
+            self.get_call('printf "foo\\nbar"; exit 3'),
+            self.get_call('echo baz >&2'),
+            self.get_call('true'),
+        ]
+
+        actual = run_async(calls, ['[1]', '[2]', '[3]'], 2, stdout, stderr)
+
+        self.assertListEqual(actual, [3, 0, 0])
+        self.assertEqual(stdout.getvalue(), b'[1] foo\n[1] bar\n')
+        self.assertEqual(stderr.getvalue(), b'[2] baz\n')
+        for nose, tag in zip(calls, ['[1]', '[2]', '[3]']):
+            nose.before_run.assert_called_once_with(tag)
+        calls[0].after_run.assert_called_once_with(3,
+                                                   usage=mock.ANY,
+                                                   timed_out=False)
+        self.assertIn('max_rss', calls[0].after_run.call_args[1]['usage'])
+
+    def test_run_async_jobs(self):
+        stdout = io.BytesIO()
+        calls = [self.get_call('echo {}'.format(i)) for i in range(3)]
+
+        actual = run_async(calls, ['a', 'b', 'c'], 1, stdout, io.BytesIO())
+
+        self.assertListEqual(actual, [0, 0, 0])
+        # only one suite runs at a time so output is in order
+        self.assertEqual(stdout.getvalue(), b'a 0\nb 1\nc 2\n')
+
+    def test_run_async_weights(self):
+        stdout = io.BytesIO()
+        calls = [self.get_call('sleep 0.1; echo {}'.format(i))
+                 for i in range(3)]
+        calls[1].weight = 3
+        limiter = ResourceLimiter(3, adaptive=False)
+
+        actual = run_async(calls, ['a', 'b', 'c'], 3, stdout, io.BytesIO(),
+                           limiter=limiter)
+
+        self.assertListEqual(actual, [0, 0, 0])
+        # heavy suite waits until the others finish
+        # while the light suite behind it is started
+        self.assertEqual(stdout.getvalue().splitlines()[-1], b'b 1')
+        self.assertEqual(limiter.running, 0)
+
+    def test_run_async_error(self):
+        calls = [self.get_call('true')]
+        calls[0].after_run.side_effect = ValueError
+
+        with self.assertRaises(ValueError):
+            run_async(calls, ['a'], 1, io.BytesIO(), io.BytesIO())
+
+    def test_run_async_error_running(self):
+        calls = [self.get_call('true'), self.get_call('sleep 10')]
+        calls[0].after_run.side_effect = ValueError
+        processes = []
+
+        def start_process(**kwargs):
+            processes.append(SuiteProcess('sleep 10', shell=True, **kwargs))
+            return processes[-1]
+
+        calls[1].start_process.side_effect = start_process
+
+        start = time.time()
+        with self.assertRaises(ValueError):
+            run_async(calls, ['a', 'b'], 2, io.BytesIO(), io.BytesIO())
+
+        self.assertLess(time.time() - start, 5)
+        # suite which was still running is stopped and reaped
+        self.assertEqual(processes[0].return_code, -15)
+        self.assertTrue(processes[0].stdout.closed)
+
+    def test_run_async_start_error(self):
+        calls = [self.get_call('true')]
+        calls[0].start_process.side_effect = ValueError
+
+        with self.assertRaises(ValueError):
+            run_async(calls, ['a'], 1, io.BytesIO(), io.BytesIO())
+
+    @mock.patch('multinosetests.runner.OUTPUT_GRACE_PERIOD', 0.1)
+    def test_run_async_inherited_pipes(self):
+        stdout = io.BytesIO()
+        # background child keeps the pipes open after the suite exits
+        calls = [self.get_call('sleep 10 & echo foo')]
+
+        start = time.time()
+        actual = run_async(calls, ['a'], 1, stdout, io.BytesIO())
+
+        self.assertListEqual(actual, [0])
+        self.assertLess(time.time() - start, 5)
+        self.assertEqual(stdout.getvalue(), b'a foo\n')
+
+    def test_run_async_exec(self):
+        stdout = io.BytesIO()
+        stderr = io.BytesIO()
+        calls = [
+            self.get_call('echo $HOME;', shell=False),
+            self.get_call('multinosetests-does-not-exist', shell=False),
+        ]
+
+        actual = run_async(calls, ['a', 'b'], 2, stdout, stderr)
+
+        self.assertListEqual(actual, [0, 127])
+        # arguments are not expanded by a shell
+        self.assertEqual(stdout.getvalue(), b'a $HOME;\n')
+        self.assertTrue(stderr.getvalue().startswith(b'b Failed to execute'))
+
+    def test_run_async_timeout(self):
+        calls = [self.get_call('sleep 10', shell=False, timeout=0.1)]
+
+        actual = run_async(calls, ['a'], 1, io.BytesIO(), io.BytesIO())
+
+        self.assertListEqual(actual, [-15])
+        calls[0].after_run.assert_called_once_with(-15,
+                                                   usage=mock.ANY,
+                                                   timed_out=True)
@@ -0,0 +1,128 @@
+from __future__ import print_function, unicode_literals
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from xml.etree import ElementTree
+
+from multinosetests.schedule import (
+    TimingCache,
+    longest_first,
+    pack_shards,
+    plan_schedule,
+)
+
+
+class TestTimingCache(unittest.TestCase):
+    """
+    Tests for the suite timings history
+    """
+
+    def setUp(self):
+        super(TestTimingCache, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'state', 'timings.json')
+
+    def tearDown(self):
+        super(TestTimingCache, self).tearDown()
+        shutil.rmtree(self.tmpdir)
+
+    def test_load_missing(self):
+        timings = TimingCache(self.path).load()
+        self.assertDictEqual(timings.suites, {})
+
+    def test_load_corrupt(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'w') as fid:
+            fid.write('{not json')
+
+        timings = TimingCache(self.path).load()
+
+        self.assertDictEqual(timings.suites, {})
+
+    def test_save_load(self):
+        timings = TimingCache(self.path)
+        timings.record('foo', 5.0)
+        timings.record('bar', None)
+        timings.record_test('foo.test', 1.0)
+        timings.save()
+
+        with open(self.path) as fid:
+            self.assertDictEqual(json.load(fid), {
+                'suites': {'foo': 5.0},
+                'tests': {'foo.test': 1.0},
+            })
+        self.assertListEqual(os.listdir(os.path.dirname(self.path)),
+                             ['timings.json'])
+
+        actual = TimingCache(self.path).load()
+        self.assertDictEqual(actual.suites, {'foo': 5.0})
+        self.assertDictEqual(actual.tests, {'foo.test': 1.0})
+
+    def test_record_testcase(self):
+        timings = TimingCache(self.path)
+        testcase = ElementTree.fromstring(
+            '<testcase classname="foo.Foo" name="test_foo" time="1.5"/>'
+        )
+
+        timings.record_testcase(testcase)
+
+        self.assertDictEqual(timings.tests, {'foo.Foo.test_foo': 1.5})
+
+    def test_estimate(self):
+        timings = TimingCache(self.path)
+        timings.suites = {'foo': 10.0, 'bar': 2.0}
+
+        actual = timings.estimate(['foo', 'baz', 'bar'])
+
+        self.assertListEqual(actual, [10.0, 6.0, 2.0])
+
+    def test_estimate_tests(self):
+        timings = TimingCache(self.path)
+        timings.tests = {'foo': 1.0}
+
+        actual = timings.estimate_tests(['foo', 'bar'])
+
+        self.assertListEqual(actual, [1.0, 1.0])
+
+    def test_estimate_unknown(self):
+        timings = TimingCache(self.path)
+        self.assertListEqual(timings.estimate(['foo', 'bar']), [0.0, 0.0])
+
+
+class TestSchedule(unittest.TestCase):
+    """
+    Tests for longest-processing-time-first scheduling
+    """
+
+    def test_longest_first(self):
+        self.assertListEqual(longest_first([1, 5, 3, 5]), [1, 3, 2, 0])
+
+    def test_plan_schedule(self):
+        workers, makespan = plan_schedule([2, 25, 3, 4, 5], 2)
+
+        self.assertListEqual(workers, [[1], [4, 3, 2, 0]])
+        self.assertEqual(makespan, 25)
+
+    def test_plan_schedule_single_worker(self):
+        workers, makespan = plan_schedule([2, 3], 4)
+
+        self.assertListEqual(workers, [[1], [0]])
+        self.assertEqual(makespan, 3)
+
+    def test_plan_schedule_empty(self):
+        self.assertEqual(plan_schedule([], 4), ([[]], 0.0))
+
+    def test_pack_shards(self):
+        actual = pack_shards([1, 8, 2, 3, 4, 2], 3)
+
+        self.assertListEqual(actual, [[1], [4, 5], [0, 2, 3]])
+
+    def test_pack_shards_unknown_durations(self):
+        actual = pack_shards([0.0] * 5, 2)
+
+        self.assertListEqual(actual, [[0, 2, 4], [1, 3]])
+
+    def test_pack_shards_more_shards_than_items(self):
+        self.assertListEqual(pack_shards([1, 2], 5), [[1], [0]])
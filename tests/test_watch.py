@@ -0,0 +1,81 @@
+from __future__ import print_function, unicode_literals
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from multinosetests.watch import (
+    SourceWatcher,
+    get_changed_files,
+    is_within,
+    take_snapshot,
+)
+
+
+TESTING_MODULE = 'multinosetests.watch'
+
+
+class TestWatch(unittest.TestCase):
+    """
+    Tests for watching sources of suites
+    """
+
+    def setUp(self):
+        super(TestWatch, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        for name in ('foo/a.py', 'foo/b.py', 'foo/.hidden', 'tests/test.py'):
+            self.write(name, 'a = 1\n')
+
+    def path(self, name):
+        return os.path.join(self.tmpdir, name)
+
+    def write(self, name, content):
+        path = self.path(name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with io.open(path, 'w') as fid:
+            fid.write(content)
+
+    def test_is_within(self):
+        self.assertTrue(is_within('/foo/bar.py', '/foo'))
+        self.assertTrue(is_within('/foo', '/foo'))
+        self.assertFalse(is_within('/foobar.py', '/foo'))
+
+    def test_take_snapshot(self):
+        snapshot = take_snapshot([self.path('foo'), self.path('tests')],
+                                 ignore=[self.path('tests')])
+
+        self.assertListEqual(sorted(snapshot),
+                             [self.path('foo/a.py'), self.path('foo/b.py')])
+
+    def test_get_changed_files(self):
+        before = {'a': (1, 1), 'b': (1, 1), 'c': (1, 1)}
+        after = {'a': (1, 1), 'b': (2, 1), 'd': (1, 1)}
+
+        self.assertSetEqual(get_changed_files(before, after),
+                            {'b', 'c', 'd'})
+
+    @mock.patch(TESTING_MODULE + '.time.sleep')
+    def test_wait(self, mock_sleep):
+        watcher = SourceWatcher([[self.path('foo')],
+                                 [self.path('foo/a.py'),
+                                  self.path('tests')]])
+        changes = [lambda: None,
+                   lambda: self.write('foo/b.py', 'b = 22\n'),
+                   lambda: os.unlink(self.path('foo/a.py')),
+                   lambda: None]
+        mock_sleep.side_effect = lambda _: changes.pop(0)()
+
+        changed = watcher.wait()
+
+        self.assertSetEqual(changed, {self.path('foo/a.py'),
+                                      self.path('foo/b.py')})
+        self.assertListEqual(changes, [])
+        self.assertListEqual(watcher.get_changed_suites(changed), [0, 1])
+        self.assertListEqual(
+            watcher.get_changed_suites({self.path('foo/b.py')}), [0],
+        )
@@ -0,0 +1,291 @@
+from __future__ import print_function, unicode_literals
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+from xml.etree import ElementTree
+
+import mock
+
+from multinosetests.xunit import (
+    get_testcase_outcome,
+    is_compression_available,
+    is_valid_report,
+    iter_testcases,
+    merge_xunit_dom,
+    merge_xunit_files,
+    merge_xunit_stream,
+    replace_testcases,
+    truncate_output,
+    write_error_report,
+    zstandard,
+)
+
+
+TESTING_MODULE = 'multinosetests.xunit'
+
+REPORT_FOO = """<?xml version="1.0" encoding="UTF-8"?>
+<testsuite name="nosetests" tests="3" errors="1" failures="1" skip="0">
+<testcase classname="foo.Foo" name="test_ok" time="0.100">
+<system-out>some output</system-out>
+</testcase>
+<testcase classname="foo.Foo" name="test_error" time="0.200">
+<error type="KeyError" message="bad">Traceback</error>
+</testcase>
+<testcase classname="foo.Foo" name="test_failure" time="0.300">
+<failure type="AssertionError" message="nope">Traceback</failure>
+</testcase>
+</testsuite>
+"""
+REPORT_BAR = """<?xml version="1.0" encoding="UTF-8"?>
+<testsuite name="nosetests" tests="2" errors="0" failures="0" skip="1">
+<testcase classname="bar.Bar" name="test_skipped" time="0.000">
+<skipped type="unittest.case.SkipTest" message="skip">skip</skipped>
+</testcase>
+<testcase classname="bar.Bar" name="test_unicode" time="0.500">
+<system-out>☃</system-out>
+</testcase>
+</testsuite>
+"""
+
+
+class XunitTestCase(unittest.TestCase):
+    """
+    Base test case which writes sample xunit reports into
+    a temporary directory
+    """
+
+    def setUp(self):
+        super(XunitTestCase, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.foo = self.write('foo.xml', REPORT_FOO)
+        self.bar = self.write('bar.xml', REPORT_BAR)
+        self.output = os.path.join(self.tmpdir, 'merged.xml')
+
+    def tearDown(self):
+        super(XunitTestCase, self).tearDown()
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, content):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'wb') as fid:
+            fid.write(content.encode('utf-8'))
+        return path
+
+
+class TestXunit(XunitTestCase):
+    """
+    Tests for streaming xunit report helpers
+    """
+
+    def test_iter_testcases(self):
+        actual = [(i.get('name'), get_testcase_outcome(i))
+                  for i in iter_testcases(self.foo)]
+
+        self.assertListEqual(actual, [
+            ('test_ok', None),
+            ('test_error', 'errors'),
+            ('test_failure', 'failures'),
+        ])
+
+    def test_merge_xunit_stream(self):
+        actual = merge_xunit_stream([self.foo, self.bar], self.output)
+
+        expected = {'tests': 5, 'errors': 1, 'failures': 1, 'skip': 1}
+        self.assertDictEqual(actual, expected)
+
+        root = ElementTree.parse(self.output).getroot()
+        self.assertEqual(root.tag, 'testsuite')
+        self.assertDictEqual(
+            {k: int(v) for k, v in root.attrib.items() if k != 'name'},
+            expected
+        )
+        self.assertListEqual(
+            [i.get('name') for i in root],
+            ['test_ok', 'test_error', 'test_failure',
+             'test_skipped', 'test_unicode'],
+        )
+        self.assertEqual(root[1].find('error').text, 'Traceback')
+        self.assertEqual(root[4].find('system-out').text, '☃')
+
+    def test_merge_xunit_stream_nested_suites(self):
+        nested = self.write('nested.xml', (
+            '<testsuites><testsuite name="a">'
+            '<testcase classname="a" name="test_a"/>'
+            '</testsuite><testsuite name="b">'
+            '<testcase classname="b" name="test_b"><failure/></testcase>'
+            '</testsuite></testsuites>'
+        ))
+
+        actual = merge_xunit_stream([nested], self.output)
+
+        self.assertDictEqual(
+            actual,
+            {'tests': 2, 'errors': 0, 'failures': 1, 'skip': 0}
+        )
+
+    def test_merge_xunit_files(self):
+        mock_engine = mock.MagicMock()
+        engines = {'foo': mock_engine}
+
+        with mock.patch.dict(TESTING_MODULE + '.MERGE_ENGINES', engines):
+            merge_xunit_files(['a', 'b'], 'c', 'foo')
+
+        mock_engine.assert_called_once_with(['a', 'b'],
+                                            'c',
+                                            callback=None,
+                                            compression=None)
+
+    def test_merge_xunit_stream_callback(self):
+        names = []
+
+        merge_xunit_stream([self.foo],
+                           self.output,
+                           lambda i: names.append(i.get('name')))
+
+        self.assertListEqual(names, ['test_ok', 'test_error', 'test_failure'])
+
+    def test_merge_xunit_dom(self):
+        callback = mock.MagicMock()
+
+        with mock.patch(TESTING_MODULE + '.merge_xunit') as mock_merge:
+            merge_xunit_dom([self.foo], self.output, callback)
+            tree = ElementTree.parse(self.foo)
+            mock_merge.call_args[1]['callback'](tree)
+
+        mock_merge.assert_called_once_with([self.foo],
+                                           self.output,
+                                           callback=mock.ANY)
+        self.assertEqual(callback.call_count, 3)
+
+    def test_merge_xunit_dom_compressed(self):
+        def merge(files, output, callback):
+            shutil.copyfile(files[0], output)
+
+        with mock.patch(TESTING_MODULE + '.merge_xunit', merge):
+            merge_xunit_dom([self.foo], self.output, compression='gzip')
+
+        with gzip.open(self.output, 'rb') as fid:
+            self.assertEqual(fid.read(), REPORT_FOO.encode('utf-8'))
+        self.assertNotIn('merged.xml.tmp', os.listdir(self.tmpdir))
+
+    def test_merge_xunit_stream_gzip(self):
+        actual = merge_xunit_stream([self.foo, self.bar],
+                                    self.output,
+                                    compression='gzip')
+
+        with open(self.output, 'rb') as fid:
+            self.assertEqual(fid.read(2), b'\x1f\x8b')
+        self.assertEqual(actual['tests'], 5)
+        # compressed reports are read transparently
+        merged = merge_xunit_stream([self.output],
+                                    os.path.join(self.tmpdir, 'plain.xml'))
+        self.assertDictEqual(merged, actual)
+
+    @unittest.skipIf(zstandard is None, 'zstandard is not installed')
+    def test_merge_xunit_stream_zstd(self):
+        merge_xunit_stream([self.foo, self.bar],
+                           self.output,
+                           compression='zstd')
+
+        self.assertListEqual(
+            [i.get('name') for i in iter_testcases(self.output)],
+            ['test_ok', 'test_error', 'test_failure',
+             'test_skipped', 'test_unicode'],
+        )
+
+    def test_is_compression_available(self):
+        self.assertTrue(is_compression_available('gzip'))
+        self.assertEqual(is_compression_available('zstd'),
+                         zstandard is not None)
+        self.assertFalse(is_compression_available('foo'))
+
+    def test_truncate_output(self):
+        testcase = ElementTree.fromstring(
+            '<testcase name="foo">'
+            '<system-out>0123456789</system-out>'
+            '<system-err>short</system-err>'
+            '<failure>0123456789</failure>'
+            '</testcase>'
+        )
+
+        truncate_output(testcase, 5)
+
+        self.assertListEqual(
+            [i.text for i in testcase],
+            ['01234\n[5 characters truncated by multinosetests]',
+             'short',
+             '0123456789'],
+        )
+
+    def test_replace_testcases(self):
+        def replace(testcase):
+            if testcase.get('name') == 'test_error':
+                return ElementTree.Element('testcase', name='test_fixed')
+            return testcase
+
+        actual = replace_testcases(self.foo, replace)
+
+        self.assertDictEqual(
+            actual,
+            {'tests': 3, 'errors': 0, 'failures': 1, 'skip': 0}
+        )
+        self.assertListEqual(
+            [i.get('name') for i in iter_testcases(self.foo)],
+            ['test_ok', 'test_fixed', 'test_failure'],
+        )
+        self.assertListEqual(sorted(os.listdir(self.tmpdir)),
+                             ['bar.xml', 'foo.xml'])
+
+    def test_is_valid_report_compressed(self):
+        path = os.path.join(self.tmpdir, 'partial.xml.gz')
+        with gzip.open(path, 'wb') as fid:
+            fid.write(REPORT_FOO.encode('utf-8'))
+        with open(path, 'rb') as fid:
+            data = fid.read()
+        with open(path, 'wb') as fid:
+            fid.write(data[:len(data) // 2])
+
+        self.assertFalse(is_valid_report(path))
+
+    def test_is_valid_report(self):
+        partial = self.write('partial.xml', REPORT_FOO[:200])
+
+        self.assertTrue(is_valid_report(self.foo))
+        self.assertFalse(is_valid_report(partial))
+        self.assertFalse(is_valid_report(self.output))
+        self.assertTrue(is_valid_report(
+            self.write('empty.xml', '<testsuite name="nosetests" />\n')
+        ))
+        # only the end of the report is checked
+        self.assertTrue(is_valid_report(
+            self.write('invalid.xml', '<testsuite><</testsuite>')
+        ))
+
+    def test_is_valid_report_gzip(self):
+        path = os.path.join(self.tmpdir, 'foo.xml.gz')
+        with gzip.open(path, 'wb') as fid:
+            fid.write(REPORT_FOO.encode('utf-8'))
+
+        self.assertTrue(is_valid_report(path))
+
+    def test_write_error_report(self):
+        write_error_report(self.output,
+                           'multinosetests',
+                           'nosetests tests <foo>',
+                           'Timeout',
+                           'Suite timed out',
+                           1.5)
+
+        actual = merge_xunit_stream([self.output, self.foo], self.output)
+
+        self.assertDictEqual(
+            actual,
+            {'tests': 4, 'errors': 2, 'failures': 1, 'skip': 0}
+        )
+        testcase = next(iter_testcases(self.output))
+        self.assertEqual(testcase.get('name'), 'nosetests tests <foo>')
+        self.assertEqual(testcase.get('time'), '1.500')
+        self.assertEqual(testcase.find('error').get('type'), 'Timeout')
+        self.assertEqual(testcase.find('error').text, 'Suite timed out')